@@ -2,8 +2,8 @@
 """
 Streamlit page that
   • runs mcp_agent.run_chembl_agent(query)  (동기)
-  • 캡쳐되는 stdout/stderr 를 한-줄-한-줄 화면에 실시간으로 표시
-  • 최종 답변은 예쁜 chat-bubble 로 출력
+  • 이 세션의 로그(logging_config.log_context sink)를 한-줄-한-줄 화면에 실시간으로 표시
+  • 최종 답변은 로그와 따로(result) 받아서 예쁜 chat-bubble 로 출력
   • 질문-답변-로그 묶음을 계속 화면에 남겨 둠
 """
 
@@ -12,101 +12,84 @@ Streamlit page that
 ###############################################################################
 import streamlit as st
 import mcp_agent                       # <- run_chembl_agent(query)
-import logging, sys, io, queue, threading, time, contextlib
+import history_store                   # 최근 창만 메모리, 나머지는 디스크
+import queue, threading, time
+import logging_config
+from logging_config import log_context, setup_logging
 
-# --- logger for every run_chembl_agent 내부 print/logger 잡기 ---------------
-LOGGER_NAME = "CHEMBL_MCP"
-logger = logging.getLogger(LOGGER_NAME)
-if not logger.hasHandlers():           # 중복 Handler 방지
-    handler = logging.StreamHandler(sys.stderr)
-    handler.setFormatter(logging.Formatter('%(filename)s:%(lineno)d | %(message)s'))
-    logger.addHandler(handler)
-logger.setLevel(logging.INFO)
+logger = setup_logging().getChild("chembl_mcp_stream_page")
 
 ###############################################################################
-# 1. stdout / stderr 를 Queue 로 tee 하기 위한 래퍼
+# 1. Agent 를 백그라운드에서 돌리면서 로그를 Queue 로 전달
+#    전역 stdout/stderr 를 가로채지 않고, 이 실행의 contextvars 에 sink(q.put)를 걸어
+#    이 세션에서 나온 로그만 받는다 (logging_config.log_context) → 동시 세션끼리 섞이지 않음
+#    sink 는 리스너 스레드에서 늦게 불리므로 답변은 로그에 싣지 않고 result 로 돌려주고,
+#    done_evt 전에 flush 해서 실행 중에 남긴 로그가 모두 q 에 들어간 뒤 끝났다고 알린다
 ###############################################################################
-class StreamToQueue(io.TextIOBase):
-    """print() 또는 logging 이 write() 할 때마다 큐에 push"""
-    def __init__(self, q: queue.Queue): self.q = q
-    def write(self, s: str):
-        if s.strip():                  # 공백줄 거르기
-            self.q.put(s)
-    def flush(self):                   # 필요 없지만 인터페이스용
-        pass
-
-###############################################################################
-# 2. Agent 를 백그라운드에서 돌리면서 로그를 Queue 로 전달
-###############################################################################
-def agent_worker(query: str, q: queue.Queue, done_evt: threading.Event):
-    buf = StreamToQueue(q)
-    with contextlib.redirect_stdout(buf), contextlib.redirect_stderr(buf):
+def agent_worker(query: str, q: queue.Queue, done_evt: threading.Event, session: str, result: dict):
+    with log_context(session=session, sink=q.put):
         try:
-            answer = mcp_agent.run_chembl_agent(query)
-            q.put(f"\n✅ **Answer returned**\n{answer}\n")
+            result["answer"] = mcp_agent.run_chembl_agent(query)
+            logger.info("✅ Answer returned")
         except Exception as exc:
-            q.put(f"\n❌ Error: {exc}\n")
+            result["error"] = str(exc)
+            logger.error(f"❌ Error: {exc}")
+    logging_config.flush()
     done_evt.set()
 
 ###############################################################################
-# 3. Streamlit UI
+# 2. Streamlit UI
 ###############################################################################
 st.set_page_config(page_title="CHEMBL-MCP demo", page_icon="🔬")
 st.title("💬 CHEMBL MCP demo — live tool-usage log")
 
-# --- 세션 상태: 대화 히스토리 ----------------------------------------------
-if "chembl_chat_history" not in st.session_state:
-    # 리스트의 각 원소는 (role, text)
-    st.session_state.chembl_chat_history = [
-        ("assistant", "안녕하세요, 무엇이 궁금하세요?"),
-    ]
+# --- 세션 상태: 대화 히스토리 (history_store.HistoryStore) ------------------
+history = history_store.get_history("chembl_chat_history", greeting="안녕하세요, 무엇이 궁금하세요?")
 
-# --- 과거 메시지 렌더 --------------------------------------------------------
-for role, text in st.session_state.chembl_chat_history:
-    st.chat_message(role).write(text)
+# --- 과거 메시지 렌더 (이전 대화는 "더 보기" 로) ------------------------------
+history_store.render_chat(history)
 
 # --- 사용자 입력 ------------------------------------------------------------
 query = st.chat_input("메시지를 입력하세요")
 if query:
-    # 3-1. 히스토리에 추가 & 즉시 출력
-    st.session_state.chembl_chat_history.append(("user", query))
+    # 2-1. 히스토리에 추가 & 즉시 출력
+    history.append("user", query)
     st.chat_message("user").write(query)
 
-    # 3-2. 질문-단위 전용 container 만들기
+    # 2-2. 질문-단위 전용 container 만들기
     container   = st.container()                   # 묶음
     log_box     = container.empty()                # 실시간 로그
     answer_box  = container.chat_message("assistant")
 
-    # 3-3. 큐 & 이벤트 & worker-thread 준비
+    # 2-3. 큐 & 이벤트 & worker-thread 준비
     q          = queue.Queue()
     done_flag  = threading.Event()
+    result     = {}                                     # answer / error (로그 스트림과 별개)
     threading.Thread(
         target=agent_worker,
-        args=(query, q, done_flag),
+        args=(query, q, done_flag, history.session, result),
         daemon=True,
     ).start()
 
-    # 3-4. polling 으로 큐 읽어와서 로그 갱신
-    lines: list[str] = []
+    # 2-4. polling 으로 큐 읽어와서 로그 갱신 (화면엔 최근 N 줄, 전체는 디스크로)
+    log = history_store.LogBuffer(history)
     while not (done_flag.is_set() and q.empty()):
         try:
-            line = q.get_nowait()
-            lines.append(line)
-            log_box.code("".join(lines), language="")   # 실시간
+            log.append(q.get_nowait())
+            log_box.code(log.text(), language="")       # 실시간
         except queue.Empty:
             time.sleep(0.1)
 
-    # 3-5. 최종 로그 한 번 더 그리기
-    log_box.code("".join(lines), language="")
+    # 2-5. 최종 로그 한 번 더 그리기
+    log.flush()
+    log_box.code(log.text(), language="")
 
-    # 3-6. '✅' 이후가 정답
-    answer_text = ""
-    for idx, ln in enumerate(lines):
-        if ln.startswith("✅"):
-            answer_text = "".join(lines[idx + 1:]).lstrip()
-            break
+    # 2-6. 정답 텍스트
+    answer_text = (result.get("answer") or "").strip()
 
-    # 3-7. 답변 chat-bubble + 히스토리 저장
+    # 2-7. 답변 chat-bubble + 히스토리 저장
     if answer_text:
         answer_box.write(answer_text)
-        st.session_state.chembl_chat_history.append(("assistant", answer_text))
\ No newline at end of file
+        history.append("assistant", answer_text)
+    elif "error" in result:
+        answer_box.error(result["error"])
\ No newline at end of file
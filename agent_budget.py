@@ -0,0 +1,246 @@
+# agent_budget.py
+"""
+에이전트 실행(run_*_agent 한 번) 단위의 예산.
+
+  deadline_s         전체 wall-clock 마감 (이 시간이 지나면 모아 둔 결과로 부분 답변을 돌려준다)
+  max_tool_calls     도구 호출 횟수 상한
+  tool_timeout_s     도구 호출 1회 상한
+  max_output_tokens  모델 출력 토큰 누적 상한
+
+도구 쪽 예산(호출 수 / 마감 - SYNTHESIS_RESERVE_S / 출력 토큰)이 먼저 바닥나면
+BudgetedTool 이 도구 대신 "지금 있는 정보로 답하라" 는 결과를 돌려주고, RoutedModel 은
+그 뒤의 턴을 synthesis 모델로 바로 보낸다. 그래도 마감을 넘기면 run_with_budget 이
+지금까지 모은 도구 결과로 부분 답변을 만든다. 어떤 예산이 걸렸는지는 report() 에 남는다.
+"""
+import contextvars
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+from datetime import timedelta
+from typing import Any, Optional
+
+from strands.tools.mcp.mcp_agent_tool import MCPAgentTool
+from strands.types.tools import AgentTool
+
+import profiler
+from logging_config import log_context, log_sink, request_id, session_id, setup_logging
+
+logger = setup_logging().getChild("agent_budget")
+
+DEADLINE_S = float(os.getenv("AGENT_DEADLINE_S", "90"))
+MAX_TOOL_CALLS = int(os.getenv("AGENT_MAX_TOOL_CALLS", "8"))
+TOOL_TIMEOUT_S = float(os.getenv("AGENT_TOOL_TIMEOUT_S", "30"))
+MAX_OUTPUT_TOKENS = int(os.getenv("AGENT_MAX_OUTPUT_TOKENS", "8000"))
+# 마감 전에 최종 답변 작성을 위해 남겨 두는 시간
+SYNTHESIS_RESERVE_S = float(os.getenv("AGENT_SYNTHESIS_RESERVE_S", "20"))
+
+# 현재 스레드에서 돌고 있는 실행의 예산 (RoutedModel 이 읽는다)
+current_budget: contextvars.ContextVar = contextvars.ContextVar("agent_budget", default=None)
+
+# MCP 가 아닌 도구의 타임아웃용
+_tool_pool = ThreadPoolExecutor(max_workers=int(os.getenv("AGENT_TOOL_THREADS", "16")),
+                                thread_name_prefix="budgeted-tool")
+
+
+class RunBudget:
+    def __init__(self, deadline_s: float = DEADLINE_S, max_tool_calls: int = MAX_TOOL_CALLS,
+                 tool_timeout_s: float = TOOL_TIMEOUT_S, max_output_tokens: int = MAX_OUTPUT_TOKENS):
+        self.deadline_s = deadline_s
+        self.max_tool_calls = max_tool_calls
+        self.tool_timeout_s = tool_timeout_s
+        self.max_output_tokens = max_output_tokens
+        self.started = time.monotonic()
+        self.tool_calls = 0
+        self.tool_timeouts = 0
+        self.output_tokens = 0
+        self.tripped = None      # 처음 걸린 예산 이름
+        self.partial = False     # 마감으로 부분 답변을 돌려줬는지
+        self._lock = threading.Lock()
+
+    def elapsed(self) -> float:
+        return time.monotonic() - self.started
+
+    def remaining(self) -> float:
+        return self.deadline_s - self.elapsed()
+
+    def trip(self, reason: str):
+        with self._lock:
+            if self.tripped is None:
+                self.tripped = reason
+                logger.info(f"budget tripped: {reason} (elapsed {self.elapsed():.1f}s, "
+                            f"tool_calls {self.tool_calls}, output_tokens {self.output_tokens})")
+
+    def add_output_tokens(self, n: int):
+        with self._lock:
+            self.output_tokens += n
+        if self.output_tokens >= self.max_output_tokens:
+            self.trip("max_output_tokens")
+
+    def check_deadline(self) -> Optional[str]:
+        """최종 답변 작성 시간만 남았으면 "deadline" 으로 닫는다."""
+        if self.remaining() <= SYNTHESIS_RESERVE_S:
+            self.trip("deadline")
+        return self.tripped
+
+    def acquire_tool_call(self) -> Optional[str]:
+        """도구를 불러도 되면 None, 아니면 걸린 예산 이름."""
+        self.check_deadline()
+        with self._lock:
+            if self.tripped is None and self.tool_calls >= self.max_tool_calls:
+                self.tripped = "max_tool_calls"
+                logger.info(f"budget tripped: max_tool_calls ({self.max_tool_calls})")
+            if self.tripped:
+                return self.tripped
+            self.tool_calls += 1
+        return None
+
+    def tool_timeout(self) -> float:
+        return max(1.0, min(self.tool_timeout_s, self.remaining() - SYNTHESIS_RESERVE_S))
+
+    def synthesis_instruction(self) -> str:
+        return (
+            f"\n\nIMPORTANT: the research budget for this request is exhausted ({self.tripped}). "
+            "Do not call any more tools. Write the final answer now using only the information "
+            "already gathered, and clearly say which parts could not be checked."
+        )
+
+    def report(self) -> dict:
+        return {
+            "tripped": self.tripped,
+            "partial": self.partial,
+            "elapsed_s": round(self.elapsed(), 2),
+            "tool_calls": self.tool_calls,
+            "tool_timeouts": self.tool_timeouts,
+            "output_tokens": self.output_tokens,
+            "limits": {
+                "deadline_s": self.deadline_s,
+                "max_tool_calls": self.max_tool_calls,
+                "tool_timeout_s": self.tool_timeout_s,
+                "max_output_tokens": self.max_output_tokens,
+            },
+        }
+
+#--------------------------------
+# 도구 래퍼
+
+
+def call_tool(tool: AgentTool, tool_use: dict, timeout: float, *args: Any, **kwargs: Any) -> dict:
+    """tool 을 timeout 초 안에서 한 번 호출한다. 타임아웃은 error 결과로 돌려준다."""
+    if isinstance(tool, MCPAgentTool):
+        # MCP 세션이 자체 타임아웃을 지원하므로 그쪽을 쓴다 (타임아웃은 error 결과로 돌아옴)
+        return tool.mcp_client.call_tool_sync(
+            tool_use_id=tool_use["toolUseId"], name=tool.tool_name, arguments=tool_use["input"],
+            read_timeout_seconds=timedelta(seconds=timeout),
+        )
+    future = _tool_pool.submit(profiler.bind(tool.invoke), tool_use, *args, **kwargs)
+    try:
+        return future.result(timeout=timeout)
+    except FutureTimeout:
+        return {"toolUseId": tool_use["toolUseId"], "status": "error",
+                "content": [{"text": f"Tool timed out after {timeout:.0f}s"}]}
+
+
+class BudgetedTool(AgentTool):
+    """
+    다른 AgentTool 을 감싸서 호출 수 / 호출 시간 예산을 적용한다.
+    prefetch(tool_prefetch.Prefetcher)가 있으면 미리 받아 둔 같은 호출의 결과를 먼저 쓴다.
+    """
+
+    def __init__(self, tool: AgentTool, budget: RunBudget, prefetch=None):
+        super().__init__()
+        self.tool = tool
+        self.budget = budget
+        self.prefetch = prefetch
+        # Strands 는 도구를 자체 스레드 풀에서 돌려 contextvars 가 안 넘어간다 → 만든 시점의 로그 ID 를 들고 감
+        self.log_ids = (session_id.get(), request_id.get(), log_sink.get())
+
+    @property
+    def tool_name(self) -> str:
+        return self.tool.tool_name
+
+    @property
+    def tool_spec(self):
+        return self.tool.tool_spec
+
+    @property
+    def tool_type(self) -> str:
+        return self.tool.tool_type
+
+    def _refused(self, tool_use_id: str, reason: str) -> dict:
+        return {
+            "toolUseId": tool_use_id,
+            "status": "error",
+            "content": [{"text": f"Tool call skipped: budget exhausted ({reason}). "
+                                 "Answer now with the information already gathered."}],
+        }
+
+    def invoke(self, tool, *args: Any, **kwargs: Any) -> dict:
+        with log_context(*self.log_ids), profiler.tagged():
+            return self._invoke(tool, *args, **kwargs)
+
+    def _invoke(self, tool, *args: Any, **kwargs: Any) -> dict:
+        reason = self.budget.acquire_tool_call()
+        if reason:
+            return self._refused(tool["toolUseId"], reason)
+        timeout = self.budget.tool_timeout()
+
+        result = self.prefetch.take(tool, timeout) if self.prefetch is not None else None
+        if result is None:
+            result = call_tool(self.tool, tool, timeout, *args, **kwargs)
+
+        if result.get("status") == "error" and "timed out" in str(result.get("content", "")).lower():
+            with self.budget._lock:
+                self.budget.tool_timeouts += 1
+        return result
+
+
+def wrap_tools(tools: list, budget: RunBudget, prefetch=None) -> list:
+    return [BudgetedTool(t, budget, prefetch) if isinstance(t, AgentTool) else t for t in tools]
+
+#--------------------------------
+# 실행
+
+
+def _partial_answer(messages: list, budget: RunBudget) -> str:
+    """마감까지 최종 답이 없을 때: 수집된 도구 결과를 그대로 정리해서 돌려준다."""
+    findings = []
+    for m in messages:
+        for block in m.get("content", []):
+            result = block.get("toolResult")
+            if result and result.get("status") == "success":
+                text = " ".join(c.get("text", "") for c in result.get("content", []) if "text" in c).strip()
+                if text:
+                    findings.append(text[:1500])
+    header = (f"⚠️ 처리 시간 제한({budget.deadline_s:.0f}초)을 넘어 최종 정리 없이 "
+              f"지금까지 조회된 결과만 보여드립니다.")
+    if not findings:
+        return header + "\n\n조회된 결과가 없습니다. 질문을 좁혀서 다시 시도해 주세요."
+    return header + "\n\n" + "\n\n---\n\n".join(findings[-5:])
+
+
+def run_with_budget(agent, query: str, budget: RunBudget) -> str:
+    """
+    agent(query) 를 별도 스레드에서 돌리고 budget.deadline_s 까지만 기다린다.
+    마감을 넘기면 예산을 "deadline" 으로 닫아 남은 도구 호출을 막고 부분 답변을 돌려준다.
+    """
+    holder = {}
+    ctx = contextvars.copy_context()
+
+    def target():
+        current_budget.set(budget)
+        try:
+            holder["result"] = str(agent(query))
+        except Exception as e:
+            holder["error"] = e
+
+    thread = threading.Thread(target=ctx.run, args=(profiler.bind(target),), daemon=True, name="agent-run")
+    thread.start()
+    thread.join(max(0.0, budget.remaining()))
+    if thread.is_alive():
+        budget.trip("deadline")
+        budget.partial = True
+        return _partial_answer(list(agent.messages), budget)
+    if "error" in holder:
+        raise holder["error"]
+    return holder["result"]
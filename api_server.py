@@ -0,0 +1,461 @@
+# api_server.py
+"""
+Streamlit 없이 KB / MCP 에이전트를 호출하기 위한 headless HTTP(ASGI) 서버.
+
+  uvicorn api_server:app --host 0.0.0.0 --port 8080
+
+  POST /kb/query                    {"question": "...", "filters": {...}}  filters 는 선택 (kb_filters.py:
+                                    source_prefix / doc_types / year_from / year_to)
+  POST /kb/query/stream             (SSE: start → text/citation … → answer → done)
+  GET  /kb/citation?uri=s3://...&page=N  인용한 PDF 한 페이지의 텍스트 (range 읽기 + 캐시, citations.py)
+  POST /agents/{name}/query         {"query": "..."}  → {"answer", "budget": 예산 사용/초과 내역}
+  POST /agents/{name}/query/stream  (SSE)
+  GET  /agents, GET /health, GET /metrics/models (단계별 모델 지연/비용, 리전별 엔드포인트 헤지/차단 상태)
+  GET  /metrics/usage?by=page&days=1 (token_meter 누적 토큰/비용과 예산 상태)
+  GET  /diagnostics/profiles        최근 프로파일 요약 (profiler.py)
+  GET  /diagnostics/profiles/{id}?format=speedscope|collapsed
+  GET  /diagnostics/warmup          인기 질문 캐시 커버리지와 마지막 warm-up 결과 (warmup.py)
+  query / stream 요청에 X-Profile: 1 헤더 또는 ?profile=1 을 붙이면 그 요청을 샘플링 프로파일한다.
+
+kb_client.query / run_*_agent 는 모두 blocking 함수라서 워커 풀(스레드)에서 돌리고,
+풀이 꽉 차면 대기열에 쌓지 않고 바로 429 를 돌려준다 (backpressure).
+"""
+import asyncio
+import contextlib
+import contextvars
+import json
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import FileResponse, JSONResponse, StreamingResponse
+from starlette.routing import Route
+
+import agent_budget
+import citations
+import history_store
+import kb_client
+import kb_filters
+import mcp_agent
+import model_hedge
+import model_router
+import logging_config
+import profiler
+import token_meter
+import warmup
+from logging_config import request_id as log_request_id, setup_logging
+
+logger = setup_logging().getChild("api_server")
+
+KB_WORKERS = int(os.getenv("API_KB_WORKERS", "8"))
+AGENT_WORKERS = int(os.getenv("API_AGENT_WORKERS", "4"))
+# 워커 수를 넘어서 대기시킬 수 있는 요청 수 (0 이면 워커가 모두 바쁠 때 즉시 429)
+QUEUE_LIMIT = int(os.getenv("API_QUEUE_LIMIT", "4"))
+KB_TIMEOUT = float(os.getenv("API_KB_TIMEOUT", "120"))
+# 에이전트는 자체 마감(AGENT_DEADLINE_S)에서 부분 답변을 돌려주므로 이 값은 바깥 안전장치
+AGENT_TIMEOUT = float(os.getenv("API_AGENT_TIMEOUT", str(agent_budget.DEADLINE_S + 30)))
+SSE_KEEPALIVE = 15.0  # 초, 프록시가 연결을 끊지 않도록 주기적으로 comment 전송
+
+
+class PoolSaturated(Exception):
+    pass
+
+
+class WorkerPool:
+    """ThreadPoolExecutor + 동시 요청 상한.
+
+    슬롯은 작업이 실제로 끝날 때 반납된다. 타임아웃으로 응답을 먼저 돌려줘도
+    백그라운드에서 계속 도는 작업은 슬롯을 잡고 있으므로 과부하가 숨지 않는다.
+    """
+
+    def __init__(self, name: str, workers: int, queue_limit: int):
+        self.name = name
+        self.capacity = workers + queue_limit
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix=f"{name}-worker")
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self.workers = workers
+
+    def _release(self, _fut):
+        with self._lock:
+            self._in_flight -= 1
+
+    async def run(self, fn, *args, timeout: float):
+        with self._lock:
+            if self._in_flight >= self.capacity:
+                raise PoolSaturated(self.name)
+            self._in_flight += 1
+        try:
+            # 요청 ID 등 contextvars 를 워커 스레드로 넘긴다 (로그에 request_id 가 붙도록)
+            # bind: 프로파일러가 이 워커 스레드를 요청의 스레드로 알아보도록 request_id 를 표시
+            fut = self._executor.submit(contextvars.copy_context().run, profiler.bind(fn), *args)
+        except Exception:
+            self._release(None)
+            raise
+        fut.add_done_callback(self._release)
+        return await asyncio.wait_for(asyncio.wrap_future(fut), timeout=timeout)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"workers": self.workers, "capacity": self.capacity, "in_flight": self._in_flight}
+
+
+kb_pool = WorkerPool("kb", KB_WORKERS, QUEUE_LIMIT)
+agent_pool = WorkerPool("agent", AGENT_WORKERS, QUEUE_LIMIT)
+
+#--------------------------------
+
+
+def _error(status: int, message: str, **extra) -> JSONResponse:
+    headers = {"Retry-After": "5"} if status == 429 else None
+    return JSONResponse({"error": message, **extra}, status_code=status, headers=headers)
+
+
+async def _read_text(request: Request, key: str):
+    try:
+        body = await request.json()
+    except ValueError:  # JSONDecodeError 또는 UTF-8 이 아닌 본문의 UnicodeDecodeError → 400
+        return None
+    text = body.get(key) if isinstance(body, dict) else None
+    if not isinstance(text, str) or not text.strip():
+        return None
+    return text.strip()
+
+
+async def _read_kb_filters(request: Request):
+    """본문의 선택 항목 "filters" (kb_filters.parse). 잘못되면 ValueError."""
+    try:
+        body = await request.json()
+    except ValueError:
+        return {}
+    return kb_filters.parse(body.get("filters")) if isinstance(body, dict) else {}
+
+
+def _kb_call(args) -> dict:
+    question, filters = args
+    answer, sources, cites = kb_client.query(question, filters)
+    return {"answer": answer, "sources": sources, "citations": cites}
+
+
+def _kb_stream(args):
+    question, filters = args
+    return kb_client.query_stream(question, filters)
+
+
+def _citation_call(args) -> dict:
+    uri, page = args
+    return {**citations.fetch_page(uri, page), "url": citations.presigned_url(uri, page)}
+
+
+def _agent_call(name: str):
+    # 응답의 "budget" 에 어떤 예산(deadline / max_tool_calls / ...)이 걸렸는지 담긴다
+    return lambda q: {"agent": name, **mcp_agent.run_agent(name, q)}
+
+
+def _wants_profile(request: Request) -> bool:
+    flag = request.headers.get("x-profile") or request.query_params.get("profile") or ""
+    return flag.lower() in ("1", "true", "yes", "on")
+
+
+async def _run_json(pool: WorkerPool, fn, arg: str, timeout: float, profile: bool = False) -> JSONResponse:
+    request_id = uuid.uuid4().hex[:12]
+    log_request_id.set(request_id)
+    profiler.requested.set(profile)
+    t0 = time.perf_counter()
+    try:
+        result = await pool.run(fn, arg, timeout=timeout)
+    except PoolSaturated:
+        logger.warning(f"[{request_id}] {pool.name} pool saturated")
+        return _error(429, f"{pool.name} workers are saturated, retry later")
+    except asyncio.TimeoutError:
+        logger.warning(f"[{request_id}] {pool.name} request timed out after {timeout}s")
+        return _error(504, f"request timed out after {timeout:.0f}s", request_id=request_id)
+    except token_meter.BudgetExceeded as e:
+        return _error(402, str(e), request_id=request_id)
+    except citations.PageNotFound as e:
+        return _error(404, str(e), request_id=request_id)
+    except citations.NotAllowed as e:
+        return _error(403, str(e), request_id=request_id)
+    except Exception as e:
+        logger.error(f"[{request_id}] {pool.name} request failed: {e}")
+        return _error(500, str(e), request_id=request_id)
+    result["request_id"] = request_id
+    result["elapsed_ms"] = round((time.perf_counter() - t0) * 1000, 1)
+    if profile:
+        # 프로파일은 요청이 끝난 뒤 백그라운드에서 저장됨 → /diagnostics/profiles 에서 request_id 로 찾는다
+        result["profiled"] = True
+    return JSONResponse(result)
+
+
+def _sse(event: str, data) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+def _run_sse(pool: WorkerPool, fn, arg: str, timeout: float, profile: bool = False):
+    """워커 풀에서 fn(arg) 를 돌리면서 SSE 로 진행 상황/결과를 흘려보낸다."""
+    request_id = uuid.uuid4().hex[:12]
+
+    async def gen():
+        log_request_id.set(request_id)
+        profiler.requested.set(profile)
+        t0 = time.perf_counter()
+        task = asyncio.ensure_future(pool.run(fn, arg, timeout=timeout))
+        yield _sse("start", {"request_id": request_id})
+        while True:
+            done, _ = await asyncio.wait({task}, timeout=SSE_KEEPALIVE)
+            if done:
+                break
+            yield ": keep-alive\n\n"
+        try:
+            result = task.result()
+        except PoolSaturated:
+            yield _sse("error", {"status": 429, "error": f"{pool.name} workers are saturated, retry later"})
+            return
+        except asyncio.TimeoutError:
+            yield _sse("error", {"status": 504, "error": f"request timed out after {timeout:.0f}s"})
+            return
+        except token_meter.BudgetExceeded as e:
+            yield _sse("error", {"status": 402, "error": str(e)})
+            return
+        except Exception as e:
+            yield _sse("error", {"status": 500, "error": str(e)})
+            return
+        yield _sse("answer", result)
+        yield _sse("done", {"request_id": request_id,
+                            "elapsed_ms": round((time.perf_counter() - t0) * 1000, 1)})
+
+    return gen()
+
+
+_DONE = object()
+
+
+def _run_sse_events(pool: WorkerPool, gen_fn, arg: str, timeout: float, profile: bool = False):
+    """gen_fn(arg) 가 내는 {"type": ..., ...} 이벤트를 워커 스레드에서 받아 그대로 SSE 로 중계한다."""
+    request_id = uuid.uuid4().hex[:12]
+
+    async def gen():
+        log_request_id.set(request_id)
+        profiler.requested.set(profile)
+        t0 = time.perf_counter()
+        loop = asyncio.get_running_loop()
+        q = asyncio.Queue()
+
+        def pump(a):
+            try:
+                for ev in gen_fn(a):
+                    loop.call_soon_threadsafe(q.put_nowait, ev)
+            finally:
+                loop.call_soon_threadsafe(q.put_nowait, _DONE)
+
+        task = asyncio.ensure_future(pool.run(pump, arg, timeout=timeout))
+        yield _sse("start", {"request_id": request_id})
+        getter = None
+        watch = {task}
+        try:
+            while True:
+                getter = getter or asyncio.ensure_future(q.get())
+                done, _ = await asyncio.wait({getter} | watch, timeout=SSE_KEEPALIVE,
+                                             return_when=asyncio.FIRST_COMPLETED)
+                if getter in done:
+                    ev, getter = getter.result(), None
+                    if ev is _DONE:
+                        break
+                    ev = dict(ev)
+                    kind = ev.pop("type")
+                    yield _sse("answer" if kind == "done" else kind, ev)
+                elif task in done:
+                    watch = set()
+                    if task.exception() is not None:
+                        break
+                elif not done:
+                    yield ": keep-alive\n\n"
+            try:
+                await task
+            except PoolSaturated:
+                yield _sse("error", {"status": 429, "error": f"{pool.name} workers are saturated, retry later"})
+                return
+            except asyncio.TimeoutError:
+                yield _sse("error", {"status": 504, "error": f"request timed out after {timeout:.0f}s"})
+                return
+            except token_meter.BudgetExceeded as e:
+                yield _sse("error", {"status": 402, "error": str(e)})
+                return
+            except Exception as e:
+                yield _sse("error", {"status": 500, "error": str(e)})
+                return
+            yield _sse("done", {"request_id": request_id,
+                                "elapsed_ms": round((time.perf_counter() - t0) * 1000, 1)})
+        finally:
+            if getter is not None:
+                getter.cancel()
+
+    return gen()
+
+
+def _stream_response(pool: WorkerPool, fn, arg: str, timeout: float, events: bool = False, profile: bool = False):
+    # 스트림을 열기 전에 포화 여부를 확인해야 429 를 상태코드로 돌려줄 수 있다
+    if pool.stats()["in_flight"] >= pool.capacity:
+        return _error(429, f"{pool.name} workers are saturated, retry later")
+    body = (_run_sse_events(pool, fn, arg, timeout, profile) if events
+            else _run_sse(pool, fn, arg, timeout, profile))
+    return StreamingResponse(
+        body,
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+#--------------------------------
+
+
+async def _log_query(request: Request, channel: str, text: str):
+    # warmup 이 인기 질문을 뽑는 곳 (Streamlit 페이지 질문과 같은 테이블).
+    # 같은 클라이언트(X-Client-Id, 없으면 접속 주소)의 질문은 한 세션으로 남겨 물어본 사람 수가 부풀지 않게 한다
+    client = request.headers.get("x-client-id") or (request.client.host if request.client else "-")
+    try:
+        await asyncio.to_thread(history_store.log_query, channel, text, f"api:{client[:128]}")
+    except Exception as e:
+        logger.warning(f"query log failed: {e}")
+
+
+async def kb_query(request: Request):
+    question = await _read_text(request, "question")
+    if question is None:
+        return _error(400, "body must be JSON with a non-empty 'question'")
+    try:
+        filters = await _read_kb_filters(request)
+    except ValueError as e:
+        return _error(400, str(e))
+    await _log_query(request, "api:kb", question)
+    return await _run_json(kb_pool, _kb_call, (question, filters), KB_TIMEOUT, _wants_profile(request))
+
+
+async def kb_query_stream(request: Request):
+    question = await _read_text(request, "question")
+    if question is None:
+        return _error(400, "body must be JSON with a non-empty 'question'")
+    try:
+        filters = await _read_kb_filters(request)
+    except ValueError as e:
+        return _error(400, str(e))
+    await _log_query(request, "api:kb", question)
+    return _stream_response(kb_pool, _kb_stream, (question, filters), KB_TIMEOUT, events=True,
+                            profile=_wants_profile(request))
+
+
+async def kb_citation(request: Request):
+    uri = request.query_params.get("uri", "")
+    if not uri.startswith("s3://"):
+        return _error(400, "'uri' must be an s3:// URI of a knowledge-base document")
+    if not citations.allowed(uri):
+        return _error(403, "'uri' is outside the knowledge-base buckets")
+    try:
+        page = int(request.query_params.get("page", ""))
+    except ValueError:
+        return _error(400, "'page' must be a page number")
+    if page < 1:
+        return _error(400, "'page' must be a page number")
+    return await _run_json(kb_pool, _citation_call, (uri, page), KB_TIMEOUT)
+
+
+async def agent_query(request: Request):
+    name = request.path_params["name"]
+    if name not in mcp_agent.AGENT_RUNNERS:
+        return _error(404, f"unknown agent '{name}'", agents=sorted(mcp_agent.AGENT_RUNNERS))
+    query = await _read_text(request, "query")
+    if query is None:
+        return _error(400, "body must be JSON with a non-empty 'query'")
+    await _log_query(request, f"api:{name}", query)
+    return await _run_json(agent_pool, _agent_call(name), query, AGENT_TIMEOUT, _wants_profile(request))
+
+
+async def agent_query_stream(request: Request):
+    name = request.path_params["name"]
+    if name not in mcp_agent.AGENT_RUNNERS:
+        return _error(404, f"unknown agent '{name}'", agents=sorted(mcp_agent.AGENT_RUNNERS))
+    query = await _read_text(request, "query")
+    if query is None:
+        return _error(400, "body must be JSON with a non-empty 'query'")
+    await _log_query(request, f"api:{name}", query)
+    return _stream_response(agent_pool, _agent_call(name), query, AGENT_TIMEOUT, profile=_wants_profile(request))
+
+
+async def list_agents(request: Request):
+    return JSONResponse({"agents": sorted(mcp_agent.AGENT_RUNNERS)})
+
+
+async def health(request: Request):
+    return JSONResponse({"status": "ok", "pools": {"kb": kb_pool.stats(), "agent": agent_pool.stats()},
+                         "logging": logging_config.stats()})
+
+
+async def model_report(request: Request):
+    return JSONResponse({"policy": model_router.policy, "steps": model_router.report(),
+                         "endpoints": model_hedge.stats()})
+
+
+async def usage_report(request: Request):
+    by = request.query_params.get("by", "page")
+    if by not in token_meter.GROUP_COLUMNS:
+        return _error(400, f"'by' must be one of {sorted(token_meter.GROUP_COLUMNS)}")
+    try:
+        days = float(request.query_params.get("days", "1"))
+    except ValueError:
+        return _error(400, "'days' must be a number")
+    return JSONResponse({"budget": token_meter.budget_status(), by: token_meter.aggregate(by, days)})
+
+
+async def list_profiles(request: Request):
+    return JSONResponse({"profiles": profiler.recent()})
+
+
+async def get_profile(request: Request):
+    fmt = request.query_params.get("format", "speedscope")
+    if fmt not in ("speedscope", "collapsed"):
+        return _error(400, "'format' must be speedscope or collapsed")
+    try:
+        path = profiler.path(request.path_params["id"], fmt)
+    except FileNotFoundError:
+        return _error(404, f"unknown profile '{request.path_params['id']}'")
+    return FileResponse(path, media_type="application/json" if fmt == "speedscope" else "text/plain",
+                        filename=os.path.basename(path))
+
+
+async def warmup_report(request: Request):
+    return JSONResponse(await asyncio.to_thread(warmup.status))
+
+
+def _busy() -> bool:
+    return kb_pool.stats()["in_flight"] + agent_pool.stats()["in_flight"] > 0
+
+
+@contextlib.asynccontextmanager
+async def lifespan(app):
+    # 매일 WARM_AT 에 인기 질문으로 캐시를 채운다 (요청을 처리 중이면 기다렸다가)
+    warmup.schedule(busy=_busy)
+    yield
+
+
+app = Starlette(lifespan=lifespan, routes=[
+    Route("/kb/query", kb_query, methods=["POST"]),
+    Route("/kb/query/stream", kb_query_stream, methods=["POST"]),
+    Route("/kb/citation", kb_citation, methods=["GET"]),
+    Route("/agents", list_agents, methods=["GET"]),
+    Route("/agents/{name}/query", agent_query, methods=["POST"]),
+    Route("/agents/{name}/query/stream", agent_query_stream, methods=["POST"]),
+    Route("/health", health, methods=["GET"]),
+    Route("/metrics/models", model_report, methods=["GET"]),
+    Route("/metrics/usage", usage_report, methods=["GET"]),
+    Route("/diagnostics/profiles", list_profiles, methods=["GET"]),
+    Route("/diagnostics/profiles/{id}", get_profile, methods=["GET"]),
+    Route("/diagnostics/warmup", warmup_report, methods=["GET"]),
+])
+
+
+if __name__ == "__main__":
+    import uvicorn
+    uvicorn.run(app, host=os.getenv("API_HOST", "0.0.0.0"), port=int(os.getenv("API_PORT", "8080")))
@@ -0,0 +1,97 @@
+# benchmarks/bench_quant.py
+"""
+양자화 인덱스의 recall / 지연 / 메모리 비교 (kb_quant.QuantizedIndex).
+
+  python -m benchmarks.bench_quant --docs 100000 --queries 200
+  python -m benchmarks.bench_quant --vectors dump.npy      # 실제 embedding_v2 덤프로 측정
+
+기준은 fp32 전수 내적(exact). recall@k = exact top-k 중 양자화 검색이 찾은 비율.
+"""
+import argparse
+import json
+import time
+
+import numpy as np
+
+from benchmarks.run_bench import percentile
+from kb_quant import QuantizedIndex
+
+
+def synthetic(n: int, dim: int, rank: int = 96, seed: int = 0) -> np.ndarray:
+    """저차원 잠재 구조 + 작은 잡음을 가진 단위 벡터 (실제 문장 임베딩처럼 intrinsic dim 이 낮은 분포 흉내)."""
+    rng = np.random.default_rng(seed)
+    basis = rng.normal(size=(rank, dim)).astype(np.float32)
+    x = rng.normal(size=(n, rank)).astype(np.float32) @ basis
+    x += 0.05 * np.linalg.norm(x, axis=1, keepdims=True) / np.sqrt(dim) * rng.normal(size=(n, dim)).astype(np.float32)
+    return x / np.linalg.norm(x, axis=1, keepdims=True)
+
+
+def exact_topk(full: np.ndarray, q: np.ndarray, k: int) -> np.ndarray:
+    s = full @ q
+    idx = np.argpartition(-s, k - 1)[:k]
+    return idx[np.argsort(-s[idx])]
+
+
+def bench(full, queries, k: int, name: str, search):
+    lat, recall = [], []
+    for q in queries:
+        truth = set(exact_topk(full, q, k).tolist())
+        t0 = time.perf_counter()
+        ids, _ = search(q)
+        lat.append(time.perf_counter() - t0)
+        recall.append(len(truth & set(np.asarray(ids).tolist())) / k)
+    return {
+        "config": name,
+        f"recall@{k}": round(float(np.mean(recall)), 4),
+        "p50_ms": round(percentile(lat, 50) * 1000, 3),
+        "p95_ms": round(percentile(lat, 95) * 1000, 3),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--vectors", default="", help="(N, dim) float32 .npy 파일")
+    parser.add_argument("--docs", type=int, default=50000)
+    parser.add_argument("--dim", type=int, default=1024)
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--candidates", default="20,50,100", help="재채점 후보 수 목록")
+    parser.add_argument("--pq-m", type=int, default=64)
+    parser.add_argument("--json", action="store_true")
+    args = parser.parse_args(argv)
+
+    if args.vectors:
+        full = np.load(args.vectors, mmap_mode="r")
+    else:
+        full = synthetic(args.docs, args.dim)
+    rng = np.random.default_rng(1)
+    picks = rng.choice(len(full), args.queries, replace=False)
+    queries = np.asarray(full[picks], dtype=np.float32)
+    queries += 0.5 * rng.normal(size=queries.shape).astype(np.float32) / np.sqrt(queries.shape[1])
+    queries /= np.linalg.norm(queries, axis=1, keepdims=True)
+    dense = np.asarray(full, dtype=np.float32)
+
+    rows = [dict(bench(dense, queries, args.k, "fp32 exact", lambda q: (exact_topk(dense, q, args.k), None)),
+                 bytes_per_vec=full.shape[1] * 4)]
+    for mode in ("int8", "pq"):
+        t0 = time.perf_counter()
+        index = QuantizedIndex(full, mode=mode, pq_m=args.pq_m)
+        build_s = time.perf_counter() - t0
+        bpv = index.code_bytes // len(full)
+        rows.append(dict(bench(dense, queries, args.k, f"{mode}",
+                               lambda q: index.search(q, args.k, rescore=False)),
+                         bytes_per_vec=bpv, build_s=round(build_s, 1)))
+        for c in (int(x) for x in args.candidates.split(",")):
+            rows.append(dict(bench(dense, queries, args.k, f"{mode}+rescore@{c}",
+                                   lambda q: index.search(q, args.k, candidates=c)),
+                             bytes_per_vec=bpv))
+
+    if args.json:
+        print(json.dumps(rows))
+    else:
+        for r in rows:
+            print("  ".join(f"{k}={v}" for k, v in r.items()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,345 @@
+# benchmarks/fakes.py
+"""
+AWS 없이 성능을 재기 위한 로컬 대역(stand-in)들.
+
+  FakeBedrockRuntime       - bedrock-runtime (invoke_model / converse / converse_stream)
+  FakeBedrockAgentRuntime  - bedrock-agent-runtime (retrieve_and_generate / _stream)
+  FakeOpenSearch           - AOSS KNN 검색 (search / index / bulk / delete, knn filter: bool/prefix/term(s)/range)
+
+지연 시간은 생성자 인자로 고정값(float) 또는 (평균, 표준편차) 튜플로 준다.
+꼬리 지연/스로틀링 주입 (model_hedge 헤지·페일오버 측정용, Bedrock 대역 두 개):
+  tail=(확률, 초)   그 확률로 첫 응답 전에 지연을 더한다
+  throttle_rate     그 확률로 ThrottlingException (botocore ClientError)
+install_kb_fakes() 로 kb_client 모듈의 전역 클라이언트를 통째로 바꿔 끼운다.
+"""
+import hashlib
+import io
+import json
+import math
+import random
+import threading
+import time
+import uuid
+
+from botocore.exceptions import ClientError
+
+
+def _sleep(delay):
+    if not delay:
+        return
+    if isinstance(delay, (tuple, list)):
+        mean, std = delay
+        delay = max(0.0, random.gauss(mean, std))
+    time.sleep(delay)
+
+
+def _inject_faults(tail, throttle_rate, operation: str):
+    if throttle_rate and random.random() < throttle_rate:
+        raise ClientError({"Error": {"Code": "ThrottlingException", "Message": "Rate exceeded"}}, operation)
+    if tail and random.random() < tail[0]:
+        time.sleep(tail[1])
+
+
+def fake_embedding(text: str, dim: int = 1024):
+    """텍스트 해시로 만든 결정적(deterministic) 단위 벡터."""
+    seed = int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:8], "big")
+    rng = random.Random(seed)
+    v = [rng.gauss(0.0, 1.0) for _ in range(dim)]
+    norm = math.sqrt(sum(x * x for x in v)) or 1.0
+    return [x / norm for x in v]
+
+
+class _Body:
+    """boto3 StreamingBody 흉내 (read() 만 지원)."""
+
+    def __init__(self, payload: dict):
+        self._buf = io.BytesIO(json.dumps(payload).encode("utf-8"))
+
+    def read(self, *args):
+        return self._buf.read(*args)
+
+
+#--------------------------------
+
+
+class FakeBedrockRuntime:
+    """
+    Titan v2 임베딩과 Anthropic messages 응답을 흉내낸다.
+
+    tool_script: converse(_stream) 첫 턴에 호출시킬 도구 목록
+                 [{"name": "search_compounds", "input": {"query": "aspirin"}}, ...]
+    """
+
+    def __init__(self, embed_delay=0.02, gen_delay=0.5, dim=1024,
+                 answer_text="벤치마크용 고정 답변입니다. [1]", tool_script=None,
+                 tail=None, throttle_rate=0.0):
+        self.embed_delay = embed_delay
+        self.gen_delay = gen_delay
+        self.dim = dim
+        self.answer_text = answer_text
+        self.tool_script = tool_script or []
+        self.tail = tail
+        self.throttle_rate = throttle_rate
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def _count(self, operation: str):
+        with self._lock:
+            self.calls += 1
+        _inject_faults(self.tail, self.throttle_rate, operation)
+
+    def invoke_model(self, modelId, body, **kwargs):
+        self._count("InvokeModel")
+        req = json.loads(body)
+        if "inputText" in req:
+            _sleep(self.embed_delay)
+            dim = req.get("dimensions", self.dim)
+            return {"body": _Body({"embedding": fake_embedding(req["inputText"], dim),
+                                   "inputTextTokenCount": len(req["inputText"].split())})}
+        _sleep(self.gen_delay)
+        return {"body": _Body({
+            "content": [{"type": "text", "text": self.answer_text}],
+            "stop_reason": "end_turn",
+            "usage": {"input_tokens": 100, "output_tokens": 50},
+        })}
+
+    # --- Converse API (strands BedrockModel 이 사용) ---------------------------
+
+    def _next_turn(self, messages, toolConfig):
+        """이번 턴에 낼 tool_use 블록 목록. 이미 도구 결과가 있으면 최종 답변."""
+        has_tool_result = any(
+            "toolResult" in block
+            for m in messages for block in m.get("content", [])
+        )
+        if toolConfig and self.tool_script and not has_tool_result:
+            return [dict(t, toolUseId=f"tooluse_{uuid.uuid4().hex[:12]}") for t in self.tool_script]
+        return []
+
+    def converse(self, modelId=None, messages=None, toolConfig=None, **kwargs):
+        self._count("Converse")
+        _sleep(self.gen_delay)
+        tool_uses = self._next_turn(messages or [], toolConfig)
+        if tool_uses:
+            content = [{"toolUse": t} for t in tool_uses]
+            stop = "tool_use"
+        else:
+            content = [{"text": self.answer_text}]
+            stop = "end_turn"
+        return {
+            "output": {"message": {"role": "assistant", "content": content}},
+            "stopReason": stop,
+            "usage": {"inputTokens": 100, "outputTokens": 50, "totalTokens": 150},
+            "metrics": {"latencyMs": 0},
+        }
+
+    def converse_stream(self, modelId=None, messages=None, toolConfig=None, **kwargs):
+        self._count("ConverseStream")
+        # 첫 이벤트까지의 지연(TTFT)만 흉내낸다
+        _sleep(self.gen_delay)
+        tool_uses = self._next_turn(messages or [], toolConfig)
+
+        def events():
+            yield {"messageStart": {"role": "assistant"}}
+            if tool_uses:
+                for i, t in enumerate(tool_uses):
+                    yield {"contentBlockStart": {"contentBlockIndex": i, "start": {
+                        "toolUse": {"toolUseId": t["toolUseId"], "name": t["name"]}}}}
+                    yield {"contentBlockDelta": {"contentBlockIndex": i, "delta": {
+                        "toolUse": {"input": json.dumps(t.get("input", {}))}}}}
+                    yield {"contentBlockStop": {"contentBlockIndex": i}}
+                stop = "tool_use"
+            else:
+                for word in self.answer_text.split(" "):
+                    yield {"contentBlockDelta": {"contentBlockIndex": 0, "delta": {"text": word + " "}}}
+                yield {"contentBlockStop": {"contentBlockIndex": 0}}
+                stop = "end_turn"
+            yield {"messageStop": {"stopReason": stop}}
+            yield {"metadata": {"usage": {"inputTokens": 100, "outputTokens": 50, "totalTokens": 150},
+                                "metrics": {"latencyMs": 0}}}
+
+        return {"stream": events()}
+
+
+class FakeBedrockAgentRuntime:
+    """retrieve_and_generate 를 흉내낸다. 검색 결과 텍스트는 그대로 무시한다."""
+
+    def __init__(self, gen_delay=2.0, answer_text=None, tail=None, throttle_rate=0.0):
+        self.gen_delay = gen_delay
+        self.answer_text = answer_text or (
+            "[Answer]\n벤치마크용 고정 답변입니다 [1].\n[References]\n- [1] s3://bench-bucket/paper.pdf"
+        )
+        self.tail = tail
+        self.throttle_rate = throttle_rate
+        self.calls = 0
+
+    def retrieve_and_generate(self, input, retrieveAndGenerateConfiguration, **kwargs):
+        self.calls += 1
+        _inject_faults(self.tail, self.throttle_rate, "RetrieveAndGenerate")
+        _sleep(self.gen_delay)
+        return {
+            "output": {"text": self.answer_text},
+            "citations": [],
+            "sessionId": uuid.uuid4().hex,
+        }
+
+    def retrieve_and_generate_stream(self, input, retrieveAndGenerateConfiguration, **kwargs):
+        self.calls += 1
+        _inject_faults(self.tail, self.throttle_rate, "RetrieveAndGenerateStream")
+        # 전체 생성 시간을 조각 수만큼 나눠서 흘려보낸다 (첫 조각까지는 1/5)
+        words = self.answer_text.split(" ")
+        first = self.gen_delay / 5 if isinstance(self.gen_delay, (int, float)) else self.gen_delay
+        rest = (self.gen_delay - first) / max(1, len(words)) if isinstance(self.gen_delay, (int, float)) else 0
+
+        def events():
+            _sleep(first)
+            for i, word in enumerate(words):
+                if i:
+                    _sleep(rest)
+                yield {"output": {"text": word + (" " if i < len(words) - 1 else "")}}
+
+        return {"stream": events(), "sessionId": uuid.uuid4().hex}
+
+
+#--------------------------------
+
+
+class FakeOpenSearch:
+    """
+    메모리 안에서 brute-force KNN 을 도는 OpenSearch 대역.
+
+    kb_client 가 쓰는 search(knn) 외에 색인/동기화 코드가 쓰는
+    index / bulk / delete 도 최소한으로 지원한다.
+    """
+
+    def __init__(self, n_docs=200, dim=1024, search_delay=0.05,
+                 vec_field="embedding_v2", text_field="AMAZON_BEDROCK_TEXT"):
+        self.search_delay = search_delay
+        self.vec_field = vec_field
+        self.text_field = text_field
+        self.docs = {}
+        self._lock = threading.Lock()
+        self.last_scored = 0   # 마지막 KNN 에서 채점한 문서 수 (필터가 후보를 얼마나 줄였나)
+        for i in range(n_docs):
+            text = f"benchmark chunk {i} about compound CHEMBL{1000 + i} and target P{i:05d}"
+            kind = "patent" if i % 4 == 0 else "paper"
+            uri = f"s3://bench-bucket/{kind}s/{kind}_{i % 20}.pdf"
+            self.docs[f"doc-{i}"] = {
+                text_field: text,
+                vec_field: fake_embedding(text, dim),
+                "x-amz-bedrock-kb-source-uri": uri,
+                # kb_filters 필드
+                "kb-source-key": uri,
+                "kb-doc-type": kind,
+                "kb-doc-year": 2015 + i % 10,
+            }
+
+    @classmethod
+    def _matches(cls, src, clause) -> bool:
+        """knn filter 로 들어오는 질의 중 kb_filters 가 만드는 것만 흉내 낸다."""
+        op, spec = next(iter(clause.items()))
+        if op == "bool":
+            return (all(cls._matches(src, c) for c in spec.get("filter", []) + spec.get("must", []))
+                    and (not spec.get("should") or any(cls._matches(src, c) for c in spec["should"])))
+        field, value = next(iter(spec.items()))
+        actual = src.get(field)
+        if op == "match_phrase":
+            return isinstance(actual, str) and str(value) in actual
+        if op == "prefix":
+            return isinstance(actual, str) and actual.startswith(value)
+        if op == "term":
+            return actual == value
+        if op == "terms":
+            return actual in value
+        if op == "range":
+            if actual is None:
+                return False
+            checks = {"gte": actual.__ge__, "gt": actual.__gt__, "lte": actual.__le__, "lt": actual.__lt__}
+            return all(checks[k](v) for k, v in value.items())
+        raise ValueError(f"FakeOpenSearch does not support {op!r} filters")
+
+    # --- 검색 -----------------------------------------------------------------
+
+    def search(self, index=None, body=None, **kwargs):
+        _sleep(self.search_delay)
+        body = body or {}
+        size = body.get("size", 10)
+        knn = body.get("query", {}).get("knn")
+        with self._lock:
+            items = list(self.docs.items())
+        if knn:
+            field, spec = next(iter(knn.items()))
+            q = spec["vector"]
+            if spec.get("filter"):
+                # efficient filtering 처럼 채점 전에 거른다
+                items = [(doc_id, src) for doc_id, src in items if self._matches(src, spec["filter"])]
+            scored = []
+            for doc_id, src in items:
+                v = src.get(field)
+                if v is None:
+                    continue
+                scored.append((sum(a * b for a, b in zip(q, v)), doc_id, src))
+            self.last_scored = len(scored)
+            scored.sort(key=lambda x: x[0], reverse=True)
+            scored = scored[:min(size, spec.get("k", size))]
+        else:
+            query = body.get("query")
+            if query and "match_all" not in query:
+                items = [(doc_id, src) for doc_id, src in items if self._matches(src, query)]
+            scored = [(1.0, doc_id, src) for doc_id, src in items[:size]]
+        hits = [{"_index": index, "_id": doc_id, "_score": score, "_source": src}
+                for score, doc_id, src in scored]
+        return {"took": 1, "hits": {"total": {"value": len(hits)}, "hits": hits}}
+
+    # --- 색인 -----------------------------------------------------------------
+
+    def index(self, index=None, body=None, id=None, **kwargs):
+        doc_id = id or uuid.uuid4().hex
+        with self._lock:
+            self.docs[doc_id] = dict(body)
+        return {"_id": doc_id, "result": "created"}
+
+    def delete(self, index=None, id=None, **kwargs):
+        with self._lock:
+            found = self.docs.pop(id, None) is not None
+        return {"_id": id, "result": "deleted" if found else "not_found"}
+
+    def bulk(self, body, index=None, **kwargs):
+        """_bulk NDJSON(문자열) 또는 action/source 리스트를 받는다."""
+        if isinstance(body, (str, bytes)):
+            lines = [json.loads(l) for l in (body.decode() if isinstance(body, bytes) else body).splitlines() if l.strip()]
+        else:
+            lines = list(body)
+        items = []
+        i = 0
+        with self._lock:
+            while i < len(lines):
+                action = lines[i]
+                op, meta = next(iter(action.items()))
+                doc_id = meta.get("_id") or uuid.uuid4().hex
+                if op == "delete":
+                    self.docs.pop(doc_id, None)
+                    i += 1
+                elif op == "update":
+                    self.docs.setdefault(doc_id, {}).update(lines[i + 1].get("doc", {}))
+                    i += 2
+                else:  # index / create
+                    self.docs[doc_id] = dict(lines[i + 1])
+                    i += 2
+                items.append({op: {"_id": doc_id, "status": 200}})
+        return {"took": 1, "errors": False, "items": items}
+
+
+#--------------------------------
+
+
+def install_kb_fakes(kb_client_module, br=None, agent_rt=None, os_client=None):
+    """kb_client 의 전역 AWS 클라이언트를 대역으로 바꾼다. 원래 값을 돌려준다."""
+    original = {
+        "br": kb_client_module.br,
+        "bedrock_agent_runtime_client": kb_client_module.bedrock_agent_runtime_client,
+        "os_client": kb_client_module.os_client,
+    }
+    kb_client_module.br = br or FakeBedrockRuntime()
+    kb_client_module.bedrock_agent_runtime_client = agent_rt or FakeBedrockAgentRuntime()
+    kb_client_module.os_client = os_client or FakeOpenSearch()
+    return original
@@ -0,0 +1,190 @@
+# benchmarks/run_bench.py
+"""
+로컬 대역(fakes)으로 kb_client.query / run_*_agent 의 지연·처리량을 재는 드라이버.
+
+  python -m benchmarks.run_bench --target kb --sessions 8 --requests 5
+  python -m benchmarks.run_bench --target agent:chembl --sessions 4 --tool-latency '{"*": 0.2}'
+  python -m benchmarks.run_bench --target kb --json --max-p95 3.0   # 회귀 테스트용 (초과 시 exit 1)
+  python -m benchmarks.run_bench --target kb --tail-prob 0.1 --tail-delay 5 --throttle-rate 0.02
+      # 주 리전 대역에만 꼬리 지연/스로틀링을 넣고 나머지 리전(model_hedge.REGIONS)은 정상 대역.
+      # MODEL_HEDGE=0 으로 한 번 더 돌려 p95/p99 를 비교한다.
+
+저장소 루트에서 실행한다. AWS 자격 증명/네트워크는 필요 없다.
+"""
+import argparse
+import json
+import math
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# kb_client / mcp_agent 는 import 시점에 boto3 클라이언트를 만들므로 가짜 자격 증명을 먼저 넣는다
+for _k, _v in {"AWS_ACCESS_KEY_ID": "bench", "AWS_SECRET_ACCESS_KEY": "bench",
+               "AWS_DEFAULT_REGION": "us-west-2"}.items():
+    os.environ.setdefault(_k, _v)
+# 같은 질문 몇 개를 반복하므로 질문 캐시(query_cache)를 끄고 콜드 경로를 잰다 (켜려면 환경변수로 TTL 지정)
+for _k in ("KB_RETRIEVAL_CACHE_TTL_S", "KB_ANSWER_CACHE_TTL_S", "AGENT_ANSWER_CACHE_TTL_S"):
+    os.environ.setdefault(_k, "0")
+
+from benchmarks.fakes import (FakeBedrockAgentRuntime, FakeBedrockRuntime,
+                              FakeOpenSearch, install_kb_fakes)
+
+STUB_SERVER = os.path.join(os.path.dirname(os.path.abspath(__file__)), "stub_mcp_server.py")
+
+BENCH_QUESTIONS = [
+    "아스피린의 작용 기전은?",
+    "EGFR 억제제의 임상 결과를 요약해줘",
+    "imatinib 의 주요 타깃은 무엇인가?",
+    "KRAS G12C 저해제 개발 동향",
+]
+
+
+def percentile(values, p: float) -> float:
+    """nearest-rank 백분위수."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(1, min(len(ordered), math.ceil(p / 100.0 * len(ordered))))
+    return ordered[rank - 1]
+
+
+def summarize(latencies, errors: int, wall: float) -> dict:
+    n = len(latencies)
+    return {
+        "requests": n + errors,
+        "errors": errors,
+        "wall_s": round(wall, 3),
+        "throughput_rps": round(n / wall, 3) if wall > 0 else 0.0,
+        "p50_s": round(percentile(latencies, 50), 4),
+        "p95_s": round(percentile(latencies, 95), 4),
+        "p99_s": round(percentile(latencies, 99), 4),
+        "max_s": round(max(latencies), 4) if latencies else 0.0,
+    }
+
+#--------------------------------
+
+
+def _faults(args) -> dict:
+    """주 리전 대역에만 넣을 꼬리 지연/스로틀링."""
+    return {"tail": (args.tail_prob, args.tail_delay) if args.tail_prob else None,
+            "throttle_rate": args.throttle_rate}
+
+
+def make_kb_target(args):
+    import kb_client
+    import model_hedge
+    install_kb_fakes(
+        kb_client,
+        br=FakeBedrockRuntime(embed_delay=args.embed_delay, gen_delay=args.gen_delay, **_faults(args)),
+        agent_rt=FakeBedrockAgentRuntime(gen_delay=args.gen_delay, **_faults(args)),
+        os_client=FakeOpenSearch(n_docs=args.docs, search_delay=args.search_delay),
+    )
+    # 헤지/페일오버 대상 리전은 정상 대역
+    for region in model_hedge.REGIONS[1:]:
+        model_hedge.set_client("bedrock-runtime", region,
+                               FakeBedrockRuntime(embed_delay=args.embed_delay, gen_delay=args.gen_delay))
+        model_hedge.set_client("bedrock-agent-runtime", region, FakeBedrockAgentRuntime(gen_delay=args.gen_delay))
+    return kb_client.query
+
+
+def make_agent_target(args, name: str):
+    import mcp_agent
+    from mcp import StdioServerParameters, stdio_client
+    from strands.tools.mcp import MCPClient
+
+    stub_args = [STUB_SERVER, "--latency", args.tool_latency, "--payload-bytes", str(args.payload_bytes)]
+
+    def make_stub_client():
+        return MCPClient(lambda: stdio_client(
+            StdioServerParameters(command=sys.executable, args=stub_args)
+        ))
+
+    # run_*_agent 는 호출 시점에 전역 make_client 를 찾으므로 모듈 속성만 바꿔치기 하면 된다
+    mcp_agent.make_client = lambda name: make_stub_client()
+
+    script = json.loads(args.tool_script) if args.tool_script else [
+        {"name": "search_compounds", "input": {"query": "aspirin"}}
+    ]
+    # 티어별 HedgedModel 의 첫 모델(주 리전)에만 장애를 넣는다
+    for hedged in mcp_agent.model.models.values():
+        for i, m in enumerate(hedged.models):
+            m.client = FakeBedrockRuntime(gen_delay=args.gen_delay, tool_script=script,
+                                          **(_faults(args) if i == 0 else {}))
+    return mcp_agent.AGENT_RUNNERS[name]
+
+
+def run(target, sessions: int, requests: int):
+    latencies, errors = [], 0
+    lock = threading.Lock()
+
+    def session(idx: int):
+        nonlocal errors
+        for r in range(requests):
+            q = BENCH_QUESTIONS[(idx + r) % len(BENCH_QUESTIONS)]
+            t0 = time.perf_counter()
+            try:
+                target(q)
+                ok = True
+            except Exception as e:
+                print(f"[session {idx}] error: {e}", file=sys.stderr)
+                ok = False
+            dt = time.perf_counter() - t0
+            with lock:
+                if ok:
+                    latencies.append(dt)
+                else:
+                    errors += 1
+
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=sessions) as ex:
+        list(ex.map(session, range(sessions)))
+    return summarize(latencies, errors, time.perf_counter() - t0)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--target", default="kb", help="kb 또는 agent:<name> (mcp_agent.AGENT_RUNNERS 키)")
+    parser.add_argument("--sessions", type=int, default=4, help="동시 세션 수")
+    parser.add_argument("--requests", type=int, default=5, help="세션당 요청 수")
+    parser.add_argument("--embed-delay", type=float, default=0.03)
+    parser.add_argument("--search-delay", type=float, default=0.05)
+    parser.add_argument("--gen-delay", type=float, default=0.5)
+    parser.add_argument("--docs", type=int, default=200, help="FakeOpenSearch 문서 수")
+    parser.add_argument("--tool-latency", default='{"*": 0.1}', help="stub MCP 서버 도구별 지연 JSON")
+    parser.add_argument("--tool-script", default="", help="가짜 모델이 첫 턴에 호출할 도구 목록 JSON")
+    parser.add_argument("--payload-bytes", type=int, default=0)
+    parser.add_argument("--tail-prob", type=float, default=0.0, help="주 리전 호출이 꼬리 지연을 겪을 확률")
+    parser.add_argument("--tail-delay", type=float, default=5.0, help="꼬리 지연(초)")
+    parser.add_argument("--throttle-rate", type=float, default=0.0, help="주 리전 호출의 ThrottlingException 확률")
+    parser.add_argument("--json", action="store_true", help="결과를 JSON 한 줄로 출력")
+    parser.add_argument("--max-p95", type=float, default=None, help="p95(초)가 이 값을 넘으면 exit 1")
+    args = parser.parse_args(argv)
+
+    if args.target == "kb":
+        target = make_kb_target(args)
+    elif args.target.startswith("agent:"):
+        target = make_agent_target(args, args.target.split(":", 1)[1])
+    else:
+        parser.error(f"unknown target {args.target!r}")
+
+    result = {"target": args.target, "sessions": args.sessions, **run(target, args.sessions, args.requests)}
+    if args.tail_prob or args.throttle_rate:
+        import model_hedge
+        result["hedge"] = model_hedge.HEDGE_ENABLED
+        result["endpoints"] = [s for s in model_hedge.stats() if s["calls"]]
+    if args.json:
+        print(json.dumps(result))
+    else:
+        for k, v in result.items():
+            print(f"{k:>15}: {v}")
+
+    if args.max_p95 is not None and result["p95_s"] > args.max_p95:
+        print(f"p95 {result['p95_s']}s exceeds limit {args.max_p95}s", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,67 @@
+# benchmarks/stub_mcp_server.py
+"""
+지연 시간을 스크립트로 지정할 수 있는 stdio MCP 서버 대역.
+
+  python benchmarks/stub_mcp_server.py --latency '{"search_compounds": 0.4, "*": 0.1}'
+
+도구 이름은 실제 bio 서버들이 쓰는 이름을 흉내내며, 어떤 인자든 받아서
+"<tool> 결과" 형태의 고정 JSON 을 돌려준다. --tools 로 목록을 바꿀 수 있다.
+"""
+import argparse
+import asyncio
+import json
+
+import mcp.types as types
+from mcp.server.lowlevel import Server
+from mcp.server.stdio import stdio_server
+
+DEFAULT_TOOLS = [
+    "search_compounds", "get_compound_info", "search_targets", "get_target_info",
+    "search_activities", "search_structures", "get_structure_info",
+    "search_pathways", "find_pathways_by_gene", "get_protein_interactions",
+    "search_go_terms", "get_go_term",
+]
+
+
+def build_server(tool_names, latency: dict, payload_bytes: int) -> Server:
+    server = Server("stub-mcp-server")
+    filler = "x" * payload_bytes
+
+    @server.list_tools()
+    async def list_tools() -> list[types.Tool]:
+        return [
+            types.Tool(
+                name=name,
+                description=f"Stub of {name} for benchmarking",
+                inputSchema={"type": "object", "properties": {}, "additionalProperties": True},
+            )
+            for name in tool_names
+        ]
+
+    @server.call_tool()
+    async def call_tool(name: str, arguments: dict) -> list[types.TextContent]:
+        delay = latency.get(name, latency.get("*", 0.0))
+        if delay:
+            await asyncio.sleep(delay)
+        result = {"tool": name, "arguments": arguments, "results": [{"id": "CHEMBL25", "name": "ASPIRIN"}]}
+        if filler:
+            result["padding"] = filler
+        return [types.TextContent(type="text", text=json.dumps(result, ensure_ascii=False))]
+
+    return server
+
+
+async def main(args):
+    latency = json.loads(args.latency) if args.latency else {}
+    tools = args.tools.split(",") if args.tools else DEFAULT_TOOLS
+    server = build_server(tools, latency, args.payload_bytes)
+    async with stdio_server() as (read_stream, write_stream):
+        await server.run(read_stream, write_stream, server.create_initialization_options())
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--latency", default="", help='도구별 지연(초) JSON, "*" 는 기본값')
+    parser.add_argument("--tools", default="", help="쉼표로 구분한 도구 이름 목록")
+    parser.add_argument("--payload-bytes", type=int, default=0, help="응답에 덧붙일 패딩 크기")
+    asyncio.run(main(parser.parse_args()))
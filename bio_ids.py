@@ -0,0 +1,40 @@
+# bio_ids.py
+"""
+생물/화학 DB 식별자 정규식 모음.
+
+대화 압축(요약/다이제스트) 때 ID 를 잃지 않도록 뽑아내거나,
+질문에서 엔티티를 빠르게 찾을 때 쓴다.
+"""
+import re
+
+ID_PATTERNS = {
+    "chembl": re.compile(r"\bCHEMBL\d+\b", re.I),
+    "pubchem_cid": re.compile(r"\bCID[:\s]?\d+\b", re.I),
+    "uniprot": re.compile(r"\b(?:[OPQ][0-9][A-Z0-9]{3}[0-9]|[A-NR-Z][0-9](?:[A-Z][A-Z0-9]{2}[0-9]){1,2})\b"),
+    "ensembl": re.compile(r"\bENS[A-Z]*[GTP]\d{11}\b"),
+    "go": re.compile(r"\bGO:\d{7}\b"),
+    "reactome": re.compile(r"\bR-[A-Z]{3}-\d+\b"),
+    "string": re.compile(r"\b\d{3,7}\.ENSP\d{11}\b"),
+    "disease": re.compile(r"\b(?:EFO|MONDO|HP|Orphanet|DOID)[_:]\d+\b"),
+    # 숫자 1개 + 영숫자 3개, 그중 영문자가 하나 이상 (연도 같은 순수 숫자는 제외)
+    "pdb": re.compile(r"\b[1-9](?=[A-Z0-9]{0,2}[A-Z])[A-Z0-9]{3}\b"),
+}
+
+
+def extract_ids(text: str, kinds=None) -> list:
+    """text 에서 찾은 식별자를 등장 순서대로 중복 없이 돌려준다 (겹치는 매치는 긴 쪽만)."""
+    spans = []
+    for kind, pat in ID_PATTERNS.items():
+        if kinds and kind not in kinds:
+            continue
+        spans.extend((m.start(), m.end(), m.group(0)) for m in pat.finditer(text or ""))
+    spans.sort(key=lambda s: (s[0], -(s[1] - s[0])))
+    found, seen, last_end = [], set(), -1
+    for start, end, v in spans:
+        if start < last_end:
+            continue
+        last_end = end
+        if v not in seen:
+            seen.add(v)
+            found.append(v)
+    return found
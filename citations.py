@@ -0,0 +1,395 @@
+# citations.py
+"""
+KB 답변의 [#] 인용을 "논문 전체" 대신 인용한 페이지/청크로 보여주기 위한 소스 전달.
+
+  page_text("s3://bucket/papers/x.pdf", 7)   → 그 페이지 텍스트 (PDF 전체를 받지 않음)
+  presigned_url("s3://bucket/papers/x.pdf", 7) → 서명 URL + "#page=7" (브라우저 PDF 뷰어가 그 페이지로 이동)
+
+PDF 는 끝의 xref 로 객체 위치를 알 수 있으므로, RangeReader 가 S3 range GET 으로 BLOCK_BYTES 씩만 읽는
+seekable 파일 노릇을 하고 pypdf 는 trailer → xref → 페이지 트리에서 그 페이지로 가는 경로 → 페이지 content
+만 읽는다. 보통 수십~수백 KB 로 끝난다 (실측은 fetch_page 결과의 bytes_fetched).
+  - 블록은 프로세스 공용 LRU (BLOCK_CACHE_MB) 에, 추출한 페이지 텍스트는 PAGE_CACHE 개까지 LRU 에 둔다
+  - 캐시 키에 ETag(로컬은 크기-mtime)를 넣어 원본이 바뀌면 새로 읽는다 (메타데이터는 META_TTL_S 동안 재사용)
+  - 서명 URL 은 만료 PRESIGN_MARGIN_S 전까지 캐시
+
+CITATION_LOCAL_ROOT 를 주면 s3://bucket/key 를 ROOT/bucket/key 로컬 파일로 대신 읽는다 (S3 없는 개발/벤치마크용).
+s3:// 가 아닌 URI 는 로컬 경로로 본다 (kb_ingest 로 로컬 디렉터리를 색인한 경우).
+
+읽기/서명은 KB 데이터 소스 버킷에만 한다 (기본 거부). 허용 버킷은 KB_ID 의 데이터 소스
+(bedrock-agent get_data_source 의 s3Configuration.bucketArn) + CITATION_BUCKETS. 둘 다 없으면 어떤
+s3:// 객체도 읽거나 서명하지 않는다 (NotAllowed, API 는 403).
+
+  python citations.py s3://bucket/papers/x.pdf 7
+"""
+import io
+import json
+import os
+import sys
+import threading
+import time
+from collections import OrderedDict
+from functools import lru_cache
+
+import boto3
+
+from logging_config import setup_logging
+
+logger = setup_logging().getChild("citations")
+
+REGION = "us-west-2"
+BLOCK_BYTES = int(os.getenv("CITATION_BLOCK_KB", "64")) * 1024
+BLOCK_CACHE_MB = int(os.getenv("CITATION_BLOCK_CACHE_MB", "64"))
+PAGE_CACHE = int(os.getenv("CITATION_PAGE_CACHE", "512"))
+META_TTL_S = float(os.getenv("CITATION_META_TTL_S", "300"))
+PRESIGN_EXPIRES_S = int(os.getenv("CITATION_PRESIGN_EXPIRES_S", "3600"))
+PRESIGN_MARGIN_S = 300
+LOCAL_ROOT = os.getenv("CITATION_LOCAL_ROOT", "")
+# KB 데이터 소스 버킷 외에 더 허용할 버킷 (쉼표 구분). KB_ID 도 이것도 없으면 전부 거부
+ALLOWED_BUCKETS = {b for b in os.getenv("CITATION_BUCKETS", "").split(",") if b}
+KB_ID = os.getenv("KB_ID", "")
+PAGE_CHARS = 20000   # 화면/응답에 돌려줄 페이지 텍스트 최대 길이
+
+_s3 = None
+_s3_lock = threading.Lock()
+
+
+class PageNotFound(IndexError):
+    """문서에 없는 페이지 번호."""
+
+
+class NotAllowed(PermissionError):
+    """허용 버킷(KB 데이터 소스) 밖의 URI."""
+
+
+def _client():
+    global _s3
+    with _s3_lock:
+        if _s3 is None:
+            _s3 = boto3.client("s3", region_name=REGION)
+        return _s3
+
+
+def split_s3(uri: str):
+    bucket, _, key = uri[len("s3://"):].partition("/")
+    return bucket, key
+
+
+def _local_path(uri: str):
+    """로컬에서 읽을 경로. S3 에서 읽어야 하면 None."""
+    if uri.startswith("s3://"):
+        return os.path.join(LOCAL_ROOT, *split_s3(uri)) if LOCAL_ROOT else None
+    return uri
+
+
+_kb_buckets = None
+_kb_buckets_lock = threading.Lock()
+
+
+def _data_source_buckets() -> set:
+    """KB_ID 의 S3 데이터 소스 버킷 (처음 한 번 조회). 조회에 실패하면 빈 집합 — 다음 호출에서 다시 시도."""
+    global _kb_buckets
+    if not KB_ID:
+        return set()
+    with _kb_buckets_lock:
+        if _kb_buckets is not None:
+            return _kb_buckets
+        try:
+            agent = boto3.client("bedrock-agent", region_name=REGION)
+            buckets = set()
+            for page in agent.get_paginator("list_data_sources").paginate(knowledgeBaseId=KB_ID):
+                for summary in page.get("dataSourceSummaries", []):
+                    ds = agent.get_data_source(knowledgeBaseId=KB_ID, dataSourceId=summary["dataSourceId"])
+                    arn = (ds["dataSource"]["dataSourceConfiguration"].get("s3Configuration") or {}).get("bucketArn")
+                    if arn:
+                        buckets.add(arn.rsplit(":", 1)[-1])
+            _kb_buckets = buckets
+            logger.info(f"citation buckets from KB {KB_ID}: {sorted(buckets)}")
+        except Exception as e:
+            logger.error(f"listing data sources of KB {KB_ID} failed, denying citations: {e}")
+            return set()
+        return _kb_buckets
+
+
+def allowed_buckets() -> set:
+    return _data_source_buckets() | ALLOWED_BUCKETS
+
+
+def allowed(uri: str) -> bool:
+    """s3:// 이고 허용 버킷(KB 데이터 소스 + CITATION_BUCKETS)이어야 함. 허용 목록이 비면 전부 거부."""
+    return uri.startswith("s3://") and split_s3(uri)[0] in allowed_buckets()
+
+
+def _check(uri: str):
+    # 로컬 경로(로컬 디렉터리를 색인한 경우)는 HTTP 로 들어올 수 없으므로 s3:// 만 검사한다
+    if uri.startswith("s3://") and not allowed(uri):
+        raise NotAllowed(f"{uri} is outside the knowledge-base buckets")
+
+#--------------------------------
+# range 읽기 + 블록 캐시
+
+
+class BlockCache:
+    """(uri, version, block 번호) → bytes. 전체 크기 max_bytes 를 넘으면 오래 안 쓴 블록부터 버림."""
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            data = self._items.get(key)
+            if data is None:
+                self.misses += 1
+                return None
+            self._items.move_to_end(key)
+            self.hits += 1
+            return data
+
+    def put(self, key, data: bytes):
+        with self._lock:
+            if key in self._items:
+                return
+            self._items[key] = data
+            self.size += len(data)
+            while self.size > self.max_bytes and len(self._items) > 1:
+                _, old = self._items.popitem(last=False)
+                self.size -= len(old)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"blocks": len(self._items), "bytes": self.size, "hits": self.hits, "misses": self.misses}
+
+
+blocks = BlockCache(BLOCK_CACHE_MB * 1024 * 1024)
+_meta = {}          # uri → (size, version, 확인 시각)
+_meta_lock = threading.Lock()
+
+
+def _fetch(uri: str, start: int, end: int, version: str = None):
+    """[start, end] 바이트 (end 포함). start 가 음수면 끝에서 -start 바이트. → (data, size, version)"""
+    path = _local_path(uri)
+    if path is not None:
+        st = os.stat(path)
+        with open(path, "rb") as f:
+            if start < 0:
+                start = max(0, st.st_size + start)
+                end = st.st_size - 1
+            f.seek(start)
+            return f.read(end - start + 1), st.st_size, f"{st.st_size}-{int(st.st_mtime)}"
+    bucket, key = split_s3(uri)
+    rng = f"bytes={start}" if start < 0 else f"bytes={start}-{end}"
+    kwargs = {"IfMatch": version} if version else {}
+    resp = _client().get_object(Bucket=bucket, Key=key, Range=rng, **kwargs)
+    size = int(resp["ContentRange"].rsplit("/", 1)[1])
+    return resp["Body"].read(), size, resp["ETag"].strip('"')
+
+
+def _open(uri: str):
+    """
+    (size, version, 새로 받은 바이트). 처음이면 HEAD 대신 끝의 BLOCK_BYTES 를 받아서
+    크기/ETag 를 얻고, 그 조각(xref 와 trailer 가 있는 곳)은 "tail" 블록으로 캐시한다.
+    """
+    now = time.time()
+    with _meta_lock:
+        cached = _meta.get(uri)
+    if cached and now - cached[2] < META_TTL_S:
+        return cached[0], cached[1], 0
+    data, size, version = _fetch(uri, -BLOCK_BYTES, -1)
+    blocks.put((uri, version, "tail"), data)
+    with _meta_lock:
+        _meta[uri] = (size, version, now)
+    return size, version, len(data)
+
+
+class RangeReader(io.RawIOBase):
+    """S3 객체(또는 로컬 파일)를 BLOCK_BYTES 단위 range GET 으로 읽는 seekable 파일."""
+
+    def __init__(self, uri: str):
+        super().__init__()
+        self.uri = uri
+        self.size, self.version, self.bytes_fetched = _open(uri)
+        self.tail_start = max(0, self.size - BLOCK_BYTES)
+        self.pos = 0
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self.pos
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        base = {io.SEEK_SET: 0, io.SEEK_CUR: self.pos, io.SEEK_END: self.size}[whence]
+        self.pos = max(0, base + offset)
+        return self.pos
+
+    def _block(self, n: int) -> bytes:
+        start = n * BLOCK_BYTES
+        if start >= self.tail_start:
+            tail = blocks.get((self.uri, self.version, "tail"))
+            if tail is not None:
+                return tail[start - self.tail_start:start - self.tail_start + BLOCK_BYTES]
+        key = (self.uri, self.version, n)
+        data = blocks.get(key)
+        if data is None:
+            data, _, _ = _fetch(self.uri, start, min(self.size, start + BLOCK_BYTES) - 1, self.version)
+            self.bytes_fetched += len(data)
+            blocks.put(key, data)
+        return data
+
+    def readinto(self, buf) -> int:
+        want = min(len(buf), self.size - self.pos)
+        done = 0
+        while done < want:
+            n, offset = divmod(self.pos, BLOCK_BYTES)
+            piece = self._block(n)[offset:offset + want - done]
+            if not piece:
+                break
+            buf[done:done + len(piece)] = piece
+            done += len(piece)
+            self.pos += len(piece)
+        return done
+
+#--------------------------------
+# 페이지 추출
+
+
+_INHERITED = ("/Resources", "/MediaBox", "/CropBox", "/Rotate")
+
+
+def _find_page(reader, page_no: int):
+    """
+    reader.pages[i] 는 페이지 트리 전체를 평탄화하느라 모든 페이지 객체를 읽는다.
+    /Count 로 필요한 가지만 내려가서 page_no(1부터) 의 PageObject 를 만든다.
+    """
+    from pypdf import PageObject
+    from pypdf.generic import IndirectObject, NameObject
+
+    node, index, inherited = reader.root_object["/Pages"].get_object(), page_no - 1, {}
+    for _ in range(64):
+        for key in _INHERITED:
+            if key in node:
+                inherited[key] = node[key]
+        kids = node["/Kids"]
+        if node.get("/Count") == len(kids):
+            # 자식마다 한 페이지인 평평한 트리 (흔함): 자식들을 열어 보지 않고 바로 인덱싱
+            ref, index = kids[index], 0
+            kid = ref.get_object()
+        else:
+            for ref in kids:
+                kid = ref.get_object()
+                count = kid.get("/Count", 0) if "/Kids" in kid else 1
+                if index < count:
+                    break
+                index -= count
+            else:
+                raise IndexError(page_no)
+        if "/Kids" not in kid:
+            page = PageObject(reader, ref if isinstance(ref, IndirectObject) else None)
+            page.update(kid)
+            for key, value in inherited.items():
+                if key not in page:
+                    page[NameObject(key)] = value
+            return page
+        node = kid
+    raise ValueError("page tree too deep")
+
+
+def _extract(uri: str, page_no: int):
+    from pypdf import PdfReader
+    from pypdf.errors import PdfReadError
+
+    stream = RangeReader(uri)
+    try:
+        # strict=False 는 열 때 xref 의 모든 객체 위치를 확인하느라 파일 전체를 훑는다
+        reader = PdfReader(stream, strict=True)
+    except PdfReadError as e:
+        logger.info(f"strict open failed for {uri} ({e}), retrying lenient")
+        reader = PdfReader(stream, strict=False)
+    count = reader.root_object["/Pages"].get_object().get("/Count", 0)
+    if not 1 <= page_no <= count:
+        raise PageNotFound(f"page {page_no} out of range (1-{count})")
+    try:
+        page = _find_page(reader, page_no)
+    except Exception as e:
+        logger.info(f"page tree walk failed for {uri} ({e}), flattening")
+        page = reader.pages[page_no - 1]
+    return page.extract_text() or "", stream.size, stream.bytes_fetched
+
+
+@lru_cache(maxsize=PAGE_CACHE)
+def _cached_page(uri: str, version: str, page_no: int):
+    return _extract(uri, page_no)
+
+
+def fetch_page(uri: str, page_no: int) -> dict:
+    """uri 의 page_no(1부터) 페이지 텍스트. bytes_fetched 는 이번에 원본에서 새로 받은 바이트 (캐시 적중이면 0)."""
+    _check(uri)
+    t0 = time.perf_counter()
+    _, version, tail_bytes = _open(uri)
+    misses = _cached_page.cache_info().misses
+    text, size, fetched = _cached_page(uri, version, int(page_no))
+    cached = _cached_page.cache_info().misses == misses
+    result = {
+        "uri": uri,
+        "page": int(page_no),
+        "text": text[:PAGE_CHARS],
+        "size": size,
+        "bytes_fetched": tail_bytes + (0 if cached else fetched),
+        "cached": cached,
+        "elapsed_ms": round((time.perf_counter() - t0) * 1000, 1),
+    }
+    if not cached:
+        logger.info(f"citation page {uri} p.{page_no}: {result['bytes_fetched']} of {size} bytes in {result['elapsed_ms']} ms")
+    return result
+
+
+def page_text(uri: str, page_no: int) -> str:
+    return fetch_page(uri, page_no)["text"]
+
+#--------------------------------
+# 서명 URL
+
+
+_presigned = {}     # uri → (url, 만료 시각)
+_presigned_lock = threading.Lock()
+
+
+def presigned_url(uri: str, page_no: int = None) -> str:
+    """브라우저에서 열 URL. S3 는 서명 URL (캐시, 허용 버킷만), 로컬은 file://. page_no 가 있으면 #page= 를 붙인다."""
+    _check(uri)
+    fragment = f"#page={page_no}" if page_no else ""
+    path = _local_path(uri)
+    if path is not None:
+        return "file://" + os.path.abspath(path) + fragment
+    now = time.time()
+    with _presigned_lock:
+        cached = _presigned.get(uri)
+    if cached is None or cached[1] - PRESIGN_MARGIN_S < now:
+        bucket, key = split_s3(uri)
+        url = _client().generate_presigned_url(
+            "get_object", Params={"Bucket": bucket, "Key": key}, ExpiresIn=PRESIGN_EXPIRES_S)
+        cached = (url, now + PRESIGN_EXPIRES_S)
+        with _presigned_lock:
+            _presigned[uri] = cached
+    return cached[0] + fragment
+
+
+def stats() -> dict:
+    info = _cached_page.cache_info()
+    return {"blocks": blocks.stats(), "pages": {"hits": info.hits, "misses": info.misses, "size": info.currsize},
+            "presigned": len(_presigned)}
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 3:
+        sys.exit("usage: python citations.py <s3://bucket/key.pdf | path> <page>")
+    out = fetch_page(sys.argv[1], int(sys.argv[2]))
+    print(json.dumps({**out, "text": out["text"][:500], "url": presigned_url(sys.argv[1], int(sys.argv[2]))},
+                     ensure_ascii=False, indent=2))
@@ -0,0 +1,756 @@
+# compound_index.py
+"""
+로컬 화합물 유사도 / 부분구조 검색 인덱스.
+
+ChEMBL MCP 서버의 search_similar_compounds / substructure_search 는 구현돼 있지 않고, PubChem 쪽은
+원격 API 라 느리고 호출 제한이 있다. 화합물 집합(ChEMBL chemreps 덤프, SMILES 파일, SDF)을 오프라인에서
+비트 벡터 지문으로 만들어 두고 프로세스 안에서 numpy 로 검색한다.
+
+  python compound_index.py build data/fixtures/compounds.smi
+  python compound_index.py build chembl_35_chemreps.txt --format chemreps --workers 8
+  python compound_index.py build compounds.sdf --format sdf
+  python compound_index.py similar "CC(=O)Oc1ccccc1C(=O)O" --top-k 5
+  python compound_index.py substructure "c1ccc2ncncc2c1"
+
+  - 유사도: ECFP4 형태의 원형 지문(반지름 2, FP_BITS 비트)을 uint64 로 packing → memmap.
+    Tanimoto = popcount(a & q) / (|a| + |q| - popcount(a & q)) 를 청크 단위로 벡터 연산, 청크별 top-k 를 합친다.
+  - 부분구조: 길이 PATH_MAX_BONDS 이하 선형 경로 지문으로 "질의 비트 ⊆ 대상 비트" 인 것만 남기고
+    (부분구조면 질의의 모든 경로가 대상에도 있으므로 놓치는 것이 없다), 남은 후보만 그래프 매칭으로 확인한다.
+RDKit 없이 동작하도록 SMILES/molfile 파서와 간단한 방향족성 판정(5·6원 고리, 4n+2)을 자체로 둔다.
+그래서 비트는 RDKit 지문과 같지 않고, 입체화학·동위원소는 무시한다.
+"""
+import argparse
+import json
+import os
+import re
+import shutil
+import threading
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import numpy as np
+from strands import tool
+
+from logging_config import setup_logging
+
+logger = setup_logging().getChild("compound_index")
+
+INDEX_DIR = os.getenv("COMPOUND_INDEX_DIR", "data/compound_index")
+FIXTURE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "fixtures", "compounds.smi")
+FP_BITS = 2048
+MORGAN_RADIUS = 2
+PATH_MAX_BONDS = 4
+CHUNK_ROWS = 65536
+SEARCH_THREADS = int(os.getenv("COMPOUND_SEARCH_THREADS", str(min(8, os.cpu_count() or 1))))
+VERIFY_MAX = int(os.getenv("COMPOUND_VERIFY_MAX", "20000"))   # 부분구조 그래프 매칭 상한
+
+WORDS = FP_BITS // 64
+AROMATIC_BOND = 4
+
+#--------------------------------
+# 분자 파싱
+
+
+_SYMBOLS = ("H He Li Be B C N O F Ne Na Mg Al Si P S Cl Ar K Ca Sc Ti V Cr Mn Fe Co Ni Cu Zn Ga Ge As Se Br Kr "
+            "Rb Sr Y Zr Nb Mo Tc Ru Rh Pd Ag Cd In Sn Sb Te I Xe Cs Ba La Ce Pr Nd Pm Sm Eu Gd Tb Dy Ho Er Tm Yb "
+            "Lu Hf Ta W Re Os Ir Pt Au Hg Tl Pb Bi Po At Rn").split()
+ELEMENTS = {s: z for z, s in enumerate(_SYMBOLS, 1)}
+_ORGANIC = ("Cl", "Br", "B", "C", "N", "O", "P", "S", "F", "I")
+_AROMATIC = ("se", "as", "b", "c", "n", "o", "p", "s")
+_VALENCES = {5: (3,), 6: (4,), 7: (3, 5), 8: (2,), 15: (3, 5), 16: (2, 4, 6), 9: (1,), 17: (1,), 35: (1,), 53: (1,)}
+_BOND_CHARS = {"-": 1, "=": 2, "#": 3, "$": 3, ":": AROMATIC_BOND, "/": 1, "\\": 1}
+_BRACKET = re.compile(r"\[(\d*)(se|as|[bcnops]|[A-Z][a-z]?)(@*(?:TH|AL|SP|TB|OH)?\d*)(H\d*)?([+-]+\d*)?(?::\d+)?\]")
+
+
+class Mol:
+    """원자 목록 + 인접 dict (이웃 → 결합 차수, 방향족은 AROMATIC_BOND). 수소는 개수로만 들고 있다."""
+
+    __slots__ = ("elements", "aromatic", "charges", "hydrogens", "bonds", "ring_atoms")
+
+    def __init__(self):
+        self.elements, self.aromatic, self.charges, self.hydrogens, self.bonds = [], [], [], [], []
+        self.ring_atoms = set()
+
+    def add_atom(self, z: int, aromatic: bool = False, charge: int = 0, hydrogens: int = None) -> int:
+        self.elements.append(z)
+        self.aromatic.append(aromatic)
+        self.charges.append(charge)
+        self.hydrogens.append(hydrogens)   # None = 아직 계산 안 한 암시적 수소
+        self.bonds.append({})
+        return len(self.elements) - 1
+
+    def add_bond(self, a: int, b: int, order: int):
+        if a == b or b in self.bonds[a]:
+            raise ValueError(f"invalid bond {a}-{b}")
+        self.bonds[a][b] = order
+        self.bonds[b][a] = order
+
+    def __len__(self):
+        return len(self.elements)
+
+
+def _implicit_hydrogens(mol: Mol):
+    for a, h in enumerate(mol.hydrogens):
+        if h is not None:
+            continue
+        valences = _VALENCES.get(mol.elements[a])
+        if not valences:
+            mol.hydrogens[a] = 0
+            continue
+        used = int(sum(1.5 if o == AROMATIC_BOND else o for o in mol.bonds[a].values()))
+        target = next((v for v in valences if v >= used), used)
+        mol.hydrogens[a] = max(0, target - used)
+
+
+def parse_smiles(smiles: str) -> Mol:
+    mol = Mol()
+    s = smiles.strip().split()[0] if smiles.strip() else ""
+    if not s:
+        raise ValueError("empty SMILES")
+    prev, bond, stack, rings = None, None, [], {}
+    i = 0
+
+    def attach(atom):
+        nonlocal prev, bond
+        if prev is not None:
+            order = bond or (AROMATIC_BOND if mol.aromatic[prev] and mol.aromatic[atom] else 1)
+            mol.add_bond(prev, atom, order)
+        prev, bond = atom, None
+
+    while i < len(s):
+        ch = s[i]
+        if ch == "(":
+            stack.append(prev)
+        elif ch == ")":
+            if not stack:
+                raise ValueError(f"unbalanced ')' in {smiles}")
+            prev = stack.pop()
+        elif ch in _BOND_CHARS:
+            bond = _BOND_CHARS[ch]
+        elif ch == ".":
+            prev = None
+        elif ch.isdigit() or ch == "%":
+            if ch == "%":
+                label, i = s[i + 1:i + 3], i + 2
+            else:
+                label = ch
+            if prev is None:
+                raise ValueError(f"ring bond without atom in {smiles}")
+            if label in rings:
+                other, other_bond = rings.pop(label)
+                order = bond or other_bond or (AROMATIC_BOND if mol.aromatic[prev] and mol.aromatic[other] else 1)
+                mol.add_bond(prev, other, order)
+                bond = None
+            else:
+                rings[label] = (prev, bond)
+                bond = None
+        elif ch == "[":
+            m = _BRACKET.match(s, i)
+            if not m:
+                raise ValueError(f"bad bracket atom at {i} in {smiles}")
+            _, symbol, _, hcount, charge = m.groups()
+            aromatic = symbol.islower()
+            z = ELEMENTS.get(symbol.capitalize())
+            if z is None:
+                raise ValueError(f"unknown element {symbol}")
+            h = 0 if not hcount else int(hcount[1:] or 1)
+            q = 0
+            if charge:
+                digits = charge.lstrip("+-")
+                q = (int(digits) if digits else len(charge)) * (1 if charge[0] == "+" else -1)
+            attach(mol.add_atom(z, aromatic, q, h))
+            i = m.end() - 1
+        else:
+            for symbol in _ORGANIC + _AROMATIC:
+                if s.startswith(symbol, i):
+                    break
+            else:
+                raise ValueError(f"unexpected '{ch}' at {i} in {smiles}")
+            attach(mol.add_atom(ELEMENTS[symbol.capitalize()], symbol.islower()))
+            i += len(symbol) - 1
+        i += 1
+    if rings or stack:
+        raise ValueError(f"unclosed ring or branch in {smiles}")
+    _implicit_hydrogens(mol)
+    _perceive_aromaticity(mol)
+    return mol
+
+
+def parse_molblock(block: str) -> Mol:
+    """V2000 molfile (SDF 한 레코드). 결합 유형 4 는 방향족."""
+    lines = block.splitlines()
+    if len(lines) < 4 or "V3000" in lines[3]:
+        raise ValueError("only V2000 molfiles are supported")
+    n_atoms, n_bonds = int(lines[3][0:3]), int(lines[3][3:6])
+    mol = Mol()
+    for line in lines[4:4 + n_atoms]:
+        symbol = line[31:34].strip()
+        z = ELEMENTS.get(symbol)
+        if z is None:
+            raise ValueError(f"unknown element {symbol}")
+        ccc = int(line[36:39] or 0)
+        mol.add_atom(z, False, 4 - ccc if ccc else 0)
+    for line in lines[4 + n_atoms:4 + n_atoms + n_bonds]:
+        a, b, kind = int(line[0:3]) - 1, int(line[3:6]) - 1, int(line[6:9])
+        mol.add_bond(a, b, AROMATIC_BOND if kind == 4 else min(kind, 3))
+    for line in lines[4 + n_atoms + n_bonds:]:
+        if line.startswith("M  CHG"):
+            fields = line.split()[3:]
+            for a, q in zip(fields[0::2], fields[1::2]):
+                mol.charges[int(a) - 1] = int(q)
+        elif line.startswith("M  END"):
+            break
+    for a in range(len(mol)):
+        if any(o == AROMATIC_BOND for o in mol.bonds[a].values()):
+            mol.aromatic[a] = True
+    _implicit_hydrogens(mol)
+    _perceive_aromaticity(mol)
+    return mol
+
+
+def _small_rings(mol: Mol, max_size: int = 8) -> list:
+    """결합마다 그 결합을 지나는 가장 작은 고리 (SSSR 근사)."""
+    rings = set()
+    for a in range(len(mol)):
+        for b in mol.bonds[a]:
+            if b < a:
+                continue
+            # a 에서 b 까지 a-b 결합을 쓰지 않는 최단 경로
+            parent = {a: None}
+            queue = deque([a])
+            while queue and b not in parent:
+                x = queue.popleft()
+                for y in mol.bonds[x]:
+                    if y not in parent and not (x == a and y == b):
+                        parent[y] = x
+                        queue.append(y)
+            if b in parent:
+                path, x = [], b
+                while x is not None:
+                    path.append(x)
+                    x = parent[x]
+                if len(path) <= max_size:
+                    rings.add(tuple(path))
+    unique = {}
+    for ring in rings:
+        unique.setdefault(frozenset(ring), ring)
+    return list(unique.values())
+
+
+def _pi_electrons(mol: Mol, a: int, ring: set):
+    z = mol.elements[a]
+    orders = mol.bonds[a]
+    if 3 in orders.values():
+        return None
+    if mol.aromatic[a]:
+        if z in (7, 15) and (len(orders) + mol.hydrogens[a] == 3) and mol.charges[a] == 0:
+            return 2   # 피롤형 N
+        return 2 if z in (8, 16, 34) else 1
+    double = [b for b, o in orders.items() if o == 2]
+    if double:
+        b = double[0]
+        if b in ring or b in mol.ring_atoms:
+            return 1
+        return 0 if z == 6 else None   # 고리 밖 C=O 의 탄소는 전자 0 개
+    if z in (7, 15) and len(orders) + mol.hydrogens[a] == 3 and mol.charges[a] == 0:
+        return 2
+    if z in (8, 16, 34) and len(orders) == 2 and mol.charges[a] == 0:
+        return 2
+    if z == 6 and mol.charges[a] == -1:
+        return 2
+    return None
+
+
+def _perceive_aromaticity(mol: Mol):
+    """Kekulé 로 쓴 5·6원 고리를 방향족으로 바꾼다 (π 전자 6 개). 융합 고리는 바뀔 때까지 반복."""
+    rings = _small_rings(mol)
+    mol.ring_atoms = {a for ring in rings for a in ring}
+    candidates = [r for r in rings if len(r) in (5, 6)]
+    changed = True
+    while changed:
+        changed = False
+        for ring in candidates:
+            pairs = list(zip(ring, ring[1:] + ring[:1]))
+            if all(mol.bonds[a][b] == AROMATIC_BOND for a, b in pairs):
+                continue
+            members = set(ring)
+            electrons = [_pi_electrons(mol, a, members) for a in ring]
+            if None in electrons or sum(electrons) != 6:
+                continue
+            for a in ring:
+                mol.aromatic[a] = True
+            for a, b in pairs:
+                mol.bonds[a][b] = mol.bonds[b][a] = AROMATIC_BOND
+            changed = True
+
+
+def to_smiles(mol: Mol) -> str:
+    """DFS 로 쓴 (정규화하지 않은) SMILES. SDF 로 만든 인덱스에 표시·검증용 구조를 남길 때 쓴다."""
+    seen, out = set(), []
+    closures, next_label = {}, [1]
+
+    def bond_text(a, b):
+        o = mol.bonds[a][b]
+        if o == 1:   # 방향족 원자 사이의 단일 결합 (비페닐 등) 은 '-' 를 써야 방향족 결합으로 읽히지 않는다
+            return "-" if mol.aromatic[a] and mol.aromatic[b] else ""
+        return {2: "=", 3: "#"}.get(o, "")
+
+    def ring_label(n):
+        return str(n) if n < 10 else f"%{n}"
+
+    def atom_text(a):
+        z, aro, q, h = mol.elements[a], mol.aromatic[a], mol.charges[a], mol.hydrogens[a]
+        symbol = _SYMBOLS[z - 1]
+        symbol = symbol.lower() if aro else symbol
+        plain = symbol in _ORGANIC + _AROMATIC and q == 0 and not (aro and z in (7, 15) and h)
+        if plain:
+            return symbol
+        hs = f"H{h if h > 1 else ''}" if h else ""
+        charge = "" if not q else ("+" if q > 0 else "-") + (str(abs(q)) if abs(q) > 1 else "")
+        return f"[{symbol}{hs}{charge}]"
+
+    # 고리 닫힘 결합을 먼저 찾는다 (DFS 트리에 안 쓰이는 결합)
+    order, tree = [], set()
+    for start in range(len(mol)):
+        if start in seen:
+            continue
+        stack = [(start, None)]
+        while stack:
+            a, parent = stack.pop()
+            if a in seen:
+                continue
+            seen.add(a)
+            order.append((a, parent))
+            if parent is not None:
+                tree.add(frozenset((a, parent)))
+            for b in sorted(mol.bonds[a], reverse=True):
+                if b not in seen:
+                    stack.append((b, a))
+    ring_bonds = {frozenset((a, b)) for a in range(len(mol)) for b in mol.bonds[a]} - tree
+    for bond in ring_bonds:
+        closures[bond] = None
+
+    written = set()
+
+    def write(a, parent):
+        written.add(a)
+        text = atom_text(a)
+        for b in sorted(mol.bonds[a]):
+            key = frozenset((a, b))
+            if key not in closures:
+                continue
+            if closures[key] is None:
+                closures[key] = next_label[0]
+                next_label[0] += 1
+                text += bond_text(a, b) + ring_label(closures[key])
+            elif b in written:
+                text += bond_text(a, b) + ring_label(closures[key])
+        children = [b for b in sorted(mol.bonds[a]) if b != parent and b not in written
+                    and frozenset((a, b)) not in closures]
+        for k, b in enumerate(children):
+            if b in written:
+                continue
+            branch = bond_text(a, b) + write(b, a)
+            text += f"({branch})" if k < len(children) - 1 else branch
+        return text
+
+    for a, parent in order:
+        if parent is None:
+            out.append(write(a, None))
+    return ".".join(out)
+
+#--------------------------------
+# 지문
+
+
+def morgan_bits(mol: Mol, radius: int = MORGAN_RADIUS) -> set:
+    """ECFP 형태: 원자 불변량(원소, 이웃 수, 수소, 전하, 고리, 방향족)에서 시작해 반지름만큼 이웃을 접는다."""
+    ids = [hash((mol.elements[a], len(mol.bonds[a]), mol.hydrogens[a], mol.charges[a],
+                 a in mol.ring_atoms, mol.aromatic[a])) & 0x7FFFFFFF for a in range(len(mol))]
+    bits = {x % FP_BITS for x in ids}
+    for _ in range(radius):
+        ids = [hash((ids[a], *sorted((o, ids[b]) for b, o in mol.bonds[a].items()))) & 0x7FFFFFFF
+               for a in range(len(mol))]
+        bits.update(x % FP_BITS for x in ids)
+    return bits
+
+
+def path_bits(mol: Mol, max_bonds: int = PATH_MAX_BONDS) -> set:
+    """길이 max_bonds 이하의 모든 단순 경로 (원소·방향족·결합 차수 서열). 부분구조 사전 선별용."""
+    label = [mol.elements[a] * 2 + mol.aromatic[a] for a in range(len(mol))]
+    bits = set()
+
+    def walk(path, codes):
+        key = tuple(codes)
+        bits.add(hash(min(key, key[::-1])) % FP_BITS)
+        if len(path) > max_bonds:
+            return
+        for b, o in mol.bonds[path[-1]].items():
+            if b not in path:
+                walk(path + [b], codes + [o, label[b]])
+
+    for a in range(len(mol)):
+        walk([a], [label[a]])
+    return bits
+
+
+def pack(bits: set) -> np.ndarray:
+    dense = np.zeros(FP_BITS, dtype=bool)
+    dense[list(bits)] = True
+    return np.packbits(dense, bitorder="little").view(np.uint64)
+
+
+if hasattr(np, "bitwise_count"):
+    def popcount_rows(words: np.ndarray) -> np.ndarray:
+        return np.bitwise_count(words).sum(axis=1, dtype=np.uint32)
+else:   # numpy < 2.0
+    _POPCOUNT8 = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+    def popcount_rows(words: np.ndarray) -> np.ndarray:
+        return _POPCOUNT8[words.view(np.uint8)].sum(axis=1, dtype=np.uint32)
+
+#--------------------------------
+# 부분구조 확인
+
+
+def _atom_matches(target: Mol, t: int, query: Mol, q: int) -> bool:
+    return (target.elements[t] == query.elements[q]
+            and target.aromatic[t] == query.aromatic[q]
+            and (query.charges[q] == 0 or target.charges[t] == query.charges[q])
+            and len(target.bonds[t]) >= len(query.bonds[q]))
+
+
+def has_substructure(target: Mol, query: Mol) -> bool:
+    """query 그래프가 target 에 들어 있는지 (백트래킹, 이미 매칭된 이웃의 이웃만 후보로)."""
+    order, seen = [], set()
+    for start in sorted(range(len(query)), key=lambda a: -len(query.bonds[a])):
+        if start in seen:
+            continue
+        queue = deque([start])
+        seen.add(start)
+        while queue:
+            a = queue.popleft()
+            order.append(a)
+            for b in query.bonds[a]:
+                if b not in seen:
+                    seen.add(b)
+                    queue.append(b)
+    mapping, used = {}, set()
+
+    def extend(depth):
+        if depth == len(order):
+            return True
+        q = order[depth]
+        anchor = next((b for b in query.bonds[q] if b in mapping), None)
+        candidates = target.bonds[mapping[anchor]] if anchor is not None else range(len(target))
+        for t in candidates:
+            if t in used or not _atom_matches(target, t, query, q):
+                continue
+            if any(target.bonds[t].get(mapping[b]) != o for b, o in query.bonds[q].items() if b in mapping):
+                continue
+            mapping[q] = t
+            used.add(t)
+            if extend(depth + 1):
+                return True
+            del mapping[q]
+            used.discard(t)
+        return False
+
+    return extend(0)
+
+#--------------------------------
+# 빌드 (오프라인)
+
+
+def read_smi(path: str):
+    """SMILES 파일: 'SMILES<공백>ID[<공백>이름]'. '#' 줄은 주석."""
+    with open(path, encoding="utf-8") as f:
+        for n, line in enumerate(f):
+            if not line.strip() or line.startswith("#"):
+                continue
+            parts = line.rstrip("\n").split(None, 2)
+            yield parts[1] if len(parts) > 1 else str(n), parts[2] if len(parts) > 2 else "", parts[0]
+
+
+def read_chemreps(path: str):
+    """ChEMBL chembl_XX_chemreps.txt (chembl_id, canonical_smiles, standard_inchi, standard_inchi_key)."""
+    with open(path, encoding="utf-8") as f:
+        header = f.readline().rstrip("\n").split("\t")
+        id_col, smiles_col = header.index("chembl_id"), header.index("canonical_smiles")
+        for line in f:
+            row = line.rstrip("\n").split("\t")
+            if len(row) > smiles_col and row[smiles_col]:
+                yield row[id_col], "", row[smiles_col]
+
+
+def read_sdf(path: str):
+    """SDF: ID 는 chembl_id / ID / PUBCHEM_COMPOUND_CID 필드나 제목 줄, 구조는 molblock 그대로 넘긴다."""
+    with open(path, encoding="utf-8") as f:
+        block = []
+        for line in f:
+            if line.startswith("$$$$"):
+                text = "".join(block)
+                block = []
+                molblock, _, data = text.partition("M  END")
+                fields = dict(re.findall(r">\s*<([^>]+)>[^\n]*\n([^\n]*)", data))
+                cid = fields.get("chembl_id") or fields.get("ID") or fields.get("PUBCHEM_COMPOUND_CID") \
+                    or molblock.splitlines()[0].strip()
+                name = fields.get("pref_name") or fields.get("NAME") or ""
+                yield cid, name, molblock + "M  END\n"
+            else:
+                block.append(line)
+
+
+READERS = {"smi": read_smi, "chemreps": read_chemreps, "sdf": read_sdf}
+
+
+def _fingerprint_chunk(records: list):
+    """(id, name, SMILES 또는 molblock) 묶음 → 통과한 레코드와 두 지문 배열. 워커 프로세스에서 실행."""
+    kept, morgan, pattern, failed = [], [], [], 0
+    for cid, name, structure in records:
+        try:
+            if "M  END" in structure:
+                mol = parse_molblock(structure)
+                smiles = to_smiles(mol)
+            else:
+                mol = parse_smiles(structure)
+                smiles = structure.split()[0]
+            morgan.append(pack(morgan_bits(mol)))
+            pattern.append(pack(path_bits(mol)))
+            kept.append((cid, name, smiles))
+        except (ValueError, IndexError, KeyError, RecursionError):
+            failed += 1
+    shape = (len(kept), WORDS)
+    return (kept, np.array(morgan, dtype=np.uint64).reshape(shape),
+            np.array(pattern, dtype=np.uint64).reshape(shape), failed)
+
+
+def _chunks(iterable, size: int):
+    batch = []
+    for item in iterable:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _fingerprint_batches(batches, workers: int):
+    """순서를 지키면서 워커에 최대 workers*2 묶음만 걸어 둔다 (덤프 전체를 메모리에 올리지 않음)."""
+    if workers <= 1:
+        yield from map(_fingerprint_chunk, batches)
+        return
+    with ProcessPoolExecutor(workers) as pool:
+        pending = deque()
+        for batch in batches:
+            pending.append(pool.submit(_fingerprint_chunk, batch))
+            if len(pending) >= workers * 2:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+def build(paths, index_dir: str = INDEX_DIR, fmt: str = "smi", workers: int = 1) -> int:
+    """지문을 index_dir.tmp 에 쓰고 끝나면 바꿔 넣는다 (검색 중인 인덱스를 반쯤 덮어쓰지 않음)."""
+    started = time.time()
+    tmp = index_dir.rstrip("/") + ".tmp"
+    shutil.rmtree(tmp, ignore_errors=True)
+    os.makedirs(tmp)
+    n, failed, offsets, counts = 0, 0, [0], []
+    records = (r for path in paths for r in READERS[fmt](path))
+    with open(os.path.join(tmp, "morgan.bin"), "wb") as fm, open(os.path.join(tmp, "pattern.bin"), "wb") as fp, \
+            open(os.path.join(tmp, "records.bin"), "wb") as fr:
+        for kept, morgan, pattern, bad in _fingerprint_batches(_chunks(records, 2000), workers):
+            fm.write(morgan.tobytes())
+            fp.write(pattern.tobytes())
+            counts.append(popcount_rows(morgan))
+            for cid, name, smiles in kept:
+                line = f"{cid}\t{name}\t{smiles}".encode("utf-8")
+                fr.write(line)
+                offsets.append(offsets[-1] + len(line))
+            n += len(kept)
+            failed += bad
+    np.save(os.path.join(tmp, "offsets.npy"), np.array(offsets, dtype=np.int64))
+    np.save(os.path.join(tmp, "morgan_count.npy"),
+            np.concatenate(counts).astype(np.uint16) if counts else np.zeros(0, np.uint16))
+    with open(os.path.join(tmp, "meta.json"), "w") as f:
+        json.dump({"count": n, "fp_bits": FP_BITS, "morgan_radius": MORGAN_RADIUS,
+                   "path_max_bonds": PATH_MAX_BONDS, "sources": [os.path.basename(p) for p in paths]}, f)
+    shutil.rmtree(index_dir, ignore_errors=True)
+    os.replace(tmp, index_dir)
+    logger.info(f"compound index: {n} compounds ({failed} unparsable) → {index_dir} in {time.time() - started:.1f}s")
+    return n
+
+#--------------------------------
+# 검색
+
+
+class CompoundIndex:
+    """지문은 memmap (RAM 에 올리지 않음), 비트 수와 레코드 오프셋만 메모리에 둔다."""
+
+    def __init__(self, index_dir: str = INDEX_DIR):
+        with open(os.path.join(index_dir, "meta.json")) as f:
+            self.meta = json.load(f)
+        if self.meta["fp_bits"] != FP_BITS:
+            raise ValueError(f"{index_dir} was built with {self.meta['fp_bits']} bits; rebuild it")
+        self.count = self.meta["count"]
+        shape = (self.count, WORDS)
+        self.morgan = self._memmap(os.path.join(index_dir, "morgan.bin"), shape)
+        self.pattern = self._memmap(os.path.join(index_dir, "pattern.bin"), shape)
+        self.morgan_count = np.load(os.path.join(index_dir, "morgan_count.npy"))
+        self.offsets = np.load(os.path.join(index_dir, "offsets.npy"))
+        self.records = np.memmap(os.path.join(index_dir, "records.bin"), dtype=np.uint8, mode="r") \
+            if self.offsets[-1] else np.zeros(0, np.uint8)
+        self._pool = ThreadPoolExecutor(SEARCH_THREADS, thread_name_prefix="compound-search")
+
+    @staticmethod
+    def _memmap(path: str, shape):
+        if shape[0] == 0:
+            return np.zeros(shape, dtype=np.uint64)
+        return np.memmap(path, dtype=np.uint64, mode="r", shape=shape)
+
+    def record(self, i: int) -> dict:
+        cid, name, smiles = bytes(self.records[self.offsets[i]:self.offsets[i + 1]]).decode("utf-8").split("\t")
+        return {"id": cid, "name": name, "smiles": smiles}
+
+    def _chunks(self):
+        return [(i, min(i + CHUNK_ROWS, self.count)) for i in range(0, self.count, CHUNK_ROWS)]
+
+    def similar(self, smiles: str, top_k: int = 10, min_similarity: float = 0.0) -> list:
+        q = pack(morgan_bits(parse_smiles(smiles)))
+        q_count = int(popcount_rows(q[None, :])[0])
+
+        def scan(bounds):
+            lo, hi = bounds
+            inter = popcount_rows(self.morgan[lo:hi] & q).astype(np.float32)
+            sims = inter / np.maximum(self.morgan_count[lo:hi].astype(np.float32) + q_count - inter, 1.0)
+            k = min(top_k, hi - lo)
+            top = np.argpartition(-sims, k - 1)[:k]
+            return lo + top, sims[top]
+
+        parts = list(self._pool.map(scan, self._chunks()))
+        if not parts:
+            return []
+        idx = np.concatenate([p[0] for p in parts])
+        sims = np.concatenate([p[1] for p in parts])
+        order = np.argsort(-sims, kind="stable")[:top_k]
+        return [{**self.record(int(idx[j])), "similarity": round(float(sims[j]), 4)}
+                for j in order if sims[j] >= min_similarity]
+
+    def screen(self, query: Mol) -> np.ndarray:
+        """경로 지문이 질의를 포함하는 후보 인덱스 (오름차순)."""
+        q = pack(path_bits(query))
+
+        def scan(bounds):
+            lo, hi = bounds
+            block = self.pattern[lo:hi]
+            return lo + np.flatnonzero(((block & q) == q).all(axis=1))
+
+        parts = list(self._pool.map(scan, self._chunks()))
+        return np.concatenate(parts) if parts else np.zeros(0, dtype=np.int64)
+
+    def substructure(self, smiles: str, limit: int = 20) -> dict:
+        query = parse_smiles(smiles)
+        candidates = self.screen(query)
+        hits, verified = [], 0
+        for i in candidates[:VERIFY_MAX]:
+            rec = self.record(int(i))
+            verified += 1
+            try:
+                if has_substructure(parse_smiles(rec["smiles"]), query):
+                    hits.append(rec)
+            except ValueError:
+                continue
+            if len(hits) >= limit:
+                break
+        return {"screened": int(len(candidates)), "verified": verified, "hits": hits,
+                "truncated": len(hits) >= limit or verified < len(candidates)}
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_index() -> CompoundIndex:
+    """INDEX_DIR 가 없으면 fixture 로 만들어서 연다."""
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                if not os.path.exists(os.path.join(INDEX_DIR, "meta.json")):
+                    build([FIXTURE_PATH], INDEX_DIR)
+                _index = CompoundIndex(INDEX_DIR)
+    return _index
+
+
+@tool
+def local_similarity_search(smiles: str, top_k: int = 10, min_similarity: float = 0.3) -> dict:
+    """
+    Find the compounds most similar to a query structure in the local compound index
+    (Tanimoto on circular fingerprints, no network). Use this instead of remote similarity
+    searches. Returns IDs (e.g. ChEMBL IDs), names, SMILES and similarity (0-1).
+
+    Args:
+        smiles: query structure as SMILES (use resolve_identifier or a search tool first if you only have a name)
+        top_k: number of results (max 100)
+        min_similarity: drop results below this Tanimoto similarity
+    """
+    started = time.time()
+    try:
+        index = get_index()
+        hits = index.similar(smiles, max(1, min(int(top_k), 100)), float(min_similarity))
+    except ValueError as e:
+        return {"query": smiles, "error": str(e)}
+    return {"query": smiles, "searched": index.count, "hits": hits,
+            "elapsed_ms": round((time.time() - started) * 1000, 1)}
+
+
+@tool
+def local_substructure_search(smiles: str, limit: int = 20) -> dict:
+    """
+    Find compounds in the local compound index that contain a substructure (given as SMILES,
+    aromatic rings in lowercase or Kekulé form). Candidates are pre-screened by fingerprint
+    and then confirmed by graph matching; no network.
+
+    Args:
+        smiles: substructure as SMILES, e.g. "c1ccc2ncncc2c1" (quinazoline)
+        limit: maximum number of hits (max 200)
+    """
+    started = time.time()
+    try:
+        index = get_index()
+        result = index.substructure(smiles, max(1, min(int(limit), 200)))
+    except ValueError as e:
+        return {"query": smiles, "error": str(e)}
+    return {"query": smiles, "searched": index.count, **result,
+            "elapsed_ms": round((time.time() - started) * 1000, 1)}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    p = sub.add_parser("build", help="화합물 파일로 인덱스 생성")
+    p.add_argument("paths", nargs="+")
+    p.add_argument("--format", choices=sorted(READERS), default="smi")
+    p.add_argument("--workers", type=int, default=1, help="지문 계산 프로세스 수")
+    p.add_argument("--dir", default=INDEX_DIR)
+    p = sub.add_parser("similar", help="유사 화합물")
+    p.add_argument("smiles")
+    p.add_argument("--top-k", type=int, default=10)
+    p = sub.add_parser("substructure", help="부분구조 검색")
+    p.add_argument("smiles")
+    p.add_argument("--limit", type=int, default=20)
+    args = parser.parse_args(argv)
+
+    if args.cmd == "build":
+        build(args.paths, args.dir, args.format, args.workers)
+    elif args.cmd == "similar":
+        print(json.dumps(get_index().similar(args.smiles, args.top_k), ensure_ascii=False, indent=2))
+    else:
+        print(json.dumps(get_index().substructure(args.smiles, args.limit), ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
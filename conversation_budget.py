@@ -0,0 +1,182 @@
+# conversation_budget.py
+"""
+토큰 예산 기반 대화 압축 (SlidingWindowConversationManager(window_size=3) 대체).
+
+메시지 개수가 아니라 추정 토큰 수로 컨텍스트를 관리한다. 예산을 넘으면
+  1) 큰 도구 결과를 다이제스트(앞부분 + 식별자 목록)로 바꾸고 (모델 호출 없음)
+  2) 그래도 넘으면 오래된 턴들을 작은 모델로 요약한 메시지 하나로 합친다.
+어느 단계에서든 CHEMBL / UniProt / GO / PDB 등의 식별자는 bio_ids 로 뽑아서 남긴다.
+
+strands 는 apply_management 를 한 번의 agent 호출이 끝난 뒤에만 부르므로,
+실행 중 매 모델 호출 직전에는 RoutedModel 이 compact() 를 불러서 턴마다 크기를 묶어 둔다.
+"""
+import json
+import os
+import time
+from typing import Optional
+
+import boto3
+from strands.agent.conversation_manager import SlidingWindowConversationManager
+from strands.types.exceptions import ContextWindowOverflowException
+
+import model_hedge
+import model_router
+from bio_ids import extract_ids
+from logging_config import setup_logging
+
+logger = setup_logging().getChild("conversation_budget")
+
+CONTEXT_TOKENS = int(os.getenv("AGENT_CONTEXT_TOKENS", "24000"))
+TOOL_RESULT_TOKENS = int(os.getenv("AGENT_TOOL_RESULT_TOKENS", "3000"))
+DIGEST_CHARS = 1200       # 다이제스트에 원문을 얼마나 남길지
+SUMMARY_MAX_TOKENS = 600
+
+_br = None
+
+
+def _bedrock(region: str = model_router.REGION):
+    global _br
+    if region != model_router.REGION:
+        return model_hedge.client("bedrock-runtime", region)
+    if _br is None:
+        _br = boto3.client("bedrock-runtime", region_name=model_router.REGION)
+    return _br
+
+
+def estimate_tokens(text: str) -> int:
+    """토크나이저 없이 쓰는 추정치: ASCII 4글자 ≈ 1토큰, 한글 등 비ASCII 1글자 ≈ 1토큰."""
+    if not text:
+        return 0
+    non_ascii = sum(1 for ch in text if ord(ch) > 127)
+    return (len(text) - non_ascii) // 4 + non_ascii + 1
+
+
+def _block_text(block: dict) -> str:
+    if "text" in block:
+        return block["text"]
+    if "toolUse" in block:
+        return json.dumps(block["toolUse"].get("input", {}), ensure_ascii=False) + block["toolUse"].get("name", "")
+    if "toolResult" in block:
+        return "".join(_block_text(c) if "text" in c else json.dumps(c.get("json", ""), ensure_ascii=False)
+                       for c in block["toolResult"].get("content", []))
+    return ""
+
+
+def message_tokens(message: dict) -> int:
+    return sum(estimate_tokens(_block_text(b)) for b in message.get("content", [])) + 4
+
+
+class TokenBudgetConversationManager(SlidingWindowConversationManager):
+    def __init__(self, max_tokens: int = CONTEXT_TOKENS, tool_result_tokens: int = TOOL_RESULT_TOKENS,
+                 summarize: bool = True):
+        super().__init__(window_size=10_000)
+        self.max_tokens = max_tokens
+        self.tool_result_tokens = tool_result_tokens
+        self.summarize = summarize
+
+    def total_tokens(self, messages) -> int:
+        return sum(message_tokens(m) for m in messages)
+
+    # --- strands ConversationManager 인터페이스 --------------------------------
+
+    def apply_management(self, messages) -> None:
+        self._remove_dangling_messages(messages)
+        self.compact(messages)
+
+    def reduce_context(self, messages, e: Optional[Exception] = None) -> None:
+        before = self.total_tokens(messages)
+        # 컨텍스트 초과가 실제로 났다면 예산을 절반으로 잡고 더 세게 줄인다
+        self.compact(messages, budget=min(self.max_tokens, before) // 2, digest_all=True)
+        if self.total_tokens(messages) >= before:
+            raise ContextWindowOverflowException("Unable to trim conversation context!") from e
+
+    # --- 압축 ---------------------------------------------------------------
+
+    def compact(self, messages, budget: int = None, digest_all: bool = False) -> None:
+        """messages 를 제자리에서 줄인다. 마지막 메시지(진행 중인 턴)는 건드리지 않는다."""
+        budget = budget or self.max_tokens
+        if self.total_tokens(messages) <= budget and not digest_all:
+            return
+
+        # 1) 큰 도구 결과 → 다이제스트 (오래된 것부터)
+        for m in messages[:-1]:
+            for block in m.get("content", []):
+                if "toolResult" in block:
+                    limit = self.tool_result_tokens // 4 if digest_all else self.tool_result_tokens
+                    self._digest_tool_result(block["toolResult"], limit)
+            if self.total_tokens(messages) <= budget:
+                return
+
+        # 2) 오래된 턴 요약
+        if self.summarize and self.total_tokens(messages) > budget:
+            self._summarize_prefix(messages, budget)
+
+    def _digest_tool_result(self, result: dict, limit: int) -> None:
+        text = "".join(_block_text(c) if "text" in c else json.dumps(c.get("json", ""), ensure_ascii=False)
+                       for c in result.get("content", []))
+        tokens = estimate_tokens(text)
+        if tokens <= limit or text.startswith("[digest]"):
+            return
+        ids = extract_ids(text)
+        digest = (
+            f"[digest] original tool result was ~{tokens} tokens and has been compacted.\n"
+            f"{text[:DIGEST_CHARS]}…\n"
+            + (f"Identifiers mentioned: {', '.join(ids[:200])}" if ids else "")
+        )
+        result["content"] = [{"text": digest}]
+
+    def _cut_index(self, messages, budget: int) -> int:
+        """
+        요약으로 합칠 접두부의 끝. messages[cut] 은 assistant 메시지여야
+        (요약 user 메시지) → assistant 순서가 유지되고 toolUse/toolResult 짝도 깨지지 않는다.
+        """
+        keep = 0
+        cut = 0
+        for i in range(len(messages) - 1, 0, -1):
+            keep += message_tokens(messages[i])
+            if messages[i]["role"] == "assistant":
+                cut = i
+                if keep > budget // 2:
+                    break
+        return cut
+
+    def _summarize_prefix(self, messages, budget: int) -> None:
+        cut = self._cut_index(messages, budget)
+        if cut <= 1:
+            return
+        prefix = messages[:cut]
+        first_user = next((b["text"] for b in prefix[0].get("content", []) if "text" in b), "")
+        transcript = "\n".join(
+            f"{m['role']}: " + " ".join(_block_text(b) for b in m.get("content", []))[:4000] for m in prefix
+        )
+        ids = extract_ids(transcript)
+        summary = self._call_summarizer(transcript) or transcript[:DIGEST_CHARS * 2]
+        text = (
+            "[Summary of earlier turns]\n"
+            f"Original request: {first_user}\n"
+            f"{summary}\n"
+            + (f"Identifiers found so far: {', '.join(ids[:200])}" if ids else "")
+        )
+        messages[:cut] = [{"role": "user", "content": [{"text": text}]}]
+        logger.info(f"summarized {cut} messages into {estimate_tokens(text)} tokens")
+
+    def _call_summarizer(self, transcript: str) -> str:
+        model_id = model_router.model_for("summarize")
+        t0 = time.perf_counter()
+        try:
+            resp = model_hedge.call(model_hedge.endpoints_for(model_id), lambda ep: _bedrock(ep.region).converse(
+                modelId=ep.model_id,
+                messages=[{"role": "user", "content": [{"text": (
+                    "Summarize the following agent/tool conversation for a research assistant that will continue it. "
+                    "Keep every database identifier (ChEMBL, UniProt, GO, PDB, Reactome, Ensembl, PubChem CID), "
+                    "numbers and tool findings; drop boilerplate. Max 12 bullet points.\n\n" + transcript[-30000:]
+                )}]}],
+                inferenceConfig={"maxTokens": SUMMARY_MAX_TOKENS, "temperature": 0},
+            ))
+        except Exception as e:
+            logger.warning(f"summarizer failed, falling back to truncation: {e}")
+            return ""
+        usage = resp.get("usage", {})
+        model_router.record("summarize", model_id, time.perf_counter() - t0,
+                            usage.get("inputTokens", 0), usage.get("outputTokens", 0))
+        return "".join(b.get("text", "") for b in resp["output"]["message"]["content"])
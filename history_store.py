@@ -0,0 +1,191 @@
+# history_store.py
+"""
+Streamlit 세션별 대화/로그 기록 저장소.
+
+st.session_state 에 리스트를 계속 붙이면 세션이 길어질수록 메모리와 rerun 렌더 시간이 같이 는다.
+HistoryStore 는 최근 HISTORY_WINDOW 개만 메모리(deque)에 두고, 모든 메시지는 바로 SQLite 에
+append 해 두었다가 "이전 대화 더 보기" 를 누를 때만 필요한 만큼 읽어서 그린다 (읽은 것은 보관하지 않음).
+LogBuffer 는 실시간 로그를 최근 N 줄만 메모리에 두고 전체는 같은 DB 에 묶어서 쓴다.
+
+  history = get_history("CHEMBL_MCP_messages", greeting="안녕하세요, 무엇이 궁금하세요?")
+  render_chat(history)
+  history.append("user", query)
+"""
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from collections import deque
+
+from logging_config import session_id, setup_logging
+
+logger = setup_logging().getChild("history_store")
+
+HISTORY_DB = os.getenv("HISTORY_DB", ".chat_history.sqlite")
+HISTORY_WINDOW = int(os.getenv("HISTORY_WINDOW", "20"))      # 메모리에 두는 최근 메시지 수
+HISTORY_PAGE = int(os.getenv("HISTORY_PAGE", "20"))          # "더 보기" 한 번에 읽는 수
+HISTORY_TTL_DAYS = float(os.getenv("HISTORY_TTL_DAYS", "7"))
+LOG_LINES = int(os.getenv("HISTORY_LOG_LINES", "300"))       # 화면에 유지하는 로그 줄 수
+LOG_FLUSH = 50
+
+_conn = None
+_conn_lock = threading.Lock()
+
+
+def _db() -> sqlite3.Connection:
+    """프로세스 공용 연결 (Streamlit rerun 스레드가 바뀌므로 check_same_thread=False + 락)."""
+    global _conn
+    if _conn is None:
+        conn = sqlite3.connect(HISTORY_DB, check_same_thread=False, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.executescript("""
+            CREATE TABLE IF NOT EXISTS messages (
+                session TEXT NOT NULL, channel TEXT NOT NULL, seq INTEGER NOT NULL,
+                ts REAL NOT NULL, role TEXT NOT NULL, content TEXT NOT NULL,
+                PRIMARY KEY (session, channel, seq)) WITHOUT ROWID;
+            CREATE TABLE IF NOT EXISTS logs (
+                session TEXT NOT NULL, channel TEXT NOT NULL, ts REAL NOT NULL, line TEXT NOT NULL);
+            CREATE INDEX IF NOT EXISTS logs_session ON logs (session, channel, ts);
+        """)
+        _conn = conn
+        prune()
+    return _conn
+
+
+def _execute(sql: str, args=(), many=False):
+    with _conn_lock:
+        db = _db()
+        return db.executemany(sql, args) if many else db.execute(sql, args).fetchall()
+
+
+def prune(max_age_days: float = HISTORY_TTL_DAYS):
+    """오래된 세션 기록 삭제 (DB 를 처음 열 때 한 번)."""
+    cutoff = time.time() - max_age_days * 86400
+    _conn.execute("DELETE FROM messages WHERE ts < ?", (cutoff,))
+    _conn.execute("DELETE FROM logs WHERE ts < ?", (cutoff,))
+
+
+def log_query(channel: str, content: str, session: str = None):
+    """
+    Streamlit 밖(api_server)에서 받은 질문도 같은 테이블에 남긴다 (warmup 이 인기 질문을 뽑는 곳).
+    같은 세션이 여러 번 물을 수 있으므로 seq 는 그 세션·채널의 다음 번호 (한 문장이라 락 안에서 원자적).
+    """
+    session = session or uuid.uuid4().hex
+    _execute("INSERT INTO messages SELECT ?, ?, COALESCE(MAX(seq), -1) + 1, ?, ?, ? "
+             "FROM messages WHERE session = ? AND channel = ?",
+             (session, channel, time.time(), "user", content, session, channel))
+
+
+def user_questions(since: float) -> list:
+    """since 이후 사용자 질문 [(channel, content, 물어본 세션 수, 마지막 시각)] (같은 문자열끼리 묶음)."""
+    return _execute(
+        "SELECT channel, content, COUNT(DISTINCT session), MAX(ts) FROM messages "
+        "WHERE role = 'user' AND ts >= ? GROUP BY channel, content", (since,))
+
+#--------------------------------
+
+
+class HistoryStore:
+    """한 세션·한 채널(페이지)의 대화 기록. 메모리에는 최근 window 개만."""
+
+    def __init__(self, channel: str, session: str = None, window: int = HISTORY_WINDOW):
+        self.channel = channel
+        self.session = session or uuid.uuid4().hex
+        self.recent = deque(maxlen=window)  # (seq, role, content)
+        self.count = 0
+
+    def append(self, role: str, content: str) -> int:
+        """메시지 순번(seq)을 돌려준다 (페이지가 메시지별 부가 정보를 붙일 때 키로 쓴다)."""
+        seq = self.count
+        _execute("INSERT INTO messages VALUES (?, ?, ?, ?, ?, ?)",
+                 (self.session, self.channel, seq, time.time(), role, content))
+        self.recent.append((seq, role, content))
+        self.count += 1
+        return seq
+
+    def older_count(self) -> int:
+        return self.count - len(self.recent)
+
+    def older(self, limit: int) -> list:
+        """메모리 창 바로 앞의 limit 개 [(role, content)] (오래된 것부터). 디스크에서 읽음."""
+        if not self.recent or limit <= 0:
+            return []
+        first = self.recent[0][0]
+        rows = _execute(
+            "SELECT role, content FROM messages WHERE session = ? AND channel = ? AND seq >= ? AND seq < ? "
+            "ORDER BY seq", (self.session, self.channel, max(0, first - limit), first))
+        return rows
+
+    def messages(self) -> list:
+        return [(role, content) for _, role, content in self.recent]
+
+
+class LogBuffer:
+    """실시간 로그. 화면용 최근 max_lines 줄만 메모리에 두고 전체는 LOG_FLUSH 줄씩 디스크로."""
+
+    def __init__(self, history: HistoryStore, max_lines: int = LOG_LINES):
+        self.history = history
+        self.lines = deque(maxlen=max_lines)
+        self.pending = []
+        self.dropped = 0
+
+    def append(self, line: str):
+        if len(self.lines) == self.lines.maxlen:
+            self.dropped += 1
+        self.lines.append(line)
+        self.pending.append((self.history.session, self.history.channel, time.time(), line))
+        if len(self.pending) >= LOG_FLUSH:
+            self.flush()
+
+    def flush(self):
+        if self.pending:
+            _execute("INSERT INTO logs VALUES (?, ?, ?, ?)", self.pending, many=True)
+            self.pending = []
+
+    def text(self) -> str:
+        head = f"… (앞의 {self.dropped} 줄 생략)\n" if self.dropped else ""
+        return head + "".join(self.lines)
+
+#--------------------------------
+# Streamlit 헬퍼
+
+
+def get_history(key: str, greeting: str = None) -> HistoryStore:
+    """st.session_state[key] 의 HistoryStore (없으면 만들고 인사말을 넣는다)."""
+    import streamlit as st
+
+    if "history_session" not in st.session_state:
+        st.session_state["history_session"] = uuid.uuid4().hex
+    # 이번 rerun 의 로그와 토큰 계량(token_meter)에 브라우저 세션 ID 를 붙인다
+    session_id.set(st.session_state["history_session"])
+    if key not in st.session_state:
+        history = HistoryStore(key, st.session_state["history_session"])
+        if greeting:
+            history.append("assistant", greeting)
+        st.session_state[key] = history
+    return st.session_state[key]
+
+
+def render_chat(history: HistoryStore, extra=None):
+    """
+    이전 대화는 버튼을 누른 만큼만 디스크에서 읽어서 그리고, 최근 창은 그대로 그린다.
+    extra(seq) 를 주면 최근 창의 메시지마다 말풍선 안에서 본문 다음에 부른다 (인용 목록 등).
+    """
+    import streamlit as st
+
+    shown_key = f"{history.channel}__older_shown"
+    shown = min(st.session_state.get(shown_key, 0), history.older_count())
+    remaining = history.older_count() - shown
+    if remaining > 0 and st.button(f"이전 대화 더 보기 ({remaining})", key=f"{history.channel}__more"):
+        shown = min(shown + HISTORY_PAGE, history.older_count())
+    st.session_state[shown_key] = shown
+
+    for role, content in history.older(shown):
+        st.chat_message(role).write(content)
+    for seq, role, content in history.recent:
+        with st.chat_message(role):
+            st.write(content)
+            if extra is not None:
+                extra(seq)
@@ -0,0 +1,207 @@
+# id_index.py
+"""
+로컬 생물/화학 식별자 인덱스 (이름·동의어 → UniProt / Ensembl / ChEMBL / PubChem CID / PDB).
+
+에이전트 도구 호출의 상당수가 "이름 → ID" 변환인데, 매번 LLM 턴 + 원격 검색이 든다.
+매핑 덤프(또는 data/fixtures/id_index.tsv)로 오프라인에서 SQLite 인덱스를 만들어 두고
+resolve_identifier 도구로 프로세스 안에서 바로 찾는다.
+
+  python id_index.py build data/fixtures/id_index.tsv                  # 기본 형식(tsv)
+  python id_index.py build hgnc_complete_set.txt --format hgnc --append # HGNC 전체 유전자 덤프
+  python id_index.py lookup imatinib
+
+키는 대소문자/공백/하이픈을 무시한 정규형이라 "STI-571", "sti571", "Gleevec" 가 모두 같은 항목으로 간다.
+정확히 일치하는 키가 없으면 접두어 범위 검색으로 후보를 보여준다.
+"""
+import argparse
+import csv
+import json
+import os
+import re
+import sqlite3
+import threading
+from functools import lru_cache
+
+from strands import tool
+
+from logging_config import setup_logging
+
+logger = setup_logging().getChild("id_index")
+
+INDEX_PATH = os.getenv("ID_INDEX_PATH", "data/id_index.sqlite")
+FIXTURE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "fixtures", "id_index.tsv")
+PREFIX_LIMIT = 5
+
+_NORM = re.compile(r"[\s\-_.,'()/+]+")
+
+
+def normalize(name: str) -> str:
+    return _NORM.sub("", (name or "").casefold())
+
+#--------------------------------
+# 빌드 (오프라인)
+
+
+def read_tsv(path: str):
+    """기본 형식: type, name, synonyms(|), xrefs(key=value;...  값 여러 개는 |). '#' 줄은 주석."""
+    with open(path, encoding="utf-8") as f:
+        for row in csv.reader(f, delimiter="\t"):
+            if not row or row[0].startswith("#"):
+                continue
+            etype, name = row[0], row[1]
+            synonyms = [s for s in (row[2] if len(row) > 2 else "").split("|") if s]
+            xrefs = {}
+            for pair in (row[3] if len(row) > 3 else "").split(";"):
+                if "=" in pair:
+                    key, value = pair.split("=", 1)
+                    values = [v for v in value.split("|") if v]
+                    xrefs[key] = values if len(values) > 1 else values[0]
+            yield etype, name, synonyms, xrefs
+
+
+def read_hgnc(path: str):
+    """HGNC complete set (hgnc_complete_set.txt, 헤더 있는 TSV)."""
+    with open(path, encoding="utf-8") as f:
+        for row in csv.DictReader(f, delimiter="\t"):
+            if row.get("status", "Approved") != "Approved":
+                continue
+            synonyms = [row.get("name", "")]
+            for col in ("alias_symbol", "prev_symbol"):
+                synonyms += (row.get(col) or "").strip('"').split("|")
+            xrefs = {"hgnc": row["hgnc_id"]}
+            for col, key in (("uniprot_ids", "uniprot"), ("ensembl_gene_id", "ensembl"), ("entrez_id", "ncbi_gene")):
+                values = [v for v in (row.get(col) or "").strip('"').split("|") if v]
+                if values:
+                    xrefs[key] = values if len(values) > 1 else values[0]
+            yield "gene", row["symbol"], [s for s in synonyms if s], xrefs
+
+
+READERS = {"tsv": read_tsv, "hgnc": read_hgnc}
+
+
+def build(paths, db_path: str = INDEX_PATH, fmt: str = "tsv", append: bool = False) -> int:
+    if not append and os.path.exists(db_path):
+        os.remove(db_path)
+    os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+    conn = sqlite3.connect(db_path)
+    conn.executescript("""
+        CREATE TABLE IF NOT EXISTS entities (
+            entity INTEGER PRIMARY KEY, type TEXT NOT NULL, name TEXT NOT NULL, xrefs TEXT NOT NULL);
+        CREATE TABLE IF NOT EXISTS names (
+            key TEXT NOT NULL, entity INTEGER NOT NULL, primary_name INTEGER NOT NULL,
+            PRIMARY KEY (key, entity)) WITHOUT ROWID;
+    """)
+    n = 0
+    with conn:
+        for path in paths:
+            for etype, name, synonyms, xrefs in READERS[fmt](path):
+                cur = conn.execute("INSERT INTO entities (type, name, xrefs) VALUES (?, ?, ?)",
+                                   (etype, name, json.dumps(xrefs, ensure_ascii=False)))
+                keys = {normalize(name): 1}
+                for s in synonyms:
+                    keys.setdefault(normalize(s), 0)
+                conn.executemany("INSERT OR IGNORE INTO names VALUES (?, ?, ?)",
+                                 [(k, cur.lastrowid, p) for k, p in keys.items() if k])
+                n += 1
+    conn.execute("ANALYZE")
+    conn.close()
+    logger.info(f"id index: {n} entities → {db_path}")
+    return n
+
+#--------------------------------
+# 조회
+
+
+class IdIndex:
+    """스레드마다 읽기 전용 연결 하나 (mmap), 정규화 키 → 항목 조회는 LRU 캐시."""
+
+    def __init__(self, db_path: str = INDEX_PATH):
+        self.db_path = db_path
+        self._local = threading.local()
+        self.lookup = lru_cache(maxsize=50_000)(self._lookup)
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(f"file:{self.db_path}?mode=ro", uri=True, check_same_thread=False)
+            conn.execute("PRAGMA mmap_size = 268435456")
+            self._local.conn = conn
+        return conn
+
+    def _rows(self, sql: str, args) -> list:
+        return [
+            {"type": t, "name": name, "matched": key, **json.loads(xrefs)}
+            for t, name, xrefs, key in self._conn().execute(sql, args)
+        ]
+
+    def _lookup(self, name: str, entity_type: str = "") -> tuple:
+        key = normalize(name)
+        if not key:
+            return ()
+        type_sql = " AND e.type = ?" if entity_type else ""
+        extra = (entity_type,) if entity_type else ()
+        rows = self._rows(
+            "SELECT e.type, e.name, e.xrefs, n.key FROM names n JOIN entities e USING (entity) "
+            f"WHERE n.key = ?{type_sql} ORDER BY n.primary_name DESC", (key, *extra))
+        if not rows:
+            # 접두어 범위 검색 (B-tree 인덱스로 처리됨)
+            rows = self._rows(
+                "SELECT e.type, e.name, e.xrefs, n.key FROM names n JOIN entities e USING (entity) "
+                f"WHERE n.key >= ? AND n.key < ?{type_sql} ORDER BY length(n.key) LIMIT ?",
+                (key, key + "￿", *extra, PREFIX_LIMIT))
+        return tuple(rows)
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_index() -> IdIndex:
+    """INDEX_PATH 가 없으면 fixture 로 만들어서 연다."""
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                if not os.path.exists(INDEX_PATH):
+                    build([FIXTURE_PATH], INDEX_PATH)
+                _index = IdIndex(INDEX_PATH)
+    return _index
+
+
+@tool
+def resolve_identifier(name: str, entity_type: str = "") -> dict:
+    """
+    Resolve a gene/protein or drug/compound name (any case, synonyms and brand names allowed)
+    to database identifiers from a local index: UniProt accession, Ensembl gene ID, HGNC ID,
+    ChEMBL ID, PubChem CID and example PDB IDs. Use this BEFORE calling any remote search tool
+    when you only need an identifier. entity_type may be "gene" or "compound" (optional).
+
+    Args:
+        name: gene symbol, protein name, drug name, synonym or brand name
+        entity_type: optional filter, "gene" or "compound"
+    """
+    matches = list(get_index().lookup(name.strip(), entity_type.strip().lower()))
+    return {"query": name, "found": bool(matches), "matches": matches}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    p = sub.add_parser("build", help="매핑 파일로 인덱스 생성")
+    p.add_argument("paths", nargs="+")
+    p.add_argument("--format", choices=sorted(READERS), default="tsv")
+    p.add_argument("--append", action="store_true", help="기존 인덱스에 추가")
+    p.add_argument("--db", default=INDEX_PATH)
+    p = sub.add_parser("lookup", help="이름 조회")
+    p.add_argument("name")
+    p.add_argument("--type", default="")
+    args = parser.parse_args(argv)
+
+    if args.cmd == "build":
+        build(args.paths, args.db, args.format, args.append)
+    else:
+        print(json.dumps(list(get_index().lookup(args.name, args.type)), ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
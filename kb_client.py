@@ -1,13 +1,29 @@
 import json, boto3, base64
 from opensearchpy import OpenSearch, RequestsHttpConnection
 from opensearchpy import AWSV4SignerAuth
-import re, os
+import re, os, time
+import citations
+import kb_filters
+import model_hedge
+import model_router
+import profiler
+import query_cache
+import token_meter
+from conversation_budget import estimate_tokens
+from logging_config import setup_logging
 
 REGION = "us-west-2"
 AOSS_HOST = "fo3v57rqvibkb306p82j.us-west-2.aoss.amazonaws.com"
-INDEX = "bedrock-knowledge-base-default-index"
+# kb_quant.py reindex 로 옮긴 int8 인덱스를 쓸 때 KB_INDEX 로 바꾼다
+INDEX = os.getenv("KB_INDEX", "bedrock-knowledge-base-default-index")
 TEXT_FIELD = "AMAZON_BEDROCK_TEXT"
 VEC_FIELD  = "embedding_v2"  # 우리가 백필해 둔 v2 벡터 필드
+SOURCE_FIELD = "x-amz-bedrock-kb-source-uri"
+PAGE_FIELD = "x-amz-bedrock-kb-document-page-number"
+# fp32: VEC_FIELD 로 바로 KNN / int8: 양자화 필드로 후보 검색 후 VEC_FIELD 로 재채점 (kb_quant.py)
+VEC_MODE = os.getenv("KB_VEC_MODE", "fp32")
+
+logger = setup_logging().getChild("kb_client")
 
 session = boto3.Session()
 auth = AWSV4SignerAuth(session.get_credentials(), REGION, service="aoss")
@@ -19,14 +35,32 @@ os_client = OpenSearch(
 br = boto3.client("bedrock-runtime", region_name=REGION)
 bedrock_agent_runtime_client = session.client("bedrock-agent-runtime", region_name=REGION)
 
-MODEL_ARN = "arn:aws:bedrock:us-west-2:170483442401:inference-profile/us.anthropic.claude-3-7-sonnet-20250219-v1:0"
+# token_meter 에 기록할 페이지 이름
+METER_PAGE = "kb"
+EMBED_MODEL = "amazon.titan-embed-text-v2:0"
 
 #--------------------------------
 
-def embed_v2(text: str):
-    r = br.invoke_model(modelId="amazon.titan-embed-text-v2:0",
-                        body=json.dumps({"inputText": text}))
-    return json.loads(r["body"].read())["embedding"]
+
+def _runtime(region):
+    """주 리전은 위의 전역 클라이언트(벤치마크가 대역으로 바꿔 끼움), 헤지/페일오버 리전은 model_hedge 의 클라이언트."""
+    return br if region == REGION else model_hedge.client("bedrock-runtime", region)
+
+
+def _agent_runtime(region):
+    return bedrock_agent_runtime_client if region == REGION else model_hedge.client("bedrock-agent-runtime", region)
+
+
+def embed_v2(text: str, dimensions: int = 1024):
+    body = {"inputText": text}
+    if dimensions != 1024:
+        body.update({"dimensions": dimensions, "normalize": True})
+
+    def invoke(ep):
+        r = _runtime(ep.region).invoke_model(modelId=ep.model_id, body=json.dumps(body))
+        return json.loads(r["body"].read())
+
+    return model_hedge.call(model_hedge.endpoints_for(EMBED_MODEL), invoke)["embedding"]
 
 
 def s3uri_to_https(s3uri: str) -> str:
@@ -41,22 +75,34 @@ def is_chitchat(q: str) -> bool:
 
 def general_chat(question: str) -> str:
 # 일반 대화 모드: system 프롬프트로 톤만 통제
-    resp = br.invoke_model(
-        modelId="arn:aws:bedrock:us-west-2:170483442401:inference-profile/us.anthropic.claude-3-7-sonnet-20250219-v1:0",
-        body=json.dumps({
-            "anthropic_version": "bedrock-2023-05-31",
-            "max_tokens": 512,
-            "temperature": 0.7,
-            "top_p": 1,
-            "messages": [        
-                {
-                    "role": "user",
-                    "content": [{"type": "text", "text": question}]
-                }
-            ]
-        })
-    )
-    return json.loads(resp["body"].read())["content"][0]["text"]
+    token_meter.enforce()
+    model_id = model_router.model_for("chitchat")
+    body = json.dumps({
+        "anthropic_version": "bedrock-2023-05-31",
+        "max_tokens": 512,
+        "temperature": 0.7,
+        "top_p": 1,
+        "messages": [        
+            {
+                "role": "user",
+                "content": [{"type": "text", "text": question}]
+            }
+        ]
+    })
+
+    def invoke(ep):
+        resp = _runtime(ep.region).invoke_model(modelId=ep.model_id, body=body)
+        return json.loads(resp["body"].read())
+
+    t0 = time.perf_counter()
+    out = model_hedge.call(model_hedge.endpoints_for(model_id), invoke)
+    usage = out.get("usage", {})
+    model_router.record("chitchat", model_id, time.perf_counter() - t0,
+                        usage.get("input_tokens", 0), usage.get("output_tokens", 0),
+                        cache_read_tokens=usage.get("cache_read_input_tokens", 0),
+                        cache_write_tokens=usage.get("cache_creation_input_tokens", 0),
+                        page=METER_PAGE)
+    return out["content"][0]["text"]
 
 def contains_difficulty_phrase(answer: str) -> bool:
     """
@@ -83,31 +129,90 @@ def overlap_count(q: str, t: str) -> int:
 
 
 
-def query(question):
-    # 1) 질문을 v2로 임베딩
-    # 1) 질문 임베딩 → KNN 검색 (같음)
+PROMPT_CHATBOT_HYBRID = (
+    "역할: 너는 의학/제약 도메인 QA 챗봇이다.\n"
+    "목표: 아래 [검색 결과]를 근거로 답하되, 이해를 돕는 비수치 배경설명을 짧게 제공할 수 있다.\n\n"
+    "절차:\n"
+    "1) 질문이 모호하면 확인 질문 한 개만 제시하고 중단.\n"
+    "2) 명확하면 답변 작성.\n\n"
+    "규칙:\n"
+    "0) 질문이 모호하여 답변이 어려울 경우, 혹은 이상한 질문이라면, 답변에 반드시 '어렵습니다'라는 단어를 포함.\n"
+    "1) 답변이 어려울 경우 [S#] 인용 절대 하지 말 것.\n"
+    "A) 수치·연도·효능·안전성 등 구체적 사실은 [#] 인용 필수.\n"
+    "B) '배경지식' 섹션에는 정의/맥락 등 일반 설명만(숫자·연구결과 금지).\n"
+    "C) 근거 부족 시 '자료 불충분' + 추가 필요정보 1–2줄.\n"
+    "D) 상충 정보는 양쪽 기술 + 불확실함 명시.\n"
+    "E) 한국어 간결체, 8-11문장.\n\n"
+    "출력 형식:\n"
+    "[Answer]\n 5–11문장. 필요한 문장에 [#] 인용.[#] 작성은 1부터 N까지 순서에 맞게 작성.\n"
+    "[Background] 1–3문장 (인용·수치 금지) — 필요 시만.\n"
+    "[References]\n"
+    "- [1] s3://...\n"
+    "- [2] s3://...\n\n"
+    "[검색 결과]\n$search_results$\n\n[답변]"
+)
+
+
+KNN_K = 5
+
+
+def _knn(question, filters):
+    flt = kb_filters.knn_filter(filters)
+    if VEC_MODE == "int8":
+        import kb_quant
+        return kb_quant.search_quantized(os_client, INDEX, VEC_FIELD, question, embed_v2, k=KNN_K, filter=flt)
     q_vec = embed_v2(question)
-    knn = os_client.search(
-        index=INDEX,
-        body={"size": 5, "query": {"knn": {VEC_FIELD: {"vector": q_vec, "k": 5}}}}
-    )
-    hits = knn["hits"]["hits"]
+    knn = {"vector": q_vec, "k": KNN_K}
+    if flt:
+        # knn 절 안의 filter: 조건에 맞는 문서 안에서만 이웃을 찾는다 (top-k 뒤에 거르는 post-filter 가 아님)
+        knn["filter"] = flt
+    return os_client.search(index=INDEX, body={"size": KNN_K, "query": {"knn": {VEC_FIELD: knn}}})["hits"]["hits"]
+
+
+def _cache_key(question, filters):
+    # 질문에서 뽑는 필터는 질문으로 정해지므로 UI/API 필터가 있을 때만 키에 넣는다 (warmup 은 질문만으로 찾는다)
+    key = query_cache.normalize(question)
+    return (key, kb_filters.key(filters)) if filters else key
+
+
+def retrieve(question, filters=None):
+    """
+    질문 임베딩 → (필터가 있으면 filtered) KNN 검색 → RnG 에 넘길 payload, s3 uri 목록,
+    [Source i] 별 출처(uri/페이지/청크), 실제로 적용한 필터.
+    filters 는 kb_filters.parse() 를 거친 dict. 질문에서 뽑은 필터(kb_filters.extract)는 키마다 filters 가 이긴다.
+    """
+    ckey = _cache_key(question, filters)
+    cached = query_cache.kb_retrieval.get(ckey)
+    if cached is not None:
+        return cached
+    applied = kb_filters.merge(filters, kb_filters.extract(question) if kb_filters.AUTO_FILTERS else {})
+    hits = _knn(question, applied)
+    if len(hits) < KNN_K and applied and applied != (filters or {}):
+        # 질문에서 뽑은 조건으로 k 개를 못 채우면 (필드가 아직 backfill 안 된 문서 포함) 명시한 필터만으로 다시 찾아
+        # 걸러진 hit 뒤에 채운다. 일부 hit 는 뽑은 조건 밖이므로 적용 필터는 명시한 것만으로 보고한다
+        logger.info(f"{len(hits)} hits with extracted filters {applied}, filling with {filters or {}}")
+        applied = dict(filters or {})
+        seen = {h["_id"] for h in hits}
+        hits = hits + [h for h in _knn(question, applied) if h["_id"] not in seen][:KNN_K - len(hits)]
 
 
 
     # 4) 히트 필터링 (조건 4개 중 2개 이상 만족 시 채택)
     chunks = []
     s3_uri_list = []
+    sources = []
 
     for i, hit in enumerate(hits, 1):
         txt = (hit["_source"].get(TEXT_FIELD) or "").strip()
         if not txt:
             continue
-        src = hit["_source"].get("x-amz-bedrock-kb-source-uri") or hit["_id"]
+        src = hit["_source"].get(SOURCE_FIELD) or hit["_id"]
         # 기존 포맷 유지
         chunks.append(f"[Source {i}] {src}\n{txt}")
         if str(src).startswith("s3://"):
             s3_uri_list.append(src)
+        page = hit["_source"].get(PAGE_FIELD)
+        sources.append({"n": i, "uri": str(src), "page": int(page) if page else None, "text": txt})
 
    
     merged = "\n\n----\n\n".join(chunks)
@@ -119,60 +224,159 @@ def query(question):
             "identifier": f"knn-top{len(chunks)}"
         }
     }
+    query_cache.kb_retrieval.put(ckey, (payload, s3_uri_list, sources, applied))
+    return payload, s3_uri_list, sources, applied
+
+
+def rng_configuration(payload, model_arn=None):
+    # EXTERNAL_SOURCES는 sources 한 개만!
+    return {
+        "type": "EXTERNAL_SOURCES",
+        "externalSourcesConfiguration": {
+            # 예산 때문에 small 로 내려갔을 수 있으므로 매 호출마다 정한다
+            "modelArn": model_arn or model_router.profile_arn("synthesis"),
+            "sources": [payload],  # <= 반드시 길이 1
+            "generationConfiguration": {
+                "promptTemplate": {
+                    "textPromptTemplate": PROMPT_CHATBOT_HYBRID
+                },
+                "inferenceConfig": {
+                    "textInferenceConfig": {"temperature": 0, "topP": 1, "maxTokens": 1024}
+                }
+            }
+        }
+    }
 
-    PROMPT_CHATBOT_HYBRID = (
-    "역할: 너는 의학/제약 도메인 QA 챗봇이다.\n"
-    "목표: 아래 [검색 결과]를 근거로 답하되, 이해를 돕는 비수치 배경설명을 짧게 제공할 수 있다.\n\n"
-    "절차:\n"
-    "1) 질문이 모호하면 확인 질문 한 개만 제시하고 중단.\n"
-    "2) 명확하면 답변 작성.\n\n"
-    "규칙:\n"
-    "0) 질문이 모호하여 답변이 어려울 경우, 혹은 이상한 질문이라면, 답변에 반드시 '어렵습니다'라는 단어를 포함.\n"
-    "1) 답변이 어려울 경우 [S#] 인용 절대 하지 말 것.\n"
-    "A) 수치·연도·효능·안전성 등 구체적 사실은 [#] 인용 필수.\n"
-    "B) '배경지식' 섹션에는 정의/맥락 등 일반 설명만(숫자·연구결과 금지).\n"
-    "C) 근거 부족 시 '자료 불충분' + 추가 필요정보 1–2줄.\n"
-    "D) 상충 정보는 양쪽 기술 + 불확실함 명시.\n"
-    "E) 한국어 간결체, 8-11문장.\n\n"
-    "출력 형식:\n"
-    "[Answer]\n 5–11문장. 필요한 문장에 [#] 인용.[#] 작성은 1부터 N까지 순서에 맞게 작성.\n"
-    "[Background] 1–3문장 (인용·수치 금지) — 필요 시만.\n"
-    "[References]\n"
-    "- [1] s3://...\n"
-    "- [2] s3://...\n\n"
-    "[검색 결과]\n$search_results$\n\n[답변]"
-    )
 
+def finalize(answer, s3_uri_list):
+    """답변이 '어렵습니다' 류면 링크를 숨기고, 아니면 s3 uri 를 https 링크로 바꿔서 붙인다."""
+    if(contains_difficulty_phrase(answer)):
+        return [answer, []]
+    return [answer, list({s3uri_to_https(uri) for uri in s3_uri_list})]
 
 
-    # 3) RnG 호출 (EXTERNAL_SOURCES는 sources 한 개만!)
-    resp = bedrock_agent_runtime_client.retrieve_and_generate(
-        input={"text": question},
-        retrieveAndGenerateConfiguration={
-            "type": "EXTERNAL_SOURCES",
-            "externalSourcesConfiguration": {
-                "modelArn": MODEL_ARN,
-                "sources": [payload],  # <= 반드시 길이 1
-                "generationConfiguration": {
-                    "promptTemplate": {
-                        "textPromptTemplate": PROMPT_CHATBOT_HYBRID
-                    },
-                    "inferenceConfig": {
-                        "textInferenceConfig": {"temperature": 0, "topP": 1, "maxTokens": 1024}
-                    }
-                }
-            }
-        },
-    )
+_CITE = re.compile(r"\[(\d+)\]")
+_REF_LINE = re.compile(r"^\s*-?\s*\[(\d+)\]\s*(\S+)", re.M)
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+")
 
-    s3_uri_list = list({s3uri_to_https(uri) for uri in s3_uri_list})    
 
-    if(contains_difficulty_phrase(resp.get("output", {}).get("text"))):
-        return [resp.get("output", {}).get("text"), []]
-    else:
-        return [resp.get("output", {}).get("text"), s3_uri_list]
+def cite(answer, sources):
+    """
+    답변 본문의 [#] 마다 근거 청크 하나를 고른다 → [{"ref", "uri", "page", "chunk", "url"}].
+    [References] 의 "- [#] s3://..." 로 문서를 찾고, 같은 문서의 청크가 여럿이면 [#] 가 붙은 문장과
+    가장 많이 겹치는 청크를 쓴다. url 은 그 페이지로 열리는 서명 URL (PDF 본문은 citations.page_text 로 필요할 때만).
+    """
+    if not answer or contains_difficulty_phrase(answer):
+        return []
+    body, _, refs = answer.partition("[References]")
+    ref_uris = {int(n): uri.rstrip(".,;)") for n, uri in _REF_LINE.findall(refs)}
+    sentences = _SENTENCE_END.split(body)
+    out = []
+    for n in dict.fromkeys(int(x) for x in _CITE.findall(body)):
+        uri = ref_uris.get(n)
+        candidates = [s for s in sources if s["uri"] == uri]
+        if not candidates and n > 0:
+            # References 가 없거나 검색 결과에 없는 URI 면 [n] 을 n 번째 검색 결과로 본다
+            candidates = sources[n - 1:n]
+        if not candidates:
+            continue
+        context = " ".join(s for s in sentences if f"[{n}]" in s)
+        best = max(candidates, key=lambda s: overlap_count(context, s["text"]))
+        out.append({
+            "ref": n,
+            "uri": best["uri"],
+            "page": best["page"],
+            "chunk": best["text"],
+            # 허용 버킷(KB 데이터 소스) 밖이면 서명하지 않는다
+            "url": citations.presigned_url(best["uri"], best["page"]) if citations.allowed(best["uri"]) else None,
+        })
+    return out
+
+
+def record_rng(model_id, latency_s, question, payload, answer):
+    """RnG 응답에는 토큰 사용량이 없으므로 프롬프트 + 검색 청크 + 답변 길이로 추정해서 기록한다."""
+    context = base64.b64decode(payload["byteContent"]["data"]).decode("utf-8")
+    model_router.record("synthesis", model_id, latency_s,
+                        estimate_tokens(PROMPT_CHATBOT_HYBRID + context + question), estimate_tokens(answer or ""),
+                        estimated=True, page=METER_PAGE)
+
+
+def _remember(question, filters, answer, s3_uri_list, sources, applied):
+    # 답하기 어렵다는 답변은 검색/생성이 흔들린 경우일 수 있으므로 재사용하지 않는다
+    if answer and not contains_difficulty_phrase(answer):
+        query_cache.kb_answer.put(_cache_key(question, filters), (answer, s3_uri_list, sources, applied))
+
+
+@profiler.profiled("kb.query")
+def query(question, filters=None):
+    """→ [answer, s3 https 링크 목록, cite() 인용 목록]. filters 는 retrieve() 참고."""
+    cached = query_cache.kb_answer.get(_cache_key(question, filters))
+    if cached is not None:
+        # 서명 URL 은 만료되므로 인용은 매번 다시 만든다
+        answer, s3_uri_list, sources, _ = cached
+        answer, links = finalize(answer, s3_uri_list)
+        return [answer, links, cite(answer, sources)]
+    token_meter.enforce()
+    payload, s3_uri_list, sources, applied = retrieve(question, filters)
+
+    # 3) RnG 호출
+    model_id = model_router.model_for("synthesis")
+    t0 = time.perf_counter()
+    resp = model_hedge.call(model_hedge.endpoints_for(model_id), lambda ep: _agent_runtime(ep.region).retrieve_and_generate(
+        input={"text": question},
+        retrieveAndGenerateConfiguration=rng_configuration(
+            payload, model_router.profile_arn("synthesis", ep.region, ep.model_id)),
+    ))
+    answer = resp.get("output", {}).get("text")
+    record_rng(model_id, time.perf_counter() - t0, question, payload, answer)
+    _remember(question, filters, answer, s3_uri_list, sources, applied)
 
+    answer, links = finalize(answer, s3_uri_list)
+    return [answer, links, cite(answer, sources)]
 
-    # s3_uri_list = list({s3uri_to_https(uri) for uri in s3_uri_list})    
-    # return  [resp.get("output", {}).get("text"), s3_uri_list]
-    
+
+@profiler.profiled("kb.query_stream")
+def query_stream(question, filters=None):
+    """
+    query() 의 스트리밍 버전. 아래 dict 들을 도착하는 대로 yield 한다.
+      {"type": "text", "text": "..."}                        답변 조각
+      {"type": "citation", "citation": {...}}                인용 이벤트 (원본 그대로)
+      {"type": "done", "answer": "...", "sources": [...], "citations": [...], "filters": {...}}
+                                                             마지막 한 번, finalize() / cite() 적용 결과와 검색에 쓴 필터
+    """
+    cached = query_cache.kb_answer.get(_cache_key(question, filters))
+    if cached is not None:
+        answer, s3_uri_list, sources, applied = cached
+        yield {"type": "text", "text": answer}
+        answer, links = finalize(answer, s3_uri_list)
+        yield {"type": "done", "answer": answer, "sources": links, "citations": cite(answer, sources),
+               "filters": applied}
+        return
+    token_meter.enforce()
+    payload, s3_uri_list, sources, applied = retrieve(question, filters)
+
+    model_id = model_router.model_for("synthesis")
+    t0 = time.perf_counter()
+    # 첫 조각이 늦으면 다른 리전으로 헤지 (model_hedge.stream)
+    stream = model_hedge.stream(model_hedge.endpoints_for(model_id), lambda ep: _agent_runtime(ep.region).retrieve_and_generate_stream(
+        input={"text": question},
+        retrieveAndGenerateConfiguration=rng_configuration(
+            payload, model_router.profile_arn("synthesis", ep.region, ep.model_id)),
+    )["stream"])
+
+    parts = []
+    for event in stream:
+        if "output" in event:
+            text = event["output"].get("text", "")
+            if text:
+                parts.append(text)
+                yield {"type": "text", "text": text}
+        elif "citation" in event:
+            yield {"type": "citation", "citation": event["citation"]}
+
+    record_rng(model_id, time.perf_counter() - t0, question, payload, "".join(parts))
+    _remember(question, filters, "".join(parts), s3_uri_list, sources, applied)
+
+    answer, links = finalize("".join(parts), s3_uri_list)
+    yield {"type": "done", "answer": answer, "sources": links, "citations": cite(answer, sources),
+           "filters": applied}
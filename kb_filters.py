@@ -0,0 +1,321 @@
+# kb_filters.py
+"""
+KB 메타데이터 필터 (출처 prefix / 문서 종류 / 연도) → OpenSearch filtered KNN.
+
+kb_client.retrieve 는 원래 인덱스 전체에 KNN 을 돌려서, 질문이 특정 문서 묶음/연도를 겨냥해도
+엉뚱한 청크가 top-k 에 섞여 생성 프롬프트만 키웠다. 필터를 knn 절 안의 "filter" 로 넘기면
+(efficient filtering) 엔진이 조건에 맞는 문서 안에서만 이웃을 찾는다 — 채점 전에 후보가 줄고,
+남은 문서가 적으면 HNSW 대신 정확 검색으로 바뀌어 k 개를 채운다.
+
+필터 dict (UI / API / 질문에서 추출, 모두 선택):
+  {"source_prefix": "s3://bucket/papers/2021/", "doc_types": ["paper", "patent"],
+   "year_from": 2020, "year_to": 2023}
+
+색인 필드 (Bedrock 기본 인덱스에는 없으므로 kb_ingest 가 청크마다 채우고, 기존 문서는 backfill)
+  SOURCE_KEY_FIELD  출처 URI 의 keyword 사본 (prefix 질의용. 기본 source-uri 필드는 text 라 prefix 가 안 맞는다)
+  DOC_TYPE_FIELD    문서 종류: .metadata.json 사이드카 → 경로의 폴더 이름(papers/ → paper) 순
+  YEAR_FIELD        연도: 사이드카 → PDF CreationDate → 파일 이름의 4자리 연도 순
+
+  python kb_filters.py mapping          # 세 필드 매핑 추가
+  python kb_filters.py backfill         # 기존 문서에 채우기 (출처마다 사이드카/PDF 정보 한 번씩)
+  python kb_filters.py extract "2020년 이후 특허에서 ..."   # 질문에서 뽑히는 필터 확인
+"""
+import argparse
+import json
+import os
+import re
+import time
+
+from logging_config import setup_logging
+
+logger = setup_logging().getChild("kb_filters")
+
+SOURCE_KEY_FIELD = os.getenv("KB_SOURCE_KEY_FIELD", "kb-source-key")
+DOC_TYPE_FIELD = os.getenv("KB_DOC_TYPE_FIELD", "kb-doc-type")
+YEAR_FIELD = os.getenv("KB_YEAR_FIELD", "kb-doc-year")
+
+# 문서 종류 → 질문/폴더 이름에서 그 종류로 보는 단어
+DOC_TYPES = json.loads(os.getenv("KB_DOC_TYPES", json.dumps({
+    "paper": ["논문", "paper", "article"],
+    "patent": ["특허", "patent"],
+    "guideline": ["가이드라인", "guideline", "지침"],
+    "label": ["허가사항", "label"],
+})))
+# 질문에서 필터를 뽑아 쓸지 (UI/API 에서 명시한 필터는 항상 쓴다)
+AUTO_FILTERS = os.getenv("KB_AUTO_FILTERS", "1") == "1"
+# Bedrock KB 관례: <문서>.metadata.json 의 metadataAttributes
+METADATA_SIDECAR = os.getenv("KB_METADATA_SIDECAR", "1") == "1"
+
+KEYS = ("source_prefix", "doc_types", "year_from", "year_to")
+MIN_YEAR, MAX_YEAR = 1900, 2100
+
+#--------------------------------
+# 문서 메타데이터 (색인 시)
+
+_YEAR = r"((?:19|20)\d{2})"
+_FILENAME_YEAR_RE = re.compile(r"(?<!\d)" + _YEAR + r"(?!\d)")
+_PDF_DATE_RE = re.compile(r"^(?:D:)?" + _YEAR)
+
+
+def _doc_type_of(word: str):
+    word = (word or "").strip().lower()
+    for doc_type, words in DOC_TYPES.items():
+        if word == doc_type or any(word in (w.lower(), w.lower() + "s") for w in words):
+            return doc_type
+    return None
+
+
+def _year(value):
+    m = re.search(_YEAR, str(value or ""))
+    return int(m.group(1)) if m else None
+
+
+def _sidecar(source_uri: str) -> dict:
+    from kb_ingest import read_source
+    try:
+        return json.loads(read_source(source_uri + ".metadata.json")).get("metadataAttributes", {})
+    except Exception as e:
+        # 사이드카는 선택 사항이라 없으면 경로/PDF 정보로 넘어간다
+        logger.debug(f"no metadata sidecar for {source_uri}: {e}")
+        return {}
+
+
+def doc_metadata(source_uri: str, reader=None) -> dict:
+    """청크에 붙일 필터 필드. reader 는 이미 열어 둔 pypdf.PdfReader (연도를 PDF 정보에서 읽을 때)."""
+    meta = {SOURCE_KEY_FIELD: source_uri}
+    attrs = _sidecar(source_uri) if METADATA_SIDECAR else {}
+
+    doc_type = _doc_type_of(attrs.get("doc_type") or attrs.get("document_type"))
+    if doc_type is None:
+        # 가장 가까운 폴더부터: s3://bucket/patents/2021/x.pdf → patent
+        folders = source_uri.split("://", 1)[-1].split("/")[1:-1]
+        doc_type = next((t for t in map(_doc_type_of, reversed(folders)) if t), None)
+    if doc_type:
+        meta[DOC_TYPE_FIELD] = doc_type
+
+    year = _year(attrs.get("year") or attrs.get("publication_year") or attrs.get("date"))
+    if year is None and reader is not None:
+        try:
+            m = _PDF_DATE_RE.match(str((reader.metadata or {}).get("/CreationDate", "")))
+            year = int(m.group(1)) if m else None
+        except Exception:
+            year = None
+    if year is None:
+        m = _FILENAME_YEAR_RE.search(os.path.basename(source_uri))
+        year = int(m.group(1)) if m else None
+    if year is not None and MIN_YEAR <= year <= MAX_YEAR:
+        meta[YEAR_FIELD] = year
+    return meta
+
+#--------------------------------
+# 필터 dict: 검증 / 질문에서 추출 / 합치기
+
+
+def parse(raw) -> dict:
+    """UI/API 에서 받은 필터를 검증해 빈 값 없는 dict 로. 잘못된 값은 ValueError."""
+    if raw is None:
+        return {}
+    if not isinstance(raw, dict):
+        raise ValueError("'filters' must be an object")
+    unknown = set(raw) - set(KEYS)
+    if unknown:
+        raise ValueError(f"unknown filter keys: {sorted(unknown)} (allowed: {list(KEYS)})")
+    out = {}
+    prefix = raw.get("source_prefix")
+    if prefix not in (None, ""):
+        if not isinstance(prefix, str):
+            raise ValueError("'source_prefix' must be a string")
+        out["source_prefix"] = prefix.strip()
+    doc_types = raw.get("doc_types")
+    if doc_types:
+        if isinstance(doc_types, str):
+            doc_types = [doc_types]
+        if not isinstance(doc_types, list) or not all(isinstance(t, str) for t in doc_types):
+            raise ValueError("'doc_types' must be a list of strings")
+        unknown = [t for t in doc_types if t not in DOC_TYPES]
+        if unknown:
+            raise ValueError(f"unknown doc_types: {unknown} (known: {list(DOC_TYPES)})")
+        out["doc_types"] = sorted(set(doc_types))
+    for key in ("year_from", "year_to"):
+        value = raw.get(key)
+        if value in (None, ""):
+            continue
+        if isinstance(value, bool) or not isinstance(value, int) or not MIN_YEAR <= value <= MAX_YEAR:
+            raise ValueError(f"'{key}' must be a year between {MIN_YEAR} and {MAX_YEAR}")
+        out[key] = value
+    if out.get("year_from", MIN_YEAR) > out.get("year_to", MAX_YEAR):
+        raise ValueError("'year_from' must not be after 'year_to'")
+    return out
+
+
+_RANGE_RE = re.compile(_YEAR + r"\s*년?\s*(?:~|-|–|부터|to)\s*" + _YEAR)
+_SINCE_RE = re.compile(_YEAR + r"\s*년?\s*(이후|부터|since|or later)", re.I)
+_UNTIL_RE = re.compile(_YEAR + r"\s*년?\s*(이전|까지|before|or earlier)", re.I)
+_EN_PREFIX_RE = re.compile(r"\b(since|after|from|before|until)\s+" + _YEAR, re.I)
+_RECENT_RE = re.compile(r"(?:최근\s*(\d{1,2})\s*년|(?:last|past)\s+(\d{1,2})\s+years?)", re.I)
+_S3_PREFIX_RE = re.compile(r"s3://[^\s'\"<>)\]]+")
+
+
+def _only_re(words) -> re.Pattern:
+    """'논문만', '특허 문서에서만', 'papers only', 'only in patents' 처럼 종류를 한정하는 표현만."""
+    alt = "|".join(sorted((re.escape(w) for w in words), key=len, reverse=True))
+    return re.compile(
+        rf"(?:{alt})\s*(?:들)?\s*(?:문서|자료)?\s*(?:중에서|에서|중)?\s*만"
+        rf"|\b(?:{alt})s?\s+only\b"
+        rf"|\b(?:only|just)\s+(?:(?:in|from|the|search|use)\s+)*(?:{alt})s?\b",
+        re.I)
+
+
+_DOC_TYPE_ONLY_RE = {t: _only_re(ws + [t]) for t, ws in DOC_TYPES.items()}
+
+
+def extract(question: str, this_year: int = None) -> dict:
+    """
+    질문에 드러난 조건만 뽑는다. 애매하면 뽑지 않는다 (k 개를 못 채우면 kb_client 가 필터 없이 채운다).
+    문서 종류는 '논문만' / 'patents only' 처럼 한정하는 표현이 있을 때만 — '이 논문에서 말하는 ...' 은 아니다.
+    """
+    this_year = this_year or time.localtime().tm_year
+    text = question or ""
+    out = {}
+
+    m = _S3_PREFIX_RE.search(text)
+    if m:
+        out["source_prefix"] = m.group(0).rstrip(".,;")
+
+    doc_types = sorted(t for t, pattern in _DOC_TYPE_ONLY_RE.items() if pattern.search(text))
+    if doc_types:
+        out["doc_types"] = doc_types
+
+    m = _RANGE_RE.search(text)
+    if m:
+        lo, hi = sorted((int(m.group(1)), int(m.group(2))))
+        out["year_from"], out["year_to"] = lo, hi
+    else:
+        for m in _SINCE_RE.finditer(text):
+            out["year_from"] = int(m.group(1))
+        for m in _UNTIL_RE.finditer(text):
+            year = int(m.group(1))
+            out["year_to"] = year - 1 if m.group(2).lower() in ("이전", "before") else year
+        for m in _EN_PREFIX_RE.finditer(text):
+            word, year = m.group(1).lower(), int(m.group(2))
+            if word in ("since", "from"):
+                out["year_from"] = year
+            elif word == "after":
+                out["year_from"] = year + 1
+            elif word == "before":
+                out["year_to"] = year - 1
+            else:
+                out["year_to"] = year
+        m = _RECENT_RE.search(text)
+        if m and "year_from" not in out:
+            out["year_from"] = this_year - int(m.group(1) or m.group(2)) + 1
+    try:
+        return parse(out)
+    except ValueError as e:
+        logger.info(f"ignoring extracted filters {out}: {e}")
+        return {}
+
+
+def merge(explicit: dict, extracted: dict) -> dict:
+    """키마다 명시한 필터가 이긴다."""
+    return {**(extracted or {}), **(explicit or {})}
+
+
+def key(filters: dict) -> str:
+    """캐시 키용 정규 문자열."""
+    return json.dumps(filters or {}, sort_keys=True, ensure_ascii=False)
+
+
+def describe(filters: dict) -> str:
+    parts = []
+    if filters.get("source_prefix"):
+        parts.append(f"출처 {filters['source_prefix']}")
+    if filters.get("doc_types"):
+        parts.append("종류 " + ", ".join(filters["doc_types"]))
+    if "year_from" in filters or "year_to" in filters:
+        parts.append(f"{filters.get('year_from', '')}–{filters.get('year_to', '')}년")
+    return " · ".join(parts)
+
+#--------------------------------
+# OpenSearch
+
+
+def knn_filter(filters: dict):
+    """필터 dict → knn 절의 "filter" 에 넣을 bool 질의 (조건이 없으면 None)."""
+    if not filters:
+        return None
+    clauses = []
+    if filters.get("source_prefix"):
+        clauses.append({"prefix": {SOURCE_KEY_FIELD: filters["source_prefix"]}})
+    if filters.get("doc_types"):
+        clauses.append({"terms": {DOC_TYPE_FIELD: list(filters["doc_types"])}})
+    years = {op: filters[k] for op, k in (("gte", "year_from"), ("lte", "year_to")) if k in filters}
+    if years:
+        clauses.append({"range": {YEAR_FIELD: years}})
+    return {"bool": {"filter": clauses}} if clauses else None
+
+
+def field_mapping() -> dict:
+    return {
+        "properties": {
+            SOURCE_KEY_FIELD: {"type": "keyword"},
+            DOC_TYPE_FIELD: {"type": "keyword"},
+            YEAR_FIELD: {"type": "integer"},
+        }
+    }
+
+
+def _pdf_reader(source_uri: str):
+    # 연도만 필요하므로 citations 의 range 읽기로 trailer/Info 근처만 받는다
+    try:
+        import citations
+        from pypdf import PdfReader
+        if citations.allowed(source_uri):
+            return PdfReader(citations.RangeReader(source_uri), strict=True)
+    except Exception as e:
+        logger.debug(f"pdf info unavailable for {source_uri}: {e}")
+    return None
+
+
+def backfill(os_client, index: str, source_field: str, batch: int = 200, pdf_dates: bool = True):
+    """기존 문서에 세 필드를 채운다. 메타데이터는 출처(PDF)마다 한 번만 계산한다. (채운 문서 수, bulk 실패 수)"""
+    from kb_ingest import send_bulk
+    from kb_quant import _scan
+
+    per_source, lines, n, failed = {}, [], 0, 0
+    for doc in _scan(os_client, index, [source_field]):
+        uri = doc["_source"].get(source_field)
+        if not uri:
+            continue
+        if uri not in per_source:
+            per_source[uri] = doc_metadata(uri, _pdf_reader(uri) if pdf_dates else None)
+        lines.append(json.dumps({"update": {"_index": index, "_id": doc["_id"]}}))
+        lines.append(json.dumps({"doc": per_source[uri]}, ensure_ascii=False))
+        n += 1
+        if len(lines) >= batch * 2:
+            failed += send_bulk(lines, os_client)
+            lines = []
+    failed += send_bulk(lines, os_client)
+    if failed:
+        logger.error(f"backfill {index}: {failed}/{n} updates failed")
+    return n, failed
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("command", choices=["mapping", "backfill", "extract"])
+    parser.add_argument("question", nargs="?", default="")
+    parser.add_argument("--no-pdf-dates", action="store_true", help="PDF CreationDate 를 읽지 않는다 (경로/사이드카만)")
+    args = parser.parse_args()
+
+    if args.command == "extract":
+        filters = extract(args.question)
+        print(json.dumps({"filters": filters, "query": knn_filter(filters)}, ensure_ascii=False, indent=2))
+    else:
+        import kb_client
+        if args.command == "mapping":
+            print(kb_client.os_client.indices.put_mapping(index=kb_client.INDEX, body=field_mapping()))
+        else:
+            n, failed = backfill(kb_client.os_client, kb_client.INDEX, kb_client.SOURCE_FIELD,
+                                 pdf_dates=not args.no_pdf_dates)
+            print(json.dumps({"backfilled": n, "failed": failed}))
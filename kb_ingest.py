@@ -0,0 +1,330 @@
+# kb_ingest.py
+"""
+논문 PDF → 청크 → Titan v2 임베딩 → AOSS 색인 (오프라인 배치).
+
+kb_client 가 검색하는 인덱스(INDEX)와 필드(TEXT_FIELD, VEC_FIELD, source-uri)를 그대로 채운다.
+메타데이터 필터용 필드(출처 / 문서 종류 / 연도, kb_filters.py)도 청크마다 함께 넣는다.
+
+  python kb_ingest.py s3://my-bucket/papers/ --chunk-workers 8 --embed-rps 20
+  python kb_ingest.py ./papers --resume          # 체크포인트 이후부터 이어서
+
+파이프라인
+  1) PDF 목록을 지연(lazy) 나열하고 하나씩 스트리밍으로 읽음 (S3 또는 로컬 디렉터리)
+  2) 텍스트 추출 + 청크 분할은 프로세스 풀에서 병렬 처리 (CPU 바운드)
+  3) 임베딩은 스레드 풀 + 초당 호출 수 제한(토큰 버킷)으로 동시 호출
+  4) _bulk API 로 묶어서 색인, 완료된 PDF 는 체크포인트 파일에 기록
+"""
+import argparse
+import hashlib
+import io
+import json
+import os
+import random
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+
+import boto3
+from botocore.exceptions import ConnectionError as BotoConnectionError, HTTPClientError
+
+import kb_client
+import kb_filters
+from kb_client import INDEX, REGION, TEXT_FIELD, VEC_FIELD
+from logging_config import setup_logging
+
+logger = setup_logging().getChild("kb_ingest")
+
+SOURCE_FIELD = "x-amz-bedrock-kb-source-uri"
+PAGE_FIELD = "x-amz-bedrock-kb-document-page-number"
+
+CHUNK_CHARS = 1500     # 청크 최대 길이(문자)
+CHUNK_OVERLAP = 200    # 청크 간 겹침(문자)
+BULK_DOCS = 200        # _bulk 한 번에 보낼 문서 수
+CHECKPOINT_PATH = ".kb_ingest_checkpoint.jsonl"
+# 잠깐 기다리면 풀리는 에러만 재시도 (그 밖의 에러는 몇 번을 다시 해도 같으므로 바로 올린다)
+RETRYABLE_CODES = {"ThrottlingException", "TooManyRequestsException", "ServiceUnavailableException",
+                   "ModelNotReadyException", "InternalServerException"}
+
+#--------------------------------
+# 1) 소스 나열 / 읽기
+
+
+def list_sources(root: str):
+    """root(s3://bucket/prefix 또는 로컬 디렉터리) 아래 PDF 를 (uri, 버전태그) 로 하나씩 돌려준다."""
+    if root.startswith("s3://"):
+        bucket, _, prefix = root[len("s3://"):].partition("/")
+        s3 = boto3.client("s3", region_name=REGION)
+        for page in s3.get_paginator("list_objects_v2").paginate(Bucket=bucket, Prefix=prefix):
+            for obj in page.get("Contents", []):
+                if obj["Key"].lower().endswith(".pdf"):
+                    yield f"s3://{bucket}/{obj['Key']}", obj["ETag"].strip('"')
+    else:
+        for dirpath, _, files in os.walk(root):
+            for name in sorted(files):
+                if name.lower().endswith(".pdf"):
+                    path = os.path.join(dirpath, name)
+                    st = os.stat(path)
+                    yield os.path.abspath(path), f"{st.st_size}-{int(st.st_mtime)}"
+
+
+_s3_local = threading.local()
+
+
+def read_source(uri: str) -> bytes:
+    if uri.startswith("s3://"):
+        if not hasattr(_s3_local, "client"):
+            _s3_local.client = boto3.client("s3", region_name=REGION)
+        bucket, key = uri[len("s3://"):].split("/", 1)
+        return _s3_local.client.get_object(Bucket=bucket, Key=key)["Body"].read()
+    with open(uri, "rb") as f:
+        return f.read()
+
+#--------------------------------
+# 2) 청크 분할 (프로세스 풀에서 실행되므로 모듈 최상위 함수여야 함)
+
+
+def split_text(text: str, size: int = CHUNK_CHARS, overlap: int = CHUNK_OVERLAP):
+    """문단/문장 경계를 최대한 살려서 size 이하 조각으로 자른다."""
+    text = " ".join(text.split())
+    if not text:
+        return []
+    out, start = [], 0
+    while start < len(text):
+        end = min(len(text), start + size)
+        if end < len(text):
+            cut = max(text.rfind(". ", start, end), text.rfind("다. ", start, end))
+            if cut > start + size // 2:
+                end = cut + 1
+        out.append(text[start:end].strip())
+        if end >= len(text):
+            break
+        start = max(end - overlap, start + 1)
+    return [c for c in out if c]
+
+
+def chunk_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def content_doc_id(source_uri: str, h: str, occurrence: int) -> str:
+    """
+    같은 소스 안에서 내용이 같으면 위치가 바뀌어도 같은 ID 가 되도록 (uri, 청크 해시, 순번) 으로 만든다.
+    kb_sync 도 같은 ID 를 쓰므로 kb_ingest 로 만든 인덱스를 kb_sync 로 이어서 관리할 수 있다.
+    """
+    return hashlib.sha1(f"{source_uri}#{h}#{occurrence}".encode("utf-8")).hexdigest()
+
+
+def extract_chunks(source_uri: str, pdf_bytes: bytes):
+    """PDF 바이트 → [{"_id", TEXT_FIELD, SOURCE_FIELD, PAGE_FIELD, 필터 필드(kb_filters)}, ...]"""
+    from pypdf import PdfReader
+
+    reader = PdfReader(io.BytesIO(pdf_bytes))
+    # 출처 prefix / 문서 종류 / 연도: 문서 단위라 한 번만 구해서 모든 청크에 붙인다
+    meta = kb_filters.doc_metadata(source_uri, reader)
+    chunks = []
+    seen = {}
+    for page_no, page in enumerate(reader.pages, 1):
+        try:
+            text = page.extract_text() or ""
+        except Exception:
+            continue
+        for piece in split_text(text):
+            h = chunk_hash(piece)
+            seen[h] = seen.get(h, -1) + 1
+            chunks.append({
+                "_id": content_doc_id(source_uri, h, seen[h]),
+                TEXT_FIELD: piece,
+                SOURCE_FIELD: source_uri,
+                PAGE_FIELD: page_no,
+                **meta,
+            })
+    return chunks
+
+
+def _read_and_chunk(uri: str):
+    return uri, extract_chunks(uri, read_source(uri))
+
+#--------------------------------
+# 3) 임베딩 (속도 제한 + 재시도)
+
+
+class RateLimiter:
+    """초당 rate 회까지 허용하는 토큰 버킷 (스레드 안전)."""
+
+    def __init__(self, rate: float, burst: int = None):
+        self.rate = rate
+        self.capacity = burst or max(1, int(rate))
+        self._tokens = float(self.capacity)
+        self._ts = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._ts) * self.rate)
+                self._ts = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait_s = (1 - self._tokens) / self.rate
+            time.sleep(wait_s)
+
+
+def retryable(e: Exception) -> bool:
+    """스로틀링/일시적 장애 코드이거나 연결/타임아웃 에러."""
+    if isinstance(e, (BotoConnectionError, HTTPClientError)):
+        return True
+    response = getattr(e, "response", None)
+    return isinstance(response, dict) and response.get("Error", {}).get("Code") in RETRYABLE_CODES
+
+
+def embed_with_retry(text: str, limiter: RateLimiter, max_attempts: int = 6, embed_fn=None):
+    embed_fn = embed_fn or kb_client.embed_v2
+    for attempt in range(max_attempts):
+        limiter.acquire()
+        try:
+            return embed_fn(text)
+        except Exception as e:
+            if attempt == max_attempts - 1 or not retryable(e):
+                raise
+            time.sleep(min(30.0, (2 ** attempt) * 0.5 + random.random()))
+
+#--------------------------------
+# 4) 색인 / 체크포인트
+
+
+def send_bulk(lines, os_client=None):
+    """_bulk NDJSON 줄 목록을 보내고 실패한 항목 수를 돌려준다."""
+    if not lines:
+        return 0
+    os_client = os_client or kb_client.os_client
+    resp = os_client.bulk(body="\n".join(lines) + "\n")
+    if not resp.get("errors"):
+        return 0
+    # delete 대상이 이미 없는 경우(404)는 실패로 보지 않는다
+    failed = [it for it in resp["items"]
+              if next(iter(it.values())).get("status", 200) >= 300
+              and not ("delete" in it and it["delete"].get("status") == 404)]
+    for it in failed[:5]:
+        logger.error(f"bulk item failed: {it}")
+    return len(failed)
+
+
+def index_actions(docs, index: str = INDEX):
+    lines = []
+    for d in docs:
+        src = {k: v for k, v in d.items() if k != "_id"}
+        if kb_client.VEC_MODE == "int8" and src.get(VEC_FIELD):
+            import kb_quant
+            # 축소 차원 양자화는 별도 임베딩이 필요하므로 kb_quant.py backfill 로 채운다
+            if len(src[VEC_FIELD]) == kb_quant.QUANT_DIM:
+                src[kb_quant.QVEC_FIELD] = kb_quant.quantize_for_index(src[VEC_FIELD])
+        lines.append(json.dumps({"index": {"_index": index, "_id": d["_id"]}}))
+        lines.append(json.dumps(src, ensure_ascii=False))
+    return lines
+
+
+def bulk_index(docs, os_client=None, index: str = INDEX):
+    """docs 를 _bulk 로 색인하고 실패한 문서 수를 돌려준다."""
+    return send_bulk(index_actions(docs, index), os_client)
+
+
+def load_checkpoint(path: str = CHECKPOINT_PATH) -> dict:
+    done = {}
+    if os.path.exists(path):
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    rec = json.loads(line)
+                    done[rec["uri"]] = rec["version"]
+    return done
+
+
+def mark_done(path: str, uri: str, version: str, n_chunks: int):
+    with open(path, "a", encoding="utf-8") as f:
+        f.write(json.dumps({"uri": uri, "version": version, "chunks": n_chunks, "ts": time.time()}) + "\n")
+
+#--------------------------------
+
+
+def ingest(root: str, chunk_workers: int = None, embed_workers: int = 8, embed_rps: float = 10.0,
+           resume: bool = True, checkpoint: str = CHECKPOINT_PATH, os_client=None, index: str = INDEX):
+    chunk_workers = chunk_workers or os.cpu_count() or 2
+    done = load_checkpoint(checkpoint) if resume else {}
+    limiter = RateLimiter(embed_rps)
+    stats = {"sources": 0, "skipped": 0, "chunks": 0, "failed": 0}
+    t0 = time.perf_counter()
+
+    pending = {}  # chunk future -> (uri, version)
+    sources = iter(list_sources(root))
+
+    def fill(pool):
+        # 프로세스 풀 앞에 PDF 를 너무 많이 쌓지 않도록 2배수까지만 미리 읽어 둔다
+        while len(pending) < chunk_workers * 2:
+            try:
+                uri, version = next(sources)
+            except StopIteration:
+                return
+            if done.get(uri) == version:
+                stats["skipped"] += 1
+                continue
+            pending[pool.submit(_read_and_chunk, uri)] = (uri, version)
+
+    with ProcessPoolExecutor(max_workers=chunk_workers) as chunk_pool, \
+            ThreadPoolExecutor(max_workers=embed_workers, thread_name_prefix="embed") as embed_pool:
+        fill(chunk_pool)
+        while pending:
+            finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for fut in finished:
+                uri, version = pending.pop(fut)
+                try:
+                    _, chunks = fut.result()
+                except Exception as e:
+                    logger.error(f"chunking failed for {uri}: {e}")
+                    stats["failed"] += 1
+                    continue
+
+                vectors = embed_pool.map(lambda c: embed_with_retry(c[TEXT_FIELD], limiter), chunks)
+                batch, failed = [], 0
+                try:
+                    for c, vec in zip(chunks, vectors):
+                        c[VEC_FIELD] = vec
+                        batch.append(c)
+                        if len(batch) >= BULK_DOCS:
+                            failed += bulk_index(batch, os_client, index)
+                            batch = []
+                except Exception as e:
+                    # 재시도해도 안 된 청크가 있으면 이 PDF 만 실패로 두고 (체크포인트 없음 → --resume 때 다시) 계속
+                    logger.error(f"{uri}: embedding failed: {e}")
+                    stats["failed"] += 1
+                    continue
+                failed += bulk_index(batch, os_client, index)
+
+                if failed:
+                    # 체크포인트에 남기지 않으면 다음 --resume 때 다시 시도된다
+                    logger.error(f"{uri}: {failed} chunks failed to index")
+                    stats["failed"] += 1
+                else:
+                    mark_done(checkpoint, uri, version, len(chunks))
+                stats["sources"] += 1
+                stats["chunks"] += len(chunks)
+                logger.info(f"indexed {uri} ({len(chunks)} chunks)")
+            fill(chunk_pool)
+
+    stats["elapsed_s"] = round(time.perf_counter() - t0, 1)
+    logger.info(f"ingest finished: {stats}")
+    return stats
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("root", help="s3://bucket/prefix 또는 로컬 디렉터리")
+    parser.add_argument("--chunk-workers", type=int, default=None, help="청크 분할 프로세스 수 (기본: CPU 수)")
+    parser.add_argument("--embed-workers", type=int, default=8, help="동시 임베딩 호출 수")
+    parser.add_argument("--embed-rps", type=float, default=10.0, help="초당 임베딩 호출 상한")
+    parser.add_argument("--no-resume", action="store_true", help="체크포인트를 무시하고 전부 다시 색인")
+    parser.add_argument("--checkpoint", default=CHECKPOINT_PATH)
+    args = parser.parse_args()
+    print(json.dumps(ingest(args.root, args.chunk_workers, args.embed_workers, args.embed_rps,
+                            resume=not args.no_resume, checkpoint=args.checkpoint)))
@@ -0,0 +1,380 @@
+# kb_quant.py
+"""
+KB 임베딩 양자화 (int8 scalar / product quantization) + full-precision 재채점(rescoring).
+
+AOSS 쪽 (kb_client.query 에서 KB_VEC_MODE=int8 일 때 사용)
+  - QVEC_FIELD 에 int8(byte) 벡터를 lucene HNSW 로 색인 → 메모리 1/4
+  - KB_QUANT_DIM=256/512 로 Titan v2 축소 차원 출력을 쓰면 추가로 1/2~1/4
+  - 후보 RESCORE_CANDIDATES 개를 가져온 뒤 _source 의 VEC_FIELD(fp32)로 정확히 재채점
+
+메모리 이관: 기존 인덱스에 QVEC_FIELD 만 더하면 fp32 HNSW 그래프가 그대로 남아 메모리가 오히려 는다.
+  reindex 로 VEC_FIELD 를 색인하지 않는 float 필드(_source 에만 저장, 재채점용)로 바꾼 새 인덱스를 만들고
+  KB_INDEX=<새 인덱스> KB_VEC_MODE=int8 로 전환한 뒤 옛 인덱스를 지운다.
+  새 인덱스에는 fp32 KNN 이 없으므로 KB_VEC_MODE=fp32 로 되돌리려면 옛 인덱스를 다시 가리켜야 한다.
+
+로컬 (벤치마크 / 오프라인 인메모리 인덱스)
+  - QuantizedIndex: int8 또는 PQ 코드만 RAM 에 두고, fp32 원본은 memmap 으로 재채점에만 사용
+
+  python kb_quant.py fit      --sample 20000          # 스케일 계산 → QUANT_PARAMS_PATH
+  python kb_quant.py reindex  --dest <새 인덱스>       # int8 HNSW + 재채점용 fp32(비색인)로 옮기기
+  python kb_quant.py mapping                          # (실험용) 기존 인덱스에 QVEC_FIELD 매핑만 추가
+  python kb_quant.py backfill                         # (실험용) 기존 문서에 QVEC_FIELD 채우기
+"""
+import argparse
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from logging_config import setup_logging
+
+QVEC_FIELD = os.getenv("KB_QVEC_FIELD", "embedding_v2_int8")
+QUANT_DIM = int(os.getenv("KB_QUANT_DIM", "1024"))  # 256 / 512 / 1024
+RESCORE_CANDIDATES = int(os.getenv("KB_RESCORE_CANDIDATES", "50"))
+QUANT_PARAMS_PATH = os.getenv("KB_QUANT_PARAMS", "kb_quant_params.json")
+
+logger = setup_logging().getChild("kb_quant")
+
+#--------------------------------
+# int8 scalar quantization
+
+
+class ScalarQuantizer:
+    """
+    대칭 전역 스케일 int8 양자화: code = round(clip(x / scale, -1, 1) * 127).
+
+    모든 차원에 같은 스케일을 쓰기 때문에 코드끼리의 내적/코사인 순위가 원본과 거의 같고,
+    질의도 같은 방식으로 양자화하면 AOSS byte 벡터 KNN 을 그대로 쓸 수 있다.
+    """
+
+    def __init__(self, scale: float = 0.15, dim: int = QUANT_DIM):
+        self.scale = float(scale)
+        self.dim = dim
+
+    @classmethod
+    def fit(cls, vectors, percentile: float = 99.9, dim: int = None):
+        vectors = np.asarray(vectors, dtype=np.float32)
+        scale = float(np.percentile(np.abs(vectors), percentile)) or 1.0
+        return cls(scale, dim or vectors.shape[1])
+
+    def encode(self, vectors) -> np.ndarray:
+        v = np.asarray(vectors, dtype=np.float32) / self.scale
+        return np.clip(np.rint(v * 127.0), -127, 127).astype(np.int8)
+
+    def decode(self, codes) -> np.ndarray:
+        return codes.astype(np.float32) * (self.scale / 127.0)
+
+    def save(self, path: str = QUANT_PARAMS_PATH):
+        with open(path, "w") as f:
+            json.dump({"type": "int8", "scale": self.scale, "dim": self.dim}, f)
+
+    @classmethod
+    def load(cls, path: str = QUANT_PARAMS_PATH):
+        if not os.path.exists(path):
+            return cls()
+        with open(path) as f:
+            p = json.load(f)
+        return cls(p["scale"], p.get("dim", QUANT_DIM))
+
+
+#--------------------------------
+# product quantization (로컬 인덱스용)
+
+
+def _kmeans(x: np.ndarray, k: int, iters: int = 15, seed: int = 0) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    centroids = x[rng.choice(len(x), size=min(k, len(x)), replace=False)].copy()
+    for _ in range(iters):
+        d = (x ** 2).sum(1)[:, None] - 2 * x @ centroids.T + (centroids ** 2).sum(1)[None, :]
+        assign = d.argmin(1)
+        for j in range(len(centroids)):
+            members = x[assign == j]
+            if len(members):
+                centroids[j] = members.mean(0)
+    return centroids
+
+
+class ProductQuantizer:
+    """m 개 부분공간 x 256 centroid. 벡터 하나당 m 바이트 (1024-d fp32 4KB → m=64 이면 64B)."""
+
+    def __init__(self, m: int = 64, ksub: int = 256):
+        self.m = m
+        self.ksub = ksub
+        self.codebooks = None  # (m, ksub, dsub)
+
+    def fit(self, vectors, sample: int = 10000, iters: int = 10):
+        x = np.asarray(vectors, dtype=np.float32)
+        if len(x) > sample:
+            x = x[np.random.default_rng(0).choice(len(x), sample, replace=False)]
+        dsub = x.shape[1] // self.m
+        self.codebooks = np.stack([
+            _kmeans(x[:, j * dsub:(j + 1) * dsub], self.ksub, iters, seed=j) for j in range(self.m)
+        ])
+        return self
+
+    def encode(self, vectors) -> np.ndarray:
+        x = np.asarray(vectors, dtype=np.float32)
+        dsub = self.codebooks.shape[2]
+        codes = np.empty((len(x), self.m), dtype=np.uint8)
+        for j in range(self.m):
+            sub = x[:, j * dsub:(j + 1) * dsub]
+            cb = self.codebooks[j]
+            d = (sub ** 2).sum(1)[:, None] - 2 * sub @ cb.T + (cb ** 2).sum(1)[None, :]
+            codes[:, j] = d.argmin(1)
+        return codes
+
+    def inner_product_table(self, q) -> np.ndarray:
+        """(m, ksub) 룩업 테이블: 질의 부분벡터와 각 centroid 의 내적 (ADC)."""
+        q = np.asarray(q, dtype=np.float32)
+        dsub = self.codebooks.shape[2]
+        return np.einsum("mkd,md->mk", self.codebooks, q.reshape(self.m, dsub))
+
+
+class QuantizedIndex:
+    """
+    코드만 메모리에 올리는 로컬 인덱스.
+
+    full: 재채점용 fp32 원본. np.load(..., mmap_mode="r") 로 넘기면 RAM 에 상주하지 않는다.
+    """
+
+    def __init__(self, full, mode: str = "int8", pq_m: int = 64):
+        self.full = full
+        self.mode = mode
+        if mode == "int8":
+            self.quantizer = ScalarQuantizer.fit(full[: min(len(full), 20000)])
+            self.codes = self.quantizer.encode(full)
+        elif mode == "pq":
+            self.quantizer = ProductQuantizer(m=pq_m).fit(full)
+            self.codes = self.quantizer.encode(full)
+        else:
+            raise ValueError(f"unknown mode {mode!r}")
+
+    @property
+    def code_bytes(self) -> int:
+        return self.codes.nbytes
+
+    def _approx_scores(self, q) -> np.ndarray:
+        if self.mode == "int8":
+            qc = self.quantizer.encode(q[None, :])[0].astype(np.float32)
+            # 전체를 한 번에 float 로 바꾸면 양자화로 아낀 메모리를 다시 쓰게 되므로 블록 단위로 계산
+            out = np.empty(len(self.codes), dtype=np.float32)
+            for i in range(0, len(self.codes), 16384):
+                out[i:i + 16384] = self.codes[i:i + 16384].astype(np.float32) @ qc
+            return out
+        lut = self.quantizer.inner_product_table(q)
+        return lut[np.arange(self.quantizer.m)[None, :], self.codes].sum(1)
+
+    def search(self, q, k: int = 5, candidates: int = RESCORE_CANDIDATES, rescore: bool = True):
+        q = np.asarray(q, dtype=np.float32)
+        scores = self._approx_scores(q)
+        n = min(len(scores), max(k, candidates if rescore else k))
+        cand = np.sort(np.argpartition(-scores, n - 1)[:n])  # memmap 은 정렬된 인덱스로 읽는 편이 빠르다
+        if rescore:
+            exact = np.asarray(self.full[cand], dtype=np.float32) @ q
+            order = np.argsort(-exact)[:k]
+            return cand[order], exact[order]
+        order = np.argsort(-scores[cand])[:k]
+        return cand[order], scores[cand][order]
+
+
+#--------------------------------
+# AOSS 연동
+
+
+def quantized_field_mapping(dim: int = QUANT_DIM) -> dict:
+    return {
+        "properties": {
+            QVEC_FIELD: {
+                "type": "knn_vector",
+                "dimension": dim,
+                "data_type": "byte",
+                "method": {
+                    "name": "hnsw",
+                    "engine": "lucene",
+                    "space_type": "cosinesimil",
+                    "parameters": {"m": 16, "ef_construction": 128},
+                },
+            }
+        }
+    }
+
+
+def rescore_only_mapping(properties: dict, vec_field: str, dim: int = QUANT_DIM) -> dict:
+    """
+    reindex 대상 매핑: 기존 필드는 그대로 두고 VEC_FIELD 는 색인/doc_values 없는 float
+    (_source 에만 남아 재채점에만 쓰임), QVEC_FIELD 만 HNSW 로 색인한다.
+    """
+    props = dict(properties)
+    props[vec_field] = {"type": "float", "index": False, "doc_values": False}
+    props.update(quantized_field_mapping(dim)["properties"])
+    return {"settings": {"index": {"knn": True}}, "mappings": {"properties": props}}
+
+
+_quantizer = None
+
+
+def get_quantizer() -> ScalarQuantizer:
+    global _quantizer
+    if _quantizer is None:
+        _quantizer = ScalarQuantizer.load()
+    return _quantizer
+
+
+def quantize_for_index(vec) -> list:
+    """색인용: fp32 벡터(길이 QUANT_DIM) → int8 리스트."""
+    return get_quantizer().encode(np.asarray(vec)[None, :])[0].tolist()
+
+
+def search_quantized(os_client, index: str, vec_field: str, question: str, embed_fn, k: int = 5,
+                     candidates: int = RESCORE_CANDIDATES, source_fields=None, filter=None):
+    """
+    int8 필드로 후보를 넓게 뽑고, 후보들의 fp32 벡터로 재채점해 상위 k 개 hit 를 돌려준다.
+    QUANT_DIM 이 1024 가 아니면 축소 차원 임베딩과 1024 임베딩을 병렬로 만든다.
+    filter 는 knn 절 안에 넣을 질의 (kb_filters.knn_filter) — 후보를 뽑기 전에 적용된다.
+    """
+    if QUANT_DIM != 1024:
+        with ThreadPoolExecutor(max_workers=2) as ex:
+            f_full = ex.submit(embed_fn, question)
+            f_small = ex.submit(embed_fn, question, QUANT_DIM)
+            q_full, q_small = f_full.result(), f_small.result()
+    else:
+        q_full = q_small = embed_fn(question)
+
+    q_code = quantize_for_index(q_small)
+    knn = {"vector": q_code, "k": candidates}
+    if filter:
+        knn["filter"] = filter
+    body = {
+        "size": candidates,
+        "query": {"knn": {QVEC_FIELD: knn}},
+    }
+    if source_fields:
+        body["_source"] = list(source_fields) + [vec_field]
+    hits = os_client.search(index=index, body=body)["hits"]["hits"]
+
+    q = np.asarray(q_full, dtype=np.float32)
+    rescored = []
+    for h in hits:
+        v = h["_source"].get(vec_field)
+        score = float(np.asarray(v, dtype=np.float32) @ q) if v else float("-inf")
+        rescored.append((score, h))
+    rescored.sort(key=lambda x: x[0], reverse=True)
+    out = []
+    for score, h in rescored[:k]:
+        h["_score"] = score
+        out.append(h)
+    return out
+
+
+def _scan(os_client, index: str, fields=None):
+    from opensearchpy.helpers import scan
+    query = {"query": {"match_all": {}}}
+    if fields is not None:
+        query["_source"] = fields
+    yield from scan(os_client, index=index, query=query)
+
+
+def fit_from_index(os_client, index: str, vec_field: str, text_field: str, embed_fn,
+                   sample: int = 20000) -> ScalarQuantizer:
+    """인덱스 샘플로 스케일을 잡는다. 축소 차원이면 샘플 텍스트를 그 차원으로 다시 임베딩한다."""
+    if QUANT_DIM != 1024:
+        sample = min(sample, 2000)
+    vecs = []
+    for doc in _scan(os_client, index, [vec_field, text_field]):
+        src = doc["_source"]
+        v = src.get(vec_field) if QUANT_DIM == 1024 else embed_fn(src.get(text_field) or "", QUANT_DIM)
+        if v:
+            vecs.append(v)
+        if len(vecs) >= sample:
+            break
+    return ScalarQuantizer.fit(vecs, dim=QUANT_DIM)
+
+
+def _qvec(src: dict, vec_field: str, text_field: str, embed_fn):
+    if QUANT_DIM == 1024:
+        vec = src.get(vec_field)
+    else:
+        vec = embed_fn(src.get(text_field) or "", QUANT_DIM)
+    return quantize_for_index(vec) if vec else None
+
+
+def backfill(os_client, index: str, vec_field: str, text_field: str, embed_fn, batch: int = 200):
+    """
+    기존 문서에 QVEC_FIELD 를 채운다. QUANT_DIM < 1024 면 텍스트를 축소 차원으로 다시 임베딩한다.
+    (채운 문서 수, bulk 실패 수) 를 돌려준다.
+    """
+    from kb_ingest import send_bulk
+
+    lines, n, failed = [], 0, 0
+    for doc in _scan(os_client, index, [vec_field, text_field]):
+        qvec = _qvec(doc["_source"], vec_field, text_field, embed_fn)
+        if qvec is None:
+            continue
+        lines.append(json.dumps({"update": {"_index": index, "_id": doc["_id"]}}))
+        lines.append(json.dumps({"doc": {QVEC_FIELD: qvec}}))
+        n += 1
+        if len(lines) >= batch * 2:
+            failed += send_bulk(lines, os_client)
+            lines = []
+    failed += send_bulk(lines, os_client)
+    if failed:
+        logger.error(f"backfill {index}: {failed}/{n} updates failed")
+    return n, failed
+
+
+def reindex(os_client, index: str, dest: str, vec_field: str, text_field: str, embed_fn, batch: int = 200):
+    """
+    index 의 문서를 rescore_only_mapping 으로 만든 dest 로 옮긴다 (AOSS 에는 _reindex 가 없어 scan + bulk).
+    (옮긴 문서 수, bulk 실패 수) 를 돌려준다. 실패가 0 일 때만 KB_INDEX 를 dest 로 바꿀 것.
+    """
+    from kb_ingest import send_bulk
+
+    mappings = next(iter(os_client.indices.get_mapping(index=index).values()))["mappings"]
+    os_client.indices.create(index=dest, body=rescore_only_mapping(mappings.get("properties", {}), vec_field))
+
+    lines, n, failed = [], 0, 0
+    for doc in _scan(os_client, index):
+        src = doc["_source"]
+        if src.get(QVEC_FIELD) is None:
+            qvec = _qvec(src, vec_field, text_field, embed_fn)
+            if qvec is not None:
+                src[QVEC_FIELD] = qvec
+        lines.append(json.dumps({"index": {"_index": dest, "_id": doc["_id"]}}))
+        lines.append(json.dumps(src, ensure_ascii=False))
+        n += 1
+        if len(lines) >= batch * 2:
+            failed += send_bulk(lines, os_client)
+            lines = []
+    failed += send_bulk(lines, os_client)
+    if failed:
+        logger.error(f"reindex {index} -> {dest}: {failed}/{n} documents failed")
+    return n, failed
+
+
+if __name__ == "__main__":
+    import kb_client
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("command", choices=["fit", "reindex", "mapping", "backfill"])
+    parser.add_argument("--sample", type=int, default=20000)
+    parser.add_argument("--dest", help="reindex 대상 인덱스 이름")
+    args = parser.parse_args()
+
+    if args.command == "fit":
+        q = fit_from_index(kb_client.os_client, kb_client.INDEX, kb_client.VEC_FIELD, kb_client.TEXT_FIELD,
+                           kb_client.embed_v2, args.sample)
+        q.save()
+        print(json.dumps({"scale": q.scale, "dim": q.dim, "path": QUANT_PARAMS_PATH}))
+    elif args.command == "mapping":
+        print(kb_client.os_client.indices.put_mapping(index=kb_client.INDEX, body=quantized_field_mapping()))
+    elif args.command == "reindex":
+        if not args.dest:
+            parser.error("reindex 에는 --dest 가 필요합니다")
+        n, failed = reindex(kb_client.os_client, kb_client.INDEX, args.dest, kb_client.VEC_FIELD,
+                            kb_client.TEXT_FIELD, kb_client.embed_v2)
+        print(json.dumps({"reindexed": n, "failed": failed, "next": f"KB_INDEX={args.dest} KB_VEC_MODE=int8"}))
+    else:
+        n, failed = backfill(kb_client.os_client, kb_client.INDEX, kb_client.VEC_FIELD, kb_client.TEXT_FIELD,
+                             kb_client.embed_v2)
+        print(json.dumps({"backfilled": n, "failed": failed}))
@@ -0,0 +1,276 @@
+# kb_sync.py
+"""
+S3(또는 로컬) PDF 변경분만 KB 인덱스에 반영하는 증분 동기화.
+
+청크 텍스트(TEXT_FIELD)의 해시를 키로 로컬 manifest(SQLite)에
+(source URI, chunk hash, doc ID) 를 기록해 두고, 실행할 때마다
+
+  - 새로 생기거나 내용이 바뀐 청크만 임베딩 + 색인
+  - 내용은 같고 페이지만 바뀐 청크는 메타데이터만 update (재임베딩 없음)
+  - 소스에서 사라진 청크 / 삭제된 PDF 의 청크는 인덱스에서 delete
+
+doc ID 는 kb_ingest.content_doc_id (uri, 청크 해시, 순번) 로 kb_ingest 와 같다.
+manifest 에 없는 소스는 먼저 인덱스에서 그 소스의 기존 청크를 읽어 이전 상태로 삼는다 (bootstrap).
+그래서 새 manifest 로 kb_ingest(예전 page/seq ID 포함)나 관리형 KB 가 만든 인덱스에 돌려도
+같은 텍스트는 기존 문서를 그대로 두고, 나머지 옛 문서는 지우므로 청크가 두 벌이 되지 않는다.
+PDF 하나를 읽거나 나누거나 임베딩하다 실패하면 그 소스만 failed_sources 로 세고 계속한다 (다음 실행에서 다시).
+
+  python kb_sync.py s3://my-bucket/papers/ --manifest .kb_manifest.sqlite
+  python kb_sync.py s3://my-bucket/papers/ --dry-run
+
+os_client / embed_fn 을 인자로 받으므로 benchmarks.fakes.FakeOpenSearch 로 로컬 검증이 가능하다.
+"""
+import argparse
+import json
+import sqlite3
+import time
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import kb_client
+from kb_client import INDEX, SOURCE_FIELD, TEXT_FIELD, VEC_FIELD
+from kb_ingest import (BULK_DOCS, PAGE_FIELD, RateLimiter, _read_and_chunk, chunk_hash, content_doc_id,
+                       embed_with_retry, index_actions, list_sources, send_bulk)
+from logging_config import setup_logging
+
+logger = setup_logging().getChild("kb_sync")
+
+MANIFEST_PATH = ".kb_manifest.sqlite"
+BOOTSTRAP_MAX_CHUNKS = 10000   # manifest 없는 소스의 기존 청크를 인덱스에서 읽을 때 상한 (PDF 하나 기준)
+
+
+class Manifest:
+    def __init__(self, path: str = MANIFEST_PATH):
+        self.conn = sqlite3.connect(path)
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS sources (
+                source_uri TEXT PRIMARY KEY,
+                version    TEXT NOT NULL,
+                synced_at  REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS chunks (
+                source_uri TEXT NOT NULL,
+                chunk_hash TEXT NOT NULL,
+                doc_id     TEXT NOT NULL,
+                page       INTEGER,
+                PRIMARY KEY (source_uri, doc_id)
+            );
+            CREATE INDEX IF NOT EXISTS chunks_by_source ON chunks (source_uri);
+        """)
+
+    def versions(self) -> dict:
+        return dict(self.conn.execute("SELECT source_uri, version FROM sources"))
+
+    def chunks(self, source_uri: str) -> dict:
+        """doc_id -> (chunk_hash, page)"""
+        rows = self.conn.execute(
+            "SELECT doc_id, chunk_hash, page FROM chunks WHERE source_uri = ?", (source_uri,))
+        return {doc_id: (h, page) for doc_id, h, page in rows}
+
+    def replace_source(self, source_uri: str, version: str, rows):
+        with self.conn:
+            self.conn.execute("DELETE FROM chunks WHERE source_uri = ?", (source_uri,))
+            self.conn.executemany(
+                "INSERT INTO chunks (source_uri, chunk_hash, doc_id, page) VALUES (?, ?, ?, ?)",
+                [(source_uri, h, doc_id, page) for doc_id, h, page in rows])
+            self.conn.execute(
+                "INSERT OR REPLACE INTO sources (source_uri, version, synced_at) VALUES (?, ?, ?)",
+                (source_uri, version, time.time()))
+
+    def drop_source(self, source_uri: str):
+        with self.conn:
+            self.conn.execute("DELETE FROM chunks WHERE source_uri = ?", (source_uri,))
+            self.conn.execute("DELETE FROM sources WHERE source_uri = ?", (source_uri,))
+
+    def close(self):
+        self.conn.close()
+
+#--------------------------------
+
+
+def indexed_chunks(os_client, index: str, source_uri: str) -> dict:
+    """인덱스에 이미 있는 source_uri 의 청크 → manifest.chunks() 와 같은 doc_id -> (chunk_hash, page)."""
+    body = {
+        "size": BOOTSTRAP_MAX_CHUNKS,
+        "_source": [SOURCE_FIELD, TEXT_FIELD, PAGE_FIELD],
+        # source-uri 는 text 필드라 구절로 찾고 정확히 같은 것만 남긴다
+        "query": {"match_phrase": {SOURCE_FIELD: source_uri}},
+    }
+    out = {}
+    for hit in os_client.search(index=index, body=body)["hits"]["hits"]:
+        src = hit["_source"]
+        if src.get(SOURCE_FIELD) == source_uri and src.get(TEXT_FIELD):
+            out[hit["_id"]] = (chunk_hash(src[TEXT_FIELD]), src.get(PAGE_FIELD))
+    return out
+
+
+def plan_source(source_uri: str, chunks, previous: dict):
+    """
+    새 청크 목록과 이전 상태(doc_id -> (hash, page))를 비교해 할 일을 정한다.
+    이전 문서는 ID 가 아니라 (hash, 순번) 으로 맞춘다 — 다른 ID 체계로 색인된 문서도 텍스트가 같으면 재사용.
+    반환: (to_embed, to_update_page, to_delete_ids, manifest_rows)
+    """
+    by_hash = defaultdict(list)
+    for doc_id, (h, _) in sorted(previous.items()):
+        by_hash[h].append(doc_id)
+    for h, ids in by_hash.items():
+        # 우리 ID 체계의 문서가 있으면 그 순번대로 먼저 (다른 체계의 ID 는 뒤에)
+        own = {content_doc_id(source_uri, h, n): n for n in range(len(ids))}
+        ids.sort(key=lambda d: (own.get(d, len(ids)), d))
+
+    seen = defaultdict(int)
+    to_embed, to_update, rows = [], [], []
+    current_ids = set()
+    for c in chunks:
+        h = chunk_hash(c[TEXT_FIELD])
+        n = seen[h]
+        seen[h] += 1
+        reuse = by_hash[h][n] if n < len(by_hash[h]) else None
+        doc_id = reuse or content_doc_id(source_uri, h, n)
+        c["_id"] = doc_id
+        current_ids.add(doc_id)
+        rows.append((doc_id, h, c.get(PAGE_FIELD)))
+        if reuse is None:
+            to_embed.append(c)
+        elif previous[doc_id][1] != c.get(PAGE_FIELD):
+            to_update.append(c)
+    to_delete = [doc_id for doc_id in previous if doc_id not in current_ids]
+    return to_embed, to_update, to_delete, rows
+
+
+def _chunked(changed, chunker, pool):
+    """changed 순서대로 (uri, version, chunks 또는 예외). 한 소스의 실패가 나머지를 막지 않게."""
+    if pool is not None:
+        futures = [pool.submit(_read_and_chunk, uri) for uri, _ in changed]
+    for i, (uri, version) in enumerate(changed):
+        try:
+            _, chunks = futures[i].result() if pool is not None else chunker(uri)
+        except Exception as e:
+            yield uri, version, e
+            continue
+        yield uri, version, chunks
+
+
+def _delete_actions(doc_ids, index: str):
+    return [json.dumps({"delete": {"_index": index, "_id": d}}) for d in doc_ids]
+
+
+def _update_actions(docs, index: str):
+    lines = []
+    for d in docs:
+        lines.append(json.dumps({"update": {"_index": index, "_id": d["_id"]}}))
+        lines.append(json.dumps({"doc": {PAGE_FIELD: d.get(PAGE_FIELD)}}))
+    return lines
+
+
+def _send_in_batches(lines_per_doc, os_client):
+    failed, batch = 0, []
+    for lines in lines_per_doc:
+        batch.extend(lines)
+        if len(batch) >= BULK_DOCS * 2:
+            failed += send_bulk(batch, os_client)
+            batch = []
+    return failed + send_bulk(batch, os_client)
+
+
+def sync(root: str, manifest_path: str = MANIFEST_PATH, os_client=None, embed_fn=None,
+         chunk_workers: int = None, embed_workers: int = 8, embed_rps: float = 10.0,
+         index: str = INDEX, dry_run: bool = False, sources=None, chunker=None):
+    """
+    sources: (uri, version) 이터러블. 주지 않으면 list_sources(root).
+    chunker: uri -> (uri, chunks). 주지 않으면 PDF 를 읽어서 프로세스 풀에서 분할.
+    """
+    os_client = os_client or kb_client.os_client
+    manifest = Manifest(manifest_path)
+    pool = None
+    limiter = RateLimiter(embed_rps)
+    stats = {"sources_changed": 0, "sources_removed": 0, "embedded": 0,
+             "updated": 0, "deleted": 0, "unchanged": 0, "failed_sources": 0}
+    t0 = time.perf_counter()
+
+    try:
+        known = manifest.versions()
+        listed = dict(sources if sources is not None else list_sources(root))
+        changed = [(uri, v) for uri, v in listed.items() if known.get(uri) != v]
+        removed = [uri for uri in known if uri not in listed]
+
+        if chunker is None:
+            pool = ProcessPoolExecutor(max_workers=chunk_workers)
+
+        with ThreadPoolExecutor(max_workers=embed_workers, thread_name_prefix="embed") as embed_pool:
+            for uri, version, chunks in _chunked(changed, chunker, pool):
+                if isinstance(chunks, Exception):
+                    logger.error(f"chunking failed for {uri}: {chunks}")
+                    stats["failed_sources"] += 1
+                    continue
+                previous = manifest.chunks(uri) if uri in known else indexed_chunks(os_client, index, uri)
+                if uri not in known and previous:
+                    logger.info(f"{uri}: not in manifest, starting from {len(previous)} chunks already indexed")
+                to_embed, to_update, to_delete, rows = plan_source(uri, chunks, previous)
+                stats["unchanged"] += len(rows) - len(to_embed) - len(to_update)
+                logger.info(f"{uri}: +{len(to_embed)} ~{len(to_update)} -{len(to_delete)}")
+                if dry_run:
+                    stats["embedded"] += len(to_embed)
+                    stats["updated"] += len(to_update)
+                    stats["deleted"] += len(to_delete)
+                    continue
+
+                vectors = embed_pool.map(
+                    lambda c: embed_with_retry(c[TEXT_FIELD], limiter, embed_fn=embed_fn), to_embed)
+                try:
+                    for c, vec in zip(to_embed, vectors):
+                        c[VEC_FIELD] = vec
+                except Exception as e:
+                    logger.error(f"{uri}: embedding failed, will retry next sync: {e}")
+                    stats["failed_sources"] += 1
+                    continue
+                failed = _send_in_batches(
+                    [index_actions([c], index) for c in to_embed]
+                    + [_update_actions([c], index) for c in to_update]
+                    + [_delete_actions([d], index) for d in to_delete],
+                    os_client,
+                )
+                if failed:
+                    # manifest 를 갱신하지 않으면 다음 실행에서 이 소스를 다시 비교한다
+                    logger.error(f"{uri}: {failed} bulk operations failed, will retry next sync")
+                    stats["failed_sources"] += 1
+                    continue
+                manifest.replace_source(uri, version, rows)
+                stats["sources_changed"] += 1
+                stats["embedded"] += len(to_embed)
+                stats["updated"] += len(to_update)
+                stats["deleted"] += len(to_delete)
+
+        for uri in removed:
+            doc_ids = list(manifest.chunks(uri))
+            logger.info(f"{uri}: source removed, deleting {len(doc_ids)} chunks")
+            stats["sources_removed"] += 1
+            stats["deleted"] += len(doc_ids)
+            if dry_run:
+                continue
+            if _send_in_batches([_delete_actions([d], index) for d in doc_ids], os_client):
+                stats["failed_sources"] += 1
+                continue
+            manifest.drop_source(uri)
+    finally:
+        if pool is not None:
+            pool.shutdown(cancel_futures=True)
+        manifest.close()
+
+    stats["elapsed_s"] = round(time.perf_counter() - t0, 1)
+    logger.info(f"sync finished: {stats}")
+    return stats
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("root", help="s3://bucket/prefix 또는 로컬 디렉터리")
+    parser.add_argument("--manifest", default=MANIFEST_PATH)
+    parser.add_argument("--chunk-workers", type=int, default=None)
+    parser.add_argument("--embed-workers", type=int, default=8)
+    parser.add_argument("--embed-rps", type=float, default=10.0)
+    parser.add_argument("--dry-run", action="store_true", help="변경 계획만 출력")
+    args = parser.parse_args()
+    print(json.dumps(sync(args.root, args.manifest, chunk_workers=args.chunk_workers,
+                          embed_workers=args.embed_workers, embed_rps=args.embed_rps,
+                          dry_run=args.dry_run)))
@@ -1,15 +1,182 @@
 # logging_config.py
-import logging, sys
+"""
+앱 공용 로깅 설정.
+
+로그 호출 스레드는 레코드를 큐에 넣기만 하고(QueueHandler), 실제 stderr 쓰기는 QueueListener
+스레드 하나가 한다. 그래서 로그가 요청 처리 경로에 I/O 지연을 더하지 않는다.
+  - 출력은 한 줄에 JSON 하나씩 (LOG_FORMAT=text 이면 예전 형식)
+  - session_id / request_id 는 contextvars 로 붙는다 (log_context)
+  - DEBUG 레코드는 LOG_DEBUG_SAMPLE 비율만 남긴다
+  - log_context(sink=...) 로 지정한 콜백에 그 실행의 로그만 따로 흘려보낸다
+    (전역 stdout 을 가로채는 contextlib.redirect_stdout 대신 사용 → 동시 세션이 섞이지 않음)
+    sink 는 레코드에 실려 가서 리스너 스레드에서 불린다 → 느린 sink 도 호출 스레드를 막지 않음
+  - LOG_EXTRA_LOGGERS (기본 strands) 로거도 같은 큐로 모아 stderr 와 sink 에 함께 나온다
+큐가 가득 차면(LOG_QUEUE_SIZE) 기다리지 않고 버린 뒤 개수만 센다.
+sink 는 리스너 스레드에서 늦게 불리므로, 실행이 끝난 뒤 남은 줄까지 받으려면 flush() 를 부른다.
+"""
+import atexit
+import contextlib
+import contextvars
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+import threading
+import time
+
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_FORMAT = os.getenv("LOG_FORMAT", "json")
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+LOG_DEBUG_SAMPLE = float(os.getenv("LOG_DEBUG_SAMPLE", "0.1"))
+# app 밖의 라이브러리 로거 (strands 의 도구/모델 로그 등) 를 같은 큐로 받는다
+LOG_EXTRA_LOGGERS = [n for n in os.getenv("LOG_EXTRA_LOGGERS", "strands").split(",") if n]
+LOG_EXTRA_LEVEL = os.getenv("LOG_EXTRA_LEVEL", "INFO").upper()
+
+session_id = contextvars.ContextVar("session_id", default="-")
+request_id = contextvars.ContextVar("request_id", default="-")
+log_sink = contextvars.ContextVar("log_sink", default=None)
+
+_listener = None
+_setup_lock = threading.Lock()
+
+
+@contextlib.contextmanager
+def log_context(session: str = None, request: str = None, sink=None):
+    """with 블록 안(과 여기서 copy_context 로 넘긴 스레드)의 로그에 ID 를 붙이고 sink 로도 보낸다."""
+    tokens = []
+    for var, value in ((session_id, session), (request_id, request), (log_sink, sink)):
+        if value is not None:
+            tokens.append((var, var.set(value)))
+    try:
+        yield
+    finally:
+        for var, token in reversed(tokens):
+            var.reset(token)
+
+#--------------------------------
+
+
+class ContextFilter(logging.Filter):
+    """로그를 부른 스레드에서 실행됨: ID 와 sink 를 레코드에 박고, DEBUG 는 샘플링한다. (I/O 없음)"""
+
+    def __init__(self):
+        super().__init__()
+        self._debug_seen = 0
+
+    def filter(self, record):
+        if record.levelno <= logging.DEBUG and LOG_DEBUG_SAMPLE < 1.0:
+            self._debug_seen += 1
+            # 결정적 샘플링: 1/LOG_DEBUG_SAMPLE 개마다 하나
+            if LOG_DEBUG_SAMPLE <= 0 or self._debug_seen % max(1, round(1 / LOG_DEBUG_SAMPLE)):
+                return False
+        record.session_id = session_id.get()
+        record.request_id = request_id.get()
+        record.log_sink = log_sink.get()
+        return True
+
+
+class SinkHandler(logging.Handler):
+    """리스너 스레드에서 실행됨: 레코드에 실려 온 그 실행의 sink 로 한 줄을 보낸다."""
+
+    def emit(self, record):
+        marker = getattr(record, "flush_marker", None)
+        if marker is not None:  # flush(): 앞선 레코드는 모두 처리됨 (큐는 FIFO, 이 핸들러가 마지막)
+            marker.set()
+            return
+        sink = getattr(record, "log_sink", None)
+        if sink is None:
+            return
+        try:
+            sink(f"{record.name} | {record.getMessage()}\n")
+        except Exception:
+            pass
+
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """큐가 가득 차면 기다리거나 traceback 을 찍지 않고 버린다."""
+
+    dropped = 0
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            DroppingQueueHandler.dropped += 1
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        out = {
+            "ts": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(record.created)) + f".{int(record.msecs):03d}",
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+            "session_id": getattr(record, "session_id", "-"),
+            "request_id": getattr(record, "request_id", "-"),
+            "thread": record.threadName,
+            "src": f"{record.filename}:{record.lineno}",
+        }
+        if record.exc_info:
+            out["exc"] = self.formatException(record.exc_info)
+        return json.dumps(out, ensure_ascii=False)
+
+
+def _formatter() -> logging.Formatter:
+    if LOG_FORMAT == "json":
+        return JsonFormatter()
+    return logging.Formatter("%(asctime)s [%(name)s] %(levelname)s %(session_id)s/%(request_id)s: %(message)s")
+
+
+def _start_listener(q: queue.Queue):
+    global _listener
+    handler = logging.StreamHandler(sys.stderr)
+    handler.setFormatter(_formatter())
+    handler.addFilter(lambda record: not hasattr(record, "flush_marker"))
+    _listener = logging.handlers.QueueListener(q, handler, SinkHandler(), respect_handler_level=True)
+    _listener.start()
+    atexit.register(_listener.stop)
+
+#--------------------------------
+
+
 def setup_logging():
     logger = logging.getLogger("app")
     if logger.handlers:  # 중복 방지
         return logger
-    handler = logging.StreamHandler(sys.stderr)
-    formatter = logging.Formatter(
-        "%(asctime)s [%(name)s] %(levelname)s: %(message)s"
-    )
-    handler.setFormatter(formatter)
-    logger.addHandler(handler)
-    logger.setLevel(logging.INFO)
-    logger.propagate = False
-    return logger
\ No newline at end of file
+    with _setup_lock:
+        if logger.handlers:
+            return logger
+        q = queue.Queue(maxsize=LOG_QUEUE_SIZE)
+        handler = DroppingQueueHandler(q)
+        handler.addFilter(ContextFilter())
+        _start_listener(q)
+        logger.addHandler(handler)
+        logger.setLevel(LOG_LEVEL)
+        logger.propagate = False
+        for name in LOG_EXTRA_LOGGERS:
+            extra = logging.getLogger(name)
+            extra.addHandler(handler)
+            extra.setLevel(LOG_EXTRA_LEVEL)
+            extra.propagate = False
+    return logger
+
+
+def flush(timeout: float = 2.0) -> bool:
+    """지금까지 큐에 넣은 로그가 stderr 와 sink 로 다 나갈 때까지 기다린다. 시간 안에 못 끝나면 False."""
+    if _listener is None:
+        return True
+    done = threading.Event()
+    marker = logging.makeLogRecord({"name": "app.flush", "levelno": logging.CRITICAL, "levelname": "CRITICAL",
+                                    "flush_marker": done})
+    try:
+        _listener.queue.put(marker, timeout=timeout)
+    except queue.Full:
+        return False
+    return done.wait(timeout)
+
+
+def stats() -> dict:
+    return {"dropped": DroppingQueueHandler.dropped,
+            "queued": _listener.queue.qsize() if _listener else 0}
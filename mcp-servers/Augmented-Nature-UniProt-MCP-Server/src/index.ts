@@ -1943,5 +1943,10 @@ class UniProtServer {
   }
 }
 
-const server = new UniProtServer();
-server.run().catch(console.error);
+export { UniProtServer };
+
+// Loaded in-process by MCP-Gateway: do not attach the stdio transport.
+if (!process.env.MCP_GATEWAY_IMPORT) {
+  const server = new UniProtServer();
+  server.run().catch(console.error);
+}
@@ -872,6 +872,11 @@ class ChEMBLServer {
         console.error('ChEMBL MCP server running on stdio');
     }
 }
-const server = new ChEMBLServer();
-server.run().catch(console.error);
+export { ChEMBLServer };
+
+// Loaded in-process by MCP-Gateway: do not attach the stdio transport.
+if (!process.env.MCP_GATEWAY_IMPORT) {
+    const server = new ChEMBLServer();
+    server.run().catch(console.error);
+}
 //# sourceMappingURL=index.js.map
\ No newline at end of file
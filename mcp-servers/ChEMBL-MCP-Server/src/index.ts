@@ -1060,5 +1060,10 @@ class ChEMBLServer {
   }
 }
 
-const server = new ChEMBLServer();
-server.run().catch(console.error);
+export { ChEMBLServer };
+
+// Loaded in-process by MCP-Gateway: do not attach the stdio transport.
+if (!process.env.MCP_GATEWAY_IMPORT) {
+  const server = new ChEMBLServer();
+  server.run().catch(console.error);
+}
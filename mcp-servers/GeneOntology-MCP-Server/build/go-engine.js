@@ -0,0 +1,445 @@
+/**
+ * Local Gene Ontology graph engine.
+ *
+ * Loads a GO release (OBO, e.g. go-basic.obo, or OBO Graphs JSON, e.g. go-basic.json) once
+ * per process into an array-backed DAG:
+ *   - GO IDs are interned to dense integer indices (alt_ids map to the primary term)
+ *   - direct parents/children are stored as CSR adjacency (offsets + Int32Array) with the
+ *     relation (is_a / part_of) per edge
+ *   - the transitive closure over is_a + part_of is precomputed as sorted CSR ancestor and
+ *     descendant lists, so "is X an ancestor of Y" is a binary search and lowest common
+ *     ancestors are a sorted-list intersection
+ * Hierarchy queries then run in-process in microseconds instead of serial QuickGO calls.
+ *
+ * GO_ONTOLOGY_PATH enables the engine with a release file; without it get_go_term and
+ * validate_go_id use QuickGO and the hierarchy tools report that no release is loaded.
+ * data/go-fixture.obo is a small hand-made subset for tests and benchmarks. Files whose header
+ * says they are a subset (data-version / remark) load as partial: hierarchy answers carry a
+ * warning and term lookups still go to QuickGO.
+ */
+import { promises as fs } from 'fs';
+import { fileURLToPath } from 'url';
+
+export const FIXTURE_PATH = fileURLToPath(new URL('../data/go-fixture.obo', import.meta.url));
+export const ONTOLOGY_PATH = process.env.GO_ONTOLOGY_PATH || '';
+
+export const NAMESPACES = ['biological_process', 'molecular_function', 'cellular_component'];
+export const RELATIONS = ['is_a', 'part_of'];
+
+const GO_ID = /^GO:\d{7}$/;
+
+function emptyDetail() {
+    return { definition: '', definition_xrefs: [], synonyms: [], xrefs: [], alt_ids: [], replaced_by: [], consider: [] };
+}
+
+// Parsers
+
+function parseObo(text) {
+    const terms = [];
+    let term = null;
+    let inTerm = false;
+    for (const raw of text.split('\n')) {
+        const line = raw.trim();
+        if (line.startsWith('[')) {
+            inTerm = line === '[Term]';
+            term = null;
+            continue;
+        }
+        if (!inTerm || !line || line.startsWith('!')) continue;
+        const cut = line.indexOf(':');
+        if (cut < 0) continue;
+        const tag = line.slice(0, cut);
+        // drop trailing "! comment" (not inside quoted definitions/synonyms)
+        const value = line.slice(cut + 1).trim();
+        const bare = value.replace(/\s+!.*$/, '');
+        if (tag === 'id') {
+            term = { id: bare, name: '', namespace: '', obsolete: false, detail: emptyDetail(), parents: [] };
+            terms.push(term);
+            continue;
+        }
+        if (!term) continue;
+        switch (tag) {
+            case 'name':
+                term.name = value;
+                break;
+            case 'namespace':
+                term.namespace = bare;
+                break;
+            case 'is_obsolete':
+                term.obsolete = bare === 'true';
+                break;
+            case 'alt_id':
+                term.detail.alt_ids.push(bare);
+                break;
+            case 'replaced_by':
+                term.detail.replaced_by.push(bare);
+                break;
+            case 'consider':
+                term.detail.consider.push(bare);
+                break;
+            case 'xref':
+                term.detail.xrefs.push(bare.split(' ')[0]);
+                break;
+            case 'def': {
+                const m = value.match(/^"((?:[^"\\]|\\.)*)"\s*\[([^\]]*)\]/);
+                if (m) {
+                    term.detail.definition = m[1].replace(/\\"/g, '"');
+                    term.detail.definition_xrefs = m[2].split(',').map((x) => x.trim()).filter(Boolean);
+                }
+                break;
+            }
+            case 'synonym': {
+                const m = value.match(/^"((?:[^"\\]|\\.)*)"\s+(\w+)/);
+                if (m) term.detail.synonyms.push({ text: m[1], scope: m[2] });
+                break;
+            }
+            case 'is_a':
+                term.parents.push([bare.split(' ')[0], 0]);
+                break;
+            case 'relationship': {
+                const [rel, target] = bare.split(/\s+/);
+                if (rel === 'part_of') term.parents.push([target, 1]);
+                break;
+            }
+        }
+    }
+    return terms;
+}
+
+function iriToId(iri) {
+    const m = iri.match(/GO_(\d{7})$/);
+    return m ? `GO:${m[1]}` : iri;
+}
+
+function parseObographs(json) {
+    const graph = json.graphs?.[0] ?? { nodes: [], edges: [] };
+    const byId = new Map();
+    for (const node of graph.nodes ?? []) {
+        const id = iriToId(node.id);
+        if (node.type !== 'CLASS' || !GO_ID.test(id)) continue;
+        const meta = node.meta ?? {};
+        const detail = emptyDetail();
+        detail.definition = meta.definition?.val ?? '';
+        detail.definition_xrefs = meta.definition?.xrefs ?? [];
+        detail.synonyms = (meta.synonyms ?? []).map((s) => ({
+            text: s.val,
+            scope: String(s.pred ?? '').replace(/^has/, '').replace(/Synonym$/, '').toUpperCase(),
+        }));
+        detail.xrefs = (meta.xrefs ?? []).map((x) => x.val);
+        let namespace = '';
+        for (const p of meta.basicPropertyValues ?? []) {
+            const pred = String(p.pred);
+            if (pred.endsWith('hasOBONamespace')) namespace = p.val;
+            else if (pred.endsWith('hasAlternativeId')) detail.alt_ids.push(p.val);
+            else if (pred.endsWith('IAO_0100001')) detail.replaced_by.push(iriToId(p.val));
+            else if (pred.endsWith('consider')) detail.consider.push(iriToId(p.val));
+        }
+        byId.set(id, { id, name: node.lbl ?? '', namespace, obsolete: !!meta.deprecated, detail, parents: [] });
+    }
+    for (const edge of graph.edges ?? []) {
+        const term = byId.get(iriToId(edge.sub));
+        if (!term) continue;
+        if (edge.pred === 'is_a') term.parents.push([iriToId(edge.obj), 0]);
+        else if (String(edge.pred).endsWith('BFO_0000050')) term.parents.push([iriToId(edge.obj), 1]);
+    }
+    return [...byId.values()];
+}
+
+// Release header
+
+const PARTIAL_HINT = /\b(subset|omitted|partial|fixture)\b/i;
+
+function releaseInfo(version, remarks) {
+    const hint = [version, ...remarks].find((s) => PARTIAL_HINT.test(s));
+    return { version, partial: hint !== undefined, note: hint ? remarks.join(' ') || version : '' };
+}
+
+function oboRelease(text) {
+    let version = '';
+    const remarks = [];
+    for (const raw of text.split('\n')) {
+        const line = raw.trim();
+        if (line.startsWith('[')) break;
+        if (line.startsWith('data-version:')) version = line.slice('data-version:'.length).trim();
+        else if (line.startsWith('remark:')) remarks.push(line.slice('remark:'.length).trim());
+    }
+    return releaseInfo(version, remarks);
+}
+
+function obographsRelease(json) {
+    const meta = json.graphs?.[0]?.meta ?? {};
+    const remarks = [...(meta.comments ?? [])];
+    for (const p of meta.basicPropertyValues ?? []) {
+        if (/(comment|description)$/i.test(String(p.pred))) remarks.push(String(p.val));
+    }
+    return releaseInfo(String(meta.version ?? ''), remarks);
+}
+
+// Graph
+
+function toCsr(lists) {
+    const offsets = new Int32Array(lists.length + 1);
+    for (let i = 0; i < lists.length; i++) offsets[i + 1] = offsets[i] + lists[i].length;
+    const values = new Int32Array(offsets[lists.length]);
+    for (let i = 0; i < lists.length; i++) values.set(lists[i], offsets[i]);
+    return { offsets, values };
+}
+
+function contains(values, from, to, x) {
+    let lo = from;
+    let hi = to - 1;
+    while (lo <= hi) {
+        const mid = (lo + hi) >> 1;
+        if (values[mid] === x) return true;
+        if (values[mid] < x) lo = mid + 1;
+        else hi = mid - 1;
+    }
+    return false;
+}
+
+export class GoGraph {
+    size;
+    ids;
+    names;
+    namespaces;
+    obsolete;
+    details;
+    depth;
+    source;
+    release;
+    index = new Map();
+    parentOffsets;
+    parents;
+    parentRels;
+    childOffsets;
+    children;
+    childRels;
+    ancOffsets;
+    ancestors;
+    descOffsets;
+    descendants;
+
+    constructor(terms, source, release = releaseInfo('', [])) {
+        const n = terms.length;
+        this.source = source;
+        this.release = release;
+        this.size = n;
+        this.ids = terms.map((t) => t.id);
+        this.names = terms.map((t) => t.name);
+        this.namespaces = Uint8Array.from(terms.map((t) => Math.max(0, NAMESPACES.indexOf(t.namespace))));
+        this.obsolete = Uint8Array.from(terms.map((t) => (t.obsolete ? 1 : 0)));
+        this.details = terms.map((t) => t.detail);
+        terms.forEach((t, i) => this.index.set(t.id, i));
+        terms.forEach((t, i) => t.detail.alt_ids.forEach((alt) => this.index.has(alt) || this.index.set(alt, i)));
+
+        // direct edges
+        const parentLists = [];
+        const parentRelLists = [];
+        const childLists = Array.from({ length: n }, () => []);
+        const childRelLists = Array.from({ length: n }, () => []);
+        terms.forEach((t, i) => {
+            const ps = [];
+            const rels = [];
+            for (const [target, rel] of t.parents) {
+                const p = this.index.get(target);
+                if (p === undefined || p === i) continue;
+                ps.push(p);
+                rels.push(rel);
+                childLists[p].push(i);
+                childRelLists[p].push(rel);
+            }
+            parentLists.push(ps);
+            parentRelLists.push(rels);
+        });
+        const parentCsr = toCsr(parentLists);
+        this.parentOffsets = parentCsr.offsets;
+        this.parents = parentCsr.values;
+        this.parentRels = Uint8Array.from(parentRelLists.flat());
+        const childCsr = toCsr(childLists);
+        this.childOffsets = childCsr.offsets;
+        this.children = childCsr.values;
+        this.childRels = Uint8Array.from(childRelLists.flat());
+
+        // transitive closure in topological order (parents before children)
+        const pending = Int32Array.from(parentLists.map((ps) => ps.length));
+        const order = [];
+        for (let i = 0; i < n; i++) if (pending[i] === 0) order.push(i);
+        for (let k = 0; k < order.length; k++) {
+            for (const c of childLists[order[k]]) {
+                if (--pending[c] === 0) order.push(c);
+            }
+        }
+        if (order.length < n) {
+            // cycles should not exist in is_a/part_of; keep the remaining terms without closure
+            console.error(`[go-engine] ${n - order.length} terms in cycles, closure skipped for them`);
+            for (let i = 0; i < n; i++) if (pending[i] > 0) order.push(i);
+        }
+
+        const ancLists = new Array(n);
+        const depth = new Int32Array(n);
+        const mark = new Int32Array(n).fill(-1);
+        for (const i of order) {
+            const out = [];
+            for (const p of parentLists[i]) {
+                depth[i] = Math.max(depth[i], depth[p] + 1);
+                for (const a of [p, ...(ancLists[p] ?? [])]) {
+                    if (mark[a] !== i) {
+                        mark[a] = i;
+                        out.push(a);
+                    }
+                }
+            }
+            ancLists[i] = out.sort((a, b) => a - b);
+        }
+        this.depth = depth;
+        const ancCsr = toCsr(ancLists);
+        this.ancOffsets = ancCsr.offsets;
+        this.ancestors = ancCsr.values;
+
+        // descendants = transpose of ancestors (filled in ascending order, so already sorted)
+        const descCounts = new Int32Array(n + 1);
+        for (let i = 0; i < this.ancestors.length; i++) descCounts[this.ancestors[i] + 1]++;
+        for (let i = 0; i < n; i++) descCounts[i + 1] += descCounts[i];
+        this.descOffsets = descCounts.slice();
+        this.descendants = new Int32Array(this.ancestors.length);
+        const fill = descCounts.slice(0, n);
+        for (let i = 0; i < n; i++) {
+            for (let k = this.ancOffsets[i]; k < this.ancOffsets[i + 1]; k++) {
+                this.descendants[fill[this.ancestors[k]]++] = i;
+            }
+        }
+    }
+
+    /** Index of a GO ID (primary or alt_id), or -1. Accepts "GO:0008150" or "0008150". */
+    lookup(id) {
+        const normalized = /^\d{7}$/.test(id) ? `GO:${id}` : id.trim().toUpperCase();
+        return this.index.get(normalized) ?? -1;
+    }
+
+    namespace(i) {
+        return NAMESPACES[this.namespaces[i]];
+    }
+
+    brief(i) {
+        return { id: this.ids[i], name: this.names[i], namespace: this.namespace(i) };
+    }
+
+    directParents(i) {
+        const out = [];
+        for (let k = this.parentOffsets[i]; k < this.parentOffsets[i + 1]; k++) {
+            out.push({ ...this.brief(this.parents[k]), relation: RELATIONS[this.parentRels[k]] });
+        }
+        return out;
+    }
+
+    directChildren(i) {
+        const out = [];
+        for (let k = this.childOffsets[i]; k < this.childOffsets[i + 1]; k++) {
+            out.push({ ...this.brief(this.children[k]), relation: RELATIONS[this.childRels[k]] });
+        }
+        return out;
+    }
+
+    ancestorCount(i) {
+        return this.ancOffsets[i + 1] - this.ancOffsets[i];
+    }
+
+    descendantCount(i) {
+        return this.descOffsets[i + 1] - this.descOffsets[i];
+    }
+
+    isAncestor(ancestor, term) {
+        return contains(this.ancestors, this.ancOffsets[term], this.ancOffsets[term + 1], ancestor);
+    }
+
+    /** BFS over the CSR adjacency, returning terms with their shortest distance. */
+    walk(start, up, maxDistance, limit) {
+        const offsets = up ? this.parentOffsets : this.childOffsets;
+        const edges = up ? this.parents : this.children;
+        const seen = new Set([start]);
+        const out = [];
+        let frontier = [start];
+        for (let distance = 1; frontier.length && distance <= maxDistance && out.length < limit; distance++) {
+            const next = [];
+            for (const t of frontier) {
+                for (let k = offsets[t]; k < offsets[t + 1]; k++) {
+                    const x = edges[k];
+                    if (seen.has(x)) continue;
+                    seen.add(x);
+                    next.push(x);
+                    if (out.length < limit) out.push({ index: x, distance });
+                }
+            }
+            frontier = next;
+        }
+        return out;
+    }
+
+    ancestorsOf(i, maxDistance = Infinity, limit = Infinity) {
+        return this.walk(i, true, maxDistance, limit);
+    }
+
+    descendantsOf(i, maxDistance = Infinity, limit = Infinity) {
+        return this.walk(i, false, maxDistance, limit);
+    }
+
+    /** Common ancestors (terms included) and the lowest ones: those with no common descendant among them. */
+    commonAncestors(terms) {
+        let common = null;
+        for (const t of terms) {
+            const own = [t, ...this.ancestors.subarray(this.ancOffsets[t], this.ancOffsets[t + 1])];
+            common = common === null ? own : common.filter((x) => own.includes(x));
+        }
+        const all = common ?? [];
+        const lowest = all.filter((c) => !all.some((other) => other !== c && this.isAncestor(c, other)));
+        lowest.sort((a, b) => this.depth[b] - this.depth[a]);
+        return { common: all, lowest };
+    }
+
+    stats() {
+        const perNamespace = {};
+        for (let i = 0; i < this.size; i++) {
+            if (this.obsolete[i]) continue;
+            perNamespace[this.namespace(i)] = (perNamespace[this.namespace(i)] ?? 0) + 1;
+        }
+        return {
+            source: this.source,
+            release: this.release,
+            terms: this.size,
+            edges: this.parents.length,
+            closure_pairs: this.ancestors.length,
+            per_namespace: perNamespace,
+        };
+    }
+}
+
+export async function loadGoGraph(path = ONTOLOGY_PATH) {
+    const started = Date.now();
+    const text = await fs.readFile(path, 'utf8');
+    const json = path.endsWith('.json') ? JSON.parse(text) : null;
+    const terms = json ? parseObographs(json) : parseObo(text);
+    const graph = new GoGraph(terms, path, json ? obographsRelease(json) : oboRelease(text));
+    if (graph.release.partial) {
+        console.error(`[go-engine] ${path} is a partial release (${graph.release.note}); term lookups use QuickGO`);
+    }
+    console.error(`[go-engine] loaded ${graph.size} terms from ${path} in ${Date.now() - started} ms`);
+    return graph;
+}
+
+let shared = null;
+
+/**
+ * The process-wide graph (loaded on first use). Resolves to null when GO_ONTOLOGY_PATH is unset
+ * or the release file cannot be loaded.
+ */
+export function getGoGraph() {
+    if (!shared) {
+        shared = ONTOLOGY_PATH
+            ? loadGoGraph().catch((error) => {
+                console.error(`[go-engine] ontology unavailable (${ONTOLOGY_PATH}): ${error}`);
+                return null;
+            })
+            : Promise.resolve(null);
+    }
+    return shared;
+}
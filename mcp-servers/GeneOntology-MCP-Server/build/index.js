@@ -17,6 +17,7 @@ import { Server } from '@modelcontextprotocol/sdk/server/index.js';
 import { StdioServerTransport } from '@modelcontextprotocol/sdk/server/stdio.js';
 import { CallToolRequestSchema, ErrorCode, ListResourceTemplatesRequestSchema, ListToolsRequestSchema, McpError, ReadResourceRequestSchema, } from '@modelcontextprotocol/sdk/types.js';
 import axios from 'axios';
+import { getGoGraph } from './go-engine.js';
 // Type guards and validation functions
 const isValidSearchArgs = (args) => {
     return (typeof args === 'object' &&
@@ -34,6 +35,21 @@ const isValidTermArgs = (args) => {
         typeof args.id === 'string' &&
         args.id.length > 0);
 };
+const isValidHierarchyArgs = (args) => {
+    return (typeof args === 'object' &&
+        args !== null &&
+        typeof args.id === 'string' &&
+        args.id.length > 0 &&
+        (args.max_distance === undefined || (typeof args.max_distance === 'number' && args.max_distance > 0)) &&
+        (args.limit === undefined || (typeof args.limit === 'number' && args.limit > 0 && args.limit <= 1000)));
+};
+const isValidLcaArgs = (args) => {
+    return (typeof args === 'object' &&
+        args !== null &&
+        Array.isArray(args.ids) &&
+        args.ids.length >= 2 &&
+        args.ids.every((id) => typeof id === 'string' && id.length > 0));
+};
 const isValidGeneArgs = (args) => {
     return (typeof args === 'object' &&
         args !== null &&
@@ -210,6 +226,42 @@ class GeneOntologyServer {
                         required: ['id'],
                     },
                 },
+                {
+                    name: 'get_go_ancestors',
+                    description: 'Get all ancestor terms of a GO term (is_a and part_of, transitive) with their distance, from the local GO graph',
+                    inputSchema: {
+                        type: 'object',
+                        properties: {
+                            id: { type: 'string', description: 'GO term identifier (e.g., GO:0006915)' },
+                            max_distance: { type: 'number', description: 'Only ancestors up to this many steps away (default: all)', minimum: 1 },
+                        },
+                        required: ['id'],
+                    },
+                },
+                {
+                    name: 'get_go_descendants',
+                    description: 'Get descendant terms of a GO term (is_a and part_of, transitive) with their distance, from the local GO graph',
+                    inputSchema: {
+                        type: 'object',
+                        properties: {
+                            id: { type: 'string', description: 'GO term identifier (e.g., GO:0006915)' },
+                            max_distance: { type: 'number', description: 'Only descendants up to this many steps away (default: all)', minimum: 1 },
+                            limit: { type: 'number', description: 'Maximum number of terms to return (1-1000, default: 100)', minimum: 1, maximum: 1000 },
+                        },
+                        required: ['id'],
+                    },
+                },
+                {
+                    name: 'get_go_lowest_common_ancestor',
+                    description: 'Find the lowest common ancestor(s) of two or more GO terms in the local GO graph (is_a and part_of)',
+                    inputSchema: {
+                        type: 'object',
+                        properties: {
+                            ids: { type: 'array', items: { type: 'string' }, description: 'Two or more GO term identifiers', minItems: 2 },
+                        },
+                        required: ['ids'],
+                    },
+                },
                 {
                     name: 'get_ontology_stats',
                     description: 'Get statistics about GO ontologies (term counts, recent updates)',
@@ -232,6 +284,12 @@ class GeneOntologyServer {
                     return this.handleGetGoTerm(args);
                 case 'validate_go_id':
                     return this.handleValidateGoId(args);
+                case 'get_go_ancestors':
+                    return this.handleGetGoAncestors(args);
+                case 'get_go_descendants':
+                    return this.handleGetGoDescendants(args);
+                case 'get_go_lowest_common_ancestor':
+                    return this.handleGetGoLowestCommonAncestor(args);
                 case 'get_ontology_stats':
                     return this.handleGetOntologyStats(args);
                 default:
@@ -249,6 +307,65 @@ class GeneOntologyServer {
         }
         return id;
     }
+    // Local GO graph: resolves an ID or returns an error result the handlers can pass through
+    async resolveLocal(id) {
+        const graph = await getGoGraph();
+        if (!graph) {
+            return { error: this.errorResult('Local GO graph is not available (set GO_ONTOLOGY_PATH to a go-basic.obo or go-basic.json release)') };
+        }
+        const index = graph.lookup(this.normalizeGoId(id));
+        if (index < 0) {
+            return { error: this.errorResult(`GO term not found in local ontology (${graph.source}): ${id}`) };
+        }
+        return { graph, index };
+    }
+    // Which release answered a hierarchy query; partial releases (fixtures, subsets) carry a warning
+    releaseNote(graph) {
+        return {
+            source: graph.source,
+            version: graph.release.version,
+            partial: graph.release.partial,
+            warning: graph.release.partial
+                ? `Loaded GO release is partial (${graph.release.note}); ancestor/descendant paths may skip intermediate terms. Set GO_ONTOLOGY_PATH to a full go-basic release.`
+                : undefined,
+        };
+    }
+    errorResult(message) {
+        return {
+            content: [
+                {
+                    type: 'text',
+                    text: JSON.stringify({ error: message }, null, 2),
+                },
+            ],
+            isError: true,
+        };
+    }
+    localTermInfo(graph, i) {
+        const detail = graph.details[i];
+        return {
+            id: graph.ids[i],
+            name: graph.names[i],
+            definition: {
+                text: detail.definition || 'No definition available',
+                references: detail.definition_xrefs,
+            },
+            namespace: graph.namespace(i),
+            obsolete: graph.obsolete[i] === 1,
+            replaced_by: detail.replaced_by,
+            consider: detail.consider,
+            synonyms: detail.synonyms,
+            xrefs: detail.xrefs,
+            alt_ids: detail.alt_ids,
+            parents: graph.directParents(i),
+            child_count: graph.directChildren(i).length,
+            ancestor_count: graph.ancestorCount(i),
+            descendant_count: graph.descendantCount(i),
+            source: 'local',
+            url: `https://www.ebi.ac.uk/QuickGO/term/${graph.ids[i]}`,
+            amigo_url: `http://amigo.geneontology.org/amigo/term/${graph.ids[i]}`
+        };
+    }
     // Tool implementations
     async handleSearchGoTerms(args) {
         if (!isValidSearchArgs(args)) {
@@ -309,6 +426,19 @@ class GeneOntologyServer {
         }
         try {
             const termId = this.normalizeGoId(args.id);
+            // Local GO graph first; QuickGO for terms the loaded release does not have or when it is partial
+            const graph = await getGoGraph();
+            const local = graph ? graph.lookup(termId) : -1;
+            if (graph && !graph.release.partial && local >= 0) {
+                return {
+                    content: [
+                        {
+                            type: 'text',
+                            text: JSON.stringify(this.localTermInfo(graph, local), null, 2),
+                        },
+                    ],
+                };
+            }
             const response = await this.quickGoClient.get(`/ontology/go/terms/${termId}`);
             const termInfo = response.data.results?.[0];
             if (!termInfo) {
@@ -373,7 +503,15 @@ class GeneOntologyServer {
             const isValidFormat = /^GO:\d{7}$/.test(termId);
             let exists = false;
             let termInfo = null;
-            if (isValidFormat) {
+            let primaryId = termId;
+            const graph = await getGoGraph();
+            const local = graph && isValidFormat ? graph.lookup(termId) : -1;
+            if (graph && !graph.release.partial && local >= 0) {
+                exists = true;
+                primaryId = graph.ids[local];
+                termInfo = { name: graph.names[local], aspect: graph.namespace(local), isObsolete: graph.obsolete[local] === 1 };
+            }
+            else if (isValidFormat) {
                 try {
                     const response = await this.quickGoClient.get(`/ontology/go/terms/${termId}`);
                     termInfo = response.data.results?.[0];
@@ -388,10 +526,12 @@ class GeneOntologyServer {
                 normalized_id: termId,
                 valid_format: isValidFormat,
                 exists: exists,
+                primary_id: exists ? primaryId : null,
                 term_info: exists ? {
                     name: termInfo?.name,
                     namespace: termInfo?.aspect === 'F' ? 'molecular_function' :
-                        termInfo?.aspect === 'P' ? 'biological_process' : 'cellular_component',
+                        termInfo?.aspect === 'P' ? 'biological_process' :
+                            termInfo?.aspect === 'C' ? 'cellular_component' : termInfo?.aspect,
                     obsolete: termInfo?.isObsolete || false
                 } : null,
                 format_rules: {
@@ -421,12 +561,93 @@ class GeneOntologyServer {
             };
         }
     }
+    async handleGetGoAncestors(args) {
+        if (!isValidHierarchyArgs(args)) {
+            throw new McpError(ErrorCode.InvalidParams, 'Invalid GO ancestor arguments');
+        }
+        const resolved = await this.resolveLocal(args.id);
+        if ('error' in resolved)
+            return resolved.error;
+        const { graph, index } = resolved;
+        const ancestors = graph.ancestorsOf(index, args.max_distance ?? Infinity);
+        return {
+            content: [
+                {
+                    type: 'text',
+                    text: JSON.stringify({
+                        term: graph.brief(index),
+                        release: this.releaseNote(graph),
+                        total_ancestors: graph.ancestorCount(index),
+                        returned: ancestors.length,
+                        parents: graph.directParents(index),
+                        ancestors: ancestors.map(({ index: a, distance }) => ({ ...graph.brief(a), distance })),
+                    }, null, 2),
+                },
+            ],
+        };
+    }
+    async handleGetGoDescendants(args) {
+        if (!isValidHierarchyArgs(args)) {
+            throw new McpError(ErrorCode.InvalidParams, 'Invalid GO descendant arguments');
+        }
+        const resolved = await this.resolveLocal(args.id);
+        if ('error' in resolved)
+            return resolved.error;
+        const { graph, index } = resolved;
+        const descendants = graph.descendantsOf(index, args.max_distance ?? Infinity, args.limit ?? 100);
+        return {
+            content: [
+                {
+                    type: 'text',
+                    text: JSON.stringify({
+                        term: graph.brief(index),
+                        release: this.releaseNote(graph),
+                        total_descendants: graph.descendantCount(index),
+                        returned: descendants.length,
+                        children: graph.directChildren(index),
+                        descendants: descendants.map(({ index: d, distance }) => ({ ...graph.brief(d), distance })),
+                    }, null, 2),
+                },
+            ],
+        };
+    }
+    async handleGetGoLowestCommonAncestor(args) {
+        if (!isValidLcaArgs(args)) {
+            throw new McpError(ErrorCode.InvalidParams, 'At least two GO term IDs are required');
+        }
+        const terms = [];
+        let graph = null;
+        for (const id of args.ids) {
+            const resolved = await this.resolveLocal(id);
+            if ('error' in resolved)
+                return resolved.error;
+            graph = resolved.graph;
+            terms.push(resolved.index);
+        }
+        const { common, lowest } = graph.commonAncestors(terms);
+        return {
+            content: [
+                {
+                    type: 'text',
+                    text: JSON.stringify({
+                        terms: terms.map((t) => graph.brief(t)),
+                        release: this.releaseNote(graph),
+                        lowest_common_ancestors: lowest.map((a) => ({ ...graph.brief(a), depth: graph.depth[a] })),
+                        common_ancestor_count: common.length,
+                        note: common.length ? undefined : 'Terms share no ancestor (different GO namespaces)',
+                    }, null, 2),
+                },
+            ],
+        };
+    }
     async handleGetOntologyStats(args) {
         try {
+            const graph = await getGoGraph();
             const stats = {
                 ontology: args.ontology || 'all',
                 last_updated: new Date().toISOString().split('T')[0],
                 note: 'Statistics are approximate and may vary based on data access methods',
+                local_engine: graph ? graph.stats() : null,
                 sources: {
                     quickgo: 'https://www.ebi.ac.uk/QuickGO/',
                     go_consortium: 'https://geneontology.org/',
@@ -485,6 +706,11 @@ class GeneOntologyServer {
         console.error('Gene Ontology MCP server running on stdio');
     }
 }
-const server = new GeneOntologyServer();
-server.run().catch(console.error);
+export { GeneOntologyServer };
+
+// Loaded in-process by MCP-Gateway: do not attach the stdio transport.
+if (!process.env.MCP_GATEWAY_IMPORT) {
+    const server = new GeneOntologyServer();
+    server.run().catch(console.error);
+}
 //# sourceMappingURL=index.js.map
\ No newline at end of file
@@ -26,6 +26,7 @@ import {
   ReadResourceRequestSchema,
 } from '@modelcontextprotocol/sdk/types.js';
 import axios, { AxiosInstance } from 'axios';
+import { getGoGraph, GoGraph } from './go-engine.js';
 
 // Gene Ontology API interfaces
 interface GOTerm {
@@ -90,6 +91,31 @@ const isValidTermArgs = (args: any): args is { id: string } => {
   );
 };
 
+const isValidHierarchyArgs = (args: any): args is {
+  id: string;
+  max_distance?: number;
+  limit?: number;
+} => {
+  return (
+    typeof args === 'object' &&
+    args !== null &&
+    typeof args.id === 'string' &&
+    args.id.length > 0 &&
+    (args.max_distance === undefined || (typeof args.max_distance === 'number' && args.max_distance > 0)) &&
+    (args.limit === undefined || (typeof args.limit === 'number' && args.limit > 0 && args.limit <= 1000))
+  );
+};
+
+const isValidLcaArgs = (args: any): args is { ids: string[] } => {
+  return (
+    typeof args === 'object' &&
+    args !== null &&
+    Array.isArray(args.ids) &&
+    args.ids.length >= 2 &&
+    args.ids.every((id: any) => typeof id === 'string' && id.length > 0)
+  );
+};
+
 const isValidGeneArgs = (args: any): args is {
   gene: string;
   species?: string;
@@ -322,6 +348,42 @@ class GeneOntologyServer {
             required: ['id'],
           },
         },
+        {
+          name: 'get_go_ancestors',
+          description: 'Get all ancestor terms of a GO term (is_a and part_of, transitive) with their distance, from the local GO graph',
+          inputSchema: {
+            type: 'object',
+            properties: {
+              id: { type: 'string', description: 'GO term identifier (e.g., GO:0006915)' },
+              max_distance: { type: 'number', description: 'Only ancestors up to this many steps away (default: all)', minimum: 1 },
+            },
+            required: ['id'],
+          },
+        },
+        {
+          name: 'get_go_descendants',
+          description: 'Get descendant terms of a GO term (is_a and part_of, transitive) with their distance, from the local GO graph',
+          inputSchema: {
+            type: 'object',
+            properties: {
+              id: { type: 'string', description: 'GO term identifier (e.g., GO:0006915)' },
+              max_distance: { type: 'number', description: 'Only descendants up to this many steps away (default: all)', minimum: 1 },
+              limit: { type: 'number', description: 'Maximum number of terms to return (1-1000, default: 100)', minimum: 1, maximum: 1000 },
+            },
+            required: ['id'],
+          },
+        },
+        {
+          name: 'get_go_lowest_common_ancestor',
+          description: 'Find the lowest common ancestor(s) of two or more GO terms in the local GO graph (is_a and part_of)',
+          inputSchema: {
+            type: 'object',
+            properties: {
+              ids: { type: 'array', items: { type: 'string' }, description: 'Two or more GO term identifiers', minItems: 2 },
+            },
+            required: ['ids'],
+          },
+        },
         {
           name: 'get_ontology_stats',
           description: 'Get statistics about GO ontologies (term counts, recent updates)',
@@ -346,6 +408,12 @@ class GeneOntologyServer {
           return this.handleGetGoTerm(args);
         case 'validate_go_id':
           return this.handleValidateGoId(args);
+        case 'get_go_ancestors':
+          return this.handleGetGoAncestors(args);
+        case 'get_go_descendants':
+          return this.handleGetGoDescendants(args);
+        case 'get_go_lowest_common_ancestor':
+          return this.handleGetGoLowestCommonAncestor(args);
         case 'get_ontology_stats':
           return this.handleGetOntologyStats(args);
         default:
@@ -368,6 +436,69 @@ class GeneOntologyServer {
     return id;
   }
 
+  // Local GO graph: resolves an ID or returns an error result the handlers can pass through
+  private async resolveLocal(id: string): Promise<{ graph: GoGraph; index: number } | { error: any }> {
+    const graph = await getGoGraph();
+    if (!graph) {
+      return { error: this.errorResult('Local GO graph is not available (set GO_ONTOLOGY_PATH to a go-basic.obo or go-basic.json release)') };
+    }
+    const index = graph.lookup(this.normalizeGoId(id));
+    if (index < 0) {
+      return { error: this.errorResult(`GO term not found in local ontology (${graph.source}): ${id}`) };
+    }
+    return { graph, index };
+  }
+
+  // Which release answered a hierarchy query; partial releases (fixtures, subsets) carry a warning
+  private releaseNote(graph: GoGraph) {
+    return {
+      source: graph.source,
+      version: graph.release.version,
+      partial: graph.release.partial,
+      warning: graph.release.partial
+        ? `Loaded GO release is partial (${graph.release.note}); ancestor/descendant paths may skip intermediate terms. Set GO_ONTOLOGY_PATH to a full go-basic release.`
+        : undefined,
+    };
+  }
+
+  private errorResult(message: string) {
+    return {
+      content: [
+        {
+          type: 'text',
+          text: JSON.stringify({ error: message }, null, 2),
+        },
+      ],
+      isError: true,
+    };
+  }
+
+  private localTermInfo(graph: GoGraph, i: number) {
+    const detail = graph.details[i];
+    return {
+      id: graph.ids[i],
+      name: graph.names[i],
+      definition: {
+        text: detail.definition || 'No definition available',
+        references: detail.definition_xrefs,
+      },
+      namespace: graph.namespace(i),
+      obsolete: graph.obsolete[i] === 1,
+      replaced_by: detail.replaced_by,
+      consider: detail.consider,
+      synonyms: detail.synonyms,
+      xrefs: detail.xrefs,
+      alt_ids: detail.alt_ids,
+      parents: graph.directParents(i),
+      child_count: graph.directChildren(i).length,
+      ancestor_count: graph.ancestorCount(i),
+      descendant_count: graph.descendantCount(i),
+      source: 'local',
+      url: `https://www.ebi.ac.uk/QuickGO/term/${graph.ids[i]}`,
+      amigo_url: `http://amigo.geneontology.org/amigo/term/${graph.ids[i]}`
+    };
+  }
+
   // Tool implementations
   private async handleSearchGoTerms(args: any) {
     if (!isValidSearchArgs(args)) {
@@ -435,6 +566,21 @@ class GeneOntologyServer {
 
     try {
       const termId = this.normalizeGoId(args.id);
+
+      // Local GO graph first; QuickGO for terms the loaded release does not have or when it is partial
+      const graph = await getGoGraph();
+      const local = graph ? graph.lookup(termId) : -1;
+      if (graph && !graph.release.partial && local >= 0) {
+        return {
+          content: [
+            {
+              type: 'text',
+              text: JSON.stringify(this.localTermInfo(graph, local), null, 2),
+            },
+          ],
+        };
+      }
+
       const response = await this.quickGoClient.get(`/ontology/go/terms/${termId}`);
 
       const termInfo = response.data.results?.[0];
@@ -505,8 +651,15 @@ class GeneOntologyServer {
 
       let exists = false;
       let termInfo = null;
-
-      if (isValidFormat) {
+      let primaryId = termId;
+
+      const graph = await getGoGraph();
+      const local = graph && isValidFormat ? graph.lookup(termId) : -1;
+      if (graph && !graph.release.partial && local >= 0) {
+        exists = true;
+        primaryId = graph.ids[local];
+        termInfo = { name: graph.names[local], aspect: graph.namespace(local), isObsolete: graph.obsolete[local] === 1 };
+      } else if (isValidFormat) {
         try {
           const response = await this.quickGoClient.get(`/ontology/go/terms/${termId}`);
           termInfo = response.data.results?.[0];
@@ -521,10 +674,12 @@ class GeneOntologyServer {
         normalized_id: termId,
         valid_format: isValidFormat,
         exists: exists,
+        primary_id: exists ? primaryId : null,
         term_info: exists ? {
           name: termInfo?.name,
           namespace: termInfo?.aspect === 'F' ? 'molecular_function' :
-                    termInfo?.aspect === 'P' ? 'biological_process' : 'cellular_component',
+                    termInfo?.aspect === 'P' ? 'biological_process' :
+                    termInfo?.aspect === 'C' ? 'cellular_component' : termInfo?.aspect,
           obsolete: termInfo?.isObsolete || false
         } : null,
         format_rules: {
@@ -555,12 +710,99 @@ class GeneOntologyServer {
     }
   }
 
+  private async handleGetGoAncestors(args: any) {
+    if (!isValidHierarchyArgs(args)) {
+      throw new McpError(ErrorCode.InvalidParams, 'Invalid GO ancestor arguments');
+    }
+
+    const resolved = await this.resolveLocal(args.id);
+    if ('error' in resolved) return resolved.error;
+    const { graph, index } = resolved;
+
+    const ancestors = graph.ancestorsOf(index, args.max_distance ?? Infinity);
+    return {
+      content: [
+        {
+          type: 'text',
+          text: JSON.stringify({
+            term: graph.brief(index),
+            release: this.releaseNote(graph),
+            total_ancestors: graph.ancestorCount(index),
+            returned: ancestors.length,
+            parents: graph.directParents(index),
+            ancestors: ancestors.map(({ index: a, distance }) => ({ ...graph.brief(a), distance })),
+          }, null, 2),
+        },
+      ],
+    };
+  }
+
+  private async handleGetGoDescendants(args: any) {
+    if (!isValidHierarchyArgs(args)) {
+      throw new McpError(ErrorCode.InvalidParams, 'Invalid GO descendant arguments');
+    }
+
+    const resolved = await this.resolveLocal(args.id);
+    if ('error' in resolved) return resolved.error;
+    const { graph, index } = resolved;
+
+    const descendants = graph.descendantsOf(index, args.max_distance ?? Infinity, args.limit ?? 100);
+    return {
+      content: [
+        {
+          type: 'text',
+          text: JSON.stringify({
+            term: graph.brief(index),
+            release: this.releaseNote(graph),
+            total_descendants: graph.descendantCount(index),
+            returned: descendants.length,
+            children: graph.directChildren(index),
+            descendants: descendants.map(({ index: d, distance }) => ({ ...graph.brief(d), distance })),
+          }, null, 2),
+        },
+      ],
+    };
+  }
+
+  private async handleGetGoLowestCommonAncestor(args: any) {
+    if (!isValidLcaArgs(args)) {
+      throw new McpError(ErrorCode.InvalidParams, 'At least two GO term IDs are required');
+    }
+
+    const terms: number[] = [];
+    let graph: GoGraph | null = null;
+    for (const id of args.ids) {
+      const resolved = await this.resolveLocal(id);
+      if ('error' in resolved) return resolved.error;
+      graph = resolved.graph;
+      terms.push(resolved.index);
+    }
+    const { common, lowest } = graph!.commonAncestors(terms);
+
+    return {
+      content: [
+        {
+          type: 'text',
+          text: JSON.stringify({
+            terms: terms.map((t) => graph!.brief(t)),
+            release: this.releaseNote(graph!),
+            lowest_common_ancestors: lowest.map((a) => ({ ...graph!.brief(a), depth: graph!.depth[a] })),
+            common_ancestor_count: common.length,
+            note: common.length ? undefined : 'Terms share no ancestor (different GO namespaces)',
+          }, null, 2),
+        },
+      ],
+    };
+  }
+
   private async handleGetOntologyStats(args: any) {
     try {
+      const graph = await getGoGraph();
       const stats = {
         ontology: args.ontology || 'all',
         last_updated: new Date().toISOString().split('T')[0],
         note: 'Statistics are approximate and may vary based on data access methods',
+        local_engine: graph ? graph.stats() : null,
         sources: {
           quickgo: 'https://www.ebi.ac.uk/QuickGO/',
           go_consortium: 'https://geneontology.org/',
@@ -621,5 +863,10 @@ class GeneOntologyServer {
   }
 }
 
-const server = new GeneOntologyServer();
-server.run().catch(console.error);
+export { GeneOntologyServer };
+
+// Loaded in-process by MCP-Gateway: do not attach the stdio transport.
+if (!process.env.MCP_GATEWAY_IMPORT) {
+  const server = new GeneOntologyServer();
+  server.run().catch(console.error);
+}
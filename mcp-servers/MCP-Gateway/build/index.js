@@ -0,0 +1,123 @@
+#!/usr/bin/env node
+/**
+ * MCP-Gateway
+ *
+ * Loads every bio MCP server implementation into this one long-lived Node process and
+ * exposes them over a single stdio MCP connection. Each backend server is connected to
+ * an in-memory transport; its tools are re-published as `<namespace>__<tool>`
+ * (e.g. `chembl__search_compounds`). Bedrock tool names only allow [a-zA-Z0-9_-],
+ * so the separator is `__` rather than `.`; override with MCP_GATEWAY_SEPARATOR.
+ *
+ * Backends must be built (`npm run build` in each server directory). Missing or
+ * failing backends are logged and skipped. MCP_GATEWAY_BACKENDS=chembl,pdb limits
+ * which namespaces are loaded.
+ */
+import { Server } from '@modelcontextprotocol/sdk/server/index.js';
+import { Client } from '@modelcontextprotocol/sdk/client/index.js';
+import { StdioServerTransport } from '@modelcontextprotocol/sdk/server/stdio.js';
+import { InMemoryTransport } from '@modelcontextprotocol/sdk/inMemory.js';
+import {
+    CallToolRequestSchema,
+    ErrorCode,
+    ListToolsRequestSchema,
+    McpError,
+} from '@modelcontextprotocol/sdk/types.js';
+
+const SEPARATOR = process.env.MCP_GATEWAY_SEPARATOR || '__';
+
+// namespace -> built server module (relative to this file) and exported class
+const BACKENDS = {
+    chembl: { module: '../../ChEMBL-MCP-Server/build/index.js', className: 'ChEMBLServer' },
+    uniprot: { module: '../../Augmented-Nature-UniProt-MCP-Server/build/index.js', className: 'UniProtServer' },
+    opentargets: { module: '../../OpenTargets-MCP-Server/build/index.js', className: 'OpenTargetsServer' },
+    reactome: { module: '../../Reactome-MCP-Server/build/index.js', className: 'ReactomeServer' },
+    string_db: { module: '../../STRING-db-MCP-Server/build/index.js', className: 'StringServer' },
+    geneontology: { module: '../../GeneOntology-MCP-Server/build/index.js', className: 'GeneOntologyServer' },
+    pubchem: { module: '../../PubChem-MCP-Server/build/index.js', className: 'PubChemServer' },
+    pdb: { module: '../../PDB-MCP-Server/build/index.js', className: 'PDBServer' },
+    proteinatlas: { module: '../../ProteinAtlas-MCP-Server/build/index.js', className: 'ProteinAtlasServer' },
+};
+
+async function loadBackend(namespace) {
+    const spec = BACKENDS[namespace];
+    try {
+        const mod = await import(new URL(spec.module, import.meta.url).href);
+        const instance = new mod[spec.className]();
+        const [clientSide, serverSide] = InMemoryTransport.createLinkedPair();
+        // `server` is private in the backend classes; the gateway attaches its own transport.
+        await instance.server.connect(serverSide);
+        const client = new Client({ name: `mcp-gateway/${namespace}`, version: '1.0.0' }, { capabilities: {} });
+        await client.connect(clientSide);
+        const { tools } = await client.listTools();
+        console.error(`[gateway] ${namespace}: ${tools.length} tools`);
+        return { namespace, client, tools };
+    } catch (error) {
+        console.error(`[gateway] ${namespace} unavailable: ${error}`);
+        return null;
+    }
+}
+
+class McpGateway {
+    constructor() {
+        this.backends = new Map();
+        this.server = new Server(
+            { name: 'mcp-gateway', version: '1.0.0' },
+            { capabilities: { tools: {} } }
+        );
+        this.setupHandlers();
+
+        this.server.onerror = (error) => console.error('[gateway] MCP Error', error);
+        process.on('SIGINT', async () => {
+            await this.server.close();
+            process.exit(0);
+        });
+    }
+
+    setupHandlers() {
+        this.server.setRequestHandler(ListToolsRequestSchema, async () => ({
+            tools: [...this.backends.values()].flatMap((backend) =>
+                backend.tools.map((tool) => ({ ...tool, name: `${backend.namespace}${SEPARATOR}${tool.name}` }))
+            ),
+        }));
+
+        this.server.setRequestHandler(CallToolRequestSchema, async (request) => {
+            const fullName = request.params.name;
+            const cut = fullName.indexOf(SEPARATOR);
+            const backend = cut > 0 ? this.backends.get(fullName.slice(0, cut)) : undefined;
+            if (!backend) {
+                throw new McpError(ErrorCode.MethodNotFound, `Unknown tool: ${fullName}`);
+            }
+            return backend.client.callTool({
+                name: fullName.slice(cut + SEPARATOR.length),
+                arguments: request.params.arguments,
+            });
+        });
+    }
+
+    async load(namespaces) {
+        const loaded = await Promise.all(namespaces.map(loadBackend));
+        for (const backend of loaded) {
+            if (backend) this.backends.set(backend.namespace, backend);
+        }
+    }
+
+    async run() {
+        const transport = new StdioServerTransport();
+        await this.server.connect(transport);
+        console.error(`MCP gateway running on stdio (${[...this.backends.keys()].join(', ')})`);
+    }
+}
+
+// Backends check this before attaching their own stdio transport.
+process.env.MCP_GATEWAY_IMPORT = '1';
+
+const namespaces = (process.env.MCP_GATEWAY_BACKENDS || Object.keys(BACKENDS).join(','))
+    .split(',')
+    .map((name) => name.trim())
+    .filter((name) => name in BACKENDS);
+
+const gateway = new McpGateway();
+gateway
+    .load(namespaces)
+    .then(() => gateway.run())
+    .catch(console.error);
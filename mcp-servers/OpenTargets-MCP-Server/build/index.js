@@ -560,6 +560,11 @@ class OpenTargetsServer {
         console.error('Open Targets MCP server running on stdio');
     }
 }
-const server = new OpenTargetsServer();
-server.run().catch(console.error);
+export { OpenTargetsServer };
+
+// Loaded in-process by MCP-Gateway: do not attach the stdio transport.
+if (!process.env.MCP_GATEWAY_IMPORT) {
+    const server = new OpenTargetsServer();
+    server.run().catch(console.error);
+}
 //# sourceMappingURL=index.js.map
\ No newline at end of file
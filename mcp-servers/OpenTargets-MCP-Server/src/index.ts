@@ -642,5 +642,10 @@ class OpenTargetsServer {
   }
 }
 
-const server = new OpenTargetsServer();
-server.run().catch(console.error);
+export { OpenTargetsServer };
+
+// Loaded in-process by MCP-Gateway: do not attach the stdio transport.
+if (!process.env.MCP_GATEWAY_IMPORT) {
+  const server = new OpenTargetsServer();
+  server.run().catch(console.error);
+}
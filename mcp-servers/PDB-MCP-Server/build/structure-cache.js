@@ -0,0 +1,274 @@
+/**
+ * Content-addressed on-disk cache for RCSB coordinate files.
+ *
+ * Downloads are streamed straight to disk (never buffered as one string), hashed with
+ * SHA-256 and stored once under `<cache>/blobs/<sha256>`. A small ref file
+ * `<cache>/refs/<pdb_id>.<format>[.assembly].json` maps a request to its blob and keeps
+ * the computed summary, so repeat downloads of popular structures are served from disk
+ * without touching the network. Concurrent requests for the same file share one download.
+ *
+ * PDB_CACHE_DIR overrides the cache location (default: `.pdb_cache` in the working directory).
+ */
+import axios from 'axios';
+import { createHash } from 'crypto';
+import { createReadStream, createWriteStream, promises as fs } from 'fs';
+import * as path from 'path';
+import { createInterface } from 'readline';
+import { pipeline } from 'stream/promises';
+import { Transform } from 'stream';
+
+export const CACHE_DIR = path.resolve(process.env.PDB_CACHE_DIR || '.pdb_cache');
+const DOWNLOAD_TIMEOUT_MS = 120000;
+export const MAX_SECTION_LINES = 1000;
+
+const WATER = new Set(['HOH', 'WAT', 'DOD', 'H2O']);
+const inflight = new Map();
+
+function refPath(pdbId, format, assemblyId) {
+    const key = [pdbId, format, assemblyId].filter(Boolean).join('.');
+    return path.join(CACHE_DIR, 'refs', `${key}.json`);
+}
+
+export function blobPath(handle) {
+    if (!/^[0-9a-f]{64}$/.test(handle)) {
+        throw new Error(`Invalid structure handle: ${handle}`);
+    }
+    return path.join(CACHE_DIR, 'blobs', handle);
+}
+
+async function readRef(file) {
+    try {
+        const ref = JSON.parse(await fs.readFile(file, 'utf8'));
+        await fs.access(ref.path);
+        return ref;
+    } catch {
+        return null;
+    }
+}
+
+async function download(url, format) {
+    await fs.mkdir(path.join(CACHE_DIR, 'blobs'), { recursive: true });
+    const tmp = path.join(CACHE_DIR, 'blobs', `.tmp-${process.pid}-${Date.now()}-${Math.random().toString(36).slice(2)}`);
+    const hash = createHash('sha256');
+    let bytes = 0;
+    let lines = 0;
+    const tap = new Transform({
+        transform(chunk, _encoding, callback) {
+            hash.update(chunk);
+            bytes += chunk.length;
+            for (const byte of chunk) {
+                if (byte === 10) lines++;
+            }
+            callback(null, chunk);
+        },
+    });
+
+    try {
+        const response = await axios.get(url, { responseType: 'stream', timeout: DOWNLOAD_TIMEOUT_MS });
+        await pipeline(response.data, tap, createWriteStream(tmp));
+        const handle = hash.digest('hex');
+        const target = blobPath(handle);
+        await fs.rename(tmp, target);
+        const summary = format === 'pdb' || format === 'mmcif' ? await summarize(target, format) : null;
+        return { handle, path: target, bytes, lines, url, format, fetched_at: new Date().toISOString(), summary };
+    } catch (error) {
+        await fs.rm(tmp, { force: true });
+        throw error;
+    }
+}
+
+/**
+ * Returns the cached file for a request, downloading it first if needed.
+ * `cached` tells whether the network was skipped.
+ */
+export async function getStructure(
+    pdbId,
+    format,
+    url,
+    assemblyId
+) {
+    const ref = refPath(pdbId, format, assemblyId);
+    const hit = await readRef(ref);
+    if (hit) {
+        return { ...hit, cached: true };
+    }
+
+    let pending = inflight.get(ref);
+    if (!pending) {
+        pending = download(url, format).then(async (entry) => {
+            await fs.mkdir(path.dirname(ref), { recursive: true });
+            await fs.writeFile(ref, JSON.stringify(entry));
+            return entry;
+        });
+        inflight.set(ref, pending);
+        pending.then(() => inflight.delete(ref), () => inflight.delete(ref));
+    }
+    return { ...(await pending), cached: false };
+}
+
+// Summaries
+
+function emptySummary() {
+    return { models: 0, atoms: 0, hetero_atoms: 0, chains: [], ligands: [], waters: 0 };
+}
+
+class SummaryBuilder {
+    summary = emptySummary();
+    chains = new Map();
+    ligands = new Map();
+    waterResidues = new Set();
+    firstModel = null;
+    models = new Set();
+
+    atom(model, hetero, chain, resName, resSeq) {
+        this.models.add(model);
+        if (this.firstModel === null) this.firstModel = model;
+        // count atoms and residues only in the first model (NMR ensembles repeat every atom)
+        if (model !== this.firstModel) return;
+        const residueKey = `${chain}:${resSeq}:${resName}`;
+        if (hetero) {
+            this.summary.hetero_atoms++;
+            if (WATER.has(resName)) {
+                this.waterResidues.add(residueKey);
+            } else {
+                if (!this.ligands.has(resName)) this.ligands.set(resName, new Set());
+                this.ligands.get(resName).add(residueKey);
+            }
+            return;
+        }
+        this.summary.atoms++;
+        if (!this.chains.has(chain)) this.chains.set(chain, { residues: new Set(), atoms: 0 });
+        const entry = this.chains.get(chain);
+        entry.atoms++;
+        entry.residues.add(residueKey);
+    }
+
+    finish() {
+        this.summary.models = this.models.size;
+        this.summary.chains = [...this.chains].map(([chain, e]) => ({ chain, residues: e.residues.size, atoms: e.atoms }));
+        this.summary.ligands = [...this.ligands].map(([id, residues]) => ({ id, count: residues.size }));
+        this.summary.waters = this.waterResidues.size;
+        return this.summary;
+    }
+}
+
+async function summarizePdb(file) {
+    const builder = new SummaryBuilder();
+    const title = [];
+    let model = '1';
+    const lines = createInterface({ input: createReadStream(file), crlfDelay: Infinity });
+    for await (const line of lines) {
+        const record = line.slice(0, 6);
+        if (record === 'ATOM  ' || record === 'HETATM') {
+            builder.atom(model, record === 'HETATM', line.slice(21, 22).trim() || '_', line.slice(17, 20).trim(), line.slice(22, 27).trim());
+        } else if (record === 'MODEL ') {
+            model = line.slice(10, 14).trim() || model;
+        } else if (record === 'TITLE ') {
+            title.push(line.slice(10).trim());
+        } else if (record === 'EXPDTA') {
+            builder.summary.experimental_method = line.slice(10).trim();
+        } else if (line.startsWith('REMARK   2 RESOLUTION.')) {
+            const value = parseFloat(line.slice(22).trim());
+            if (!Number.isNaN(value)) builder.summary.resolution = value;
+        }
+    }
+    if (title.length) builder.summary.title = title.join(' ').replace(/\s+/g, ' ');
+    return builder.finish();
+}
+
+const CIF_RESOLUTION_KEYS = ['_refine.ls_d_res_high', '_reflns.d_resolution_high', '_em_3d_reconstruction.resolution'];
+
+function cifValue(line) {
+    return line.replace(/^\S+\s+/, '').trim().replace(/^['"]|['"]$/g, '');
+}
+
+async function summarizeMmcif(file) {
+    const builder = new SummaryBuilder();
+    let columns = [];
+    let inLoop = false;
+    let inAtomSite = false;
+    const lines = createInterface({ input: createReadStream(file), crlfDelay: Infinity });
+    for await (const line of lines) {
+        if (line.startsWith('loop_')) {
+            inLoop = true;
+            inAtomSite = false;
+            columns = [];
+            continue;
+        }
+        if (inLoop && line.startsWith('_')) {
+            columns.push(line.trim());
+            inAtomSite = columns[0].startsWith('_atom_site.');
+            continue;
+        }
+        if (inAtomSite && (line.startsWith('ATOM') || line.startsWith('HETATM'))) {
+            const fields = line.trim().split(/\s+/);
+            const col = (name) => fields[columns.indexOf(`_atom_site.${name}`)];
+            builder.atom(
+                col('pdbx_PDB_model_num') ?? '1',
+                fields[0] === 'HETATM',
+                col('auth_asym_id') ?? col('label_asym_id') ?? '_',
+                col('auth_comp_id') ?? col('label_comp_id') ?? '',
+                col('auth_seq_id') ?? col('label_seq_id') ?? ''
+            );
+            continue;
+        }
+        if (line.startsWith('#')) {
+            inLoop = false;
+            inAtomSite = false;
+            continue;
+        }
+        if (!inLoop) {
+            if (line.startsWith('_struct.title')) {
+                builder.summary.title = cifValue(line);
+            } else if (line.startsWith('_exptl.method')) {
+                builder.summary.experimental_method = cifValue(line);
+            } else if (builder.summary.resolution === undefined && CIF_RESOLUTION_KEYS.some((key) => line.startsWith(key))) {
+                const value = parseFloat(cifValue(line));
+                if (!Number.isNaN(value)) builder.summary.resolution = value;
+            }
+        }
+    }
+    return builder.finish();
+}
+
+export function summarize(file, format) {
+    return format === 'mmcif' ? summarizeMmcif(file) : summarizePdb(file);
+}
+
+// Section access
+
+/**
+ * Reads part of a cached file: a line range, optionally filtered by record prefix
+ * (e.g. "HETATM", "HELIX", "_refine.") and/or chain ID (ATOM/HETATM lines in PDB format).
+ * `start_line` is 1-based and counts matching lines when a filter is given.
+ */
+export async function readSection(handle, request) {
+    const file = blobPath(handle);
+    try {
+        await fs.access(file);
+    } catch {
+        throw new Error(`Unknown structure handle ${handle}; call download_structure first`);
+    }
+    const start = Math.max(1, request.start_line ?? 1);
+    const limit = Math.min(MAX_SECTION_LINES, Math.max(1, request.max_lines ?? 200));
+    const out = [];
+    let matched = 0;
+    let more = false;
+    const lines = createInterface({ input: createReadStream(file), crlfDelay: Infinity });
+    for await (const line of lines) {
+        if (request.record && !line.startsWith(request.record)) continue;
+        if (request.chain) {
+            const isAtom = line.startsWith('ATOM  ') || line.startsWith('HETATM');
+            if (!isAtom || line.slice(21, 22) !== request.chain) continue;
+        }
+        matched++;
+        if (matched < start) continue;
+        if (out.length >= limit) {
+            more = true;
+            break;
+        }
+        out.push(line);
+    }
+    lines.close();
+    return { start_line: start, returned: out.length, more, next_start_line: more ? start + out.length : null, text: out.join('\n') };
+}
@@ -11,6 +11,7 @@ import {
   ReadResourceRequestSchema,
 } from '@modelcontextprotocol/sdk/types.js';
 import axios, { AxiosInstance } from 'axios';
+import { getStructure, MAX_SECTION_LINES, readSection } from './structure-cache.js';
 
 // PDB API interfaces
 interface PDBEntry {
@@ -267,7 +268,7 @@ class PDBServer {
         },
         {
           name: 'download_structure',
-          description: 'Download structure coordinates in various formats',
+          description: 'Download structure coordinates to a local cache and return a file handle with a summary (chains, residue counts, ligands, resolution). Use read_structure_section with the handle to read parts of the file.',
           inputSchema: {
             type: 'object',
             properties: {
@@ -278,6 +279,21 @@ class PDBServer {
             required: ['pdb_id'],
           },
         },
+        {
+          name: 'read_structure_section',
+          description: 'Read part of a structure file returned by download_structure: a line range, optionally filtered by record type (e.g. HETATM, HELIX, SEQRES, or an mmCIF category such as _refine.) and/or chain ID',
+          inputSchema: {
+            type: 'object',
+            properties: {
+              handle: { type: 'string', description: 'File handle from download_structure' },
+              start_line: { type: 'number', description: 'First (matching) line to return, 1-based (default: 1)', minimum: 1 },
+              max_lines: { type: 'number', description: `Number of lines to return (1-${MAX_SECTION_LINES}, default: 200)`, minimum: 1, maximum: MAX_SECTION_LINES },
+              record: { type: 'string', description: 'Only lines starting with this prefix (e.g. HETATM, REMARK 465, _atom_site)' },
+              chain: { type: 'string', description: 'Only ATOM/HETATM lines of this chain ID (PDB format)' },
+            },
+            required: ['handle'],
+          },
+        },
         {
           name: 'search_by_uniprot',
           description: 'Find PDB structures associated with a UniProt accession',
@@ -314,6 +330,8 @@ class PDBServer {
           return this.handleGetStructureInfo(args);
         case 'download_structure':
           return this.handleDownloadStructure(args);
+        case 'read_structure_section':
+          return this.handleReadStructureSection(args);
         case 'search_by_uniprot':
           return this.handleSearchByUniprot(args);
         case 'get_structure_quality':
@@ -493,13 +511,24 @@ class PDBServer {
         url = `https://files.rcsb.org/download/${pdbId}.${extension}`;
       }
 
-      const response = await axios.get(url);
+      // Coordinate files can be megabytes: return a handle + summary instead of the file itself
+      const entry = await getStructure(pdbId, format, url, assemblyId);
 
       return {
         content: [
           {
             type: 'text',
-            text: `Structure file for ${args.pdb_id} (${format.toUpperCase()} format)${assemblyId ? ` - Assembly ${assemblyId}` : ''}:\n\n${response.data}`,
+            text: JSON.stringify({
+              pdb_id: args.pdb_id,
+              format,
+              assembly_id: assemblyId ?? null,
+              handle: entry.handle,
+              cached: entry.cached,
+              bytes: entry.bytes,
+              lines: entry.lines,
+              summary: entry.summary,
+              hint: 'Use read_structure_section with this handle (record / chain / start_line) to read parts of the file.',
+            }, null, 2),
           },
         ],
       };
@@ -516,6 +545,44 @@ class PDBServer {
     }
   }
 
+  private async handleReadStructureSection(args: any) {
+    if (
+      !args ||
+      typeof args.handle !== 'string' ||
+      (args.start_line !== undefined && typeof args.start_line !== 'number') ||
+      (args.max_lines !== undefined && typeof args.max_lines !== 'number') ||
+      (args.record !== undefined && typeof args.record !== 'string') ||
+      (args.chain !== undefined && typeof args.chain !== 'string')
+    ) {
+      throw new McpError(ErrorCode.InvalidParams, 'Invalid read structure section arguments');
+    }
+
+    try {
+      const section = await readSection(args.handle, args);
+      const header = `Lines ${section.start_line}-${section.start_line + section.returned - 1}` +
+        (section.more ? ` (more: start_line=${section.next_start_line})` : ' (end)');
+
+      return {
+        content: [
+          {
+            type: 'text',
+            text: `${header}\n\n${section.text}`,
+          },
+        ],
+      };
+    } catch (error) {
+      return {
+        content: [
+          {
+            type: 'text',
+            text: `Error reading structure section: ${error instanceof Error ? error.message : 'Unknown error'}`,
+          },
+        ],
+        isError: true,
+      };
+    }
+  }
+
   private async handleSearchByUniprot(args: any) {
     if (!args || typeof args.uniprot_id !== 'string') {
       throw new McpError(ErrorCode.InvalidParams, 'Invalid UniProt search arguments');
@@ -619,5 +686,10 @@ class PDBServer {
   }
 }
 
-const server = new PDBServer();
-server.run().catch(console.error);
+export { PDBServer };
+
+// Loaded in-process by MCP-Gateway: do not attach the stdio transport.
+if (!process.env.MCP_GATEWAY_IMPORT) {
+  const server = new PDBServer();
+  server.run().catch(console.error);
+}
@@ -1169,6 +1169,11 @@ class ProteinAtlasServer {
         console.error('Human Protein Atlas MCP server running on stdio');
     }
 }
-const server = new ProteinAtlasServer();
-server.run().catch(console.error);
+export { ProteinAtlasServer };
+
+// Loaded in-process by MCP-Gateway: do not attach the stdio transport.
+if (!process.env.MCP_GATEWAY_IMPORT) {
+    const server = new ProteinAtlasServer();
+    server.run().catch(console.error);
+}
 //# sourceMappingURL=index.js.map
\ No newline at end of file
@@ -1338,5 +1338,10 @@ class ProteinAtlasServer {
   }
 }
 
-const server = new ProteinAtlasServer();
-server.run().catch(console.error);
+export { ProteinAtlasServer };
+
+// Loaded in-process by MCP-Gateway: do not attach the stdio transport.
+if (!process.env.MCP_GATEWAY_IMPORT) {
+  const server = new ProteinAtlasServer();
+  server.run().catch(console.error);
+}
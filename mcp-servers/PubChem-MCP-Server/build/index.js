@@ -1030,6 +1030,11 @@ class PubChemServer {
         console.error('PubChem MCP server running on stdio');
     }
 }
-const server = new PubChemServer();
-server.run().catch(console.error);
+export { PubChemServer };
+
+// Loaded in-process by MCP-Gateway: do not attach the stdio transport.
+if (!process.env.MCP_GATEWAY_IMPORT) {
+    const server = new PubChemServer();
+    server.run().catch(console.error);
+}
 //# sourceMappingURL=index.js.map
\ No newline at end of file
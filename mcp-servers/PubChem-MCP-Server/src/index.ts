@@ -1233,5 +1233,10 @@ class PubChemServer {
   }
 }
 
-const server = new PubChemServer();
-server.run().catch(console.error);
+export { PubChemServer };
+
+// Loaded in-process by MCP-Gateway: do not attach the stdio transport.
+if (!process.env.MCP_GATEWAY_IMPORT) {
+  const server = new PubChemServer();
+  server.run().catch(console.error);
+}
@@ -16,6 +16,7 @@ import { Server } from '@modelcontextprotocol/sdk/server/index.js';
 import { StdioServerTransport } from '@modelcontextprotocol/sdk/server/stdio.js';
 import { CallToolRequestSchema, ErrorCode, ListResourceTemplatesRequestSchema, ListToolsRequestSchema, McpError, ReadResourceRequestSchema, } from '@modelcontextprotocol/sdk/types.js';
 import axios from 'axios';
+import { getReactomeIndex } from './reactome-index.js';
 // Type guards and validation functions
 const isValidSearchArgs = (args) => {
     return (typeof args === 'object' &&
@@ -359,11 +360,26 @@ class ReactomeServer {
             };
         }
     }
+    // Local index for the requested species (null when unavailable or for another species)
+    async localIndex(species) {
+        const index = await getReactomeIndex();
+        if (!index)
+            return null;
+        if (species && !index.species.toLowerCase().includes(species.toLowerCase()))
+            return null;
+        return index;
+    }
     async resolvePathwayId(identifier) {
         // If it's already a stable identifier, return it
         if (identifier.match(/^R-[A-Z]{3}-\d+$/)) {
             return identifier;
         }
+        // Exact pathway name in the local index
+        const index = await this.localIndex();
+        const local = index ? index.pathway(identifier) : -1;
+        if (index && local >= 0) {
+            return index.pathwayIds[local];
+        }
         // Search for the pathway by name
         try {
             const searchResponse = await this.apiClient.get('/search/query', {
@@ -464,6 +480,31 @@ class ReactomeServer {
             throw new McpError(ErrorCode.InvalidParams, 'Invalid gene arguments');
         }
         try {
+            // Answer from the local index; the API is only used for genes it does not know
+            const index = await this.localIndex(args.species);
+            const gene = index ? index.gene(args.gene) : -1;
+            if (index && gene >= 0) {
+                const pathways = index.pathwaysOfGene(gene).map((p) => index.brief(p));
+                const result = {
+                    gene: args.gene,
+                    protein: {
+                        id: index.geneAccessions[gene],
+                        name: index.geneSymbols[gene] || index.geneAccessions[gene],
+                        species: index.species
+                    },
+                    pathwayCount: pathways.length,
+                    pathways,
+                    source: 'local'
+                };
+                return {
+                    content: [
+                        {
+                            type: 'text',
+                            text: JSON.stringify(result, null, 2),
+                        },
+                    ],
+                };
+            }
             // First search for the gene/protein entity
             const searchResponse = await this.apiClient.get('/search/query', {
                 params: {
@@ -622,6 +663,33 @@ class ReactomeServer {
                     isError: true,
                 };
             }
+            // Ancestors up to the top-level pathway and direct children from the local index
+            const index = await this.localIndex();
+            const local = index ? index.pathway(pathwayId) : -1;
+            if (index && local >= 0) {
+                const hierarchy = {
+                    pathwayId: pathwayId,
+                    originalQuery: args.id,
+                    basicInfo: {
+                        name: index.pathwayNames[local],
+                        type: 'Pathway',
+                        species: index.species
+                    },
+                    topLevel: index.isTopLevel(local),
+                    parents: index.parentsOf(local).map((p) => index.brief(p)),
+                    ancestors: index.ancestorsOf(local).map((p) => ({ ...index.brief(p), topLevel: index.isTopLevel(p) })),
+                    children: index.childrenOf(local).map((p) => index.brief(p)),
+                    source: 'local'
+                };
+                return {
+                    content: [
+                        {
+                            type: 'text',
+                            text: JSON.stringify(hierarchy, null, 2),
+                        },
+                    ],
+                };
+            }
             // Get basic pathway information first
             const pathwayInfo = await this.apiClient.get(`/data/query/${pathwayId}`);
             // Try alternative endpoints for hierarchy
@@ -700,6 +768,34 @@ class ReactomeServer {
                     isError: true,
                 };
             }
+            // Proteins mapped to the pathway or its sub-pathways in the local index
+            const index = await this.localIndex();
+            const local = index ? index.pathway(pathwayId) : -1;
+            const genes = index && local >= 0 ? index.genesOfPathway(local) : [];
+            if (index && genes.length > 0) {
+                const result = {
+                    pathwayId: pathwayId,
+                    originalQuery: args.id,
+                    participantCount: genes.length,
+                    participants: genes.slice(0, 50).map((g) => ({
+                        id: index.geneAccessions[g],
+                        name: index.geneSymbols[g] || index.geneAccessions[g],
+                        type: 'Protein',
+                        species: index.species,
+                        identifier: index.geneAccessions[g],
+                        url: `https://www.uniprot.org/uniprotkb/${index.geneAccessions[g]}`
+                    })),
+                    source: 'local'
+                };
+                return {
+                    content: [
+                        {
+                            type: 'text',
+                            text: JSON.stringify(result, null, 2),
+                        },
+                    ],
+                };
+            }
             // Try alternative approaches for getting participants
             let participants = [];
             try {
@@ -959,6 +1055,11 @@ class ReactomeServer {
         console.error('Reactome MCP server running on stdio');
     }
 }
-const server = new ReactomeServer();
-server.run().catch(console.error);
+export { ReactomeServer };
+
+// Loaded in-process by MCP-Gateway: do not attach the stdio transport.
+if (!process.env.MCP_GATEWAY_IMPORT) {
+    const server = new ReactomeServer();
+    server.run().catch(console.error);
+}
 //# sourceMappingURL=index.js.map
\ No newline at end of file
@@ -24,6 +24,7 @@ import {
   ReadResourceRequestSchema,
 } from '@modelcontextprotocol/sdk/types.js';
 import axios, { AxiosInstance } from 'axios';
+import { getReactomeIndex, ReactomeIndex } from './reactome-index.js';
 
 // Type guards and validation functions
 const isValidSearchArgs = (args: any): args is { query: string; type?: string; size?: number } => {
@@ -425,12 +426,27 @@ class ReactomeServer {
     }
   }
 
+  // Local index for the requested species (null when unavailable or for another species)
+  private async localIndex(species?: string): Promise<ReactomeIndex | null> {
+    const index = await getReactomeIndex();
+    if (!index) return null;
+    if (species && !index.species.toLowerCase().includes(species.toLowerCase())) return null;
+    return index;
+  }
+
   private async resolvePathwayId(identifier: string): Promise<string | null> {
     // If it's already a stable identifier, return it
     if (identifier.match(/^R-[A-Z]{3}-\d+$/)) {
       return identifier;
     }
 
+    // Exact pathway name in the local index
+    const index = await this.localIndex();
+    const local = index ? index.pathway(identifier) : -1;
+    if (index && local >= 0) {
+      return index.pathwayIds[local];
+    }
+
     // Search for the pathway by name
     try {
       const searchResponse = await this.apiClient.get('/search/query', {
@@ -539,6 +555,32 @@ class ReactomeServer {
     }
 
     try {
+      // Answer from the local index; the API is only used for genes it does not know
+      const index = await this.localIndex(args.species);
+      const gene = index ? index.gene(args.gene) : -1;
+      if (index && gene >= 0) {
+        const pathways = index.pathwaysOfGene(gene).map((p) => index.brief(p));
+        const result = {
+          gene: args.gene,
+          protein: {
+            id: index.geneAccessions[gene],
+            name: index.geneSymbols[gene] || index.geneAccessions[gene],
+            species: index.species
+          },
+          pathwayCount: pathways.length,
+          pathways,
+          source: 'local'
+        };
+        return {
+          content: [
+            {
+              type: 'text',
+              text: JSON.stringify(result, null, 2),
+            },
+          ],
+        };
+      }
+
       // First search for the gene/protein entity
       const searchResponse = await this.apiClient.get('/search/query', {
         params: {
@@ -713,6 +755,34 @@ class ReactomeServer {
         };
       }
 
+      // Ancestors up to the top-level pathway and direct children from the local index
+      const index = await this.localIndex();
+      const local = index ? index.pathway(pathwayId) : -1;
+      if (index && local >= 0) {
+        const hierarchy = {
+          pathwayId: pathwayId,
+          originalQuery: args.id,
+          basicInfo: {
+            name: index.pathwayNames[local],
+            type: 'Pathway',
+            species: index.species
+          },
+          topLevel: index.isTopLevel(local),
+          parents: index.parentsOf(local).map((p) => index.brief(p)),
+          ancestors: index.ancestorsOf(local).map((p) => ({ ...index.brief(p), topLevel: index.isTopLevel(p) })),
+          children: index.childrenOf(local).map((p) => index.brief(p)),
+          source: 'local'
+        };
+        return {
+          content: [
+            {
+              type: 'text',
+              text: JSON.stringify(hierarchy, null, 2),
+            },
+          ],
+        };
+      }
+
       // Get basic pathway information first
       const pathwayInfo = await this.apiClient.get(`/data/query/${pathwayId}`);
 
@@ -796,6 +866,35 @@ class ReactomeServer {
         };
       }
 
+      // Proteins mapped to the pathway or its sub-pathways in the local index
+      const index = await this.localIndex();
+      const local = index ? index.pathway(pathwayId) : -1;
+      const genes = index && local >= 0 ? index.genesOfPathway(local) : [];
+      if (index && genes.length > 0) {
+        const result = {
+          pathwayId: pathwayId,
+          originalQuery: args.id,
+          participantCount: genes.length,
+          participants: genes.slice(0, 50).map((g) => ({
+            id: index.geneAccessions[g],
+            name: index.geneSymbols[g] || index.geneAccessions[g],
+            type: 'Protein',
+            species: index.species,
+            identifier: index.geneAccessions[g],
+            url: `https://www.uniprot.org/uniprotkb/${index.geneAccessions[g]}`
+          })),
+          source: 'local'
+        };
+        return {
+          content: [
+            {
+              type: 'text',
+              text: JSON.stringify(result, null, 2),
+            },
+          ],
+        };
+      }
+
       // Try alternative approaches for getting participants
       let participants = [];
 
@@ -1073,5 +1172,10 @@ class ReactomeServer {
   }
 }
 
-const server = new ReactomeServer();
-server.run().catch(console.error);
+export { ReactomeServer };
+
+// Loaded in-process by MCP-Gateway: do not attach the stdio transport.
+if (!process.env.MCP_GATEWAY_IMPORT) {
+  const server = new ReactomeServer();
+  server.run().catch(console.error);
+}
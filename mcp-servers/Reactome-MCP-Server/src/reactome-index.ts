@@ -0,0 +1,251 @@
+/**
+ * Local Reactome index built from the downloadable mapping files
+ * (https://reactome.org/download-data):
+ *
+ *   ReactomePathways.txt            stId, name, species
+ *   ReactomePathwaysRelation.txt    parent stId, child stId
+ *   UniProt2Reactome_PE_Pathway.txt UniProt, PE stId, PE name ("TP53 [nucleoplasm]"), pathway stId,
+ *                                   url, pathway name, evidence, species
+ *   (or UniProt2Reactome.txt        UniProt, pathway stId, url, pathway name, evidence, species)
+ *
+ * The files are read once per process, filtered to one species, and packed into interned
+ * integer IDs with CSR arrays (parent/child pathway edges, gene -> lowest-level pathways and
+ * pathway -> genes). Gene lookups, hierarchy walks and participant lists then run in-process;
+ * the server calls the Reactome API only for identifiers the index does not know.
+ *
+ * REACTOME_INDEX_DIR enables the index (data/reactome-fixture is a small hand-made subset for
+ * tests and benchmarks); without it every request goes to the Content Service. REACTOME_SPECIES
+ * selects the species (default: Homo sapiens).
+ */
+import { promises as fs } from 'fs';
+import * as path from 'path';
+import { fileURLToPath } from 'url';
+
+export const FIXTURE_DIR = fileURLToPath(new URL('../data/reactome-fixture', import.meta.url));
+export const INDEX_DIR = process.env.REACTOME_INDEX_DIR || '';
+export const SPECIES = process.env.REACTOME_SPECIES || 'Homo sapiens';
+
+const MAPPING_FILES = ['UniProt2Reactome_PE_Pathway.txt', 'UniProt2Reactome.txt'];
+
+async function readRows(file: string): Promise<string[][]> {
+  const text = await fs.readFile(file, 'utf8');
+  const rows: string[][] = [];
+  for (const line of text.split('\n')) {
+    if (!line || line.startsWith('#')) continue;
+    rows.push(line.replace(/\r$/, '').split('\t'));
+  }
+  return rows;
+}
+
+function toCsr(lists: number[][]): { offsets: Int32Array; values: Int32Array } {
+  const offsets = new Int32Array(lists.length + 1);
+  for (let i = 0; i < lists.length; i++) offsets[i + 1] = offsets[i] + lists[i].length;
+  const values = new Int32Array(offsets[lists.length]);
+  for (let i = 0; i < lists.length; i++) values.set(lists[i], offsets[i]);
+  return { offsets, values };
+}
+
+function slice(csr: { offsets: Int32Array; values: Int32Array }, i: number): Int32Array {
+  return csr.values.subarray(csr.offsets[i], csr.offsets[i + 1]);
+}
+
+export class ReactomeIndex {
+  readonly species: string;
+  readonly source: string;
+  readonly pathwayIds: string[] = [];
+  readonly pathwayNames: string[] = [];
+  readonly geneAccessions: string[] = [];
+  readonly geneSymbols: string[] = [];
+  private pathwayIndex = new Map<string, number>();
+  private pathwayNameIndex = new Map<string, number>();
+  private geneIndex = new Map<string, number>();
+  private parents: { offsets: Int32Array; values: Int32Array };
+  private children: { offsets: Int32Array; values: Int32Array };
+  private genePathways: { offsets: Int32Array; values: Int32Array };
+  private pathwayGenes: { offsets: Int32Array; values: Int32Array };
+
+  constructor(pathways: string[][], relations: string[][], mappings: string[][], species: string, source: string) {
+    this.species = species;
+    this.source = source;
+
+    for (const [stId, name, sp] of pathways) {
+      if (sp !== species || this.pathwayIndex.has(stId)) continue;
+      this.pathwayIndex.set(stId, this.pathwayIds.length);
+      this.pathwayNameIndex.set(name.toLowerCase(), this.pathwayIds.length);
+      this.pathwayIds.push(stId);
+      this.pathwayNames.push(name);
+    }
+    const n = this.pathwayIds.length;
+
+    const parentLists: number[][] = Array.from({ length: n }, () => []);
+    const childLists: number[][] = Array.from({ length: n }, () => []);
+    for (const [parent, child] of relations) {
+      const p = this.pathwayIndex.get(parent);
+      const c = this.pathwayIndex.get(child);
+      if (p === undefined || c === undefined) continue;
+      parentLists[c].push(p);
+      childLists[p].push(c);
+    }
+    this.parents = toCsr(parentLists);
+    this.children = toCsr(childLists);
+
+    const genePathwayLists: number[][] = [];
+    const pathwayGeneLists: number[][] = Array.from({ length: n }, () => []);
+    for (const row of mappings) {
+      // PE_Pathway rows have 8 columns, plain UniProt2Reactome rows 6
+      const pe = row.length >= 8;
+      const accession = row[0].split('-')[0];
+      const stId = pe ? row[3] : row[1];
+      const sp = pe ? row[7] : row[5];
+      const p = this.pathwayIndex.get(stId);
+      if (sp !== species || p === undefined) continue;
+
+      let g = this.geneIndex.get(accession.toUpperCase());
+      if (g === undefined) {
+        g = this.geneAccessions.length;
+        this.geneAccessions.push(accession);
+        this.geneSymbols.push('');
+        genePathwayLists.push([]);
+        this.geneIndex.set(accession.toUpperCase(), g);
+      }
+      const symbol = pe ? row[2].replace(/\s*\[.*$/, '').trim() : '';
+      if (symbol && !this.geneSymbols[g]) {
+        this.geneSymbols[g] = symbol;
+        if (!this.geneIndex.has(symbol.toUpperCase())) this.geneIndex.set(symbol.toUpperCase(), g);
+      }
+      if (!genePathwayLists[g].includes(p)) {
+        genePathwayLists[g].push(p);
+        pathwayGeneLists[p].push(g);
+      }
+    }
+    this.genePathways = toCsr(genePathwayLists);
+    this.pathwayGenes = toCsr(pathwayGeneLists);
+  }
+
+  /** Pathway index for a stable ID or an exact (case-insensitive) pathway name, or -1. */
+  pathway(identifier: string): number {
+    return this.pathwayIndex.get(identifier.trim()) ?? this.pathwayNameIndex.get(identifier.trim().toLowerCase()) ?? -1;
+  }
+
+  /** Gene index for a UniProt accession or gene symbol, or -1. */
+  gene(identifier: string): number {
+    return this.geneIndex.get(identifier.trim().toUpperCase()) ?? -1;
+  }
+
+  brief(p: number) {
+    return {
+      id: this.pathwayIds[p],
+      name: this.pathwayNames[p],
+      species: this.species,
+      url: `https://reactome.org/content/detail/${this.pathwayIds[p]}`,
+    };
+  }
+
+  isTopLevel(p: number): boolean {
+    return this.parents.offsets[p + 1] === this.parents.offsets[p];
+  }
+
+  parentsOf(p: number): number[] {
+    return [...slice(this.parents, p)];
+  }
+
+  childrenOf(p: number): number[] {
+    return [...slice(this.children, p)];
+  }
+
+  /** All ancestors, nearest first (breadth-first up the hierarchy). */
+  ancestorsOf(p: number): number[] {
+    const seen = new Set<number>([p]);
+    const out: number[] = [];
+    let frontier = [p];
+    while (frontier.length) {
+      const next: number[] = [];
+      for (const x of frontier) {
+        for (const parent of slice(this.parents, x)) {
+          if (seen.has(parent)) continue;
+          seen.add(parent);
+          out.push(parent);
+          next.push(parent);
+        }
+      }
+      frontier = next;
+    }
+    return out;
+  }
+
+  /** Pathway and all sub-pathways. */
+  subtreeOf(p: number): number[] {
+    const seen = new Set<number>([p]);
+    const stack = [p];
+    while (stack.length) {
+      for (const child of slice(this.children, stack.pop()!)) {
+        if (!seen.has(child)) {
+          seen.add(child);
+          stack.push(child);
+        }
+      }
+    }
+    return [...seen];
+  }
+
+  /** Lowest-level pathways a gene is mapped to. */
+  pathwaysOfGene(g: number): number[] {
+    return [...slice(this.genePathways, g)];
+  }
+
+  /** Genes mapped to a pathway or any of its sub-pathways. */
+  genesOfPathway(p: number): number[] {
+    const genes = new Set<number>();
+    for (const x of this.subtreeOf(p)) {
+      for (const g of slice(this.pathwayGenes, x)) genes.add(g);
+    }
+    return [...genes];
+  }
+
+  stats() {
+    return {
+      source: this.source,
+      species: this.species,
+      pathways: this.pathwayIds.length,
+      relations: this.parents.values.length,
+      genes: this.geneAccessions.length,
+      gene_pathway_pairs: this.genePathways.values.length,
+    };
+  }
+}
+
+export async function loadReactomeIndex(dir: string = INDEX_DIR, species: string = SPECIES): Promise<ReactomeIndex> {
+  const started = Date.now();
+  const pathways = await readRows(path.join(dir, 'ReactomePathways.txt'));
+  const relations = await readRows(path.join(dir, 'ReactomePathwaysRelation.txt'));
+  let mappings: string[][] = [];
+  for (const name of MAPPING_FILES) {
+    try {
+      mappings = await readRows(path.join(dir, name));
+      break;
+    } catch {
+      // try the next mapping file
+    }
+  }
+  const index = new ReactomeIndex(pathways, relations, mappings, species, dir);
+  console.error(`[reactome-index] ${JSON.stringify(index.stats())} loaded in ${Date.now() - started} ms`);
+  return index;
+}
+
+let shared: Promise<ReactomeIndex | null> | null = null;
+
+/**
+ * The process-wide index (loaded on first use). Resolves to null when REACTOME_INDEX_DIR is unset
+ * or the files cannot be read, so callers use the Content Service.
+ */
+export function getReactomeIndex(): Promise<ReactomeIndex | null> {
+  if (!shared) {
+    shared = INDEX_DIR
+      ? loadReactomeIndex().catch((error) => {
+          console.error(`[reactome-index] index unavailable (${INDEX_DIR}): ${error}`);
+          return null;
+        })
+      : Promise.resolve(null);
+  }
+  return shared;
+}
@@ -3,6 +3,7 @@ import { Server } from '@modelcontextprotocol/sdk/server/index.js';
 import { StdioServerTransport } from '@modelcontextprotocol/sdk/server/stdio.js';
 import { CallToolRequestSchema, ErrorCode, ListResourceTemplatesRequestSchema, ListToolsRequestSchema, McpError, ReadResourceRequestSchema, } from '@modelcontextprotocol/sdk/types.js';
 import axios from 'axios';
+import { getStringStore } from './string-store.js';
 // Type guards and validation functions
 const isValidProteinArgs = (args) => {
     return (typeof args === 'object' &&
@@ -331,6 +332,11 @@ class StringServer {
             types.push('textmining');
         return types;
     }
+    // Local store for the requested species, if one is configured (STRING_DATA_DIR)
+    async localStore(species) {
+        const store = await getStringStore();
+        return store && store.taxon === String(species) ? store : null;
+    }
     // Tool handlers
     async handleGetProteinInteractions(args) {
         if (!isValidProteinArgs(args)) {
@@ -340,6 +346,30 @@ class StringServer {
             const species = args.species || '9606';
             const limit = args.limit || 10;
             const requiredScore = args.required_score || 400;
+            const store = await this.localStore(species);
+            const query = store ? store.resolve(args.protein_id) : -1;
+            if (store && query >= 0) {
+                const partners = store.partners(query, requiredScore, limit);
+                return {
+                    content: [
+                        {
+                            type: 'text',
+                            text: JSON.stringify({
+                                query_protein: args.protein_id,
+                                species: species,
+                                total_interactions: partners.length,
+                                interactions: partners.map(e => ({
+                                    partner_protein: store.names[store.neighbor(e)],
+                                    string_id: store.ids[store.neighbor(e)],
+                                    confidence_score: store.score(e) / 1000,
+                                    evidence_scores: store.edgeEvidence(e),
+                                })),
+                                source: 'local',
+                            }, null, 2),
+                        },
+                    ],
+                };
+            }
             const response = await this.apiClient.get('/tsv/interaction_partners', {
                 params: {
                     identifiers: args.protein_id,
@@ -396,6 +426,46 @@ class StringServer {
             const species = args.species || '9606';
             const addNodes = args.add_nodes || 0;
             const requiredScore = args.required_score || 400;
+            // Answer from the local store when it has this network type and knows every protein
+            const store = await this.localStore(species);
+            const resolved = store ? store.resolveAll(args.protein_ids) : null;
+            if (store && resolved && resolved.missing.length === 0 && store.networkType === (args.network_type || 'functional')) {
+                const nodes = resolved.nodes.concat(store.expand(resolved.nodes, addNodes, requiredScore));
+                const edges = store.subgraph(nodes, requiredScore);
+                return {
+                    content: [
+                        {
+                            type: 'text',
+                            text: JSON.stringify({
+                                query_proteins: args.protein_ids,
+                                species: species,
+                                network_stats: {
+                                    total_nodes: nodes.length,
+                                    total_edges: edges.length,
+                                    average_degree: edges.length > 0 ? (edges.length * 2) / nodes.length : 0,
+                                },
+                                nodes: nodes.map((i, position) => ({
+                                    protein_name: store.names[i],
+                                    string_id: store.ids[i],
+                                    annotation: store.annotations[i],
+                                    protein_size: store.sizes[i],
+                                    added: position >= resolved.nodes.length,
+                                })),
+                                edges: edges.map(([a, b, e]) => {
+                                    const evidence = store.edgeEvidence(e);
+                                    return {
+                                        protein_a: store.names[a],
+                                        protein_b: store.names[b],
+                                        confidence_score: store.score(e) / 1000,
+                                        evidence_types: evidence ? Object.keys(evidence).filter(name => evidence[name] > 0) : undefined,
+                                    };
+                                }),
+                                source: 'local',
+                            }, null, 2),
+                        },
+                    ],
+                };
+            }
             // Get network data
             const networkResponse = await this.apiClient.get('/tsv/network', {
                 params: {
@@ -461,6 +531,36 @@ class StringServer {
         }
         try {
             const species = args.species || '9606';
+            // Hypergeometric test against the local annotation sets when every protein is known
+            const store = await this.localStore(species);
+            const resolved = store ? store.resolveAll(args.protein_ids) : null;
+            const background = store && args.background_string_identifiers ? store.resolveAll(args.background_string_identifiers) : null;
+            if (store && store.hasAnnotations && resolved && resolved.missing.length === 0 && (!background || background.missing.length === 0)) {
+                const enrichments = store.enrichment(resolved.nodes, background?.nodes);
+                const groupedEnrichments = {};
+                enrichments.forEach(term => {
+                    if (!groupedEnrichments[term.category]) {
+                        groupedEnrichments[term.category] = [];
+                    }
+                    groupedEnrichments[term.category].push(term);
+                });
+                return {
+                    content: [
+                        {
+                            type: 'text',
+                            text: JSON.stringify({
+                                query_proteins: args.protein_ids,
+                                species: species,
+                                total_terms: enrichments.length,
+                                enrichment_categories: Object.keys(groupedEnrichments),
+                                enrichments: groupedEnrichments,
+                                significant_terms: enrichments.filter(term => term.pvalue_fdr < 0.05).length,
+                                source: 'local',
+                            }, null, 2),
+                        },
+                    ],
+                };
+            }
             const params = {
                 identifiers: args.protein_ids.join('%0d'),
                 species: species,
@@ -656,6 +756,11 @@ class StringServer {
         console.error('STRING MCP server running on stdio');
     }
 }
-const server = new StringServer();
-server.run().catch(console.error);
+export { StringServer };
+
+// Loaded in-process by MCP-Gateway: do not attach the stdio transport.
+if (!process.env.MCP_GATEWAY_IMPORT) {
+    const server = new StringServer();
+    server.run().catch(console.error);
+}
 //# sourceMappingURL=index.js.map
\ No newline at end of file
@@ -0,0 +1,490 @@
+/**
+ * Optional local STRING store for one species.
+ *
+ * Loads the species' flat files from https://string-db.org/cgi/download once per process:
+ *   <taxon>.protein.info.v12.0.txt[.gz]                 names, sizes, annotations
+ *   <taxon>.protein.links[.detailed].v12.0.txt[.gz]     scored links (both directions, as shipped)
+ *   <taxon>.protein.enrichment.terms.v12.0.txt[.gz]     annotation sets (optional, for enrichment)
+ *   <taxon>.protein.aliases.v12.0.txt[.gz]              extra identifiers (optional)
+ * Proteins are interned to integers and the links kept as CSR adjacency (offsets + Int32Array
+ * neighbours + Uint16Array scores, each row sorted by score, highest first), so a score threshold
+ * is a prefix of each row. Neighbourhood expansion accumulates scores in one Float64Array, induced
+ * subgraphs use a byte mask over all proteins, and enrichment is a hypergeometric test against
+ * the cached annotation sets with Benjamini-Hochberg FDR per category.
+ *
+ * STRING_DATA_DIR enables the store (data/string-fixture is a small hand-made set for tests);
+ * without it every request goes to the STRING API. STRING_SPECIES selects the taxon (default
+ * 9606) and STRING_NETWORK_TYPE the link file (functional or physical).
+ */
+import { createReadStream, promises as fs } from 'fs';
+import * as path from 'path';
+import { createInterface } from 'readline';
+import { createGunzip } from 'zlib';
+
+export const DATA_DIR = process.env.STRING_DATA_DIR || '';
+export const SPECIES = process.env.STRING_SPECIES || '9606';
+export const NETWORK_TYPE = process.env.STRING_NETWORK_TYPE === 'physical' ? 'physical' : 'functional';
+
+// detailed link file column -> evidence name used by the STRING API
+const CHANNELS = [
+    ['neighborhood', 'neighborhood'],
+    ['fusion', 'fusion'],
+    ['cooccurence', 'cooccurrence'],
+    ['coexpression', 'coexpression'],
+    ['experimental', 'experimental'],
+    ['experiments', 'experimental'],
+    ['database', 'database'],
+    ['textmining', 'textmining'],
+];
+const EVIDENCE = ['neighborhood', 'fusion', 'cooccurrence', 'coexpression', 'experimental', 'database', 'textmining'];
+
+class IntBuffer {
+    data = new Int32Array(1024);
+    length = 0;
+
+    push(value) {
+        if (this.length === this.data.length) {
+            const grown = new Int32Array(this.data.length * 2);
+            grown.set(this.data);
+            this.data = grown;
+        }
+        this.data[this.length++] = value;
+    }
+
+    view() {
+        return this.data.subarray(0, this.length);
+    }
+}
+
+async function* readLines(file) {
+    const input = file.endsWith('.gz') ? createReadStream(file).pipe(createGunzip()) : createReadStream(file);
+    const lines = createInterface({ input, crlfDelay: Infinity });
+    for await (const line of lines) {
+        if (line)
+            yield line;
+    }
+}
+
+async function findFile(dir, taxon, kinds) {
+    const names = await fs.readdir(dir);
+    for (const kind of kinds) {
+        const hit = names.filter((name) => name.startsWith(`${taxon}.${kind}.`) && /\.txt(\.gz)?$/.test(name)).sort().pop();
+        if (hit)
+            return path.join(dir, hit);
+    }
+    return null;
+}
+
+/** Item indices grouped by key: items of key k are order[offsets[k]..offsets[k+1]). */
+function groupBy(keys, n) {
+    const offsets = new Int32Array(n + 1);
+    for (let i = 0; i < keys.length; i++)
+        offsets[keys[i] + 1]++;
+    for (let k = 0; k < n; k++)
+        offsets[k + 1] += offsets[k];
+    const cursor = offsets.slice(0, n);
+    const order = new Int32Array(keys.length);
+    for (let i = 0; i < keys.length; i++)
+        order[cursor[keys[i]]++] = i;
+    return { offsets, order };
+}
+
+export class StringStore {
+    taxon;
+    networkType;
+    source;
+    ids = [];
+    names = [];
+    annotations = [];
+    sizes = [];
+    index = new Map();
+    // adjacency
+    offsets = new Int32Array(1);
+    neighbors = new Int32Array(0);
+    scores = new Uint16Array(0);
+    evidence = null;
+    // annotation sets
+    termIds = [];
+    termCategories = [];
+    termDescriptions = [];
+    termIndex = new Map();
+    termOffsets = new Int32Array(1);
+    termMembers = new Int32Array(0);
+    proteinTermOffsets = new Int32Array(1);
+    proteinTerms = new Int32Array(0);
+    logFactorials = new Float64Array(1);
+
+    constructor(taxon, networkType, source) {
+        this.taxon = taxon;
+        this.networkType = networkType;
+        this.source = source;
+    }
+
+    get size() {
+        return this.ids.length;
+    }
+
+    get hasAnnotations() {
+        return this.termIds.length > 0;
+    }
+
+    /** Interns a protein by STRING ID (returns the existing index if known). */
+    addProtein(stringId, name = '', size = 0, annotation = '') {
+        const known = this.index.get(stringId.toUpperCase());
+        if (known !== undefined && this.ids[known] === stringId)
+            return known;
+        const i = this.ids.length;
+        this.ids.push(stringId);
+        this.names.push(name || stringId);
+        this.sizes.push(size);
+        this.annotations.push(annotation);
+        this.index.set(stringId.toUpperCase(), i);
+        // "9606.ENSP00000269305" is also reachable as "ENSP00000269305"
+        const bare = stringId.slice(stringId.indexOf('.') + 1).toUpperCase();
+        if (!this.index.has(bare))
+            this.index.set(bare, i);
+        if (name && !this.index.has(name.toUpperCase()))
+            this.index.set(name.toUpperCase(), i);
+        return i;
+    }
+
+    addAlias(alias, i) {
+        const key = alias.toUpperCase();
+        if (!this.index.has(key))
+            this.index.set(key, i);
+    }
+
+    /** Protein index for a STRING ID, preferred name or alias, or -1. */
+    resolve(identifier) {
+        return this.index.get(identifier.trim().toUpperCase()) ?? -1;
+    }
+
+    /** Resolves a list of identifiers (duplicates removed); `missing` lists the unknown ones. */
+    resolveAll(identifiers) {
+        const nodes = [];
+        const missing = [];
+        for (const identifier of identifiers) {
+            const i = this.resolve(identifier);
+            if (i < 0)
+                missing.push(identifier);
+            else if (!nodes.includes(i))
+                nodes.push(i);
+        }
+        return { nodes, missing };
+    }
+
+    setLinks(from, to, scores, evidence) {
+        const { offsets, order } = groupBy(from, this.size);
+        // highest score first within each row, so thresholds cut a prefix
+        for (let i = 0; i < this.size; i++) {
+            const row = order.subarray(offsets[i], offsets[i + 1]);
+            if (row.length > 1)
+                row.set(Array.from(row).sort((x, y) => scores[y] - scores[x]));
+        }
+        this.offsets = offsets;
+        this.neighbors = new Int32Array(order.length);
+        this.scores = new Uint16Array(order.length);
+        this.evidence = evidence ? new Uint16Array(order.length * EVIDENCE.length) : null;
+        for (let e = 0; e < order.length; e++) {
+            const item = order[e];
+            this.neighbors[e] = to[item];
+            this.scores[e] = scores[item];
+            if (this.evidence && evidence) {
+                for (let c = 0; c < EVIDENCE.length; c++)
+                    this.evidence[e * EVIDENCE.length + c] = evidence[item * EVIDENCE.length + c];
+            }
+        }
+    }
+
+    setAnnotations(proteins, terms) {
+        const byTerm = groupBy(terms, this.termIds.length);
+        this.termOffsets = byTerm.offsets;
+        this.termMembers = byTerm.order.map((pair) => proteins[pair]);
+        const byProtein = groupBy(proteins, this.size);
+        this.proteinTermOffsets = byProtein.offsets;
+        this.proteinTerms = byProtein.order.map((pair) => terms[pair]);
+    }
+
+    internTerm(category, term, description) {
+        const key = `${category}\t${term}`;
+        let t = this.termIndex.get(key);
+        if (t === undefined) {
+            t = this.termIds.length;
+            this.termIds.push(term);
+            this.termCategories.push(category);
+            this.termDescriptions.push(description);
+            this.termIndex.set(key, t);
+        }
+        return t;
+    }
+
+    /** Score (0-1000) of an edge position. */
+    score(e) {
+        return this.scores[e];
+    }
+
+    neighbor(e) {
+        return this.neighbors[e];
+    }
+
+    /** Per-channel evidence scores (0-1) of an edge position, when a detailed link file was loaded. */
+    edgeEvidence(e) {
+        if (!this.evidence)
+            return undefined;
+        const out = {};
+        EVIDENCE.forEach((name, c) => {
+            out[name] = this.evidence[e * EVIDENCE.length + c] / 1000;
+        });
+        return out;
+    }
+
+    /** Edge positions of a protein's partners with score >= minScore, strongest first. */
+    partners(i, minScore, limit) {
+        const out = [];
+        for (let e = this.offsets[i]; e < this.offsets[i + 1] && out.length < limit; e++) {
+            if (this.scores[e] < minScore)
+                break;
+            out.push(e);
+        }
+        return out;
+    }
+
+    /**
+      * The `count` proteins outside `seeds` with the highest summed link score to the seeds
+      * (links >= minScore), like STRING's add_white_nodes.
+      */
+    expand(seeds, count, minScore) {
+        if (count <= 0)
+            return [];
+        const weight = new Float64Array(this.size);
+        const isSeed = new Uint8Array(this.size);
+        for (const s of seeds)
+            isSeed[s] = 1;
+        const touched = [];
+        for (const s of seeds) {
+            for (let e = this.offsets[s]; e < this.offsets[s + 1]; e++) {
+                if (this.scores[e] < minScore)
+                    break;
+                const j = this.neighbors[e];
+                if (isSeed[j])
+                    continue;
+                if (weight[j] === 0)
+                    touched.push(j);
+                weight[j] += this.scores[e];
+            }
+        }
+        return touched.sort((a, b) => weight[b] - weight[a]).slice(0, count);
+    }
+
+    /** Edges (as [a, b, edge position]) among `nodes` with score >= minScore, each pair once. */
+    subgraph(nodes, minScore) {
+        const member = new Uint8Array(this.size);
+        for (const i of nodes)
+            member[i] = 1;
+        const edges = [];
+        for (const i of nodes) {
+            for (let e = this.offsets[i]; e < this.offsets[i + 1]; e++) {
+                if (this.scores[e] < minScore)
+                    break;
+                const j = this.neighbors[e];
+                if (member[j] && i < j)
+                    edges.push([i, j, e]);
+            }
+        }
+        return edges;
+    }
+
+    logFactorial(n) {
+        if (this.logFactorials.length <= n) {
+            const table = new Float64Array(n + 1);
+            for (let i = 2; i <= n; i++)
+                table[i] = table[i - 1] + Math.log(i);
+            this.logFactorials = table;
+        }
+        return this.logFactorials;
+    }
+
+    /** P(X >= k) for X ~ Hypergeometric(population N, K successes, n draws). */
+    hypergeometricTail(k, n, K, N) {
+        const lf = this.logFactorial(N);
+        const logChoose = (a, b) => lf[a] - lf[b] - lf[a - b];
+        const total = logChoose(N, n);
+        let p = 0;
+        for (let x = k; x <= Math.min(n, K); x++) {
+            if (n - x > N - K)
+                continue;
+            p += Math.exp(logChoose(K, x) + logChoose(N - K, n - x) - total);
+        }
+        return Math.min(1, p);
+    }
+
+    /**
+      * Over-represented annotation terms among `nodes` against the whole genome (or `background`),
+      * with Benjamini-Hochberg FDR per category. Only terms with FDR < maxFdr are returned, like the API.
+      */
+    enrichment(nodes, background, maxFdr = 0.05) {
+        let inBackground = null;
+        let query = nodes;
+        let N = this.size;
+        if (background && background.length > 0) {
+            inBackground = new Uint8Array(this.size);
+            for (const b of background)
+                inBackground[b] = 1;
+            query = nodes.filter((i) => inBackground[i]);
+            N = background.length;
+        }
+        const hits = new Map();
+        for (const i of query) {
+            for (let x = this.proteinTermOffsets[i]; x < this.proteinTermOffsets[i + 1]; x++) {
+                const t = this.proteinTerms[x];
+                if (!hits.has(t))
+                    hits.set(t, []);
+                hits.get(t).push(i);
+            }
+        }
+        const tested = [];
+        for (const [t, members] of hits) {
+            let K = this.termOffsets[t + 1] - this.termOffsets[t];
+            if (inBackground) {
+                K = 0;
+                for (let x = this.termOffsets[t]; x < this.termOffsets[t + 1]; x++)
+                    K += inBackground[this.termMembers[x]];
+            }
+            tested.push({
+                category: this.termCategories[t],
+                term: this.termIds[t],
+                number_of_genes: members.length,
+                number_of_genes_in_background: K,
+                ncbiTaxonId: Number(this.taxon),
+                inputGenes: members.map((i) => this.ids[i]).join(','),
+                preferredNames: members.map((i) => this.names[i]).join(','),
+                pvalue: this.hypergeometricTail(members.length, query.length, K, N),
+                pvalue_fdr: 1,
+                description: this.termDescriptions[t],
+            });
+        }
+        const byCategory = new Map();
+        for (const term of tested) {
+            if (!byCategory.has(term.category))
+                byCategory.set(term.category, []);
+            byCategory.get(term.category).push(term);
+        }
+        for (const terms of byCategory.values()) {
+            terms.sort((a, b) => a.pvalue - b.pvalue);
+            let running = 1;
+            for (let r = terms.length - 1; r >= 0; r--) {
+                running = Math.min(running, (terms[r].pvalue * terms.length) / (r + 1));
+                terms[r].pvalue_fdr = running;
+            }
+        }
+        return tested.filter((term) => term.pvalue_fdr < maxFdr).sort((a, b) => a.pvalue_fdr - b.pvalue_fdr || a.pvalue - b.pvalue);
+    }
+
+    stats() {
+        return {
+            source: this.source,
+            taxon: this.taxon,
+            network_type: this.networkType,
+            proteins: this.size,
+            links: this.neighbors.length / 2,
+            detailed_evidence: this.evidence !== null,
+            annotation_terms: this.termIds.length,
+        };
+    }
+}
+
+export async function loadStringStore(dir = DATA_DIR, taxon = SPECIES, networkType = NETWORK_TYPE) {
+    const started = Date.now();
+    const store = new StringStore(taxon, networkType, dir);
+    const prefix = networkType === 'physical' ? 'protein.physical.links' : 'protein.links';
+    const linksFile = await findFile(dir, taxon, [`${prefix}.detailed`, prefix]);
+    if (!linksFile) {
+        throw new Error(`no ${taxon}.${prefix} file in ${dir}`);
+    }
+
+    const infoFile = await findFile(dir, taxon, ['protein.info']);
+    if (infoFile) {
+        for await (const line of readLines(infoFile)) {
+            if (line.startsWith('#'))
+                continue;
+            const [id, name, size, annotation] = line.split('\t');
+            store.addProtein(id, name, Number(size) || 0, annotation || '');
+        }
+    }
+
+    const from = new IntBuffer();
+    const to = new IntBuffer();
+    const scores = new IntBuffer();
+    let evidence = null;
+    let scoreColumn = -1;
+    let channelColumns = [];
+    for await (const line of readLines(linksFile)) {
+        const fields = line.split(' ');
+        if (scoreColumn < 0) {
+            // header: protein1 protein2 [channels...] combined_score
+            scoreColumn = fields.indexOf('combined_score');
+            channelColumns = EVIDENCE.map((name) => {
+                const column = CHANNELS.find(([file, api]) => api === name && fields.includes(file));
+                return column ? fields.indexOf(column[0]) : -1;
+            });
+            if (channelColumns.some((c) => c >= 0))
+                evidence = new IntBuffer();
+            continue;
+        }
+        from.push(store.addProtein(fields[0]));
+        to.push(store.addProtein(fields[1]));
+        scores.push(Number(fields[scoreColumn]));
+        if (evidence) {
+            for (const c of channelColumns)
+                evidence.push(c >= 0 ? Number(fields[c]) : 0);
+        }
+    }
+    store.setLinks(from.view(), to.view(), scores.view(), evidence ? evidence.view() : null);
+
+    const aliasFile = await findFile(dir, taxon, ['protein.aliases']);
+    if (aliasFile) {
+        for await (const line of readLines(aliasFile)) {
+            if (line.startsWith('#'))
+                continue;
+            const [id, alias] = line.split('\t');
+            const i = store.resolve(id);
+            if (i >= 0 && alias)
+                store.addAlias(alias, i);
+        }
+    }
+
+    const termsFile = await findFile(dir, taxon, ['protein.enrichment.terms']);
+    if (termsFile) {
+        const proteins = new IntBuffer();
+        const terms = new IntBuffer();
+        for await (const line of readLines(termsFile)) {
+            if (line.startsWith('#'))
+                continue;
+            const [id, category, term, description] = line.split('\t');
+            const i = store.resolve(id);
+            if (i < 0)
+                continue;
+            proteins.push(i);
+            terms.push(store.internTerm(category, term, description || ''));
+        }
+        store.setAnnotations(proteins.view(), terms.view());
+    }
+
+    console.error(`[string-store] ${JSON.stringify(store.stats())} loaded in ${Date.now() - started} ms`);
+    return store;
+}
+
+let shared = null;
+
+/** The process-wide store (loaded on first use). Resolves to null when disabled or unreadable. */
+export function getStringStore() {
+    if (!shared) {
+        shared = DATA_DIR
+            ? loadStringStore().catch((error) => {
+                console.error(`[string-store] local store unavailable (${DATA_DIR}): ${error}`);
+                return null;
+            })
+            : Promise.resolve(null);
+    }
+    return shared;
+}
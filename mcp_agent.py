@@ -2,6 +2,7 @@ import logging
 import datetime
 import sys
 import os
+import uuid
 
 from strands import Agent, tool
 from strands.models import BedrockModel
@@ -9,8 +10,18 @@ from strands_tools import file_write
 from botocore.config import Config
 from strands.tools.mcp import MCPClient
 from mcp import stdio_client, StdioServerParameters
-from strands.agent.conversation_manager import SlidingWindowConversationManager
-from logging_config import setup_logging
+from agent_budget import RunBudget, call_tool, current_budget, run_with_budget, wrap_tools
+from conversation_budget import TokenBudgetConversationManager
+import mcp_gateway
+import profiler
+import query_cache
+import token_meter
+from logging_config import log_context, request_id, setup_logging
+from tool_prefetch import Prefetcher
+from id_index import resolve_identifier
+from compound_index import local_similarity_search, local_substructure_search
+from model_router import MODELS, RoutedModel
+from model_hedge import HedgedModel, endpoints_for
 
 # logging.basicConfig(
 #     level=logging.INFO,  # Defaulx t to INFO level
@@ -25,196 +36,186 @@ from logging_config import setup_logging
 logger = setup_logging().getChild("mcp_agent")
 
 def get_session_logger():
+    # 핸들러는 app 로거의 QueueHandler 하나 (logging_config) → 호출 경로에서 I/O 없음
     ts = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
-    logger = logging.getLogger(f"session_{ts}")
-    logger.setLevel(logging.INFO)
-    logger.propagate = False
-    if not logger.handlers:  # 중복 핸들러 방지
-        handler = logging.StreamHandler(sys.stderr)
-        handler.setFormatter(logging.Formatter(
-            "%(asctime)s %(levelname)s [%(name)s] %(message)s"
-        ))
-        logger.addHandler(handler)
-    return logger
+    return setup_logging().getChild(f"session_{ts}")
 
 logger = get_session_logger()
 logger.info("세션 시작")
 
 
-model = BedrockModel(
-    boto_client_config=Config(
-        read_timeout=900,
-        connect_timeout=900,
-        retries=dict(max_attempts=3, mode="adaptive"),
-    ),
-    model_id="us.anthropic.claude-3-7-sonnet-20250219-v1:0",
-    max_tokens = 5000,
-    stop_sequences=["\n\nHuman:"],
-    temperature=0.1,
-    top_p=0.9,
-    STRANDS_BUDGET_TOKENS = 180000,
-    additional_request_fields={
-        "thinking": {
-            "type": "disabled"
+MODEL_READ_TIMEOUT = int(os.getenv("AGENT_MODEL_READ_TIMEOUT", "60"))
+
+
+def _bedrock_model(model_id: str, region: str, failover: bool) -> BedrockModel:
+    return BedrockModel(
+        region_name=region,
+        # 호출 1회가 전체 실행 마감(agent_budget.DEADLINE_S)보다 길게 걸리지 않도록
+        boto_client_config=Config(
+            read_timeout=MODEL_READ_TIMEOUT,
+            connect_timeout=10,
+            # 다른 리전으로 넘길 수 있으면 같은 엔드포인트에서 재시도하며 기다리지 않는다 (model_hedge)
+            retries=dict(max_attempts=1 if failover else 2, mode="adaptive"),
+        ),
+        model_id=model_id,
+        max_tokens = 5000,
+        stop_sequences=["\n\nHuman:"],
+        temperature=0.1,
+        top_p=0.9,
+        additional_request_fields={
+            "thinking": {
+                "type": "disabled"
+            }
         }
-    }
-)
+    )
 
-conversation_manager = SlidingWindowConversationManager(
-    window_size=3,  
-)
 
+def _hedged_model(model_id: str) -> HedgedModel:
+    # 티어마다 리전/프로파일별 모델을 묶어서 느린 첫 응답은 헤지, 에러는 페일오버 (model_hedge.MODEL_REGIONS)
+    endpoints = endpoints_for(model_id)
+    return HedgedModel([_bedrock_model(ep.model_id, ep.region, len(endpoints) > 1) for ep in endpoints])
 
-# chembl_mcp_client = MCPClient(lambda: stdio_client(
-#     StdioServerParameters(command="node", args=["ChEMBL-MCP-Server/build/index.js"])
-# ))
 
+# 도구 선택 턴은 작은 모델, 최종 답변은 큰 모델 (정책: model_router.MODEL_POLICY)
+model = RoutedModel({tier: _hedged_model(model_id) for tier, model_id in MODELS.items()})
 
-# chembl_mcp_client = MCPClient(lambda: stdio_client(
-#     StdioServerParameters(command="docker", args=["run", "-i", "chembl-mcp-server"])
-# ))
+# 메시지 개수 대신 추정 토큰 수로 컨텍스트 관리 (AGENT_CONTEXT_TOKENS / AGENT_TOOL_RESULT_TOKENS)
+conversation_manager = TokenBudgetConversationManager()
+model.context_manager = conversation_manager
+model.budget_provider = current_budget.get
 
 
-def make_chembl_client():
-    return MCPClient(lambda: stdio_client(
-        StdioServerParameters(
-            command="docker",
-            args=["run", "-i", "chembl-mcp-server"]
-        )
-    ))
+# 에이전트 이름(AGENT_RUNNERS 키) → 단독 실행 명령
+MCP_SERVERS = {
+    "chembl": ("docker", ["run", "-i", "chembl-mcp-server"]),
+    "uniprot": ("docker", ["run", "-i", "uniprot-mcp-server"]),
+    "opentargets": ("node", ["mcp-servers/OpenTargets-MCP-Server/build/index.js"]),
+    "reactome": ("node", ["mcp-servers/Reactome-MCP-Server/build/index.js"]),
+    "string_db": ("node", ["mcp-servers/STRING-db-MCP-Server/build/index.js"]),
+    "geneontology": ("node", ["mcp-servers/GeneOntology-MCP-Server/build/index.js"]),
+    "pubchem": ("node", ["mcp-servers/PubChem-MCP-Server/build/index.js"]),
+    "pdb": ("node", ["mcp-servers/PDB-MCP-Server/build/index.js"]),
+    "proteinatlas": ("node", ["mcp-servers/ProteinAtlas-MCP-Server/build/index.js"]),
+}
 
-# uniprot_mcp_client = MCPClient(lambda: stdio_client(
-#     StdioServerParameters(command="docker", args=["run", "-i", "uniprot-mcp-server"])
-# ))
 
-
-def make_uniprot_mcp_client():
-    return MCPClient(lambda: stdio_client(
-        StdioServerParameters(
-            command="docker",
-            args=["run", "-i", "uniprot-mcp-server"]
-        )
-    ))
-
-# OpenTargets_mcp_client = MCPClient(lambda: stdio_client(
-#      StdioServerParameters(command="node", args=["mcp-servers/OpenTargets-MCP-Server/build/index.js"])
-# ))
-
-def make_OpenTargets_mcp_client():
-    return MCPClient(lambda: stdio_client(
-     StdioServerParameters(command="node", args=["mcp-servers/OpenTargets-MCP-Server/build/index.js"])
-))
-
-
-# Reactome_mcp_client = MCPClient(lambda: stdio_client(
-#      StdioServerParameters(command="node", args=["mcp-servers/Reactome-MCP-Server/build/index.js"])
-# ))
-
-
-def make_Reactome_mcp_client():
-    return MCPClient(lambda: stdio_client(
-     StdioServerParameters(command="node", args=["mcp-servers/Reactome-MCP-Server/build/index.js"])
-))
-
-
-# string_db_mcp_client = MCPClient(lambda: stdio_client(
-#      StdioServerParameters(command="node", args=["mcp-servers/STRING-db-MCP-Server/build/index.js"])
-# ))
-
-def make_string_db_mcp_client():
-    return MCPClient(lambda: stdio_client(
-     StdioServerParameters(command="node", args=["mcp-servers/STRING-db-MCP-Server/build/index.js"])
-))
-
-
-GeneOntology_mcp_client = MCPClient(lambda: stdio_client(
-     StdioServerParameters(command="node", args=["mcp-servers/GeneOntology-MCP-Server/build/index.js"])
-))
-
-def make_GeneOntology_mcp_client():
-    return MCPClient(lambda: stdio_client(
-     StdioServerParameters(command="node", args=["mcp-servers/GeneOntology-MCP-Server/build/index.js"])
-))
-
-PubChem_mcp_client = MCPClient(lambda: stdio_client(
-     StdioServerParameters(command="node", args=["mcp-servers/PubChem-MCP-Server/build/index.js"])
-))
-
-def make_PubChem_mcp_client():
-    return  MCPClient(lambda: stdio_client(
-     StdioServerParameters(command="node", args=["mcp-servers/PubChem-MCP-Server/build/index.js"])
-))
-
-
-PDB_mcp_client = MCPClient(lambda: stdio_client(
-     StdioServerParameters(command="node", args=["mcp-servers/PDB-MCP-Server/build/index.js"])
-))
-
-def make_PDB_mcp_client():
-    return  MCPClient(lambda: stdio_client(
-     StdioServerParameters(command="node", args=["mcp-servers/PDB-MCP-Server/build/index.js"])
-))
-
-
-ProteinAtlas_mcp_client = MCPClient(lambda: stdio_client(
-     StdioServerParameters(command="node", args=["mcp-servers/ProteinAtlas-MCP-Server/build/index.js"])
-))
-
-def make_ProteinAtlas_mcp_client():
-    return MCPClient(lambda: stdio_client(
-     StdioServerParameters(command="node", args=["mcp-servers/ProteinAtlas-MCP-Server/build/index.js"])
-))
+def make_client(name: str):
+    """
+    name 서버의 MCP 클라이언트. MCP_GATEWAY=1 이면 서버마다 프로세스를 띄우지 않고
+    항상 떠 있는 MCP-Gateway 연결 하나를 네임스페이스로 나눠 쓴다.
+    """
+    if mcp_gateway.ENABLED:
+        return mcp_gateway.GatewayNamespace(name)
+    command, args = MCP_SERVERS[name]
+    return MCPClient(lambda: stdio_client(StdioServerParameters(command=command, args=args)))
 
 
+class LoggingCallbackHandler:
+    """
+    Strands 기본 PrintingCallbackHandler 는 스트리밍 텍스트를 매 조각 print(stdout) 한다.
+    대신 도구 사용만 로거로 남긴다 (텍스트는 최종 답변으로 돌려주므로 찍지 않음).
+    """
 
-# chembl_agent_tools = chembl_mcp_client.list_tools_sync()
-# uniprot_agent_tools = uniprot_mcp_client.list_tools_sync()
-# OpenTargets_agent_tools = OpenTargets_mcp_client.list_tools_sync()
-# Reactome_agent_tools = Reactome_mcp_client.list_tools_sync()
-# string_db_agent_tools = string_db_mcp_client.list_tools_sync()
-# GeneOntology_agent_tools = GeneOntology_mcp_client.list_tools_sync()
-# PubChem_agent_tools = PubChem_mcp_client.list_tools_sync()
-# PDB_agent_tools = PDB_mcp_client.list_tools_sync()
+    def __init__(self, name: str):
+        self.log = logger.getChild(name)
+        self.tool_count = 0
+        self.seen = set()
 
+    def __call__(self, **kwargs):
+        tool_use = kwargs.get("current_tool_use") or {}
+        tool_use_id = tool_use.get("toolUseId")
+        if tool_use.get("name") and tool_use_id not in self.seen:
+            self.seen.add(tool_use_id)
+            self.tool_count += 1
+            self.log.info(f"Tool #{self.tool_count}: {tool_use['name']}")
+        elif kwargs.get("data"):
+            self.log.debug(kwargs["data"])
 
 
-def run_chembl_agent(query: str) -> str:
+def _run_agent(name: str, system_prompt: str, query: str,
+               budget: RunBudget = None, max_tools: int = None) -> str:
     """
-    chembl_agent를 실행하고 결과를 반환합니다.
+    MCP 클라이언트를 열고 예산(budget) 안에서 에이전트를 돌린다.
+    예산을 다 쓰면 그때까지 모은 정보로 답하거나 부분 답변을 돌려준다.
+    질문에서 예상되는 첫 도구 호출은 모델의 첫 턴과 동시에 미리 실행해 둔다 (tool_prefetch).
     """
-   
+    budget = budget or RunBudget()
+    # 같은 질문의 최근 답변이 있으면 MCP 서버/모델을 건너뛴다 (query_cache, warmup 이 아침에 채움)
+    key = (name, query_cache.normalize(query))
+    cached = query_cache.agent_answer.get(key)
+    if cached is not None:
+        logger.info(f"{name}_agent answer cache hit")
+        return cached
+    # 요청 ID 가 없으면(페이지에서 직접 부른 경우) 실행마다 하나 붙인다
+    rid = uuid.uuid4().hex[:12] if request_id.get() == "-" else None
+    # 사이드바 스위치 / X-Profile 헤더로 켠 요청만 스택 샘플링 (profiler)
+    with log_context(request=rid), token_meter.metering(name), profiler.profiling(f"agent.{name}"):
+        try:
+            # 세션/하루 토큰 예산을 다 썼으면 MCP 서버를 열기 전에 거절
+            token_meter.enforce()
+        except token_meter.BudgetExceeded as e:
+            return f"Error: {e}"
+        answer = _run_agent_logged(name, system_prompt, query, budget, max_tools)
+    # 에러나 예산에 걸려 잘린 답변은 재사용하지 않는다
+    report = budget.report()
+    if not answer.startswith("Error") and not report["tripped"] and not report["partial"]:
+        query_cache.agent_answer.put(key, answer)
+    return answer
+
+
+# 서버별로 붙이는 프로세스 내 도구 (원격 API 대신 로컬 인덱스)
+LOCAL_TOOLS = {
+    "chembl": [local_similarity_search, local_substructure_search],
+    "pubchem": [local_similarity_search, local_substructure_search],
+}
+
+
+def _run_agent_logged(name: str, system_prompt: str, query: str, budget: RunBudget, max_tools: int) -> str:
+    prefetch = None
     try:
-        with make_chembl_client() as client:
+        with make_client(name) as client:
             tools = client.list_tools_sync()
-            system_prompt = """
-        You are a specialized ChEMBL research agent. Your role is to:
-        1. Extract either the compound name or target name from the query
-        2. Search ChEMBL with the name
-        3. Return structured, well-formatted compound information with SMILES and activity information for the name
-        4. Anwser should be in Korean
-        """
+            if max_tools:
+                tools = tools[:max_tools]
+            prefetch = Prefetcher(name, tools, lambda t, u: call_tool(t, u, budget.tool_timeout_s)).start(query)
             agent = Agent(
-                tools=tools,
+                # resolve_identifier: 이름 → ID 는 원격 검색 대신 로컬 인덱스로 (모든 에이전트 공통)
+                tools=wrap_tools(tools, budget, prefetch) + [resolve_identifier] + LOCAL_TOOLS.get(name, []),
                 system_prompt=system_prompt,
                 conversation_manager=conversation_manager,
                 model=model,
+                callback_handler=LoggingCallbackHandler(name),
             )
-            response = agent(query)
-            return str(response)
+            return run_with_budget(agent, query, budget)
     except Exception as e:
-        logger.error(f"Error in chembl_agent: {e}")
+        logger.error(f"Error in {name}_agent: {e}")
         return f"Error: {str(e)}"
+    finally:
+        if prefetch is not None:
+            prefetch.close()
+        logger.info(f"{name}_agent budget: {budget.report()}")
 
 
-def run_uniprot_agent(query: str) -> str:
+def run_chembl_agent(query: str, budget: RunBudget = None) -> str:
     """
-    uniprot_agent를 실행하고 결과를 반환합니다.
+    chembl_agent를 실행하고 결과를 반환합니다.
     """
+    system_prompt = """
+        You are a specialized ChEMBL research agent. Your role is to:
+        1. Extract either the compound name or target name from the query
+        2. Search ChEMBL with the name
+        3. Return structured, well-formatted compound information with SMILES and activity information for the name
+        4. For similar-compound or substructure questions, use local_similarity_search / local_substructure_search with a SMILES
+        5. Anwser should be in Korean
+        """
+    return _run_agent("chembl", system_prompt, query, budget)
 
-    try:
-        with make_uniprot_mcp_client() as client:
-            tools = client.list_tools_sync()
-            system_prompt = """
+
+def run_uniprot_agent(query: str, budget: RunBudget = None) -> str:
+    """
+    uniprot_agent를 실행하고 결과를 반환합니다.
+    """
+    system_prompt = """
             You are a specialized UniProt research agent. Your role is to:
 
             1. Understand and extract key biological entities or research intents from the input query.
@@ -228,26 +229,13 @@ def run_uniprot_agent(query: str) -> str:
 
             Always format results clearly and concisely for downstream consumption by LLMs or human users.
             """
-            agent = Agent(
-                tools=tools[:10],
-                system_prompt=system_prompt,
-                conversation_manager=conversation_manager,
-                model=model
-            )
-            response = agent(query)
-            return str(response)
-    except Exception as e:
-        logger.error(f"Error in uniprot_agent: {e}")
-        return f"Error: {str(e)}"
+    return _run_agent("uniprot", system_prompt, query, budget, max_tools=10)
 
-def run_OpenTargets_agent(query: str) -> str:
+def run_OpenTargets_agent(query: str, budget: RunBudget = None) -> str:
     """
     chembl_agent를 실행하고 결과를 반환합니다.
     """
-    try:
-        with make_OpenTargets_mcp_client() as client:
-            tools = client.list_tools_sync()
-            system_prompt = """
+    system_prompt = """
                 You are an advanced biomedical research assistant specialized in gene, disease, and drug association analysis using Open Targets data.
 
                 Your primary responsibilities are to:
@@ -271,26 +259,13 @@ def run_OpenTargets_agent(query: str) -> str:
 
                 Respond in a helpful, clear, and scientifically accurate manner, tailored to biomedical researchers and professionals.
                 """
-            agent = Agent(
-                tools=tools,
-                system_prompt=system_prompt,
-                conversation_manager=conversation_manager,
-                model=model
-            )
-            response = agent(query)
-            return str(response)
-    except Exception as e:
-        logger.error(f"Error in uniprot_agent: {e}")
-        return f"Error: {str(e)}"
+    return _run_agent("opentargets", system_prompt, query, budget)
 
-def run_Reactome_agent(query: str) -> str:
+def run_Reactome_agent(query: str, budget: RunBudget = None) -> str:
     """
     chembl_agent를 실행하고 결과를 반환합니다.
     """
-    try:
-        with make_Reactome_mcp_client() as client:
-            tools = client.list_tools_sync()
-            system_prompt = """
+    system_prompt = """
                 You are a specialized systems biology research assistant designed to help users explore biological pathways, molecular interactions, and systems biology data using the Reactome knowledgebase.
 
                 Your responsibilities are:
@@ -307,31 +282,19 @@ def run_Reactome_agent(query: str) -> str:
                 🦠 Disease Pathways – Identify pathways associated with diseases  
                 🌲 Pathway Hierarchy – Navigate parent/child relationships of biological pathways  
                 🧪 Pathway Participants – Get all molecules involved in a given pathway  
+                (When the server is started with a Reactome release index (REACTOME_INDEX_DIR), Gene-to-Pathways, Pathway Hierarchy and Pathway Participants are answered from it first; results marked "source": "local" come from the full release files and need no further API calls)
                 ⚗️ Biochemical Reactions – Explore detailed biochemical reactions  
                 🔗 Protein Interactions – Discover interaction networks within pathways
 
                 Respond accurately, concisely, and with a deep understanding of systems biology and the Reactome database.
                 """
-            agent = Agent(
-                tools=tools,
-                system_prompt=system_prompt,
-                conversation_manager=conversation_manager,
-                model=model
-            )
-            response = agent(query)
-            return str(response)
-    except Exception as e:
-        logger.error(f"Error in uniprot_agent: {e}")
-        return f"Error: {str(e)}"
+    return _run_agent("reactome", system_prompt, query, budget)
 
-def run_string_db_agent(query: str) -> str:
+def run_string_db_agent(query: str, budget: RunBudget = None) -> str:
     """
     chembl_agent를 실행하고 결과를 반환합니다.
     """
-    try:
-        with make_string_db_mcp_client() as client:
-            tools = client.list_tools_sync()
-            system_prompt = """
+    system_prompt = """
 You are a specialized protein interaction and comparative genomics research assistant designed to help users explore molecular networks using the STRING database.
 
 Your responsibilities include:
@@ -358,26 +321,13 @@ You can also generate structured references using the following MCP resource tem
 
 Be accurate, concise, and always format your response for researchers and AI agents who consume structured protein data. Assume users are familiar with basic molecular biology but not always with the STRING API structure.
 """
-            agent = Agent(
-                tools=tools,
-                system_prompt=system_prompt,
-                conversation_manager=conversation_manager,
-                model=model
-            )
-            response = agent(query)
-            return str(response)
-    except Exception as e:
-        logger.error(f"Error in uniprot_agent: {e}")
-        return f"Error: {str(e)}"
+    return _run_agent("string_db", system_prompt, query, budget)
 
-def run_GeneOntology_agent(query: str) -> str:
+def run_GeneOntology_agent(query: str, budget: RunBudget = None) -> str:
     """
     chembl_agent를 실행하고 결과를 반환합니다.
     """
-    try:
-        with make_GeneOntology_mcp_client() as client:
-            tools = client.list_tools_sync()
-            system_prompt = """
+    system_prompt = """
 You are a specialized Gene Ontology (GO) research assistant operating through a Model Context Protocol (MCP) interface. Your responsibilities include:
 0. Anwser should be in Korean
 1. Understanding user queries related to Gene Ontology terms, annotations, and relationships.
@@ -385,33 +335,23 @@ You are a specialized Gene Ontology (GO) research assistant operating through a
 3. Performing the appropriate API operations to:
     - Search or lookup GO terms by keyword, ID, or name.
     - Explore term definitions and hierarchical relationships (parents/children).
+      Use get_go_ancestors / get_go_descendants / get_go_lowest_common_ancestor for hierarchy questions;
+      they run on a local GO graph in one call instead of walking terms one by one
+      (if the result has release.partial = true, say the hierarchy may be incomplete).
     - Retrieve GO annotations for given genes or proteins.
     - Validate GO term identifiers and report on their existence.
     - Provide ontology-wide statistics, such as term counts or categories.
 
 Respond in a clear and structured format, using scientific language where appropriate. If a GO ID or gene name is not found, respond gracefully with a helpful suggestion.
 """
-            agent = Agent(
-                tools=tools,
-                system_prompt=system_prompt,
-                conversation_manager=conversation_manager,
-                model=model
-            )
-            response = agent(query)
-            return str(response)
-    except Exception as e:
-        logger.error(f"Error in uniprot_agent: {e}")
-        return f"Error: {str(e)}"
+    return _run_agent("geneontology", system_prompt, query, budget)
 
 
-def run_PubChem_agent(query: str) -> str:
+def run_PubChem_agent(query: str, budget: RunBudget = None) -> str:
     """
     chembl_agent를 실행하고 결과를 반환합니다.
     """
-    try:
-        with make_PubChem_mcp_client() as client:
-            tools = client.list_tools_sync()
-            system_prompt = """
+    system_prompt = """
 You are a PubChem research assistant powered by a Model Context Protocol (MCP) server. Your job is to understand natural language queries and extract structured information related to chemical compounds, their properties, bioassays, safety data, and external references. You interface directly with PubChem's API via MCP tools.
 
 Your capabilities include:
@@ -422,6 +362,7 @@ Your capabilities include:
 
 🧬 **Structure Analysis & Similarity**
 - Perform similarity, substructure, and superstructure searches.
+  Prefer local_similarity_search / local_substructure_search (local index, no rate limits) and use the remote searches only when they find nothing.
 - Analyze stereochemistry and retrieve 3D conformers.
 
 ⚗️ **Chemical Properties & Descriptors**
@@ -446,26 +387,13 @@ Respond in structured format (JSON or bullet points), and always include CID or
 Default to English chemical nomenclature. Be concise but detailed. If compound or assay is not found, suggest alternatives.
 Answer should be in Korean
 """
-            agent = Agent(
-                tools=tools,
-                system_prompt=system_prompt,
-                conversation_manager=conversation_manager,
-                model=model
-            )
-            response = agent(query)
-            return str(response)
-    except Exception as e:
-        logger.error(f"Error in uniprot_agent: {e}")
-        return f"Error: {str(e)}"
+    return _run_agent("pubchem", system_prompt, query, budget)
 
-def run_PDB_agent(query: str) -> str:
+def run_PDB_agent(query: str, budget: RunBudget = None) -> str:
     """
     chembl_agent를 실행하고 결과를 반환합니다.
     """
-    try:
-        with make_PDB_mcp_client() as client:
-            tools = client.list_tools_sync()
-            system_prompt = """
+    system_prompt = """
 You are a scientific assistant powered by the Protein Data Bank (PDB) Model Context Protocol (MCP) server. Your role is to help users explore and analyze 3D biomolecular structures through PDB's APIs using structured tools and resources.
 
 Your core capabilities include:
@@ -478,6 +406,7 @@ Your core capabilities include:
 
 📦 **Structure Downloads**
 - Offer downloadable 3D coordinate files in formats like PDB, mmCIF, mmTF, or XML.
+- download_structure returns a file handle and a summary (chains, residue counts, ligands, resolution), not the file itself; use read_structure_section with the handle only when specific records or chains are needed.
 
 🧬 **UniProt Integration**
 - Map UniProt accession numbers to corresponding PDB entries and retrieve their structures.
@@ -498,26 +427,13 @@ Your core capabilities include:
 Your responses should be concise, accurate, and tailored for bioinformatics or structural biology researchers.
 Answer should be in Korean
 """
-            agent = Agent(
-                tools=tools,
-                system_prompt=system_prompt,
-                conversation_manager=conversation_manager,
-                model=model
-            )
-            response = agent(query)
-            return str(response)
-    except Exception as e:
-        logger.error(f"Error in uniprot_agent: {e}")
-        return f"Error: {str(e)}"
+    return _run_agent("pdb", system_prompt, query, budget)
 
-def run_ProteinAtlas_agent(query: str) -> str:
+def run_ProteinAtlas_agent(query: str, budget: RunBudget = None) -> str:
     """
     chembl_agent를 실행하고 결과를 반환합니다.
     """
-    try:
-        with make_ProteinAtlas_mcp_client() as client:
-            tools = client.list_tools_sync()
-            system_prompt = """
+    system_prompt = """
 You are a research-grade assistant powered by the Human Protein Atlas (HPA) Model Context Protocol (MCP) server. Your purpose is to provide structured access to protein expression, localization, pathology, and antibody data through the Human Protein Atlas.
 
 Your capabilities include:
@@ -556,14 +472,24 @@ Your capabilities include:
 You respond like a biomedical research assistant trained for precision and utility.
 Answer should be in Korean
 """
-            agent = Agent(
-                tools=tools,
-                system_prompt=system_prompt,
-                conversation_manager=conversation_manager,
-                model=model
-            )
-            response = agent(query)
-            return str(response)
-    except Exception as e:
-        logger.error(f"Error in uniprot_agent: {e}")
-        return f"Error: {str(e)}"
\ No newline at end of file
+    return _run_agent("proteinatlas", system_prompt, query, budget)
+
+# 외부(HTTP API 등)에서 이름으로 에이전트를 고를 때 쓰는 레지스트리
+AGENT_RUNNERS = {
+    "chembl": run_chembl_agent,
+    "uniprot": run_uniprot_agent,
+    "opentargets": run_OpenTargets_agent,
+    "reactome": run_Reactome_agent,
+    "string_db": run_string_db_agent,
+    "geneontology": run_GeneOntology_agent,
+    "pubchem": run_PubChem_agent,
+    "pdb": run_PDB_agent,
+    "proteinatlas": run_ProteinAtlas_agent,
+}
+
+
+def run_agent(name: str, query: str, budget: RunBudget = None) -> dict:
+    """AGENT_RUNNERS[name] 을 예산과 함께 돌리고 답변과 예산 사용 내역을 돌려준다."""
+    budget = budget or RunBudget()
+    answer = AGENT_RUNNERS[name](query, budget)
+    return {"answer": answer, "budget": budget.report()}
@@ -0,0 +1,99 @@
+# mcp_gateway.py
+"""
+MCP-Gateway(mcp-servers/MCP-Gateway) 클라이언트.
+
+아홉 개 bio 서버를 따로 띄우는 대신, 모두를 한 Node 프로세스에 올린 게이트웨이에
+MCP 연결 하나만 열어 두고(프로세스 수명 동안 유지) 여러 에이전트 실행이 같이 쓴다.
+게이트웨이 도구 이름은 "<namespace>__<tool>" (예: chembl__search_compounds) 이고,
+GatewayNamespace 가 에이전트에게는 접두어를 뗀 원래 이름으로 보여준다.
+
+  MCP_GATEWAY=1            게이트웨이 사용 (mcp_agent.make_client 가 이 모듈을 씀)
+  MCP_GATEWAY_CMD          게이트웨이 실행 명령 (기본: node mcp-servers/MCP-Gateway/build/index.js)
+"""
+import atexit
+import os
+import shlex
+import threading
+
+from mcp import StdioServerParameters, stdio_client
+from strands.tools.mcp import MCPClient
+from strands.tools.mcp.mcp_agent_tool import MCPAgentTool
+
+from logging_config import setup_logging
+
+logger = setup_logging().getChild("mcp_gateway")
+
+ENABLED = os.getenv("MCP_GATEWAY", "0") == "1"
+GATEWAY_CMD = os.getenv("MCP_GATEWAY_CMD", "node mcp-servers/MCP-Gateway/build/index.js")
+SEPARATOR = "__"
+
+_client = None
+_tools = None  # namespace → [mcp.types.Tool (접두어 뗀 이름)]
+_lock = threading.Lock()
+
+
+def _start() -> MCPClient:
+    command, *args = shlex.split(GATEWAY_CMD)
+    client = MCPClient(lambda: stdio_client(StdioServerParameters(command=command, args=args)))
+    client.start()
+    logger.info(f"MCP gateway started: {GATEWAY_CMD}")
+    return client
+
+
+def gateway_client() -> MCPClient:
+    """공유 게이트웨이 연결. 처음 부를 때 띄우고, 세션이 죽었으면 다시 띄운다."""
+    global _client, _tools
+    with _lock:
+        if _client is None or not _client._is_session_active():
+            if _client is not None:
+                logger.warning("MCP gateway session lost, restarting")
+            _client = _start()
+            _tools = None
+        return _client
+
+
+def namespace_tools() -> dict:
+    global _tools
+    client = gateway_client()
+    with _lock:
+        if _tools is None:
+            _tools = {}
+            for t in client.list_tools_sync():
+                ns, _, name = t.mcp_tool.name.partition(SEPARATOR)
+                _tools.setdefault(ns, []).append(t.mcp_tool.model_copy(update={"name": name}))
+        return _tools
+
+
+@atexit.register
+def _shutdown():
+    if _client is not None:
+        try:
+            _client.stop(None, None, None)
+        except Exception:
+            pass
+
+
+class GatewayNamespace:
+    """
+    게이트웨이의 한 네임스페이스를 MCPClient 처럼 쓰게 해 주는 뷰.
+    `with make_client(name) as client:` 패턴을 그대로 쓰되, with 를 빠져나가도 공유 연결은 닫지 않는다.
+    """
+
+    def __init__(self, namespace: str):
+        self.namespace = namespace
+
+    def __enter__(self):
+        gateway_client()
+        return self
+
+    def __exit__(self, *exc):
+        return None
+
+    def list_tools_sync(self) -> list:
+        return [MCPAgentTool(t, self) for t in namespace_tools().get(self.namespace, [])]
+
+    def call_tool_sync(self, tool_use_id: str, name: str, arguments=None, read_timeout_seconds=None):
+        return gateway_client().call_tool_sync(
+            tool_use_id=tool_use_id, name=f"{self.namespace}{SEPARATOR}{name}",
+            arguments=arguments, read_timeout_seconds=read_timeout_seconds,
+        )
@@ -0,0 +1,439 @@
+# model_hedge.py
+"""
+Bedrock 모델 호출의 꼬리 지연 대책: 헤지(hedged) 요청 + 엔드포인트별 서킷 브레이커 + 페일오버.
+
+엔드포인트 = (리전, 모델/inference profile). 모델마다 MODEL_REGIONS 순서대로 같은 ID 를 쓰는 엔드포인트를 둔다
+(us.* 교차 리전 profile 은 us-west-2 / us-east-1 / us-east-2 어느 리전 클라이언트로도 부를 수 있다).
+MODEL_FALLBACKS='{"us.anthropic...sonnet...": "us.anthropic...haiku..."}' 처럼 다른 profile 을 마지막 후보로 붙일 수 있다.
+
+호출 한 번 (call: 응답 전체, stream: 첫 이벤트 기준)
+  1) 브레이커가 닫힌(또는 시험 중인) 첫 엔드포인트로 보낸다
+  2) 헤지 지연(그 엔드포인트의 같은 종류 호출의 최근 응답 지연 p95, [HEDGE_MIN_S, 종류별 상한]) 안에 응답이 없으면
+     다음 엔드포인트로 같은 요청을 하나 더 보내고 먼저 첫 응답을 낸 쪽을 쓴다 (진 쪽은 버린다)
+  3) 첫 응답 전에 에러(스로틀링, 연결 실패 등)가 나면 기다리지 않고 다음 엔드포인트로 넘긴다 (페일오버)
+  헤지는 전체 호출의 HEDGE_BUDGET 비율까지만 (토큰 버킷) — 스로틀링 중에 부하를 두 배로 만들지 않도록.
+  진 쪽 요청의 토큰도 과금되므로 이 비율이 곧 추가 비용 상한이다.
+
+지연 통계는 호출 종류별로 따로 둔다 — 스트림의 첫 이벤트("first")와 응답 전체("full": 비스트리밍 RnG,
+invoke_model 등)는 분포가 전혀 달라서, 섞으면 스트림의 헤지가 늦어지고 길지만 정상인 응답이 "느림" 으로 세진다.
+  first  헤지 기본/상한 HEDGE_DEFAULT_S / HEDGE_MAX_S,            느림 기준 BREAKER_SLOW_S
+  full   헤지 기본/상한 HEDGE_DEFAULT_FULL_S / HEDGE_MAX_FULL_S,  느림 기준 BREAKER_SLOW_FULL_S
+
+서킷 브레이커 (엔드포인트별)
+  최근 BREAKER_WINDOW 번 중 실패(에러, 또는 응답이 그 종류의 느림 기준 초과)가 BREAKER_FAILURE_RATIO 이상이거나
+  BREAKER_CONSECUTIVE 번 연속 실패면 open → BREAKER_COOLDOWN_S 동안 건너뜀 → half-open 에서 한 번 시험.
+  요청 자체가 잘못된 에러(ValidationException, 컨텍스트 초과)는 엔드포인트 탓이 아니므로 세지 않고,
+  다른 엔드포인트로 넘기지도 않는다 (다른 시도가 아직 돌고 있으면 그 결과를 기다린다).
+
+stats() 는 엔드포인트별 호출/실패/헤지/승리/페일오버 수, 브레이커 상태, 종류별 p50/p95 (api_server /metrics/models).
+벤치마크: python -m benchmarks.run_bench --target kb --tail-prob 0.1 --tail-delay 5 (benchmarks/fakes.py 의 지연 주입)
+"""
+import contextvars
+import json
+import os
+import queue
+import threading
+import time
+from collections import deque
+from typing import Any, Iterable, Optional
+
+import boto3
+from botocore.exceptions import ClientError
+from strands.types.exceptions import ContextWindowOverflowException
+from strands.types.models import Model
+
+import profiler
+from logging_config import setup_logging
+
+logger = setup_logging().getChild("model_hedge")
+
+REGIONS = [r.strip() for r in os.getenv("MODEL_REGIONS", "us-west-2,us-east-1").split(",") if r.strip()]
+FALLBACKS = json.loads(os.getenv("MODEL_FALLBACKS", "{}"))
+HEDGE_ENABLED = os.getenv("MODEL_HEDGE", "1") == "1"
+HEDGE_MIN_S = float(os.getenv("HEDGE_MIN_S", "1.0"))
+HEDGE_MAX_S = float(os.getenv("HEDGE_MAX_S", "20"))
+HEDGE_DEFAULT_S = float(os.getenv("HEDGE_DEFAULT_S", "6"))   # 표본이 모이기 전 헤지 지연
+HEDGE_MIN_SAMPLES = 20
+HEDGE_BUDGET = float(os.getenv("HEDGE_BUDGET", "0.1"))        # 헤지할 수 있는 호출 비율
+BREAKER_WINDOW = int(os.getenv("BREAKER_WINDOW", "20"))
+BREAKER_FAILURE_RATIO = float(os.getenv("BREAKER_FAILURE_RATIO", "0.5"))
+BREAKER_MIN_CALLS = 5
+BREAKER_CONSECUTIVE = int(os.getenv("BREAKER_CONSECUTIVE", "5"))
+BREAKER_SLOW_S = float(os.getenv("BREAKER_SLOW_S", "30"))
+# 응답 전체를 기다리는 호출(call)용: 긴 답변 생성도 정상이므로 기준이 훨씬 느슨하다
+HEDGE_DEFAULT_FULL_S = float(os.getenv("HEDGE_DEFAULT_FULL_S", "30"))
+HEDGE_MAX_FULL_S = float(os.getenv("HEDGE_MAX_FULL_S", "90"))
+BREAKER_SLOW_FULL_S = float(os.getenv("BREAKER_SLOW_FULL_S", "120"))
+BREAKER_COOLDOWN_S = float(os.getenv("BREAKER_COOLDOWN_S", "30"))
+LATENCY_WINDOW = 200
+
+# 호출 종류 → (표본 전 헤지 지연, 헤지 지연 상한, 느림 기준)
+KINDS = {
+    "first": (HEDGE_DEFAULT_S, HEDGE_MAX_S, BREAKER_SLOW_S),
+    "full": (HEDGE_DEFAULT_FULL_S, HEDGE_MAX_FULL_S, BREAKER_SLOW_FULL_S),
+}
+
+# 요청이 잘못된 경우: 다른 엔드포인트로 보내도 똑같이 실패하고, 엔드포인트 건강과도 무관
+CALLER_ERROR_CODES = {"ValidationException"}
+
+
+def caller_error(e: Exception) -> bool:
+    if isinstance(e, ContextWindowOverflowException):
+        return True
+    if isinstance(e, ClientError):
+        return e.response.get("Error", {}).get("Code") in CALLER_ERROR_CODES
+    return False
+
+#--------------------------------
+# 엔드포인트 상태
+
+
+class CircuitBreaker:
+    """closed → (실패 누적) open → (cooldown) half-open → 시험 1회 성공이면 closed, 실패면 다시 open."""
+
+    def __init__(self):
+        self.state = "closed"
+        self.opened_at = 0.0
+        self.outcomes = deque(maxlen=BREAKER_WINDOW)   # True = 실패
+        self.consecutive = 0
+        self.trips = 0
+        self._probe_at = None
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        """half-open 이면 시험 호출 하나만 허용. 후보로만 뽑히고 쓰이지 않은 시험은 cooldown 뒤 다시 허용."""
+        with self._lock:
+            if self.state == "closed":
+                return True
+            now = time.monotonic()
+            if self.state == "open" and now - self.opened_at >= BREAKER_COOLDOWN_S:
+                self.state = "half-open"
+                self._probe_at = None
+            if self.state == "half-open" and (self._probe_at is None or now - self._probe_at >= BREAKER_COOLDOWN_S):
+                self._probe_at = now
+                return True
+            return False
+
+    def retry_at(self) -> float:
+        return self.opened_at + BREAKER_COOLDOWN_S if self.state == "open" else 0.0
+
+    def record(self, failed: bool):
+        with self._lock:
+            self.outcomes.append(failed)
+            self.consecutive = self.consecutive + 1 if failed else 0
+            if self.state == "half-open":
+                if failed:
+                    self._open()
+                else:
+                    self.state = "closed"
+                    self.outcomes.clear()
+                self._probe_at = None
+                return
+            if self.state == "closed" and failed:
+                n = len(self.outcomes)
+                if (self.consecutive >= BREAKER_CONSECUTIVE
+                        or (n >= BREAKER_MIN_CALLS and sum(self.outcomes) / n >= BREAKER_FAILURE_RATIO)):
+                    self._open()
+
+    def _open(self):
+        self.state = "open"
+        self.opened_at = time.monotonic()
+        self.trips += 1
+
+
+class Endpoint:
+    def __init__(self, region: str, model_id: str):
+        self.region = region
+        self.model_id = model_id
+        self.name = f"{region}/{model_id}"
+        self.breaker = CircuitBreaker()
+        self.latency = {kind: deque(maxlen=LATENCY_WINDOW) for kind in KINDS}
+        self.counts = {"calls": 0, "errors": 0, "slow": 0, "hedges": 0, "hedge_wins": 0, "failovers": 0}
+        self._lock = threading.Lock()
+
+    def count(self, key: str):
+        with self._lock:
+            self.counts[key] += 1
+
+    def percentile(self, p: float, kind: str = "first") -> Optional[float]:
+        with self._lock:
+            values = sorted(self.latency[kind])
+        if not values:
+            return None
+        return values[min(len(values) - 1, int(p * len(values)))]
+
+    def hedge_delay(self, kind: str = "first") -> float:
+        default, maximum, _ = KINDS[kind]
+        if len(self.latency[kind]) < HEDGE_MIN_SAMPLES:
+            return default
+        return min(maximum, max(HEDGE_MIN_S, self.percentile(0.95, kind)))
+
+    def record(self, latency_s: float = None, error: Exception = None, kind: str = "first"):
+        """시도 하나가 응답(kind 의 기준: 첫 이벤트 / 전체)을 냈거나 그 전에 실패했을 때 (진 시도 포함)."""
+        if error is not None:
+            if caller_error(error):
+                return
+            self.count("errors")
+            self.breaker.record(True)
+            return
+        slow = latency_s > KINDS[kind][2]
+        with self._lock:
+            self.latency[kind].append(latency_s)
+            if slow:
+                self.counts["slow"] += 1
+        self.breaker.record(slow)
+
+    def stats(self) -> dict:
+        with self._lock:
+            counts = dict(self.counts)
+        out = {"endpoint": self.name, **counts, "breaker": self.breaker.state, "breaker_trips": self.breaker.trips}
+        for kind in KINDS:
+            for p in (0.5, 0.95):
+                value = self.percentile(p, kind)
+                out[f"p{int(p * 100)}_{kind}_s"] = round(value, 3) if value is not None else None
+        out["hedge_delay_s"] = round(self.hedge_delay("first"), 3)
+        out["hedge_delay_full_s"] = round(self.hedge_delay("full"), 3)
+        return out
+
+
+_endpoints = {}
+_endpoints_lock = threading.Lock()
+
+
+def endpoint(region: str, model_id: str) -> Endpoint:
+    with _endpoints_lock:
+        key = (region, model_id)
+        if key not in _endpoints:
+            _endpoints[key] = Endpoint(region, model_id)
+        return _endpoints[key]
+
+
+def endpoints_for(model_id: str) -> list:
+    """model_id 의 후보 엔드포인트 (우선순위 순). 같은 (리전, 모델)이면 모든 호출 경로가 상태를 공유한다."""
+    out = [endpoint(region, model_id) for region in REGIONS]
+    fallback = FALLBACKS.get(model_id)
+    if fallback:
+        out.append(endpoint(REGIONS[0], fallback))
+    return out
+
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def client(service: str, region: str):
+    """리전별 boto3 클라이언트 (벤치마크는 set_client 로 대역을 끼운다)."""
+    with _clients_lock:
+        key = (service, region)
+        if key not in _clients:
+            _clients[key] = boto3.client(service, region_name=region)
+        return _clients[key]
+
+
+def set_client(service: str, region: str, value):
+    with _clients_lock:
+        _clients[(service, region)] = value
+
+#--------------------------------
+# 헤지 실행
+
+
+class _HedgeBudget:
+    """호출마다 HEDGE_BUDGET 만큼 쌓이고 헤지 한 번에 1 씩 쓰는 토큰 버킷 (최대 10)."""
+
+    def __init__(self, ratio: float):
+        self.ratio = ratio
+        self.tokens = 1.0
+        self._lock = threading.Lock()
+
+    def deposit(self):
+        with self._lock:
+            self.tokens = min(10.0, self.tokens + self.ratio)
+
+    def take(self) -> bool:
+        with self._lock:
+            if self.tokens >= 1.0:
+                self.tokens -= 1.0
+                return True
+            return False
+
+
+hedge_budget = _HedgeBudget(HEDGE_BUDGET)
+
+
+def _order(endpoints: list) -> list:
+    """브레이커가 허용하는 엔드포인트를 원래 순서대로. 모두 open 이면 가장 먼저 풀릴 것부터 (거절하지 않음)."""
+    allowed = [ep for ep in endpoints if ep.breaker.allow()]
+    if allowed:
+        return allowed
+    return sorted(endpoints, key=lambda ep: ep.breaker.retry_at())
+
+
+class _Attempt:
+    """별도 스레드에서 fn(endpoint) 이터레이터를 돌리며 이벤트를 자기 큐에 넣는다."""
+
+    def __init__(self, ep: Endpoint, fn, signals: queue.Queue, kind: str = "first"):
+        self.endpoint = ep
+        self.kind = kind
+        self.events = queue.Queue()
+        self.cancelled = False
+        self._fn = fn
+        self._signals = signals
+        ctx = contextvars.copy_context()
+        threading.Thread(target=ctx.run, args=(profiler.bind(self._run),), daemon=True,
+                         name=f"hedge-{ep.region}").start()
+
+    def _run(self):
+        ep, t0, first = self.endpoint, time.perf_counter(), False
+        ep.count("calls")
+        iterator = None
+        try:
+            iterator = iter(self._fn(ep))
+            for event in iterator:
+                if not first:
+                    first = True
+                    ep.record(latency_s=time.perf_counter() - t0, kind=self.kind)
+                    self.events.put(("event", event))
+                    self._signals.put((self, None))
+                else:
+                    self.events.put(("event", event))
+                if self.cancelled:
+                    break
+            if not first:
+                # 이벤트 없이 끝난 스트림도 "응답" 이다
+                ep.record(latency_s=time.perf_counter() - t0, kind=self.kind)
+                self._signals.put((self, None))
+            self.events.put(("done", None))
+        except Exception as e:
+            if not first:
+                ep.record(error=e)
+                self._signals.put((self, e))
+            else:
+                self.events.put(("error", e))
+        finally:
+            close = getattr(iterator, "close", None)
+            if close is not None:
+                try:
+                    close()
+                except Exception:
+                    pass
+
+
+def stream(endpoints: list, fn, kind: str = "first") -> Iterable[Any]:
+    """
+    fn(endpoint) → 이터레이터. 첫 이벤트를 가장 먼저 낸 시도의 이벤트를 그대로 흘려보낸다.
+    첫 이벤트 이후의 에러는 (이미 일부를 돌려줬으므로) 다른 엔드포인트로 넘기지 않고 올린다.
+    kind 는 지연 통계/헤지 지연/느림 기준을 고르는 호출 종류 (KINDS).
+    """
+    candidates = _order(endpoints)
+    hedge_budget.deposit()
+    signals = queue.Queue()
+    primary = _Attempt(candidates.pop(0), fn, signals, kind)
+    running = [primary]
+    hedge = None
+    hedge_at = time.monotonic() + primary.endpoint.hedge_delay(kind) if HEDGE_ENABLED else None
+    try:
+        while True:
+            timeout = None
+            if hedge_at is not None and candidates:
+                timeout = max(0.0, hedge_at - time.monotonic())
+            try:
+                attempt, error = signals.get(timeout=timeout)
+            except queue.Empty:
+                hedge_at = None
+                if hedge_budget.take():
+                    ep = candidates.pop(0)
+                    ep.count("hedges")
+                    logger.info(f"hedging {primary.endpoint.name} → {ep.name} after "
+                                f"{primary.endpoint.hedge_delay(kind):.2f}s without a {kind} response")
+                    hedge = _Attempt(ep, fn, signals, kind)
+                    running.append(hedge)
+                continue
+            if error is None:
+                winner = attempt
+                break
+            running.remove(attempt)
+            if running:
+                logger.warning(f"{attempt.endpoint.name} failed before first response: {error}")
+                continue
+            if caller_error(error) or not candidates:
+                raise error
+            ep = candidates.pop(0)
+            ep.count("failovers")
+            logger.warning(f"{attempt.endpoint.name} failed before first response, failing over to {ep.name}: {error}")
+            running.append(_Attempt(ep, fn, signals, kind))
+
+        if winner is hedge:
+            winner.endpoint.count("hedge_wins")
+        while True:
+            ev_kind, value = winner.events.get()
+            if ev_kind == "event":
+                yield value
+            elif ev_kind == "done":
+                return
+            else:
+                raise value
+    finally:
+        # 진 시도와, 호출한 쪽이 중간에 그만 읽은 경우의 이긴 시도까지 다음 이벤트에서 멈추게 한다
+        for attempt in running:
+            attempt.cancelled = True
+
+
+def call(endpoints: list, fn):
+    """fn(endpoint) → 결과. 응답 전체를 "첫 이벤트" 로 보고 stream 과 같은 규칙으로 헤지/페일오버 (지연 통계는 "full")."""
+    for result in stream(endpoints, lambda ep: (fn(ep),), kind="full"):
+        return result
+
+
+def stats() -> list:
+    with _endpoints_lock:
+        eps = list(_endpoints.values())
+    return [ep.stats() for ep in eps]
+
+#--------------------------------
+# strands 용
+
+
+class HedgedModel(Model):
+    """
+    같은 요청을 받을 수 있는 BedrockModel 여러 개 (리전/프로파일별) 를 하나의 strands Model 로 묶는다.
+    converse 는 stream() 규칙으로 헤지/페일오버한다. 설정/포맷은 첫 모델(주 엔드포인트) 기준.
+    """
+
+    def __init__(self, models: list):
+        self.models = models
+        self.endpoints = [endpoint(m.client.meta.region_name, m.config["model_id"]) for m in models]
+        self._by_endpoint = dict(zip((ep.name for ep in self.endpoints), models))
+
+    @property
+    def config(self):
+        return self.models[0].config
+
+    def update_config(self, **model_config: Any) -> None:
+        for m in self.models:
+            m.update_config(**{k: v for k, v in model_config.items() if k != "model_id"})
+
+    def get_config(self) -> Any:
+        return self.models[0].get_config()
+
+    @property
+    def client(self):
+        return self.models[0].client
+
+    @client.setter
+    def client(self, value):
+        for m in self.models:
+            m.client = value
+
+    def format_request(self, messages, tool_specs=None, system_prompt=None) -> Any:
+        return self.models[0].format_request(messages, tool_specs, system_prompt)
+
+    def format_chunk(self, event: Any):
+        return self.models[0].format_chunk(event)
+
+    def stream(self, request: Any) -> Iterable[Any]:
+        return self.models[0].stream(request)
+
+    def converse(self, messages, tool_specs: Optional[list] = None, system_prompt: Optional[str] = None):
+        yield from stream(self.endpoints,
+                          lambda ep: self._by_endpoint[ep.name].converse(messages, tool_specs, system_prompt))
@@ -0,0 +1,279 @@
+# model_router.py
+"""
+단계(step)별 모델 선택과 단계별 지연/비용 리포트.
+
+단계
+  chitchat   - 인사/잡담 (kb_client.general_chat)
+  plan       - 에이전트의 도구 선택/엔티티 추출 턴 (도구를 부르는 턴)
+  synthesis  - 최종 답변 작성 (에이전트 마지막 턴, KB RetrieveAndGenerate)
+  summarize  - 컨텍스트 예산 초과 시 오래된 턴 요약 (conversation_budget)
+
+정책은 MODEL_POLICY 환경변수로 고른다: 프리셋 이름(quality / balanced / fast) 또는
+{"plan": "small", "synthesis": "large", ...} 형태의 JSON. 기본값은 balanced.
+세션/하루 예산(token_meter)을 METER_DOWNGRADE_AT 이상 쓰면 정책과 상관없이 모든 단계를 small 로 보낸다.
+"""
+import json
+import os
+import threading
+import time
+from collections import deque
+from typing import Any, Iterable, Optional
+
+from strands.types.models import Model
+
+import token_meter
+
+REGION = "us-west-2"
+ACCOUNT_ID = os.getenv("BEDROCK_ACCOUNT_ID", "170483442401")
+
+MODELS = {
+    "small": os.getenv("MODEL_SMALL", "us.anthropic.claude-3-5-haiku-20241022-v1:0"),
+    "large": os.getenv("MODEL_LARGE", "us.anthropic.claude-3-7-sonnet-20250219-v1:0"),
+}
+
+# USD / 1K tokens (input, output, cache read, cache write). 리포트/예산용 추정치
+PRICING = {
+    "us.anthropic.claude-3-5-haiku-20241022-v1:0": (0.0008, 0.004, 0.00008, 0.001),
+    "us.anthropic.claude-3-7-sonnet-20250219-v1:0": (0.003, 0.015, 0.0003, 0.00375),
+}
+
+# plan 모델이 도구 호출 전에 이만큼(문자) 넘게 글을 쓰면 최종 답변으로 보고 그 자리에서 끊고 synthesis 로.
+# 0 이면 첫 텍스트 조각에서 바로 (도구 앞의 짧은 머리말까지 plan 모델에 맡기려면 100~200)
+PLAN_PROBE_TEXT_CHARS = int(os.getenv("PLAN_PROBE_TEXT_CHARS", "0"))
+
+POLICIES = {
+    "quality":  {"chitchat": "large", "plan": "large", "synthesis": "large", "summarize": "small"},
+    "balanced": {"chitchat": "small", "plan": "small", "synthesis": "large", "summarize": "small"},
+    "fast":     {"chitchat": "small", "plan": "small", "synthesis": "small", "summarize": "small"},
+}
+
+
+def _load_policy() -> dict:
+    raw = os.getenv("MODEL_POLICY", "balanced").strip()
+    if raw.startswith("{"):
+        return {**POLICIES["balanced"], **json.loads(raw)}
+    return dict(POLICIES[raw])
+
+
+policy = _load_policy()
+
+
+def set_policy(name_or_mapping):
+    """런타임에 정책을 바꾼다 (프리셋 이름 또는 step→tier dict)."""
+    global policy
+    if isinstance(name_or_mapping, str):
+        policy = dict(POLICIES[name_or_mapping])
+    else:
+        policy = {**policy, **name_or_mapping}
+
+
+def tier(step: str) -> str:
+    """step 에 쓸 티어. 세션/하루 예산을 METER_DOWNGRADE_AT 이상 썼으면 모든 단계가 small."""
+    if token_meter.downgraded():
+        return "small"
+    return policy.get(step, "large")
+
+
+def model_for(step: str) -> str:
+    """step 에 쓸 모델(inference profile) ID."""
+    return MODELS[tier(step)]
+
+
+def profile_arn(step: str, region: str = REGION, model_id: str = None) -> str:
+    """RetrieveAndGenerate 처럼 ARN 이 필요한 곳에서 쓰는 inference profile ARN (헤지/페일오버는 다른 리전)."""
+    return f"arn:aws:bedrock:{region}:{ACCOUNT_ID}:inference-profile/{model_id or model_for(step)}"
+
+
+def estimate_cost(model_id: str, input_tokens: int, output_tokens: int,
+                  cache_read_tokens: int = 0, cache_write_tokens: int = 0) -> float:
+    price_in, price_out, price_read, price_write = PRICING.get(model_id, (0.0, 0.0, 0.0, 0.0))
+    return (input_tokens * price_in + output_tokens * price_out
+            + cache_read_tokens * price_read + cache_write_tokens * price_write) / 1000
+
+#--------------------------------
+# 단계별 기록 / 리포트
+
+
+_records = deque(maxlen=5000)
+_records_lock = threading.Lock()
+
+
+def record(step: str, model_id: str, latency_s: float, input_tokens: int = 0, output_tokens: int = 0,
+           wasted: bool = False, cache_read_tokens: int = 0, cache_write_tokens: int = 0,
+           estimated: bool = False, page: str = None):
+    """
+    wasted=True 는 결과를 버린 호출 (예: 작은 모델이 최종 답을 쓰려다 큰 모델로 재요청).
+    최근 기록은 메모리(report 용)에, 세션/페이지별 누적은 token_meter 에 남긴다.
+    """
+    cost = estimate_cost(model_id, input_tokens, output_tokens, cache_read_tokens, cache_write_tokens)
+    token_meter.record(step, model_id, input_tokens, output_tokens, cache_read_tokens, cache_write_tokens,
+                       cost, estimated=estimated, wasted=wasted, page_name=page)
+    with _records_lock:
+        _records.append({
+            "ts": time.time(),
+            "step": step,
+            "model_id": model_id,
+            "latency_s": latency_s,
+            "input_tokens": input_tokens,
+            "output_tokens": output_tokens,
+            "cache_read_tokens": cache_read_tokens,
+            "cache_write_tokens": cache_write_tokens,
+            "cost_usd": cost,
+            "wasted": wasted,
+        })
+
+
+def report(since: float = 0.0) -> list:
+    """(step, model) 별 호출 수 / 평균·p95 지연 / 토큰 / 추정 비용."""
+    with _records_lock:
+        rows = [r for r in _records if r["ts"] >= since]
+    groups = {}
+    for r in rows:
+        groups.setdefault((r["step"], r["model_id"]), []).append(r)
+    out = []
+    for (step, model_id), rs in sorted(groups.items()):
+        lat = sorted(r["latency_s"] for r in rs)
+        out.append({
+            "step": step,
+            "model_id": model_id,
+            "calls": len(rs),
+            "wasted_calls": sum(r["wasted"] for r in rs),
+            "avg_latency_s": round(sum(lat) / len(lat), 3),
+            "p95_latency_s": round(lat[min(len(lat) - 1, int(0.95 * len(lat)))], 3),
+            "input_tokens": sum(r["input_tokens"] for r in rs),
+            "output_tokens": sum(r["output_tokens"] for r in rs),
+            "cache_read_tokens": sum(r["cache_read_tokens"] for r in rs),
+            "cost_usd": round(sum(r["cost_usd"] for r in rs), 5),
+        })
+    return out
+
+#--------------------------------
+# strands 용 라우팅 모델
+
+
+class RoutedModel(Model):
+    """
+    도구를 부를 수 있는 턴은 plan 모델로 먼저 돌리고,
+    plan 모델이 도구 호출 전에 글을 쓰기 시작하면(PLAN_PROBE_TEXT_CHARS 초과) 그 자리에서 스트림을 끊고
+    synthesis 모델로 다시 요청한다 — 버리는 것은 첫 조각까지의 지연뿐, 답 전체를 두 번 생성하지 않는다.
+    도구 목록이 없는 호출은 바로 synthesis 모델로 보낸다.
+
+    models: {"small": BedrockModel, "large": BedrockModel}
+    context_manager: compact(messages) 를 가진 객체. 있으면 매 모델 호출 직전에 불러서
+                     에이전트 루프 중간에도 컨텍스트가 예산 안에 있게 한다.
+    budget_provider: 현재 실행의 agent_budget.RunBudget 을 돌려주는 함수. 예산이 걸린 뒤의
+                     턴은 plan 모델을 건너뛰고 "도구 없이 답하라" 는 지시와 함께 synthesis 로 보낸다.
+    """
+
+    def __init__(self, models: dict, context_manager=None, budget_provider=None):
+        self.models = models
+        self.context_manager = context_manager
+        self.budget_provider = budget_provider
+
+    def _model(self, step: str):
+        return self.models[tier(step)]
+
+    # --- 설정은 synthesis(기본 large) 모델 기준으로 노출, 변경은 모두에게 적용 ---
+    @property
+    def config(self):
+        return self._model("synthesis").config
+
+    def update_config(self, **model_config: Any) -> None:
+        for m in self.models.values():
+            m.update_config(**{k: v for k, v in model_config.items() if k != "model_id"})
+
+    def get_config(self) -> Any:
+        return self._model("synthesis").get_config()
+
+    @property
+    def client(self):
+        return self._model("synthesis").client
+
+    @client.setter
+    def client(self, value):
+        # 벤치마크/테스트에서 가짜 bedrock-runtime 을 끼울 때 모든 티어에 적용
+        for m in self.models.values():
+            m.client = value
+
+    # --- Model 인터페이스 (converse 를 직접 구현하므로 나머지는 synthesis 모델에 위임) ---
+    def format_request(self, messages, tool_specs=None, system_prompt=None) -> Any:
+        return self._model("synthesis").format_request(messages, tool_specs, system_prompt)
+
+    def format_chunk(self, event: Any):
+        return self._model("synthesis").format_chunk(event)
+
+    def stream(self, request: Any) -> Iterable[Any]:
+        return self._model("synthesis").stream(request)
+
+    @staticmethod
+    def _timed(step: str, model, messages, tool_specs, system_prompt, wasted_box=None, budget=None):
+        """model.converse 를 감싸서 지연/토큰을 기록한다."""
+        t0 = time.perf_counter()
+        usage = {}
+        try:
+            for event in model.converse(messages, tool_specs, system_prompt):
+                if budget is not None and budget.partial:
+                    # 호출한 쪽이 이미 마감으로 부분 답변을 돌려줬으면 더 생성하지 않는다
+                    raise TimeoutError("agent run abandoned after deadline")
+                if "metadata" in event:
+                    usage = event["metadata"].get("usage", {}) or usage
+                yield event
+        finally:
+            estimated = False
+            if not usage and wasted_box and wasted_box[0]:
+                # 중간에 끊은 호출은 metadata(usage) 가 오지 않는다: 입력은 그대로 과금되므로 추정해서 남긴다
+                from conversation_budget import estimate_tokens
+                usage = {"inputTokens": estimate_tokens(json.dumps(messages, ensure_ascii=False, default=str)
+                                                        + (system_prompt or ""))}
+                estimated = True
+            record(step, model.config["model_id"], time.perf_counter() - t0,
+                   usage.get("inputTokens", 0), usage.get("outputTokens", 0),
+                   wasted=bool(wasted_box and wasted_box[0]),
+                   cache_read_tokens=usage.get("cacheReadInputTokens", 0),
+                   cache_write_tokens=usage.get("cacheWriteInputTokens", 0),
+                   estimated=estimated)
+            if budget is not None:
+                budget.add_output_tokens(usage.get("outputTokens", 0))
+
+    def converse(self, messages, tool_specs: Optional[list] = None, system_prompt: Optional[str] = None):
+        if self.context_manager is not None:
+            # messages 는 agent.messages 그 자체이므로 제자리 압축이 다음 턴에도 유지된다
+            self.context_manager.compact(messages)
+        budget = self.budget_provider() if self.budget_provider else None
+        synth = self._model("synthesis")
+        if not tool_specs:
+            yield from self._timed("synthesis", synth, messages, tool_specs, system_prompt, budget=budget)
+            return
+        if budget is not None and budget.check_deadline():
+            # 예산 소진: 도구 목록은 (기존 toolUse 블록 때문에) 그대로 두고 답변만 쓰게 한다
+            yield from self._timed("synthesis", synth, messages, tool_specs,
+                                   (system_prompt or "") + budget.synthesis_instruction(), budget=budget)
+            return
+
+        planner = self._model("plan")
+        if planner is synth:
+            yield from self._timed("plan", planner, messages, tool_specs, system_prompt, budget=budget)
+            return
+
+        # plan 모델의 출력을 도구 호출 여부가 정해질 때까지 버퍼링
+        buffered, wasted, text_chars = [], [False], 0
+        stream = self._timed("plan", planner, messages, tool_specs, system_prompt, wasted, budget=budget)
+        for event in stream:
+            start = event.get("contentBlockStart", {}).get("start", {})
+            if "toolUse" in start:
+                yield from buffered
+                yield event
+                yield from stream
+                return
+            text_chars += len(event.get("contentBlockDelta", {}).get("delta", {}).get("text", ""))
+            if text_chars > PLAN_PROBE_TEXT_CHARS or "messageStop" in event:
+                # 도구 없이 답을 쓰기 시작한 턴 = 최종 답변 → 나머지는 생성하지 않고 큰 모델로 다시 작성
+                wasted[0] = True
+                stream.close()
+                break
+            buffered.append(event)
+        else:
+            yield from buffered
+            return
+
+        yield from self._timed("synthesis", synth, messages, tool_specs, system_prompt, budget=budget)
@@ -0,0 +1,85 @@
+import os
+import threading
+import streamlit as st
+import pandas as pd
+import profiler
+import warmup
+from logging_config import setup_logging
+
+logger = setup_logging().getChild("diagnostics_page")
+
+st.title("Diagnostics")
+st.write("인기 질문 캐시 warm-up 상태와, 사이드바 '이 요청 프로파일링' 을 켜거나 API 에 X-Profile: 1 을 붙인 요청의 프로파일입니다.")
+
+# 인기 질문 캐시 warm-up (warmup.py): 최근 질문 중 많이 물은 것이 지금 캐시에 있는 비율
+st.subheader("Cache warm-up")
+status = warmup.status()
+cov = status["coverage"]
+cols = st.columns(3)
+cols[0].metric("인기 질문", cov["questions"])
+cols[1].metric("캐시 커버리지", f"{cov['coverage']:.0%}" if cov["coverage"] is not None else "-")
+cols[2].metric("질문자 기준", f"{cov['asker_coverage']:.0%}" if cov["asker_coverage"] is not None else "-")
+if cov["by_target"]:
+    st.dataframe(pd.DataFrame([{"target": t, **v} for t, v in cov["by_target"].items()]),
+                 hide_index=True, use_container_width=True)
+st.dataframe(pd.DataFrame(status["caches"]), hide_index=True, use_container_width=True)
+st.caption(f"다음 예약: {status['next_run'] or '-'} · 마지막 실행: "
+           + (f"{status['last_run']['started']} ({status['last_run']['replayed']}개 재실행)" if status["last_run"] else "-"))
+if st.button("지금 데우기", help="캐시에 없는 인기 질문을 백그라운드에서 한 번씩 실행합니다 (모델 비용 발생)"):
+    threading.Thread(target=warmup.run, daemon=True, name="warmup-manual").start()
+    st.info("백그라운드에서 시작했습니다. 잠시 후 새로고침하면 커버리지가 갱신됩니다.")
+
+st.subheader("Profiles")
+profiles = profiler.recent()
+if not profiles:
+    st.info(f"아직 프로파일이 없습니다 ({profiler.PROFILE_DIR}).")
+    st.stop()
+
+# 최근 프로파일 목록
+st.dataframe(pd.DataFrame([{
+    "started": p["started"],
+    "name": p["name"],
+    "request": p["request_id"],
+    "wall_s": p["wall_s"],
+    "process_cpu_s": p["process_cpu_s"],
+    "samples": p["samples"],
+    # 가장 많은 샘플이 걸린 분류 (network / json / streamlit / subprocess / wait / python)
+    "mostly": max(p["categories"]["wall"], key=p["categories"]["wall"].get, default="-"),
+} for p in profiles]), hide_index=True, use_container_width=True)
+
+selected = st.selectbox(
+    "프로파일", profiles,
+    format_func=lambda p: f"{p['started']}  {p['name']}  {p['wall_s']}s  ({p['request_id']})",
+)
+
+cols = st.columns(4)
+cols[0].metric("wall", f"{selected['wall_s']}s")
+cols[1].metric("process CPU", f"{selected['process_cpu_s']}s")
+cols[2].metric("samples", selected["samples"])
+cols[3].metric("profiler overhead", f"{selected['overhead_s'] * 1000:.0f}ms")
+
+# 분류별 샘플 수: wall 은 기다린 시간까지, cpu 는 실제로 돈 시간만
+st.subheader("어디에 시간을 썼나")
+st.bar_chart(pd.DataFrame(selected["categories"]).fillna(0))
+
+wall_tab, cpu_tab = st.tabs(["wall (self)", "cpu (self)"])
+with wall_tab:
+    st.dataframe(pd.DataFrame(selected["top_wall"]), hide_index=True, use_container_width=True)
+with cpu_tab:
+    if selected["top_cpu"]:
+        st.dataframe(pd.DataFrame(selected["top_cpu"]), hide_index=True, use_container_width=True)
+    else:
+        st.caption("CPU 샘플이 없습니다 (거의 기다리기만 했거나 /proc 를 읽을 수 없는 환경).")
+
+# 전체 스택은 파일로: speedscope.app 에 끌어다 놓거나 flamegraph.pl 로 SVG 생성
+st.subheader("Flamegraph 파일")
+cols = st.columns(2)
+for col, fmt, label in ((cols[0], "speedscope", "speedscope JSON"), (cols[1], "collapsed", "collapsed stacks")):
+    try:
+        path = profiler.path(selected["id"], fmt)
+    except FileNotFoundError:
+        col.caption(f"{label}: 파일이 정리되었습니다")
+        continue
+    with open(path, "rb") as f:
+        col.download_button(label, f.read(), file_name=os.path.basename(path), key=f"profile_{fmt}")
+st.caption("speedscope JSON 은 https://www.speedscope.app 에 끌어다 놓으면 wall / cpu 프로파일을 볼 수 있습니다.")
@@ -1,8 +1,15 @@
 import streamlit as st
+import history_store
+import profiler
 import logging
 import sys
 import kb_client
+import kb_filters
+import citations
 import os
+from collections import OrderedDict
+import time
+import token_meter
 from logging_config import setup_logging
 
 # logger = logging.getLogger("KB")  # 예: "MCP" 또는 "KB"
@@ -17,47 +24,125 @@ from logging_config import setup_logging
 logger = setup_logging().getChild("kb_page")
 
 
+# 켜 두면 이 세션의 요청을 샘플링 프로파일 (Diagnostics 페이지에서 확인)
+profiler.sidebar_switch()
+
 st.title("KB Page")
 st.write("This is the KB page content.")
 
 
-if "kb_messages" not in st.session_state:
-    st.session_state["kb_messages"] = [
-        {"role": "assistant", "content": "안녕하세요, 무엇이 궁금하세요?"}
-    ]
-# 지난 답변 출력
-for msg in st.session_state.kb_messages:
-    content = msg["content"]
-    st.chat_message(msg["role"]).write(content)
+# 검색 범위 좁히기: 조건에 맞는 문서 안에서만 KNN (kb_filters.py). 비워 두면 질문에 드러난 조건만 자동으로 쓴다
+with st.sidebar.expander("검색 필터"):
+    source_prefix = st.text_input("출처 prefix", placeholder="s3://bucket/papers/2021/")
+    doc_types = st.multiselect("문서 종류", list(kb_filters.DOC_TYPES))
+    this_year = time.localtime().tm_year
+    years = (st.slider("연도", 1990, this_year, (this_year - 5, this_year))
+             if st.checkbox("연도 범위 지정") else None)
+    st.caption("비운 조건은 질문에서 추출합니다 (예: '2020년 이후 특허만'). 맞는 문서가 5개보다 적으면 필터 없이 채웁니다.")
+kb_search_filters = kb_filters.parse({
+    "source_prefix": source_prefix,
+    "doc_types": doc_types,
+    "year_from": years[0] if years else None,
+    "year_to": years[1] if years else None,
+})
+
+
+# 답변별 출처/인용 (seq → {"sources", "citations", "filters"}): 메모리 창(HISTORY_WINDOW)만큼만 둔다
+refs = st.session_state.setdefault("kb_refs", OrderedDict())
+# "원문 보기" 로 읽은 페이지 텍스트: 최근 KB_PAGE_TEXTS 개만
+page_texts = st.session_state.setdefault("kb_page_texts", OrderedDict())
+KB_PAGE_TEXTS = int(os.getenv("KB_PAGE_TEXTS", "8"))
+
+
+def remember_refs(seq, entry):
+    refs[seq] = entry
+    while len(refs) > history_store.HISTORY_WINDOW:
+        refs.popitem(last=False)
+
+
+def load_page(c):
+    key = (c["uri"], c["page"])
+    try:
+        page_texts[key] = citations.page_text(c["uri"], c["page"])
+    except Exception as e:
+        logger.warning(f"citation page fetch failed: {c['uri']} p.{c['page']}: {e}")
+        page_texts[key] = f"페이지를 불러오지 못했습니다: {e}"
+    while len(page_texts) > KB_PAGE_TEXTS:
+        page_texts.popitem(last=False)
+
+
+def render_refs(seq):
+    entry = refs.get(seq)
+    if not entry:
+        return
+    if entry["filters"]:
+        st.caption(f"검색 필터: {kb_filters.describe(entry['filters'])}")
+    # 인용 [#] 별 근거: 청크는 바로, 페이지 원문은 버튼을 누를 때만 range 읽기로 (PDF 전체를 받지 않음)
+    if entry["citations"]:
+        with st.expander("References"):
+            for c in entry["citations"]:
+                filename = os.path.basename(c["uri"])
+                where = f"{filename} p.{c['page']}" if c["page"] else filename
+                if c["url"]:
+                    # 서명 URL + #page=N: 브라우저 PDF 뷰어가 그 페이지로 열린다
+                    st.markdown(
+                        f'[{c["ref"]}] <a href="{c["url"]}" target="_blank" style="text-decoration: none; color: #1f77b4;">📎 {where}</a>',
+                        unsafe_allow_html=True
+                    )
+                else:
+                    st.markdown(f"[{c['ref']}] 📎 {where}")
+                st.caption(c["chunk"])
+                if c["page"] and st.button(f"p.{c['page']} 원문 보기", key=f"kb_citation_btn_{seq}_{c['ref']}"):
+                    load_page(c)
+                if (c["uri"], c["page"]) in page_texts:
+                    st.text(page_texts[(c["uri"], c["page"])])
+    # 검색에 쓰인 PDF 전체 목록 ([#] 인용이 없는 답변도 출처는 보이도록)
+    if entry["sources"]:
+        with st.expander("PDF URI"):
+            for pdf_url in entry["sources"]:
+                filename = os.path.basename(pdf_url)
+                # 하이퍼링크: PDF 이름을 누르면 다운로드
+                st.markdown(
+                    f'<a href="{pdf_url}" target="_blank" style="text-decoration: none; color: #1f77b4;">📎 {filename}</a>',
+                    unsafe_allow_html=True
+                )
+
+
+history = history_store.get_history("kb_messages", greeting="안녕하세요, 무엇이 궁금하세요?")
+# 지난 답변 출력 (최근 창만 메모리, 이전 대화는 "더 보기" 로 디스크에서). 버튼을 누르면 rerun 되므로 인용도 여기서 그린다
+history_store.render_chat(history, extra=render_refs)
 
 
 #유저가 쓴 chat을 query라는 변수에 담음
 query = st.chat_input("Search documentation")
 if query:
     # Session에 메세지 저장
-    st.session_state.kb_messages.append({"role": "user", "content": query})
+    history.append("user", query)
     
     # UI에 출력
     st.chat_message("user").write(query)
 
-    # UI 출력
-    param = kb_client.query(query)
-    answer = param[0]
-    s3_uri_list = param[1]
-        
-
-    # Session 메세지 저장 (전체 결과 저장)
-    st.session_state.kb_messages.append({"role": "assistant", "content": answer})
-
-    st.chat_message("assistant").write(answer)
-    with st.expander("PDF URI"):
-        for s3_uri in s3_uri_list:
-            pdf_url = s3_uri
-
-            filename = os.path.basename(pdf_url)
+    # UI 출력 (스트리밍: 도착하는 조각을 바로 그림)
+    answer = ""
+    entry = {"sources": [], "citations": [], "filters": {}}
+    with st.chat_message("assistant"):
+        placeholder = st.empty()
+        try:
+            for event in kb_client.query_stream(query, kb_search_filters):
+                if event["type"] == "text":
+                    answer += event["text"]
+                    placeholder.markdown(answer + "▌")
+                elif event["type"] == "done":
+                    # 어려움 문구 체크 / 링크 변환은 끝난 뒤 한 번에 적용됨
+                    answer = event["answer"]
+                    entry = {"sources": event["sources"], "citations": event["citations"],
+                             "filters": event.get("filters") or {}}
+        except token_meter.BudgetExceeded as e:
+            # 세션/하루 토큰 예산 초과: 모델을 부르지 않고 안내만
+            answer = str(e)
+        placeholder.markdown(answer)
 
-            # 하이퍼링크: PDF 이름을 누르면 다운로드
-            st.markdown(
-                f'<a href="{pdf_url}" target="_blank" style="text-decoration: none; color: #1f77b4;">📎 {filename}</a>',
-                unsafe_allow_html=True
-            )
+        # Session 메세지 저장 (전체 결과 저장)
+        seq = history.append("assistant", answer)
+        remember_refs(seq, entry)
+        render_refs(seq)
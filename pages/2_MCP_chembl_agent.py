@@ -1,4 +1,6 @@
 import streamlit as st
+import history_store
+import profiler
 import mcp_agent
 import sys
 import asyncio
@@ -14,23 +16,22 @@ logger = setup_logging().getChild("chembl_mcp_page")  # 페이지명
 #     logger.addHandler(handler)
 # logger.setLevel(logging.INFO)
 
+# 켜 두면 이 세션의 요청을 샘플링 프로파일 (Diagnostics 페이지에서 확인)
+profiler.sidebar_switch()
+
 st.title("CHEMBL_MCP Page")
 st.write("This is the CHEMBL_MCP page content.")
 
-if "CHEMBL_MCP_messages" not in st.session_state:
-    st.session_state["CHEMBL_MCP_messages"] = [
-        {"role": "assistant", "content": "안녕하세요, 무엇이 궁금하세요?"}
-    ]
-# 지난 답변 출력
-for msg in st.session_state.CHEMBL_MCP_messages:
-    st.chat_message(msg["role"]).write(msg["content"])
+history = history_store.get_history("CHEMBL_MCP_messages", greeting="안녕하세요, 무엇이 궁금하세요?")
+# 지난 답변 출력 (최근 창만 메모리, 이전 대화는 "더 보기" 로 디스크에서)
+history_store.render_chat(history)
 
 
 #유저가 쓴 chat을 query라는 변수에 담음
 query = st.chat_input("chat with CHEMBL_MCP_messages")
 if query:
     # Session에 메세지 저장
-    st.session_state.CHEMBL_MCP_messages.append({"role": "user", "content": query})
+    history.append("user", query)
     
     # UI에 출력
     st.chat_message("user").write(query)
@@ -41,4 +42,4 @@ if query:
     st.chat_message("assistant").write(answer)
 
     # Session 메세지 저장
-    st.session_state.CHEMBL_MCP_messages.append({"role": "assistant", "content": answer})
+    history.append("assistant", answer)
@@ -1,4 +1,6 @@
 import streamlit as st
+import history_store
+import profiler
 import mcp_agent
 import logging
 import sys
@@ -11,23 +13,22 @@ if not logger.hasHandlers():
     logger.addHandler(handler)
 logger.setLevel(logging.INFO)
 
+# 켜 두면 이 세션의 요청을 샘플링 프로파일 (Diagnostics 페이지에서 확인)
+profiler.sidebar_switch()
+
 st.title("PDB_MCP Page")
 st.write("This is the PDB_MCP page content.")
 
-if "PDB_mcp_messages" not in st.session_state:
-    st.session_state["PDB_mcp_messages"] = [
-        {"role": "assistant", "content": "안녕하세요, 무엇이 궁금하세요?"}
-    ]
-# 지난 답변 출력
-for msg in st.session_state.PDB_mcp_messages:
-    st.chat_message(msg["role"]).write(msg["content"])
+history = history_store.get_history("PDB_mcp_messages", greeting="안녕하세요, 무엇이 궁금하세요?")
+# 지난 답변 출력 (최근 창만 메모리, 이전 대화는 "더 보기" 로 디스크에서)
+history_store.render_chat(history)
 
 
 #유저가 쓴 chat을 query라는 변수에 담음
 query = st.chat_input("chat with MCP")
 if query:
     # Session에 메세지 저장
-    st.session_state.PDB_mcp_messages.append({"role": "user", "content": query})
+    history.append("user", query)
     
     # UI에 출
     st.chat_message("user").write(query)
@@ -37,4 +38,4 @@ if query:
     st.chat_message("assistant").write(answer)
 
     # Session 메세지 저장
-    st.session_state.PDB_mcp_messages.append({"role": "assistant", "content": answer})
+    history.append("assistant", answer)
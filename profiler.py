@@ -0,0 +1,374 @@
+# profiler.py
+"""
+요청 하나를 골라서 켜는 샘플링 프로파일러 (재배포 없이 운영 중 핫스팟 찾기).
+
+켜는 방법 (기본은 꺼짐, 켜진 요청만 비용을 낸다)
+  - API: X-Profile: 1 헤더 또는 ?profile=1  (api_server)
+  - Streamlit: 사이드바 "이 요청 프로파일링" 스위치 (sidebar_switch)
+  - PROFILE_SAMPLE_RATE=0.01 이면 켜지 않은 요청도 1% 는 자동으로
+kb_client.query / query_stream 과 mcp_agent._run_agent (모든 run_*_agent) 가 profiling() 으로 감싼다.
+
+샘플러 스레드가 PROFILE_INTERVAL_MS 마다 sys._current_frames() 로 스택을 뜬다.
+대상은 요청을 시작한 스레드 + 지금 같은 request_id 의 일을 하는 스레드. 다른 스레드의 contextvars 는
+밖에서 읽을 수 없으므로, 풀에 일을 넘기는 곳이 bind(fn) / tagged() 로 스레드에 request_id 를 표시한다
+(api_server 워커, agent_budget 도구 풀·agent-run, tool_prefetch, model_hedge 시도). 표시하지 않는
+스레드(MCP 클라이언트의 이벤트 루프 등)는 빠지고, 동시에 도는 다른 요청의 스레드는 섞이지 않는다.
+요청 ID 가 없는 실행(Streamlit 등)은 profiling() 이 새 request_id 를 걸어 준다.
+  wall  모든 샘플 (네트워크/서브프로세스/락을 기다린 시간 포함)
+  cpu   그 순간 스레드가 실행 중(R)이던 샘플만 (/proc/self/task/<tid>/stat, 리눅스 외에서는 비어 있음)
+각 샘플은 가장 안쪽 프레임부터 CATEGORIES 를 찾아 분류한다 (network / json / streamlit / subprocess / wait / python).
+
+결과는 PROFILE_DIR 에 최근 PROFILE_KEEP 개만:
+  <id>.speedscope.json  https://www.speedscope.app 에 끌어다 놓으면 wall / cpu 두 프로파일
+  <id>.collapsed.txt    flamegraph.pl / inferno 용 (thread;frame;...;frame count, wall)
+  <id>.meta.json        요약 (recent() → 진단 페이지, GET /diagnostics/profiles)
+"""
+import collections
+import contextlib
+import contextvars
+import functools
+import inspect
+import json
+import os
+import random
+import re
+import sys
+import threading
+import time
+import uuid
+
+from logging_config import request_id, session_id, setup_logging
+
+logger = setup_logging().getChild("profiler")
+
+PROFILE_DIR = os.getenv("PROFILE_DIR", ".profiles")
+PROFILE_INTERVAL_MS = float(os.getenv("PROFILE_INTERVAL_MS", "5"))
+PROFILE_KEEP = int(os.getenv("PROFILE_KEEP", "20"))
+PROFILE_MAX_S = float(os.getenv("PROFILE_MAX_S", "300"))       # 이보다 길면 샘플링만 멈춘다
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+MAX_DEPTH = 128
+TOP_FRAMES = 20
+
+# 가장 안쪽 프레임부터 올라가며 처음 맞는 분류 (파일 경로 조각)
+CATEGORIES = [
+    ("network", ("ssl.py", "socket.py", "http/client.py", "urllib3/", "httpcore/", "httpx/",
+                 "botocore/", "boto3/", "opensearchpy/", "requests/")),
+    ("json", ("json/",)),
+    ("streamlit", ("streamlit/",)),
+    ("subprocess", ("subprocess.py", "selectors.py", "asyncio/", "anyio/", "mcp/")),
+    ("wait", ("threading.py", "queue.py", "concurrent/futures/")),
+]
+
+# 이번 요청을 프로파일할지 (api_server / 사이드바가 건다). 진행 중인 Sampler 는 _current.
+requested = contextvars.ContextVar("profile_requested", default=False)
+_current = contextvars.ContextVar("profile_current", default=None)
+# 스레드 ident → 그 스레드가 지금 일하는 request_id (tagged 가 쓰고 샘플러는 읽기만 한다)
+_thread_requests = {}
+
+_PREFIX_RE = re.compile(r".*/(?:site-packages|dist-packages|lib/python\d+\.\d+)/")
+_ROOT = os.path.dirname(os.path.abspath(__file__)) + os.sep
+
+
+def _short(path: str) -> str:
+    if path.startswith(_ROOT):
+        return path[len(_ROOT):]
+    return _PREFIX_RE.sub("", path)
+
+
+# 모든 스레드 바닥에 깔리는 프레임 (threading.py 지만 "wait" 가 아님)
+_BOOTSTRAP = {"_bootstrap", "_bootstrap_inner", "run"}
+
+
+def _category(codes) -> str:
+    for code in codes:
+        path = code.co_filename
+        if code.co_name in _BOOTSTRAP and path.endswith("threading.py"):
+            continue
+        for name, fragments in CATEGORIES:
+            if any(f in path for f in fragments):
+                return name
+    return "python"
+
+
+def _running(native_id: int):
+    """스레드가 지금 CPU 에서 도는 중인지. 알 수 없으면 None."""
+    try:
+        with open(f"/proc/self/task/{native_id}/stat", "rb") as f:
+            stat = f.read()
+    except OSError:
+        return None
+    # "pid (comm) S ..." — comm 에 공백/괄호가 있을 수 있으므로 마지막 ')' 뒤를 본다
+    return stat[stat.rindex(b")") + 2:stat.rindex(b")") + 3] == b"R"
+
+#--------------------------------
+# 샘플러
+
+
+class Sampler:
+    def __init__(self, name: str):
+        self.name = name
+        self.id = f"{time.strftime('%Y%m%d-%H%M%S')}-{re.sub(r'[^A-Za-z0-9_-]', '_', name)}-{uuid.uuid4().hex[:6]}"
+        self.request = request_id.get()
+        self.session = session_id.get()
+        self.wall = collections.Counter()     # (thread, frame index...) → 샘플 수
+        self.cpu = collections.Counter()
+        self.categories = {"wall": collections.Counter(), "cpu": collections.Counter()}
+        self.frames = []                      # speedscope shared.frames
+        self._frame_index = {}                # code 객체 → frames 인덱스
+        self._root = threading.get_ident()
+        self._names = {}
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True, name=f"profiler-{name}")
+        self.samples = 0
+        self.overhead_s = 0.0
+
+    def start(self):
+        self._t0 = time.perf_counter()
+        self._cpu0 = time.process_time()
+        self.started = time.time()
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """샘플링을 멈춘다. 파일 저장은 샘플러 스레드가 하므로 요청을 붙잡지 않는다."""
+        self.wall_s = time.perf_counter() - self._t0
+        self.cpu_s = time.process_time() - self._cpu0
+        self._stop.set()
+
+    def _frame(self, code) -> int:
+        idx = self._frame_index.get(code)
+        if idx is None:
+            idx = self._frame_index[code] = len(self.frames)
+            self.frames.append({"name": code.co_name, "file": _short(code.co_filename),
+                                "line": code.co_firstlineno})
+        return idx
+
+    def _thread_name(self, ident: int):
+        if ident not in self._names:
+            for t in threading.enumerate():
+                self._names.setdefault(t.ident, (t.name, t.native_id))
+        return self._names.get(ident, (f"thread-{ident}", None))
+
+    def _sample(self):
+        me = threading.get_ident()
+        for ident, frame in sys._current_frames().items():
+            if ident == me or (ident != self._root and _thread_requests.get(ident) != self.request):
+                continue
+            codes = []
+            while frame is not None and len(codes) < MAX_DEPTH:
+                codes.append(frame.f_code)
+                frame = frame.f_back
+            name, native_id = self._thread_name(ident)
+            # 스레드 이름의 숫자는 지우고 묶는다 (kb-worker_3 → kb-worker_)
+            stack = (re.sub(r"\d+", "", name),) + tuple(self._frame(c) for c in reversed(codes))
+            category = _category(codes)
+            self.wall[stack] += 1
+            self.categories["wall"][category] += 1
+            if native_id is not None and _running(native_id):
+                self.cpu[stack] += 1
+                self.categories["cpu"][category] += 1
+        self.samples += 1
+
+    def _run(self):
+        interval = PROFILE_INTERVAL_MS / 1000.0
+        deadline = time.monotonic() + PROFILE_MAX_S
+        while not self._stop.wait(interval) and time.monotonic() < deadline:
+            t0 = time.perf_counter()
+            try:
+                self._sample()
+            except Exception as e:
+                logger.warning(f"[{self.name}] sample failed: {e}")
+            self.overhead_s += time.perf_counter() - t0
+        self._stop.wait()
+        try:
+            self.save()
+        except OSError as e:
+            logger.warning(f"[{self.name}] profile not saved: {e}")
+
+    #--------------------------------
+    # 저장
+
+    def _top(self, counter) -> list:
+        """자기 시간(self) 기준 상위 프레임: 가장 안쪽 프레임별 샘플 수."""
+        own = collections.Counter()
+        for stack, n in counter.items():
+            if len(stack) > 1:
+                own[stack[-1]] += n
+        total = sum(counter.values()) or 1
+        return [{"frame": self.frames[i]["name"], "file": f"{self.frames[i]['file']}:{self.frames[i]['line']}",
+                 "samples": n, "pct": round(100.0 * n / total, 1)} for i, n in own.most_common(TOP_FRAMES)]
+
+    def summary(self) -> dict:
+        return {
+            "id": self.id,
+            "name": self.name,
+            "request_id": self.request,
+            "session_id": self.session,
+            "started": time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(self.started)),
+            "wall_s": round(self.wall_s, 3),
+            "process_cpu_s": round(self.cpu_s, 3),
+            "interval_ms": PROFILE_INTERVAL_MS,
+            "samples": self.samples,
+            "overhead_s": round(self.overhead_s, 4),
+            "categories": {kind: dict(c.most_common()) for kind, c in self.categories.items()},
+            "top_wall": self._top(self.wall),
+            "top_cpu": self._top(self.cpu),
+        }
+
+    def _speedscope(self) -> dict:
+        weight = PROFILE_INTERVAL_MS
+        frames = [{"name": "[" + t + "]"} for t in sorted({s[0] for s in self.wall})]
+        thread_frame = {f["name"][1:-1]: i for i, f in enumerate(frames)}
+        offset = len(frames)
+        frames += [{"name": f["name"], "file": f["file"], "line": f["line"]} for f in self.frames]
+
+        def profile(kind, counter):
+            samples = [[thread_frame[s[0]]] + [offset + i for i in s[1:]] for s in counter]
+            return {"type": "sampled", "name": f"{self.name} ({kind})", "unit": "milliseconds",
+                    "startValue": 0, "endValue": sum(counter.values()) * weight,
+                    "samples": samples, "weights": [n * weight for n in counter.values()]}
+
+        return {
+            "$schema": "https://www.speedscope.app/file-format-schema.json",
+            "name": f"{self.name} {self.request}",
+            "exporter": "profiler.py",
+            "activeProfileIndex": 0,
+            "shared": {"frames": frames},
+            "profiles": [profile("wall", self.wall), profile("cpu", self.cpu)],
+        }
+
+    def _collapsed(self) -> str:
+        def label(i):
+            f = self.frames[i]
+            return f"{f['name']} ({f['file']}:{f['line']})".replace(";", ":")
+        return "".join(f"{';'.join([s[0]] + [label(i) for i in s[1:]])} {n}\n" for s, n in self.wall.items())
+
+    def save(self):
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        base = os.path.join(PROFILE_DIR, self.id)
+        with open(base + ".speedscope.json", "w", encoding="utf-8") as f:
+            json.dump(self._speedscope(), f)
+        with open(base + ".collapsed.txt", "w", encoding="utf-8") as f:
+            f.write(self._collapsed())
+        # meta 를 마지막에 써야 recent() 가 반쯤 쓴 프로파일을 보지 않는다
+        with open(base + ".meta.json", "w", encoding="utf-8") as f:
+            json.dump(self.summary(), f, ensure_ascii=False)
+        logger.info(f"[{self.name}] profile {self.id}: {self.wall_s:.2f}s wall, {self.samples} samples, "
+                    f"overhead {self.overhead_s * 1000:.0f}ms")
+        prune()
+
+#--------------------------------
+# 켜고 끄기
+
+
+@contextlib.contextmanager
+def tagged(request: str = None):
+    """with 블록 동안 이 스레드를 request(기본: 현재 request_id) 의 일로 표시한다."""
+    ident = threading.get_ident()
+    prev = _thread_requests.get(ident)
+    _thread_requests[ident] = request or request_id.get()
+    try:
+        yield
+    finally:
+        if prev is None:
+            _thread_requests.pop(ident, None)
+        else:
+            _thread_requests[ident] = prev
+
+
+def bind(fn):
+    """지금 request_id 로 표시한 채 fn 을 부르는 함수. 다른 스레드로 넘길 때: pool.submit(profiler.bind(fn), ...)."""
+    request = request_id.get()
+
+    @functools.wraps(fn)
+    def run(*args, **kwargs):
+        with tagged(request):
+            return fn(*args, **kwargs)
+    return run
+
+
+@contextlib.contextmanager
+def profiling(name: str, enabled: bool = None):
+    """with 블록을 프로파일한다 (requested 가 켜졌거나 PROFILE_SAMPLE_RATE 에 걸린 요청만). 중첩되면 바깥 것만."""
+    if enabled is None:
+        enabled = requested.get() or (PROFILE_SAMPLE_RATE > 0 and random.random() < PROFILE_SAMPLE_RATE)
+    if not enabled or _current.get() is not None:
+        yield None
+        return
+    # 요청 ID 가 없으면 하나 걸어서 이 실행이 넘기는 스레드를 구분할 수 있게 한다
+    request_token = request_id.set(uuid.uuid4().hex[:12]) if request_id.get() == "-" else None
+    sampler = Sampler(name).start()
+    token = _current.set(sampler)
+    try:
+        yield sampler
+    finally:
+        _current.reset(token)
+        if request_token is not None:
+            request_id.reset(request_token)
+        sampler.stop()
+
+
+def profiled(name: str):
+    """함수(또는 제너레이터 함수)를 profiling(name) 으로 감싸는 데코레이터."""
+    def wrap(fn):
+        if inspect.isgeneratorfunction(fn):
+            @functools.wraps(fn)
+            def gen(*args, **kwargs):
+                with profiling(name):
+                    yield from fn(*args, **kwargs)
+            return gen
+
+        @functools.wraps(fn)
+        def call(*args, **kwargs):
+            with profiling(name):
+                return fn(*args, **kwargs)
+        return call
+    return wrap
+
+
+def sidebar_switch():
+    """Streamlit 페이지 사이드바 스위치. 켜 두면 이 세션의 요청을 프로파일한다 (진단 페이지에서 확인)."""
+    import streamlit as st
+    requested.set(st.sidebar.toggle("이 요청 프로파일링", key="profile_requests",
+                                    help="켜 두면 요청마다 스택 샘플을 떠서 Diagnostics 페이지에 남깁니다"))
+
+#--------------------------------
+# 조회
+
+
+def recent(limit: int = PROFILE_KEEP) -> list:
+    """최근 프로파일 요약 (새 것부터)."""
+    try:
+        names = [n for n in os.listdir(PROFILE_DIR) if n.endswith(".meta.json")]
+    except FileNotFoundError:
+        return []
+    out = []
+    for n in sorted(names, reverse=True)[:limit]:
+        try:
+            with open(os.path.join(PROFILE_DIR, n), encoding="utf-8") as f:
+                out.append(json.load(f))
+        except (OSError, ValueError):
+            continue
+    return out
+
+
+def path(profile_id: str, fmt: str = "speedscope") -> str:
+    """프로파일 파일 경로. 없는 ID 면 FileNotFoundError."""
+    if not re.fullmatch(r"[A-Za-z0-9_-]+", profile_id or ""):
+        raise FileNotFoundError(profile_id)
+    p = os.path.join(PROFILE_DIR, f"{profile_id}.{'speedscope.json' if fmt == 'speedscope' else 'collapsed.txt'}")
+    if not os.path.exists(p):
+        raise FileNotFoundError(profile_id)
+    return p
+
+
+def prune(keep: int = PROFILE_KEEP):
+    """최근 keep 개만 남긴다 (이름이 시각으로 시작하므로 이름 순 = 시간 순)."""
+    try:
+        ids = sorted({n.split(".", 1)[0] for n in os.listdir(PROFILE_DIR)})
+    except FileNotFoundError:
+        return
+    for old in ids[:-keep] if keep > 0 else ids:
+        for suffix in (".meta.json", ".speedscope.json", ".collapsed.txt"):
+            with contextlib.suppress(OSError):
+                os.remove(os.path.join(PROFILE_DIR, old + suffix))
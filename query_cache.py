@@ -0,0 +1,96 @@
+# query_cache.py
+"""
+같은 질문에 대한 결과 캐시 (프로세스 메모리, LRU + TTL).
+
+KB 질문과 에이전트 질문은 대화 문맥 없이 질문 한 줄로 결과가 정해지므로(temperature 0)
+정규화한 질문을 키로 재사용한다. 아침마다 warmup 이 어제까지 많이 물은 질문으로 미리 채운다.
+
+  kb.retrieval   질문 → KNN 검색 결과 (임베딩 + KNN 생략)        KB_RETRIEVAL_CACHE_TTL_S
+  kb.answer      질문 → RnG 답변 + 출처 (임베딩/KNN/생성 모두 생략) KB_ANSWER_CACHE_TTL_S
+  agent.answer   (에이전트, 질문) → 답변 (MCP 서버/도구/모델 생략)  AGENT_ANSWER_CACHE_TTL_S
+TTL 을 0 으로 두면 그 캐시는 끈다. 크기는 QUERY_CACHE_SIZE (캐시마다).
+"""
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+
+from logging_config import setup_logging
+
+logger = setup_logging().getChild("query_cache")
+
+QUERY_CACHE_SIZE = int(os.getenv("QUERY_CACHE_SIZE", "512"))
+
+_SPACE_RE = re.compile(r"\s+")
+
+
+def normalize(question: str) -> str:
+    """공백/대소문자/끝 문장부호 차이는 같은 질문으로 본다."""
+    return _SPACE_RE.sub(" ", question or "").strip().rstrip("?!.。 ").lower()
+
+
+class QueryCache:
+    def __init__(self, name: str, ttl_s: float, size: int = QUERY_CACHE_SIZE):
+        self.name = name
+        self.ttl_s = ttl_s
+        self.size = size
+        self._items = OrderedDict()   # key → (저장 시각, 값)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl_s > 0
+
+    def _fresh(self, key):
+        item = self._items.get(key)
+        if item is None:
+            return None
+        if time.time() - item[0] > self.ttl_s:
+            del self._items[key]
+            return None
+        return item
+
+    def get(self, key):
+        if not self.enabled:
+            return None
+        with self._lock:
+            item = self._fresh(key)
+            if item is None:
+                self.misses += 1
+                return None
+            self._items.move_to_end(key)
+            self.hits += 1
+            return item[1]
+
+    def put(self, key, value):
+        if not self.enabled:
+            return
+        with self._lock:
+            self._items[key] = (time.time(), value)
+            self._items.move_to_end(key)
+            while len(self._items) > self.size:
+                self._items.popitem(last=False)
+
+    def __contains__(self, key) -> bool:
+        """적중 통계를 건드리지 않고 들어 있는지만 (warmup 커버리지 계산용)."""
+        with self._lock:
+            return self.enabled and self._fresh(key) is not None
+
+    def stats(self) -> dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return {"cache": self.name, "entries": len(self._items), "size": self.size, "ttl_s": self.ttl_s,
+                    "hits": self.hits, "misses": self.misses,
+                    "hit_ratio": round(self.hits / total, 3) if total else None}
+
+
+kb_retrieval = QueryCache("kb.retrieval", float(os.getenv("KB_RETRIEVAL_CACHE_TTL_S", "21600")))
+kb_answer = QueryCache("kb.answer", float(os.getenv("KB_ANSWER_CACHE_TTL_S", "21600")))
+agent_answer = QueryCache("agent.answer", float(os.getenv("AGENT_ANSWER_CACHE_TTL_S", "21600")))
+
+
+def stats() -> list:
+    return [c.stats() for c in (kb_retrieval, kb_answer, agent_answer)]
@@ -1,6 +1,7 @@
 import streamlit as st
 import logging
 import sys
+import warmup
 from logging_config import setup_logging
 
 
@@ -16,6 +17,9 @@ from logging_config import setup_logging
 root_logger = setup_logging()
 root_logger.info("앱 시작")
 
+# 매일 WARM_AT 에 어제까지의 인기 질문으로 KB/에이전트 캐시를 채운다 (프로세스당 한 번만 예약됨)
+warmup.schedule()
+
 st.set_page_config(
     page_title="JW Pharmaceutical AI PoC",
     layout="wide",
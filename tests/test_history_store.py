@@ -0,0 +1,36 @@
+# tests/test_history_store.py
+import importlib
+import time
+
+import pytest
+
+
+@pytest.fixture
+def history_store(tmp_path, monkeypatch):
+    monkeypatch.setenv("HISTORY_DB", str(tmp_path / "history.sqlite"))
+    import history_store
+    module = importlib.reload(history_store)
+    yield module
+    if module._conn is not None:
+        module._conn.close()
+
+
+def test_log_query_keeps_every_question_from_one_client(history_store):
+    history_store.log_query("api:kb", "what is egfr", session="api:10.0.0.1")
+    history_store.log_query("api:kb", "what is kras", session="api:10.0.0.1")
+    history_store.log_query("api:kb", "what is egfr", session="api:10.0.0.1")
+
+    rows = history_store.user_questions(time.time() - 60)
+    asked = {content: askers for channel, content, askers, _ in rows if channel == "api:kb"}
+    assert asked == {"what is egfr": 1, "what is kras": 1}
+    seqs = history_store._execute("SELECT seq FROM messages WHERE session = ? ORDER BY seq", ("api:10.0.0.1",))
+    assert [s for (s,) in seqs] == [0, 1, 2]
+
+
+def test_log_query_counts_distinct_clients(history_store):
+    history_store.log_query("api:kb", "what is egfr", session="api:a")
+    history_store.log_query("api:kb", "what is egfr", session="api:b")
+    history_store.log_query("api:chembl", "what is egfr", session="api:a")
+
+    rows = history_store.user_questions(time.time() - 60)
+    assert {(channel, askers) for channel, content, askers, _ in rows} == {("api:kb", 2), ("api:chembl", 1)}
@@ -0,0 +1,218 @@
+# token_meter.py
+"""
+모델 호출별 토큰/비용 계량과 세션·하루 예산.
+
+model_router.record() 가 호출 한 번마다 여기 record() 를 불러 SQLite(METER_DB) 에 한 줄씩 쌓는다.
+  시각, 날짜, session, page, request, step, model, 입력/출력/캐시 읽기/캐시 쓰기 토큰, 추정 비용
+session / request 는 logging_config 의 contextvars (Streamlit 은 history_store.get_history 가 세션을 건다),
+page 는 metering(page) 로 건 이름 (mcp_agent 는 에이전트 이름, kb_client 는 "kb").
+
+예산 (USD, 0 이면 끔)
+  METER_SESSION_BUDGET_USD  세션 하나가 쓸 수 있는 금액 (세션 ID 가 없는 호출 "-" 은 제외)
+  METER_DAILY_BUDGET_USD    하루 전체 (로컬 날짜 기준)
+  METER_DOWNGRADE_AT        예산의 이 비율을 넘으면 모든 단계를 작은 모델로 (model_router.tier)
+예산을 다 쓰면 enforce() 가 BudgetExceeded 를 던져 새 요청을 거절한다. 이미 돌고 있는 실행은 끝까지 간다.
+
+  python token_meter.py report --by page --days 7
+"""
+import argparse
+import contextlib
+import contextvars
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from logging_config import request_id, session_id, setup_logging
+
+logger = setup_logging().getChild("token_meter")
+
+METER_DB = os.getenv("METER_DB", ".token_meter.sqlite")
+METER_TTL_DAYS = float(os.getenv("METER_TTL_DAYS", "90"))
+SESSION_BUDGET_USD = float(os.getenv("METER_SESSION_BUDGET_USD", "0"))
+DAILY_BUDGET_USD = float(os.getenv("METER_DAILY_BUDGET_USD", "0"))
+DOWNGRADE_AT = float(os.getenv("METER_DOWNGRADE_AT", "0.8"))
+
+GROUP_COLUMNS = {"page": "page", "session": "session", "model": "model_id", "step": "step", "day": "day"}
+
+page = contextvars.ContextVar("meter_page", default="-")
+
+_conn = None
+_conn_lock = threading.Lock()
+# 예산 판정은 매 모델 호출마다 하므로 합계는 메모리에 두고, 처음 볼 때만 DB 에서 읽는다
+_session_cost = {}
+_day_cost = {}
+
+
+class BudgetExceeded(Exception):
+    """세션 또는 하루 예산을 다 써서 새 요청을 받지 않음."""
+
+
+def _db() -> sqlite3.Connection:
+    global _conn
+    if _conn is None:
+        conn = sqlite3.connect(METER_DB, check_same_thread=False, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.executescript("""
+            CREATE TABLE IF NOT EXISTS calls (
+                ts REAL NOT NULL, day TEXT NOT NULL, session TEXT NOT NULL, page TEXT NOT NULL,
+                request TEXT NOT NULL, step TEXT NOT NULL, model_id TEXT NOT NULL,
+                input_tokens INTEGER NOT NULL, output_tokens INTEGER NOT NULL,
+                cache_read_tokens INTEGER NOT NULL, cache_write_tokens INTEGER NOT NULL,
+                cost_usd REAL NOT NULL, estimated INTEGER NOT NULL, wasted INTEGER NOT NULL);
+            CREATE INDEX IF NOT EXISTS calls_day ON calls (day);
+            CREATE INDEX IF NOT EXISTS calls_session ON calls (session);
+        """)
+        _conn = conn
+        prune()
+    return _conn
+
+
+def _execute(sql: str, args=()):
+    with _conn_lock:
+        return _db().execute(sql, args).fetchall()
+
+
+def prune(max_age_days: float = METER_TTL_DAYS):
+    """오래된 기록 삭제 (DB 를 처음 열 때 한 번)."""
+    _conn.execute("DELETE FROM calls WHERE ts < ?", (time.time() - max_age_days * 86400,))
+
+
+def _today() -> str:
+    return time.strftime("%Y-%m-%d")
+
+#--------------------------------
+# 기록
+
+
+@contextlib.contextmanager
+def metering(name: str):
+    """with 블록 안의 모델 호출을 page=name 으로 기록한다."""
+    token = page.set(name)
+    try:
+        yield
+    finally:
+        page.reset(token)
+
+
+def record(step: str, model_id: str, input_tokens: int = 0, output_tokens: int = 0,
+           cache_read_tokens: int = 0, cache_write_tokens: int = 0, cost_usd: float = 0.0,
+           estimated: bool = False, wasted: bool = False, page_name: str = None):
+    """호출 한 번. estimated=True 는 응답에 usage 가 없어 글자 수로 추정한 토큰 (RetrieveAndGenerate)."""
+    day, session = _today(), session_id.get()
+    try:
+        with _conn_lock:
+            _db().execute(
+                "INSERT INTO calls VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (time.time(), day, session, page_name or page.get(), request_id.get(), step, model_id,
+                 input_tokens, output_tokens, cache_read_tokens, cache_write_tokens, cost_usd,
+                 int(estimated), int(wasted)))
+            # 아직 안 읽은 합계는 다음 spent() 때 DB 에서 (방금 넣은 줄 포함) 읽힌다
+            if day in _day_cost:
+                _day_cost[day] += cost_usd
+            if session in _session_cost:
+                _session_cost[session] += cost_usd
+    except sqlite3.Error as e:
+        logger.warning(f"usage record failed: {e}")
+
+#--------------------------------
+# 예산
+
+
+def spent(session: str = None) -> dict:
+    """현재(또는 주어진) 세션과 오늘 쓴 금액."""
+    session = session or session_id.get()
+    day = _today()
+    # 읽고 채우는 것을 record() 와 같은 락 안에서: 그 사이에 들어온 호출이 빠지거나 두 번 더해지지 않게
+    with _conn_lock:
+        if day not in _day_cost:
+            _day_cost.clear()
+            _day_cost[day] = _db().execute(
+                "SELECT COALESCE(SUM(cost_usd), 0) FROM calls WHERE day = ?", (day,)).fetchone()[0]
+        if session not in _session_cost:
+            if len(_session_cost) >= 10000:
+                _session_cost.clear()
+            _session_cost[session] = _db().execute(
+                "SELECT COALESCE(SUM(cost_usd), 0) FROM calls WHERE session = ?", (session,)).fetchone()[0]
+        return {"session": session, "session_usd": _session_cost[session], "day": day, "day_usd": _day_cost[day]}
+
+
+def usage_ratio(session: str = None) -> float:
+    """세션/하루 예산 중 더 많이 쓴 쪽의 사용 비율 (예산이 없으면 0)."""
+    if not SESSION_BUDGET_USD and not DAILY_BUDGET_USD:
+        return 0.0
+    s = spent(session)
+    ratio = 0.0
+    if SESSION_BUDGET_USD and s["session"] != "-":
+        ratio = s["session_usd"] / SESSION_BUDGET_USD
+    if DAILY_BUDGET_USD:
+        ratio = max(ratio, s["day_usd"] / DAILY_BUDGET_USD)
+    return ratio
+
+
+def downgraded() -> bool:
+    """예산의 DOWNGRADE_AT 이상을 썼으면 True (model_router 가 모든 단계를 작은 모델로 보냄)."""
+    return usage_ratio() >= DOWNGRADE_AT
+
+
+def enforce():
+    """예산을 다 썼으면 BudgetExceeded. 요청을 시작하기 전에 부른다."""
+    if not SESSION_BUDGET_USD and not DAILY_BUDGET_USD:
+        return
+    s = spent()
+    if DAILY_BUDGET_USD and s["day_usd"] >= DAILY_BUDGET_USD:
+        logger.warning(f"daily budget exhausted: ${s['day_usd']:.4f} / ${DAILY_BUDGET_USD}")
+        raise BudgetExceeded(f"오늘 사용 예산(${DAILY_BUDGET_USD:g})을 모두 사용했습니다. 내일 다시 시도해 주세요.")
+    if SESSION_BUDGET_USD and s["session"] != "-" and s["session_usd"] >= SESSION_BUDGET_USD:
+        logger.warning(f"session budget exhausted: {s['session']} ${s['session_usd']:.4f} / ${SESSION_BUDGET_USD}")
+        raise BudgetExceeded(f"이 세션의 사용 예산(${SESSION_BUDGET_USD:g})을 모두 사용했습니다.")
+
+
+def budget_status() -> dict:
+    return {**spent(), "session_budget_usd": SESSION_BUDGET_USD, "daily_budget_usd": DAILY_BUDGET_USD,
+            "downgrade_at": DOWNGRADE_AT, "downgraded": downgraded()}
+
+#--------------------------------
+# 집계
+
+
+def aggregate(by: str = "page", days: float = 1.0, session: str = None) -> list:
+    """by(page / session / model / step / day) 별 호출 수, 토큰, 추정 비용. 비용이 큰 순."""
+    column = GROUP_COLUMNS[by]
+    where, args = "ts >= ?", [time.time() - days * 86400]
+    if session:
+        where += " AND session = ?"
+        args.append(session)
+    rows = _execute(
+        f"SELECT {column}, COUNT(*), SUM(input_tokens), SUM(output_tokens), SUM(cache_read_tokens), "
+        f"SUM(cache_write_tokens), SUM(cost_usd), SUM(estimated), SUM(wasted) "
+        f"FROM calls WHERE {where} GROUP BY {column} ORDER BY SUM(cost_usd) DESC", args)
+    return [{
+        by: key,
+        "calls": calls,
+        "input_tokens": tin,
+        "output_tokens": tout,
+        "cache_read_tokens": cread,
+        "cache_write_tokens": cwrite,
+        "cost_usd": round(cost, 5),
+        "estimated_calls": estimated,
+        "wasted_calls": wasted,
+    } for key, calls, tin, tout, cread, cwrite, cost, estimated, wasted in rows]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="token / cost usage report")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    p = sub.add_parser("report")
+    p.add_argument("--by", choices=sorted(GROUP_COLUMNS), default="page")
+    p.add_argument("--days", type=float, default=1.0)
+    p.add_argument("--session")
+    sub.add_parser("budget")
+    args = parser.parse_args()
+
+    if args.cmd == "report":
+        print(json.dumps(aggregate(args.by, args.days, args.session), ensure_ascii=False, indent=2))
+    else:
+        print(json.dumps(budget_status(), ensure_ascii=False, indent=2))
@@ -0,0 +1,203 @@
+# tool_prefetch.py
+"""
+첫 도구 호출 추측 실행(speculative prefetch).
+
+에이전트의 첫 턴은 거의 항상 "질문에서 이름/ID 를 뽑아 search_* / get_* 호출" 이다.
+모델이 첫 턴을 생각하는 동안 같은 호출을 미리 날려 두고, 모델이 실제로 같은 호출
+(도구 이름 + 입력이 같음)을 하면 그 결과를 돌려준다. 안 쓰인 결과는 실행이 끝나면 버린다.
+
+  guess_calls(agent, query)  - 로컬 규칙으로 (tool_name, input) 후보를 만든다 (모델 호출 없음)
+  Prefetcher                 - 후보를 병렬로 실행하고 take() 로 꺼내 주는 실행 단위 캐시
+"""
+import json
+import os
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import profiler
+from bio_ids import extract_ids
+from logging_config import setup_logging
+
+logger = setup_logging().getChild("tool_prefetch")
+
+ENABLED = os.getenv("AGENT_PREFETCH", "1") != "0"
+MAX_GUESSES = int(os.getenv("AGENT_PREFETCH_MAX", "2"))
+TTL_S = float(os.getenv("AGENT_PREFETCH_TTL_S", "60"))
+
+_pool = ThreadPoolExecutor(max_workers=int(os.getenv("AGENT_PREFETCH_THREADS", "8")),
+                           thread_name_prefix="tool-prefetch")
+
+#--------------------------------
+# 질문 → 후보 호출 (로컬 규칙)
+
+_WORD = re.compile(r"[A-Za-z0-9][A-Za-z0-9\-]*")
+_GENE = re.compile(r"^[A-Z][A-Z0-9\-]{1,9}$")
+# 엔티티 이름이 아닌 영어 단어 (질문에 섞여 나오는 용어)
+_STOP = {
+    "a", "an", "the", "of", "for", "and", "or", "in", "on", "to", "with", "by", "about", "is", "are",
+    "what", "which", "how", "show", "find", "search", "get", "list", "tell", "me", "please",
+    "info", "information", "detail", "details", "data", "structure", "structures", "compound", "compounds",
+    "protein", "proteins", "gene", "genes", "target", "targets", "drug", "drugs", "disease", "diseases",
+    "pathway", "pathways", "inhibitor", "inhibitors", "activity", "activities", "expression", "interaction",
+    "interactions", "term", "terms", "function", "id", "ids", "smiles", "inchi", "cas", "cid", "pdb",
+    "go", "uniprot", "chembl", "pubchem", "reactome", "string", "opentargets", "hpa", "dna", "rna",
+    "api", "mcp", "human", "mouse", "ic50", "ki", "admet", "mw", "logp", "partner", "partners", "network",
+    "similar", "related", "associated", "association", "associations", "mechanism", "property", "properties",
+    "sequence", "domain", "domains", "localization", "tissue", "tissues", "summary",
+}
+
+
+def _phrases(query: str) -> list:
+    """질문 속 영문 토큰 중 불용어가 아닌 연속 구간 (예: "breast cancer", "EGFR")."""
+    ids = set(extract_ids(query))
+    phrases, current = [], []
+    for m in _WORD.finditer(query):
+        word = m.group(0)
+        if not word[0].isalpha() or word.lower() in _STOP or word in ids or word.upper() in ids:
+            if current:
+                phrases.append(" ".join(current))
+                current = []
+            continue
+        # 사이에 공백만 있을 때만 한 구로 묶는다
+        if current and query[m.start() - 1] != " ":
+            phrases.append(" ".join(current))
+            current = []
+        current.append(word)
+    if current:
+        phrases.append(" ".join(current))
+    return phrases
+
+
+def _split(query: str):
+    """(식별자 dict, 유전자 기호 목록, 그 밖의 이름 목록)"""
+    ids = {}
+    for kind in ("chembl", "pubchem_cid", "uniprot", "go", "reactome", "pdb"):
+        found = extract_ids(query, kinds=[kind])
+        if found:
+            ids[kind] = found
+    genes = [p for p in _phrases(query) if _GENE.match(p) and any(c.isalpha() for c in p)]
+    names = [p for p in _phrases(query) if p not in genes and len(p) >= 3]
+    return ids, genes, names
+
+
+def _cid(value: str) -> str:
+    return re.sub(r"\D", "", value)
+
+
+def guess_calls(agent: str, query: str) -> list:
+    """agent(AGENT_RUNNERS 키, 대소문자 무관)의 첫 도구 호출 후보 [(tool_name, input), ...]."""
+    ids, genes, names = _split(query)
+    agent = agent.lower()
+    g = []
+    if agent == "chembl":
+        g += [("get_compound_info", {"chembl_id": i.upper()}) for i in ids.get("chembl", [])]
+        g += [("search_targets", {"query": x}) for x in genes]
+        g += [("search_compounds", {"query": x}) for x in names]
+    elif agent == "pubchem":
+        g += [("get_compound_info", {"cid": _cid(i)}) for i in ids.get("pubchem_cid", [])]
+        g += [("search_compounds", {"query": x}) for x in names + genes]
+    elif agent == "pdb":
+        g += [("get_structure_info", {"pdb_id": i}) for i in ids.get("pdb", [])]
+        g += [("search_by_uniprot", {"uniprot_id": i}) for i in ids.get("uniprot", [])]
+        g += [("search_structures", {"query": x}) for x in genes + names]
+    elif agent == "uniprot":
+        g += [("get_protein_info", {"accession": i}) for i in ids.get("uniprot", [])]
+        g += [("search_by_gene", {"gene": x}) for x in genes]
+        g += [("search_proteins", {"query": x}) for x in names]
+    elif agent == "geneontology":
+        g += [("get_go_term", {"id": i}) for i in ids.get("go", [])]
+        g += [("search_go_terms", {"query": x}) for x in names + genes]
+    elif agent == "reactome":
+        g += [("get_pathway_details", {"id": i}) for i in ids.get("reactome", [])]
+        g += [("search_pathways", {"query": x}) for x in names + genes]
+    elif agent == "opentargets":
+        g += [("search_targets", {"query": x}) for x in genes]
+        g += [("search_diseases", {"query": x}) for x in names]
+    elif agent == "proteinatlas":
+        g += [("get_protein_info", {"gene": x}) for x in genes]
+        g += [("search_proteins", {"query": x}) for x in names]
+    elif agent == "string_db":
+        g += [("get_protein_interactions", {"protein_id": x}) for x in genes]
+        g += [("search_proteins", {"query": x}) for x in names]
+
+    seen, out = set(), []
+    for name, args in g:
+        key = _key(name, args)
+        if key not in seen:
+            seen.add(key)
+            out.append((name, args))
+    return out[:MAX_GUESSES]
+
+#--------------------------------
+# 실행 단위 캐시
+
+
+def _norm(v):
+    if isinstance(v, str):
+        return v.strip().casefold()
+    if isinstance(v, dict):
+        return {k: _norm(x) for k, x in v.items()}
+    if isinstance(v, list):
+        return [_norm(x) for x in v]
+    return v
+
+
+def _key(tool_name: str, args: dict) -> str:
+    return tool_name + ":" + json.dumps(_norm(args or {}), sort_keys=True, ensure_ascii=False)
+
+
+class Prefetcher:
+    """
+    start() 로 후보 호출을 띄우고, 도구 래퍼가 take() 로 같은 호출의 결과를 꺼내 간다.
+    call_fn(tool, tool_use) 는 실제 호출 함수 (agent_budget.call_tool).
+    """
+
+    def __init__(self, agent: str, tools: list, call_fn):
+        self.agent = agent
+        self.tools = {t.tool_name: t for t in tools if hasattr(t, "tool_name")}
+        self.call_fn = call_fn
+        self.entries = {}  # key → (started, future)
+        self.hits = 0
+        self.misses = 0
+
+    def start(self, query: str):
+        if not ENABLED:
+            return self
+        for i, (name, args) in enumerate(guess_calls(self.agent, query)):
+            tool = self.tools.get(name)
+            if tool is None:
+                continue
+            tool_use = {"toolUseId": f"prefetch-{i}", "name": name, "input": args}
+            self.entries[_key(name, args)] = (time.monotonic(), _pool.submit(profiler.bind(self.call_fn), tool, tool_use))
+            logger.info(f"[{self.agent}] prefetch {name} {args}")
+        return self
+
+    def take(self, tool_use: dict, timeout: float):
+        """같은 호출을 미리 해 뒀으면 그 결과(toolUseId 를 바꿔서), 아니면 None."""
+        entry = self.entries.pop(_key(tool_use["name"], tool_use.get("input")), None)
+        if entry is None:
+            if self.entries:
+                self.misses += 1
+            return None
+        started, future = entry
+        if time.monotonic() - started > TTL_S:
+            return None
+        try:
+            result = future.result(timeout=timeout)
+        except Exception as e:
+            logger.info(f"[{self.agent}] prefetch {tool_use['name']} unusable: {e}")
+            return None
+        self.hits += 1
+        return {**result, "toolUseId": tool_use["toolUseId"]}
+
+    def close(self) -> dict:
+        """안 쓰인 prefetch 를 버리고 통계를 돌려준다."""
+        unused = len(self.entries)
+        for _, future in self.entries.values():
+            future.cancel()
+        self.entries.clear()
+        stats = {"hits": self.hits, "misses": self.misses, "unused": unused}
+        if self.hits or unused:
+            logger.info(f"[{self.agent}] prefetch {stats}")
+        return stats
@@ -0,0 +1,234 @@
+# warmup.py
+"""
+자주 묻는 질문으로 캐시 미리 채우기 (아침 첫 질문자가 콜드 비용을 내지 않도록).
+
+history_store 에 쌓인 최근 WARM_DAYS 일의 사용자 질문(Streamlit 페이지 + api_server)을
+정규화해서 묶고, 물어본 세션 수가 많은 순으로 KB 는 WARM_TOP_KB 개, 에이전트는 WARM_TOP_AGENT 개를 고른다.
+아직 캐시에 없는 질문만 kb_client.query / mcp_agent.run_agent 로 한 번씩 다시 돌린다.
+  - 채워지는 것: query_cache (KB 검색/답변, 에이전트 답변), 임베딩/KNN/모델 엔드포인트 지연 통계(model_hedge),
+    MCP-Gateway 프로세스와 그 안의 로컬 인덱스, PDB 디스크 캐시, 인용 서명 URL 등
+  - 낮은 우선순위: 스레드 하나로 순서대로, 질문 사이 WARM_PAUSE_S 쉬고, busy() 가 참이면(요청 처리 중) 기다린다
+  - 비용은 token_meter 에 session "warmup" 으로 남는다 (세션 예산 METER_SESSION_BUDGET_USD 가 상한)
+
+캐시는 프로세스 메모리이므로 서비스하는 프로세스 안에서 돌아야 한다.
+api_server 는 시작할 때 schedule() 을 불러 매일 WARM_AT(현지 시각, 예 "07:30") 에 돌리고,
+Streamlit 도 streamlit.py 에서 같은 일을 한다. 커버리지는 status() (GET /diagnostics/warmup, Diagnostics 페이지).
+
+  python warmup.py top      후보 질문 목록 (무엇을 데울지 미리 보기)
+  python warmup.py run      이 프로세스에서 한 번 돌리고 커버리지 출력 (디스크 캐시/동작 확인용)
+"""
+import argparse
+import json
+import os
+import threading
+import time
+import uuid
+
+import history_store
+import query_cache
+import token_meter
+from logging_config import log_context, setup_logging
+
+logger = setup_logging().getChild("warmup")
+
+WARM_DAYS = float(os.getenv("WARM_DAYS", "3"))
+WARM_TOP_KB = int(os.getenv("WARM_TOP_KB", "30"))
+WARM_TOP_AGENT = int(os.getenv("WARM_TOP_AGENT", "10"))
+WARM_MIN_ASKERS = int(os.getenv("WARM_MIN_ASKERS", "2"))     # 이 수 이상의 세션이 물어본 질문만
+WARM_AT = os.getenv("WARM_AT", "07:30")                     # 빈 값이면 예약하지 않음
+WARM_ON_START = os.getenv("WARM_ON_START", "0") == "1"
+WARM_PAUSE_S = float(os.getenv("WARM_PAUSE_S", "2"))
+WARM_MAX_S = float(os.getenv("WARM_MAX_S", "1800"))
+WARM_BUSY_WAIT_S = 1.0
+
+# history_store 채널(페이지 키) → 대상. api_server 는 "api:kb" / "api:<에이전트>" 로 남긴다
+# (세션은 "api:<클라이언트>" 라서 같은 클라이언트의 반복 질문은 한 명으로 센다).
+CHANNEL_TARGETS = {
+    "kb_messages": "kb",
+    "CHEMBL_MCP_messages": "chembl",
+    "chembl_chat_history": "chembl",  # 11_MCP_chembl_agent_stream.py
+    "OpenTargets_mcp_messages": "opentargets",
+    "string_db_mcp_messages": "string_db",
+    "GeneOntology_mcp_messages": "geneontology",
+    "PDB_mcp_messages": "pdb",
+    "ProteinAtlas_mcp_messages": "proteinatlas",
+}
+
+_last_run = None
+_next_run = None
+_run_lock = threading.Lock()
+_schedule_lock = threading.Lock()
+_scheduled = False
+
+
+def _target(channel: str):
+    if channel.startswith("api:"):
+        return channel[4:]
+    return CHANNEL_TARGETS.get(channel)
+
+#--------------------------------
+# 후보 / 커버리지
+
+
+def candidates(days: float = WARM_DAYS, top_kb: int = WARM_TOP_KB, top_agent: int = WARM_TOP_AGENT,
+               min_askers: int = WARM_MIN_ASKERS) -> list:
+    """[{target, question, askers, last_asked}] — 대상별로 많이 물은 순 (KB 먼저)."""
+    merged = {}
+    for channel, content, askers, last in history_store.user_questions(time.time() - days * 86400):
+        target = _target(channel)
+        key = query_cache.normalize(content)
+        if target is None or not key:
+            continue
+        item = merged.setdefault((target, key), {"target": target, "question": content, "askers": 0, "last_asked": 0})
+        # 세션 수는 채널마다 따로 세었으므로 더해도 (거의) 중복이 없다
+        item["askers"] += askers
+        if last > item["last_asked"]:
+            item["question"], item["last_asked"] = content, last
+    ranked = sorted((c for c in merged.values() if c["askers"] >= min_askers),
+                    key=lambda c: (-c["askers"], -c["last_asked"]))
+    kb = [c for c in ranked if c["target"] == "kb"][:top_kb]
+    agents = [c for c in ranked if c["target"] != "kb"][:top_agent]
+    return kb + agents
+
+
+def cached(c: dict) -> bool:
+    key = query_cache.normalize(c["question"])
+    if c["target"] == "kb":
+        return key in query_cache.kb_answer
+    return (c["target"], key) in query_cache.agent_answer
+
+
+def coverage(cands: list = None) -> dict:
+    """후보 질문 중 지금 캐시에 있는 비율 (질문 수 기준, 물어본 세션 수 가중)."""
+    cands = candidates() if cands is None else cands
+    hot = [cached(c) for c in cands]
+    askers = sum(c["askers"] for c in cands)
+    by_target = {}
+    for c, h in zip(cands, hot):
+        t = by_target.setdefault(c["target"], {"questions": 0, "cached": 0})
+        t["questions"] += 1
+        t["cached"] += int(h)
+    return {
+        "questions": len(cands),
+        "cached": sum(hot),
+        "coverage": round(sum(hot) / len(cands), 3) if cands else None,
+        "asker_coverage": round(sum(c["askers"] for c, h in zip(cands, hot) if h) / askers, 3) if askers else None,
+        "by_target": by_target,
+    }
+
+#--------------------------------
+# 실행
+
+
+def _lower_priority():
+    # 리눅스에서는 스레드마다 nice 를 따로 줄 수 있다 (GIL 경합은 WARM_PAUSE_S / busy 로 줄인다)
+    try:
+        os.setpriority(os.PRIO_PROCESS, threading.get_native_id(), 10)
+    except (AttributeError, OSError):
+        pass
+
+
+def _replay(c: dict):
+    if c["target"] == "kb":
+        import kb_client
+        kb_client.query(c["question"])
+        return
+    import mcp_agent
+    answer = mcp_agent.run_agent(c["target"], c["question"])["answer"]
+    if answer.startswith("Error"):
+        raise RuntimeError(answer[:200])
+
+
+def run(busy=None, max_s: float = WARM_MAX_S, days: float = WARM_DAYS) -> dict:
+    """캐시에 없는 후보를 한 번씩 돌린다. busy() 가 참이면 그동안 기다린다. 결과 요약을 돌려준다."""
+    global _last_run
+    if not _run_lock.acquire(blocking=False):
+        logger.info("warm-up already running")
+        return _last_run
+    try:
+        cands = candidates(days=days)
+        before = coverage(cands)
+        started, t0 = time.time(), time.perf_counter()
+        result = {"started": time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(started)), "replayed": 0,
+                  "already_hot": 0, "failed": 0, "stopped": None, "coverage_before": before}
+        logger.info(f"warm-up: {len(cands)} candidates, coverage {before['coverage']}")
+        with log_context(session="warmup"):
+            for c in cands:
+                if time.perf_counter() - t0 > max_s:
+                    result["stopped"] = "time limit"
+                    break
+                if cached(c):
+                    result["already_hot"] += 1
+                    continue
+                while busy is not None and busy() and time.perf_counter() - t0 <= max_s:
+                    time.sleep(WARM_BUSY_WAIT_S)
+                with log_context(request=uuid.uuid4().hex[:12]):
+                    try:
+                        _replay(c)
+                        result["replayed"] += 1
+                    except token_meter.BudgetExceeded as e:
+                        result["stopped"] = f"budget: {e}"
+                        break
+                    except Exception as e:
+                        result["failed"] += 1
+                        logger.warning(f"warm-up {c['target']} failed: {c['question'][:60]!r}: {e}")
+                time.sleep(WARM_PAUSE_S)
+        result["elapsed_s"] = round(time.perf_counter() - t0, 1)
+        result["coverage_after"] = coverage(cands)
+        logger.info(f"warm-up done: {json.dumps({k: v for k, v in result.items() if not k.startswith('coverage')})} "
+                    f"coverage {before['coverage']} → {result['coverage_after']['coverage']}")
+        _last_run = result
+        return result
+    finally:
+        _run_lock.release()
+
+
+def _seconds_until(hhmm: str) -> float:
+    hour, minute = (int(x) for x in hhmm.split(":"))
+    now = time.localtime()
+    target = time.mktime((now.tm_year, now.tm_mon, now.tm_mday, hour, minute, 0, 0, 0, -1))
+    if target <= time.time():
+        target += 86400
+    return target - time.time()
+
+
+def schedule(busy=None):
+    """백그라운드 스레드로 매일 WARM_AT 에 run() (WARM_ON_START=1 이면 시작하자마자 한 번 더). 여러 번 불러도 하나만."""
+    global _scheduled
+    with _schedule_lock:
+        if _scheduled or (not WARM_AT and not WARM_ON_START):
+            return
+        _scheduled = True
+
+    def loop():
+        global _next_run
+        _lower_priority()
+        if WARM_ON_START:
+            run(busy)
+        while WARM_AT:
+            wait = _seconds_until(WARM_AT)
+            _next_run = time.strftime("%Y-%m-%d %H:%M", time.localtime(time.time() + wait))
+            time.sleep(wait)
+            try:
+                run(busy)
+            except Exception as e:
+                logger.error(f"warm-up failed: {e}")
+
+    threading.Thread(target=loop, daemon=True, name="warmup").start()
+    logger.info(f"warm-up scheduled daily at {WARM_AT or '-'} (on start: {WARM_ON_START})")
+
+
+def status() -> dict:
+    return {"next_run": _next_run, "last_run": _last_run, "coverage": coverage(), "caches": query_cache.stats()}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="cache warm-up from popular questions")
+    parser.add_argument("cmd", choices=["top", "run"])
+    parser.add_argument("--days", type=float, default=WARM_DAYS)
+    args = parser.parse_args()
+
+    if args.cmd == "top":
+        print(json.dumps(candidates(days=args.days), ensure_ascii=False, indent=2))
+    else:
+        print(json.dumps(run(days=args.days), ensure_ascii=False, indent=2))